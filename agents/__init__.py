@@ -1,4 +1,5 @@
 from .graph import compliance_graph
-from .state import ComplianceState
+from .results import ResultAccumulator
+from .state import ComplianceState, initial_state
 
-__all__ = ["compliance_graph", "ComplianceState"]
\ No newline at end of file
+__all__ = ["compliance_graph", "ComplianceState", "initial_state", "ResultAccumulator"]
@@ -0,0 +1,81 @@
+"""
+Amendment reviews - carry a previous version's extraction onto a restated plan
+
+extract_features, given the previous version of the document, sends the
+LLM only the passages that changed (tools.plan_diff). The reply states
+just what those passages say; every field it leaves null keeps the
+previous version's value:
+
+    features = inherit(previous, delta)
+    field_drift(previous, features)    # [{"field": "vesting.type", "old": ..., "new": ..., "change": ...}]
+"""
+
+import copy
+from typing import Any, Iterable
+
+# Top-level extraction fields belong to the "plan" group (see tools.plan_diff.groups_in)
+PLAN_GROUP = "plan"
+
+CHANGED = "changed"
+ADDED = "added"
+REMOVED = "removed"
+REVIEW = "review"  # a deleted passage spoke to this field, but nothing replaced it: value carried over
+
+
+def flatten(features: dict, prefix: str = "") -> dict[str, Any]:
+    """{"vesting": {"type": "cliff"}} -> {"vesting.type": "cliff"}"""
+    flat = {}
+    for key, value in (features or {}).items():
+        if isinstance(value, dict):
+            flat.update(flatten(value, f"{prefix}{key}."))
+        else:
+            flat[f"{prefix}{key}"] = value
+    return flat
+
+
+def unflatten(flat: dict[str, Any]) -> dict:
+    """{"vesting.type": "cliff"} -> {"vesting": {"type": "cliff"}}"""
+    nested: dict = {}
+    for field, value in flat.items():
+        *parents, key = field.split(".")
+        node = nested
+        for parent in parents:
+            node = node.setdefault(parent, {})
+        node[key] = value
+    return nested
+
+
+def group(field: str) -> str:
+    return field.split(".", 1)[0] if "." in field else PLAN_GROUP
+
+
+def inherit(previous: dict, delta: dict) -> dict:
+    """The previous extraction with every non-null field of delta laid over it"""
+    merged = copy.deepcopy(previous or {})
+    for key, value in (delta or {}).items():
+        if isinstance(value, dict):
+            merged[key] = inherit(merged.get(key) if isinstance(merged.get(key), dict) else {}, value)
+        elif value is not None:
+            merged[key] = value
+    return merged
+
+
+def field_drift(previous: dict, features: dict, review_groups: Iterable[str] = ()) -> list[dict]:
+    """
+    Field-level changes between two extractions, in schema order. Fields
+    of review_groups whose value was carried over unchanged are listed
+    as "review", so a deleted provision isn't silently inherited
+    """
+    before, after = flatten(previous), flatten(features)
+    review_groups = set(review_groups)
+    drift = []
+    for field in list(after) + [f for f in before if f not in after]:
+        old, new = before.get(field), after.get(field)
+        if old != new:
+            change = ADDED if old is None else REMOVED if new is None else CHANGED
+        elif old is not None and group(field) in review_groups:
+            change = REVIEW
+        else:
+            continue
+        drift.append({"field": field, "old": old, "new": new, "change": change})
+    return drift
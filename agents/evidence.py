@@ -0,0 +1,122 @@
+"""
+Evidence packing - fits KB and web evidence into a per-node token budget
+"""
+
+import os
+import re
+
+from tools.lexical_index import tokenize
+from tools.tokens import count_tokens
+
+# Token budgets for the evidence blocks of the evaluate_kb / determine_compliance prompts.
+# The KB block is packed once per feature and sent to both nodes unchanged, so the
+# determination reuses the sufficiency check's cached prompt prefix; web evidence,
+# when the check asked for it, is appended after it
+TOKEN_BUDGETS = {
+    "kb_evidence": int(os.getenv("KB_EVIDENCE_TOKEN_BUDGET", "2000")),
+    "web_evidence": int(os.getenv("WEB_EVIDENCE_TOKEN_BUDGET", "700")),
+}
+
+# Don't trim a chunk below this many tokens just to squeeze in more sources
+MIN_ITEM_TOKENS = 120
+
+SEPARATOR = "\n\n---\n\n"
+NO_EVIDENCE = "No relevant regulations found in knowledge base."
+
+_SENTENCE_SPLIT = re.compile(r"(?<=[.;:!?])\s+(?=[A-Z(\"'§0-9])|\n+")
+
+
+def split_sentences(text: str) -> list[str]:
+    return [s.strip() for s in _SENTENCE_SPLIT.split(text or "") if s.strip()]
+
+
+def _sentence_key(sentence: str) -> str:
+    return re.sub(r"\W+", " ", sentence.lower()).strip()
+
+
+def items_from_hits(hits: list[dict]) -> list[dict]:
+    """Evidence items from retrieve() hits"""
+    return [
+        {
+            "header": f"[Source: {h['metadata'].get('source_name', 'Unknown')}] (Relevance: {h['score']:.2f})",
+            "content": h["metadata"].get("content", ""),
+        }
+        for h in hits
+    ]
+
+
+def items_from_links(links: list[dict]) -> list[dict]:
+    """Evidence items from search_official_sources() results"""
+    return [
+        {"header": f"[Source: {l.get('title') or 'Official source'}] ({l['url']})", "content": l.get("snippet") or ""}
+        for l in links
+        if l.get("url")
+    ]
+
+
+def _allocate(costs: list[int], budget: int) -> list[int]:
+    """Water-fill a budget across items: small items get what they need, big ones split the rest"""
+    allocation = [0] * len(costs)
+    remaining = budget
+    pending = sorted(range(len(costs)), key=lambda i: costs[i])
+    for rank, i in enumerate(pending):
+        share = remaining // (len(pending) - rank)
+        allocation[i] = min(costs[i], max(share, min(MIN_ITEM_TOKENS, remaining)))
+        remaining -= allocation[i]
+    return allocation
+
+
+def pack_evidence(query: str, items: list[dict], budget: int, empty: str = NO_EVIDENCE) -> str:
+    """
+    Pack ranked evidence items into at most `budget` tokens.
+
+    Sentences already seen in a higher-ranked item are dropped (KB chunks
+    overlap), the budget is shared so one verbose regulation can't crowd
+    out the rest, and each item keeps its most query-relevant sentences
+    in original order.
+    """
+    query_terms = set(tokenize(query))
+    sep_tokens = count_tokens(SEPARATOR)
+    seen: set[str] = set()
+
+    prepared = []
+    for item in items:
+        sentences = []
+        for sentence in split_sentences(item["content"]):
+            key = _sentence_key(sentence)
+            if key and key not in seen:
+                seen.add(key)
+                sentences.append(sentence)
+
+        # link-only evidence (e.g. a web result without a snippet) is kept as just its header
+        if not sentences and item["content"]:
+            continue
+
+        costs = [count_tokens(sentence) + 1 for sentence in sentences]
+        fixed = count_tokens(item["header"]) + 1 + sep_tokens
+        prepared.append((item["header"], sentences, costs, fixed))
+
+    allocation = _allocate([fixed + sum(costs) for _, _, costs, fixed in prepared], budget)
+
+    blocks: list[str] = []
+    for (header, sentences, costs, fixed), allowed in zip(prepared, allocation):
+        if allowed < fixed:
+            continue
+        if not sentences:
+            blocks.append(header)
+            continue
+
+        # most relevant sentences first; ties keep document order
+        ranked = sorted(
+            range(len(sentences)),
+            key=lambda i: (-len(query_terms.intersection(tokenize(sentences[i]))), i),
+        )
+        keep, spent = [], fixed
+        for i in ranked:
+            if spent + costs[i] <= allowed:
+                keep.append(i)
+                spent += costs[i]
+        if keep:
+            blocks.append(header + "\n" + " ".join(sentences[i] for i in sorted(keep)))
+
+    return SEPARATOR.join(blocks) if blocks else empty
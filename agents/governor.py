@@ -0,0 +1,352 @@
+"""
+Process-wide LLM governor - in-flight cap, tokens-per-minute bucket, priority queue
+
+Every model request takes a lease from the governor before it is sent.
+The governor caps concurrent requests (LLM_MAX_IN_FLIGHT) and tokens per
+minute (LLM_TOKENS_PER_MINUTE, 0 = unlimited). Waiters are served in FIFO
+order within a priority. Interactive (UI) audits go before batch work;
+batch requests that have waited longer than LLM_BATCH_AGING_S are
+promoted so they can't starve.
+
+Set LLM_GOVERNOR_DB to a SQLite path to share the limits across
+processes (several Streamlit servers, batch workers) on one machine.
+
+    with llm_priority(BATCH):
+        compliance_graph.invoke(state)
+"""
+
+import os
+import sqlite3
+import statistics
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+from tools.cancellation import current_token
+
+INTERACTIVE = "interactive"
+BATCH = "batch"
+_RANK = {INTERACTIVE: 0, BATCH: 1}
+
+# How often waiters re-check shared (cross-process) state
+POLL_S = 0.05
+
+# Leases older than this are assumed leaked by a crashed process
+LEASE_TTL_S = 600.0
+
+# How often a waiter checks whether its audit was cancelled
+CANCEL_POLL_S = 0.25
+
+_priority: ContextVar[str] = ContextVar("llm_priority", default=INTERACTIVE)
+
+
+class GovernorTimeout(TimeoutError):
+    """No LLM capacity was granted before the caller's deadline"""
+
+
+@contextmanager
+def llm_priority(priority: str):
+    """Tag every LLM call made inside the block as interactive or batch"""
+    if priority not in _RANK:
+        raise ValueError(f"Unknown priority: {priority}")
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def current_priority() -> str:
+    return _priority.get()
+
+
+# ============================================================
+# Capacity state: in-process or shared via SQLite
+# ============================================================
+
+class _LocalState:
+    """Leases and token bucket for this process only; callers hold the governor lock"""
+
+    def __init__(self, max_in_flight: int, tokens_per_minute: int):
+        self.max_in_flight = max_in_flight
+        self.tpm = tokens_per_minute
+        self.in_flight = 0
+        self.tokens = float(tokens_per_minute)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+
+    def _refill(self, now: float):
+        if self.tpm:
+            self.tokens = min(self.tpm, self.tokens + (now - self.updated) * self.tpm / 60)
+        self.updated = now
+
+    def try_acquire(self, lease_id: str, tokens: int) -> float:
+        """0 when granted, otherwise seconds worth waiting before retrying"""
+        now = time.monotonic()
+        if now < self.paused_until:
+            return self.paused_until - now
+        if self.in_flight >= self.max_in_flight:
+            return POLL_S
+        self._refill(now)
+        if self.tpm and self.tokens < tokens:
+            return (tokens - self.tokens) * 60 / self.tpm
+        self.in_flight += 1
+        self.tokens -= tokens if self.tpm else 0
+        return 0.0
+
+    def release(self, lease_id: str, token_delta: int):
+        self.in_flight -= 1
+        if self.tpm:
+            self._refill(time.monotonic())
+            self.tokens = min(self.tpm, self.tokens - token_delta)
+
+    def pause(self, seconds: float):
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    def available_tokens(self) -> Optional[float]:
+        if not self.tpm:
+            return None
+        self._refill(time.monotonic())
+        return self.tokens
+
+
+class _SqliteState:
+    """Same limits shared by every process pointing at one SQLite file"""
+
+    def __init__(self, path: str, max_in_flight: int, tokens_per_minute: int):
+        self.max_in_flight = max_in_flight
+        self.tpm = tokens_per_minute
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS leases (id TEXT PRIMARY KEY, pid INTEGER, tokens INTEGER, acquired REAL)"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS bucket (id INTEGER PRIMARY KEY CHECK (id = 1), "
+            "tokens REAL, updated REAL, paused_until REAL)"
+        )
+        self._db.execute(
+            "INSERT OR IGNORE INTO bucket VALUES (1, ?, ?, 0)", (float(tokens_per_minute), time.time())
+        )
+
+    @contextmanager
+    def _transaction(self):
+        self._db.execute("BEGIN IMMEDIATE")
+        try:
+            yield self._db
+            self._db.execute("COMMIT")
+        except BaseException:
+            self._db.execute("ROLLBACK")
+            raise
+
+    def _refilled(self, db, now: float) -> tuple[float, float]:
+        tokens, updated, paused_until = db.execute("SELECT tokens, updated, paused_until FROM bucket").fetchone()
+        if self.tpm:
+            tokens = min(self.tpm, tokens + (now - updated) * self.tpm / 60)
+        return tokens, paused_until
+
+    def try_acquire(self, lease_id: str, tokens: int) -> float:
+        now = time.time()
+        with self._transaction() as db:
+            db.execute("DELETE FROM leases WHERE acquired < ?", (now - LEASE_TTL_S,))
+            available, paused_until = self._refilled(db, now)
+            if now < paused_until:
+                return paused_until - now
+            (in_flight,) = db.execute("SELECT COUNT(*) FROM leases").fetchone()
+            if in_flight >= self.max_in_flight:
+                return POLL_S
+            if self.tpm and available < tokens:
+                return min((tokens - available) * 60 / self.tpm, 1.0)
+            db.execute("INSERT INTO leases VALUES (?, ?, ?, ?)", (lease_id, os.getpid(), tokens, now))
+            db.execute(
+                "UPDATE bucket SET tokens = ?, updated = ?",
+                (available - tokens if self.tpm else available, now),
+            )
+        return 0.0
+
+    def release(self, lease_id: str, token_delta: int):
+        now = time.time()
+        with self._transaction() as db:
+            db.execute("DELETE FROM leases WHERE id = ?", (lease_id,))
+            available, _ = self._refilled(db, now)
+            if self.tpm:
+                available = min(self.tpm, available - token_delta)
+            db.execute("UPDATE bucket SET tokens = ?, updated = ?", (available, now))
+
+    def pause(self, seconds: float):
+        with self._transaction() as db:
+            db.execute("UPDATE bucket SET paused_until = MAX(paused_until, ?)", (time.time() + seconds,))
+
+    @property
+    def in_flight(self) -> int:
+        return self._db.execute("SELECT COUNT(*) FROM leases").fetchone()[0]
+
+    def available_tokens(self) -> Optional[float]:
+        if not self.tpm:
+            return None
+        with self._transaction() as db:
+            return self._refilled(db, time.time())[0]
+
+
+# ============================================================
+# Governor
+# ============================================================
+
+class Lease:
+    """One granted request slot; release() with the tokens actually used"""
+
+    def __init__(self, governor: "Governor", lease_id: str, tokens: int):
+        self._governor = governor
+        self.lease_id = lease_id
+        self.tokens = tokens
+        self._released = False
+
+    def release(self, used_tokens: int = None):
+        if self._released:
+            return
+        self._released = True
+        delta = 0 if used_tokens is None else used_tokens - self.tokens
+        self._governor._release(self, delta)
+
+
+class Governor:
+    def __init__(self, max_in_flight: int = 8, tokens_per_minute: int = 0,
+                 db_path: str = None, batch_aging_s: float = 30.0):
+        self.max_in_flight = max_in_flight
+        self.tokens_per_minute = tokens_per_minute
+        self.batch_aging_s = batch_aging_s
+        self.shared = bool(db_path)
+        self._state = (
+            _SqliteState(db_path, max_in_flight, tokens_per_minute) if db_path
+            else _LocalState(max_in_flight, tokens_per_minute)
+        )
+        self._cond = threading.Condition()
+        self._waiting: list[tuple[int, float, str]] = []  # (rank, enqueued_at, waiter id)
+        self._waits = {p: deque(maxlen=1000) for p in _RANK}
+        self._counters = {"granted": 0, "timeouts": 0, "pauses": 0}
+
+    def _head(self) -> tuple:
+        """Next waiter to serve: best priority (with aging), then FIFO"""
+        now = time.monotonic()
+
+        def key(entry):
+            rank, enqueued_at, _ = entry
+            if rank and now - enqueued_at > self.batch_aging_s:
+                rank = 0
+            return rank, enqueued_at
+
+        return min(self._waiting, key=key)
+
+    def acquire(self, tokens: int, priority: str = None, timeout: float = None) -> Lease:
+        """
+        Block until a request slot and token budget are free; GovernorTimeout
+        after timeout, AuditCancelled if the caller's audit is cancelled
+        """
+        priority = priority or current_priority()
+        if self.tokens_per_minute:
+            tokens = min(tokens, self.tokens_per_minute)
+        lease_id = uuid.uuid4().hex
+        enqueued_at = time.monotonic()
+        entry = (_RANK[priority], enqueued_at, lease_id)
+        deadline = None if timeout is None else enqueued_at + timeout
+        cancel = current_token()
+
+        with self._cond:
+            self._waiting.append(entry)
+            try:
+                while True:
+                    if cancel is not None:
+                        cancel.check()
+                    wait_s = POLL_S
+                    if self._head() is entry:
+                        wait_s = self._state.try_acquire(lease_id, tokens)
+                        if wait_s == 0:
+                            self._waiting.remove(entry)
+                            self._waits[priority].append(time.monotonic() - enqueued_at)
+                            self._counters["granted"] += 1
+                            self._cond.notify_all()
+                            return Lease(self, lease_id, tokens)
+                    if deadline is not None:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            self._counters["timeouts"] += 1
+                            raise GovernorTimeout(f"No LLM capacity within {timeout:g}s ({priority})")
+                        wait_s = min(wait_s, remaining)
+                    if cancel is not None:
+                        wait_s = min(wait_s, CANCEL_POLL_S)
+                    # shared state changes without local notifications, so keep polling it
+                    self._cond.wait(min(wait_s, POLL_S) if self.shared else wait_s)
+            except BaseException:
+                if entry in self._waiting:
+                    self._waiting.remove(entry)
+                    self._cond.notify_all()
+                raise
+
+    def _release(self, lease: Lease, token_delta: int):
+        with self._cond:
+            self._state.release(lease.lease_id, token_delta)
+            self._cond.notify_all()
+
+    @contextmanager
+    def lease(self, tokens: int, priority: str = None, timeout: float = None):
+        lease = self.acquire(tokens, priority, timeout)
+        try:
+            yield lease
+        finally:
+            lease.release()
+
+    def pause(self, seconds: float):
+        """Hold every new request (all processes in shared mode), e.g. after a 429"""
+        with self._cond:
+            self._state.pause(seconds)
+            self._counters["pauses"] += 1
+
+    def metrics(self) -> dict:
+        with self._cond:
+            depth = {p: sum(1 for rank, _, _ in self._waiting if rank == r) for p, r in _RANK.items()}
+            waits = {p: list(w) for p, w in self._waits.items()}
+            in_flight = self._state.in_flight
+            tokens = self._state.available_tokens()
+
+        def pct(values, q):
+            if not values:
+                return 0.0
+            if len(values) == 1:
+                return round(values[0] * 1000, 1)
+            return round(statistics.quantiles(values, n=100)[q - 1] * 1000, 1)
+
+        return {
+            "in_flight": in_flight,
+            "max_in_flight": self.max_in_flight,
+            "queue_depth": depth,
+            "wait_ms_p50": {p: pct(w, 50) for p, w in waits.items()},
+            "wait_ms_p95": {p: pct(w, 95) for p, w in waits.items()},
+            "tokens_available": None if tokens is None else round(tokens),
+            "tokens_per_minute": self.tokens_per_minute or None,
+            "shared": self.shared,
+            **self._counters,
+        }
+
+
+_governor = None
+_governor_lock = threading.Lock()
+
+
+def get_governor() -> Governor:
+    """Lazy initialization of the process-wide governor from the environment"""
+    global _governor
+
+    with _governor_lock:
+        if _governor is None:
+            _governor = Governor(
+                max_in_flight=int(os.getenv("LLM_MAX_IN_FLIGHT", "8")),
+                tokens_per_minute=int(os.getenv("LLM_TOKENS_PER_MINUTE", "0")),
+                db_path=os.getenv("LLM_GOVERNOR_DB") or None,
+                batch_aging_s=float(os.getenv("LLM_BATCH_AGING_S", "30")),
+            )
+    return _governor
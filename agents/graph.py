@@ -2,7 +2,11 @@
 LangGraph definition 
 """
 
+from functools import wraps
+
 from langgraph.graph import StateGraph, END
+from tools.cancellation import check_cancelled
+from tools.tracing import traced
 from .state import ComplianceState
 from .nodes import (
     extract_features,
@@ -31,6 +35,18 @@ def has_more_features(state: ComplianceState) -> str:
         return "search_kb"
 
 
+def _node(fn):
+    """Record each execution of a node as a trace span; don't start it if the audit was cancelled"""
+    traced_fn = traced(fn.__name__, kind="node")(fn)
+
+    @wraps(fn)
+    def run(state):
+        check_cancelled()
+        return traced_fn(state)
+
+    return run
+
+
 def build_graph() -> StateGraph:
     """Build the compliance checking graph"""
     
@@ -38,13 +54,13 @@ def build_graph() -> StateGraph:
     graph = StateGraph(ComplianceState)
     
     # Add nodes
-    graph.add_node("extract_features", extract_features)
-    graph.add_node("select_next_feature", select_next_feature)
-    graph.add_node("search_kb", search_kb)
-    graph.add_node("evaluate_kb", evaluate_kb)
-    graph.add_node("search_web", search_web)
-    graph.add_node("determine_compliance", determine_compliance)
-    graph.add_node("generate_report", generate_report)
+    graph.add_node("extract_features", _node(extract_features))
+    graph.add_node("select_next_feature", _node(select_next_feature))
+    graph.add_node("search_kb", _node(search_kb))
+    graph.add_node("evaluate_kb", _node(evaluate_kb))
+    graph.add_node("search_web", _node(search_web))
+    graph.add_node("determine_compliance", _node(determine_compliance))
+    graph.add_node("generate_report", _node(generate_report))
     
     # Set entry point
     graph.set_entry_point("extract_features")
@@ -0,0 +1,272 @@
+"""
+LLM access for the graph nodes
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from typing import Callable, Type, TypeVar, Union
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage
+from langchain_openai import ChatOpenAI
+from pydantic import BaseModel
+from tools.cancellation import bound_timeout
+from tools.cassette import active_cassette
+from tools.tokens import count_tokens
+from tools.tracing import record_usage, span
+from .prompts import PromptMessages, prompt_key, prompt_text
+from .resilience import call_with_policy, policy_for, stream_with_policy
+from .schemas import StructuredOutputError, parse_reply
+
+MODEL_NAME = os.getenv("LLM_MODEL", "gpt-5-nano")
+
+# Extra LLM calls allowed per node when a structured reply can't be repaired locally
+STRUCTURED_RETRIES = int(os.getenv("LLM_STRUCTURED_RETRIES", "1"))
+
+# Expected completion size per node, reserved from the governor's token budget
+OUTPUT_TOKEN_ESTIMATES = {
+    "extract_features": 600,
+    "evaluate_kb": 5,
+    "determine_compliance": 200,
+    "generate_report": 900,
+}
+
+# OpenAI JSON mode: the reply is always a syntactically valid JSON object
+JSON_MODE = {"response_format": {"type": "json_object"}}
+
+T = TypeVar("T", bound=BaseModel)
+
+_llm = None
+
+
+def get_llm() -> ChatOpenAI:
+    """Lazy initialization of the chat model"""
+    global _llm
+
+    if _llm is None:
+        # retries/backoff are handled per node by call_with_policy
+        _llm = ChatOpenAI(model=MODEL_NAME, temperature=2, max_retries=0, stream_usage=True)
+
+    return _llm
+
+
+def set_llm(llm):
+    """Swap the chat model (e.g. for a FakeLLM); None restores the lazy default"""
+    global _llm
+    _llm = llm
+
+
+class FakeLLM:
+    """
+    Offline stand-in for the chat model. responder maps the prompt text to
+    the reply; latency is seconds per call or a callable returning them.
+    With prompt_cache, usage reports cached input tokens the way OpenAI's
+    prompt caching does: the longest prefix shared with a recent prompt,
+    in 128-token steps, once it reaches 1024 tokens.
+    """
+
+    CACHE_MIN_TOKENS = 1024
+    CACHE_BLOCK_TOKENS = 128
+
+    def __init__(self, responder: Callable[[str], str], latency: Union[float, Callable[[], float]] = 0.0,
+                 prompt_cache: bool = False):
+        self.responder = responder
+        self.latency = latency
+        self.calls = 0
+        self.prompt_cache = prompt_cache
+        self._recent = deque(maxlen=256)
+        self._lock = threading.Lock()
+
+    def _delay(self) -> float:
+        with self._lock:
+            self.calls += 1
+        return self.latency() if callable(self.latency) else self.latency
+
+    def _cached_tokens(self, text: str) -> int:
+        if not self.prompt_cache:
+            return 0
+        with self._lock:
+            shared = max((len(os.path.commonprefix([text, seen])) for seen in self._recent), default=0)
+            self._recent.append(text)
+        tokens = count_tokens(text[:shared]) // self.CACHE_BLOCK_TOKENS * self.CACHE_BLOCK_TOKENS
+        return tokens if tokens >= self.CACHE_MIN_TOKENS else 0
+
+    def _reply(self, prompt) -> AIMessage:
+        text = prompt_text(prompt)
+        content = self.responder(text)
+        input_tokens, output_tokens = count_tokens(text), count_tokens(content)
+        usage = {
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "total_tokens": input_tokens + output_tokens,
+        }
+        cached = self._cached_tokens(text)
+        if cached:
+            usage["input_token_details"] = {"cache_read": cached}
+        return AIMessage(content=content, usage_metadata=usage)
+
+    def invoke(self, prompt, **kwargs) -> AIMessage:
+        delay = self._delay()
+        if delay > 0:
+            time.sleep(delay)
+        return self._reply(prompt)
+
+    def stream(self, prompt, **kwargs):
+        """The reply in word-sized chunks, latency spread across them; usage on the last"""
+        delay = self._delay()
+        reply = self._reply(prompt)
+        words = reply.content.split(" ")
+        for i, word in enumerate(words):
+            if delay > 0:
+                time.sleep(delay / len(words))
+            last = i == len(words) - 1
+            yield AIMessageChunk(
+                content=word if last else word + " ",
+                usage_metadata=reply.usage_metadata if last else None,
+            )
+
+
+def _usage(response) -> tuple[int, int, int]:
+    """(input, output, cached input) tokens from a LangChain AIMessage"""
+    usage = getattr(response, "usage_metadata", None) or {}
+    cached = (usage.get("input_token_details") or {}).get("cache_read", 0) or 0
+    return usage.get("input_tokens", 0), usage.get("output_tokens", 0), cached
+
+
+def _model(node: str, json_mode: bool):
+    """
+    The chat model with per-request options: JSON mode, and an HTTP timeout
+    so an abandoned request (deadline, cancelled audit) doesn't linger
+    """
+    llm = get_llm()
+    if not hasattr(llm, "bind"):
+        return llm
+    options = dict(JSON_MODE) if json_mode else {}
+    options["timeout"] = max(0.1, bound_timeout(policy_for(node).timeout))
+    return llm.bind(**options)
+
+
+def _invoke(prompt, node: str, json_mode: bool = False):
+    """Call the model under its node's deadline policy, through the active cassette if any"""
+    tokens = count_tokens(prompt_text(prompt)) + OUTPUT_TOKEN_ESTIMATES.get(node, 500)
+
+    def model_call():
+        return call_with_policy(lambda: _model(node, json_mode).invoke(prompt), node, tokens)
+
+    cassette = active_cassette()
+    if cassette is None:
+        return model_call()
+
+    def record():
+        response = model_call()
+        return {"content": response.content, "usage_metadata": dict(response.usage_metadata or {})}
+
+    payload = {"node": node, "model": MODEL_NAME, "prompt": prompt_text(prompt)}
+    if json_mode:
+        payload["json_mode"] = True
+    recorded = cassette.intercept("llm", payload, record)
+    return AIMessage(content=recorded["content"], usage_metadata=recorded["usage_metadata"] or None)
+
+
+def call_llm(prompt, node: str, json_mode: bool = False, **attrs):
+    """Invoke the chat model for a graph node, recording latency and token usage"""
+    if prompt_key(prompt):
+        attrs["prompt"] = prompt_key(prompt)
+    with span(f"{node}.llm", kind="llm", node=node, model=MODEL_NAME, **attrs):
+        response = _invoke(prompt, node, json_mode)
+        input_tokens, output_tokens, cached_tokens = _usage(response)
+        record_usage(input_tokens, output_tokens, cached_tokens, model=MODEL_NAME)
+
+    return response
+
+
+def stream_llm(prompt, node: str, on_token: Callable[[str], None], **attrs) -> AIMessage:
+    """
+    Like call_llm, but hands each piece of the reply to on_token as it
+    arrives. Returns the complete message. A cassette replays the recorded
+    reply as a single piece.
+    """
+    tokens = count_tokens(prompt_text(prompt)) + OUTPUT_TOKEN_ESTIMATES.get(node, 500)
+    streamed = False
+
+    def model_stream() -> AIMessage:
+        nonlocal streamed
+        streamed = True
+        message = None
+        for chunk in stream_with_policy(lambda: _model(node, False).stream(prompt), node, tokens):
+            if chunk.content:
+                on_token(chunk.content)
+            message = chunk if message is None else message + chunk
+        return AIMessage(content=message.content if message else "",
+                         usage_metadata=getattr(message, "usage_metadata", None))
+
+    if prompt_key(prompt):
+        attrs["prompt"] = prompt_key(prompt)
+    with span(f"{node}.llm", kind="llm", node=node, model=MODEL_NAME, streamed=True, **attrs):
+        cassette = active_cassette()
+        if cassette is None:
+            response = model_stream()
+        else:
+            def record():
+                response = model_stream()
+                return {"content": response.content, "usage_metadata": dict(response.usage_metadata or {})}
+
+            # same payload as call_llm, so existing cassettes replay either way
+            payload = {"node": node, "model": MODEL_NAME, "prompt": prompt_text(prompt)}
+            recorded = cassette.intercept("llm", payload, record)
+            response = AIMessage(content=recorded["content"], usage_metadata=recorded["usage_metadata"] or None)
+            if not streamed and response.content:
+                on_token(response.content)
+
+        input_tokens, output_tokens, cached_tokens = _usage(response)
+        record_usage(input_tokens, output_tokens, cached_tokens, model=MODEL_NAME)
+
+    return response
+
+
+REPAIR_PROMPT = """{prompt}
+
+Your previous reply could not be used:
+{reply}
+
+Problem: {error}
+
+Reply again with ONLY the corrected JSON object.
+"""
+
+# the same, as a follow-up turn after the original messages, which stay a cacheable prefix
+REPAIR_FOLLOWUP = """Your previous reply could not be used.
+
+Problem: {error}
+
+Reply again with ONLY the corrected JSON object.
+"""
+
+
+def _repair(prompt, reply: str, error: str):
+    """The prompt for a retry: the rejected reply and the error after the original prompt"""
+    if isinstance(prompt, str):
+        return REPAIR_PROMPT.format(prompt=prompt, reply=reply, error=error)
+    followup = [AIMessage(content=reply), HumanMessage(content=REPAIR_FOLLOWUP.format(error=error))]
+    return PromptMessages(list(prompt) + followup, key=prompt_key(prompt))
+
+
+def call_structured(prompt, node: str, schema: Type[T], retries: int = None) -> T:
+    """
+    Invoke the chat model in JSON mode and validate the reply against schema.
+    Replies are repaired locally first; only if that fails is this node's call
+    retried (at most `retries` times), with the rejected reply and the error.
+    Raises StructuredOutputError once the retries are spent.
+    """
+    retries = STRUCTURED_RETRIES if retries is None else retries
+    attempt_prompt = prompt
+
+    for attempt in range(retries + 1):
+        response = call_llm(attempt_prompt, node=node, json_mode=True, attempt=attempt)
+        try:
+            return parse_reply(response.content, schema)
+        except StructuredOutputError as e:
+            error = e
+            attempt_prompt = _repair(prompt, response.content[:2000], str(e)[:500])
+
+    raise StructuredOutputError(f"{node}: no valid {schema.__name__} after {retries + 1} attempts: {error}")
@@ -2,81 +2,99 @@
 Agent nodes for the Compliance Drift Detector graph
 """
 
+import copy
 import json
-from langchain_openai import ChatOpenAI
-from .state import ComplianceState, Finding
-from tools import search_knowledge_base, search_official_sources
+import os
+import re
+from typing import Optional
 
-# Initialize LLM
-llm = ChatOpenAI(model="gpt-5-nano", temperature=2)
+from langgraph.config import get_stream_writer
+from .amendments import field_drift, flatten, group, inherit, unflatten
+from .state import ComplianceState, Finding
+from .llm import call_llm, call_structured, stream_llm
+from .resilience import LLMDeadlineExceeded
+from .schemas import ComplianceResult, PlanExtraction, StructuredOutputError
+from .evidence import TOKEN_BUDGETS, items_from_hits, items_from_links, pack_evidence
+from .prompts import EXTRACTION_FIELDS, get_prompt, prompt_text
+from tools import retrieve, format_hits, build_filter, search_official_sources
+from tools.blobstore import put_blob, resolve
+from tools.plan_diff import diff_documents, groups_in
+from tools.pre_extract import pre_extract, relevant_passages
+from tools.reranker import RERANK_CANDIDATES, rerank, rerank_enabled
+from tools.report import compile_report, report_to_markdown
+from tools.text_normalizer import normalization_enabled, normalize_text
+from tools.tokens import count_tokens
+from tools.tracing import span
 
 
 # ============================================================
 # NODE 1: Extract Features from Plan Document
 # ============================================================
 
-EXTRACTION_PROMPT = """You are an expert at extracting structured data from 401(k) plan documents.
-
-Extract the following features from this plan document. Return ONLY valid JSON.
-
-{{
-  "plan_name": "string or null",
-  "effective_date": "string or null",
-  
-  "eligibility": {{
-    "age_requirement": "number or null",
-    "service_requirement": "string or null",
-    "entry_dates": "string or null"
-  }},
-  
-  "contributions": {{
-    "employer_match_formula": "string or null",
-    "match_cap": "string or null",
-    "catch_up_allowed": "boolean or null"
-  }},
-  
-  "vesting": {{
-    "type": "string or null (immediate, cliff, graded)",
-    "schedule": "string or null",
-    "years_to_full": "number or null"
-  }},
-  
-  "auto_enrollment": {{
-    "enabled": "boolean or null",
-    "default_rate": "number or null",
-    "auto_escalation": "boolean or null"
-  }},
-  
-  "distributions": {{
-    "hardship_allowed": "boolean or null",
-    "loans_allowed": "boolean or null"
-  }}
-}}
-
-PLAN DOCUMENT:
-{pdf_text}
-"""
-
-
-def extract_features(state: ComplianceState) -> dict:
-    """Extract plan features using LLM"""
-    
-    prompt = EXTRACTION_PROMPT.format(pdf_text=state["pdf_text"][:50000])
-    
-    response = llm.invoke(prompt)
-    content = response.content.strip()
-    
-    # Clean markdown if present
-    if content.startswith("```json"):
-        content = content[7:]
-    if content.startswith("```"):
-        content = content[3:]
-    if content.endswith("```"):
-        content = content[:-3]
-    
-    features = json.loads(content.strip())
-    
-    # Build list of features to check
+EXTRACTION_CHARS = 50000
+# Pattern pre-extraction (tools.pre_extract): fields at or above this confidence skip the LLM
+PRE_EXTRACT_MIN_CONFIDENCE = float(os.getenv("PRE_EXTRACT_MIN_CONFIDENCE", "0.8"))
+_FIELD_HINTS = flatten(json.loads(EXTRACTION_FIELDS.format()))
+# Above this share of changed text, re-extract the whole restated document instead
+AMENDMENT_MAX_CHANGED = float(os.getenv("AMENDMENT_MAX_CHANGED", "0.5"))
+
+
+def _extract(prompt) -> dict:
+    # JSON mode + schema validation; a bad reply retries this call only
+    return call_structured(prompt, node="extract_features", schema=PlanExtraction).model_dump()
+
+
+def pre_extraction_prompt(text: str, threshold: float = None) -> tuple[dict, list]:
+    """
+    Fields the pattern pass is confident about (dotted paths), and the
+    prompt messages that ask the LLM for the rest from just the passages
+    about them; "" when nothing is left to ask
+    """
+    text = text[:EXTRACTION_CHARS]
+    threshold = PRE_EXTRACT_MIN_CONFIDENCE if threshold is None else threshold
+    with span("pre_extract") as s:
+        guesses = pre_extract(text)
+        confident = {f: g.value for f, g in guesses.items() if g.confidence >= threshold and f in _FIELD_HINTS}
+        # a group the document never mentions has nothing for the LLM to find either
+        mentioned = set(groups_in(text)) | {"plan"}
+        missing = [f for f in _FIELD_HINTS if f not in confident and group(f) in mentioned]
+        s.attrs.update(found=len(guesses), confident=len(confident), missing=len(missing))
+    if not missing:
+        return confident, ""
+    fields = json.dumps(unflatten({f: _FIELD_HINTS[f] for f in missing}), indent=2)
+    passages = relevant_passages(text, sorted({group(f) for f in missing}))
+    return confident, get_prompt("partial_extraction").messages(fields=fields, passages=passages)
+
+
+def extract_document(text: str, threshold: float = None) -> tuple[dict, list]:
+    """
+    Features of a whole plan document and the prompt sent for them ("" if
+    none): patterns first, the LLM only for what they couldn't settle
+    """
+    if os.getenv("PRE_EXTRACT", "1").lower() in ("0", "false", "no"):
+        prompt = get_prompt("extraction").messages(pdf_text=text[:EXTRACTION_CHARS])
+        return _extract(prompt), prompt
+
+    confident, prompt = pre_extraction_prompt(text, threshold)
+    if prompt:
+        # the reply only counts for the fields it was asked for
+        reply = {f: v for f, v in flatten(_extract(prompt)).items() if f not in confident}
+        confident = {**confident, **reply}
+    features = PlanExtraction.model_validate(unflatten(confident)).model_dump()
+    return features, prompt
+
+
+def _normalized(text: str) -> tuple[str, Optional[dict]]:
+    """Plan text with page furniture and boilerplate stripped, and what that saved (None when disabled)"""
+    if not normalization_enabled():
+        return text, None
+    with span("normalize_text") as s:
+        normalized = normalize_text(text)
+        s.attrs.update(normalized.summary())
+    return normalized.text, normalized.summary()
+
+
+def _features_to_check(features: dict) -> list[str]:
     features_to_check = []
     
     if features.get("eligibility", {}).get("age_requirement"):
@@ -91,18 +109,103 @@ def extract_features(state: ComplianceState) -> dict:
         features_to_check.append("auto_enrollment")
     if features.get("contributions", {}).get("catch_up_allowed") is not None:
         features_to_check.append("catch_up")
+    return features_to_check
+
+
+def _extract_amendment(state: ComplianceState) -> tuple[dict, dict, Optional[dict]]:
+    """
+    Extraction of a restated plan from its previous version: only the
+    changed passages go to the LLM, everything else is inherited
+    """
+    old_text, _ = _normalized(resolve(state["baseline_text"]))
+    new_text, normalization = _normalized(resolve(state["pdf_text"]))
+    previous = state.get("baseline_features") or {}
+    baseline_extracted = not previous
+    baseline_tokens = 0
+    if baseline_extracted:
+        # the previous version was never audited here: one full extraction of it, counted in
+        # tokens_sent (it is stored, so the next review of this plan skips it)
+        previous, baseline_prompt = extract_document(old_text)
+        baseline_tokens = count_tokens(prompt_text(baseline_prompt)) if baseline_prompt else 0
+
+    with span("plan_diff") as s:
+        diff = diff_documents(old_text, new_text)
+        s.attrs.update(diff.summary())
+
+    full_prompt = get_prompt("extraction").format(pdf_text=new_text[:EXTRACTION_CHARS])
+    review = []
+    if diff.identical:
+        mode, prompt, features = "inherited", "", copy.deepcopy(previous)
+    elif diff.changed_fraction > AMENDMENT_MAX_CHANGED:
+        mode = "full"
+        features, prompt = extract_document(new_text)
+    else:
+        mode = "changed_sections"
+        prompt = get_prompt("amendment_extraction").messages(changes=diff.excerpt()[:EXTRACTION_CHARS])
+        delta = _extract(prompt)
+        features = inherit(previous, delta)
+        # a deleted provision reads as "not stated": flag what it covered unless the delta restated it
+        restated = {group(f) for f, v in flatten(delta).items() if v is not None}
+        review = [g for g in diff.touched_groups(removed=True) if g not in restated]
+
+    plan_diff = {
+        **diff.summary(),
+        "mode": mode,
+        "tokens_sent": (count_tokens(prompt_text(prompt)) if prompt else 0) + baseline_tokens,
+        "tokens_baseline": baseline_tokens,
+        "tokens_full": count_tokens(full_prompt),
+        "drift": field_drift(previous, features, review),
+        "baseline_digest": state["baseline_text"].digest,
+        "baseline_features": previous if baseline_extracted else None,
+    }
+    return features, plan_diff, normalization
+
+
+def extract_features(state: ComplianceState) -> dict:
+    """Extract plan features using LLM; against a previous version, only what changed"""
     
-    return {
+    if state.get("baseline_text") is not None:
+        features, plan_diff, normalization = _extract_amendment(state)
+    else:
+        text, normalization = _normalized(resolve(state["pdf_text"]))
+        features, _ = extract_document(text)
+        plan_diff = None
+    
+    update = {
         "extracted_features": features,
-        "features_to_check": features_to_check,
+        "features_to_check": _features_to_check(features),
         "findings": []
     }
+    if plan_diff is not None:
+        update["plan_diff"] = plan_diff
+    if normalization is not None:
+        update["text_normalization"] = normalization
+    return update
 
 
 # ============================================================
 # NODE 2: Select Next Feature to Check
 # ============================================================
 
+def feature_value(extracted: dict, feature: str):
+    """The extracted plan value a feature is checked against; None if the feature has none"""
+    if feature == "eligibility_age":
+        return str(extracted.get("eligibility", {}).get("age_requirement"))
+    elif feature == "eligibility_service":
+        return extracted.get("eligibility", {}).get("service_requirement")
+    elif feature == "vesting":
+        vesting = extracted.get("vesting", {})
+        return f"{vesting.get('type')} - {vesting.get('schedule', 'N/A')}"
+    elif feature == "employer_match":
+        return extracted.get("contributions", {}).get("employer_match_formula")
+    elif feature == "auto_enrollment":
+        auto = extracted.get("auto_enrollment", {})
+        return f"Enabled: {auto.get('enabled')}, Rate: {auto.get('default_rate')}%"
+    elif feature == "catch_up":
+        return str(extracted.get("contributions", {}).get("catch_up_allowed"))
+    return None
+
+
 def select_next_feature(state: ComplianceState) -> dict:
     """Pick the next feature to verify"""
     
@@ -115,26 +218,9 @@ def select_next_feature(state: ComplianceState) -> dict:
     feature = features[0]
     remaining = features[1:]
     
-    # Get the value for this feature
-    value = None
-    if feature == "eligibility_age":
-        value = str(extracted.get("eligibility", {}).get("age_requirement"))
-    elif feature == "eligibility_service":
-        value = extracted.get("eligibility", {}).get("service_requirement")
-    elif feature == "vesting":
-        vesting = extracted.get("vesting", {})
-        value = f"{vesting.get('type')} - {vesting.get('schedule', 'N/A')}"
-    elif feature == "employer_match":
-        value = extracted.get("contributions", {}).get("employer_match_formula")
-    elif feature == "auto_enrollment":
-        auto = extracted.get("auto_enrollment", {})
-        value = f"Enabled: {auto.get('enabled')}, Rate: {auto.get('default_rate')}%"
-    elif feature == "catch_up":
-        value = str(extracted.get("contributions", {}).get("catch_up_allowed"))
-    
     return {
         "current_feature": feature,
-        "current_feature_value": value,
+        "current_feature_value": feature_value(extracted, feature),
         "features_to_check": remaining
     }
 
@@ -153,48 +239,95 @@ FEATURE_QUERIES = {
 }
 
 
+# Chunks passed on to evaluate_kb / determine_compliance
+KB_TOP_K = 3
+
+
 def search_kb(state: ComplianceState) -> dict:
     """Search knowledge base for relevant regulations"""
     
     feature = state["current_feature"]
     query = FEATURE_QUERIES.get(feature, feature)
     
-    results = search_knowledge_base(query, top_k=3)
+    # Only regulations for this feature, in force on the plan's effective date
+    effective_date = state.get("extracted_features", {}).get("effective_date")
+    kb_filter = build_filter(feature, effective_date)
+    
+    # With reranking on, cast a wider net and let the cross-encoder pick the best few
+    top_k = RERANK_CANDIDATES if rerank_enabled() else KB_TOP_K
+    
+    hits = retrieve(query, top_k=top_k, filter=kb_filter)
+    if not hits and kb_filter:
+        # untagged (legacy) records or nothing in range - fall back to the whole index
+        hits = retrieve(query, top_k=top_k)
+    
+    if rerank_enabled():
+        hits = rerank(query, hits, top_n=KB_TOP_K)
     
-    return {"kb_results": results}
+    # evidence goes to the blob store; clear web evidence left over from the previous feature
+    return {
+        "kb_hits": put_blob(hits),
+        "kb_results": put_blob(format_hits(hits)),
+        "web_results": "",
+        "web_links": []
+    }
+
+
+def _evidence_query(state: ComplianceState) -> str:
+    """What web evidence is ranked against: the feature query plus the plan's value"""
+    feature = state["current_feature"]
+    return f"{FEATURE_QUERIES.get(feature, feature)} {state.get('current_feature_value') or ''}"
 
 
 # ============================================================
 # NODE 4: Evaluate KB Results
 # ============================================================
 
-EVAL_PROMPT = """You are a compliance expert evaluating if knowledge base results answer the question.
+def _kb_evidence(state: ComplianceState) -> str:
+    """
+    The KB evidence block shared by evaluate_kb and determine_compliance.
+    It is packed against the feature query alone, so the same regulations
+    give the same block for every plan and the prompt prefix up to it is
+    served from the provider's cache after the first call
+    """
+    feature = state["current_feature"]
+    return pack_evidence(
+        FEATURE_QUERIES.get(feature, feature),
+        items_from_hits(resolve(state.get("kb_hits")) or []),
+        TOKEN_BUDGETS["kb_evidence"]
+    )
 
-Feature being checked: {feature}
-Plan value: {plan_value}
 
-Knowledge base results:
-{kb_results}
+_INSUFFICIENT = re.compile(r"\b(?:insufficient|not\s+sufficient)\b", re.IGNORECASE)
+_SUFFICIENT = re.compile(r"\bsufficient\b", re.IGNORECASE)
 
-Question: Do these results provide enough information to determine if the plan value is compliant?
 
-Respond with ONLY "sufficient" or "insufficient".
-"""
+def is_sufficient(reply: str) -> bool:
+    """
+    The sufficiency verdict in a reply: "Sufficient.", "**sufficient**" or
+    {"answer": "sufficient"} all count; anything naming "insufficient" (or
+    "not sufficient"), or neither word, does not
+    """
+    return not _INSUFFICIENT.search(reply or "") and bool(_SUFFICIENT.search(reply or ""))
 
 
 def evaluate_kb(state: ComplianceState) -> dict:
     """Evaluate if KB results are sufficient"""
     
-    prompt = EVAL_PROMPT.format(
+    prompt = get_prompt("evaluate_kb").messages(
         feature=state["current_feature"],
         plan_value=state["current_feature_value"],
-        kb_results=state["kb_results"]
+        kb_results=_kb_evidence(state)
     )
     
-    response = llm.invoke(prompt)
-    is_sufficient = response.content.strip().lower() == "sufficient"
+    try:
+        response = call_llm(prompt, node="evaluate_kb")
+        sufficient = is_sufficient(response.content)
+    except LLMDeadlineExceeded:
+        # no verdict in time - gather web evidence rather than stall
+        sufficient = False
 
-    return {"kb_sufficient": is_sufficient}
+    return {"kb_sufficient": sufficient}
 
 
 # ============================================================
@@ -209,70 +342,55 @@ def search_web(state: ComplianceState) -> dict:
     links = search_official_sources(query, max_results=3)
 
     # keep both: structured links for UI + text version for the LLM
-    web_text = "\n".join([f"- {l.get('title')}: {l.get('url')}" for l in links if l.get("url")])
+    web_text = "\n".join(
+        f"- {l.get('title')}: {l.get('url')}" + (f"\n  {l['snippet']}" if l.get("snippet") else "")
+        for l in links if l.get("url")
+    )
 
     return {
         "web_links": links,      
-        "web_results": web_text  
+        "web_results": put_blob(web_text)
     }
 
 # ============================================================
 # NODE 6: Make Compliance Determination
 # ============================================================
 
-COMPLIANCE_PROMPT = """You are a 401(k) compliance expert. Determine if the plan feature is compliant.
-
-Feature: {feature}
-Plan Value: {plan_value}
-
-Regulations Found:
-{regulations}
-
-Based on the regulations, is this plan feature compliant?
-
-Respond in this exact JSON format:
-{{
-  "status": "compliant" or "gap" or "needs_review",
-  "regulation": "the specific rule that applies",
-  "notes": "brief explanation"
-}}
-"""
-
-
 def determine_compliance(state: ComplianceState) -> dict:
     """Determine if feature is compliant"""
     
-    # Combine KB and web results
-    regulations = state.get("kb_results", "")
-    if state.get("web_results"):
-        regulations += "\n\n" + state["web_results"]
+    # the KB block exactly as evaluate_kb sent it; web evidence goes after it
+    kb_evidence = _kb_evidence(state)
+    web_items = items_from_links(state.get("web_links", []))
+    web_evidence = ""
+    if web_items:
+        web_evidence = pack_evidence(_evidence_query(state), web_items, TOKEN_BUDGETS["web_evidence"], empty="")
     
-    prompt = COMPLIANCE_PROMPT.format(
+    prompt = get_prompt("determine_compliance").messages(
         feature=state["current_feature"],
         plan_value=state["current_feature_value"],
-        regulations=regulations
+        kb_results=kb_evidence,
+        web_results=f"\n\nOfficial sources:\n{web_evidence}" if web_evidence else "",
+        regulations=kb_evidence + (f"\n\n{web_evidence}" if web_evidence else "")  # version 1 layout
     )
     
-    response = llm.invoke(prompt)
-    content = response.content.strip()
-    
-    # Clean markdown
-    if content.startswith("```json"):
-        content = content[7:]
-    if content.startswith("```"):
-        content = content[3:]
-    if content.endswith("```"):
-        content = content[:-3]
-    
-    result = json.loads(content.strip())
+    try:
+        result = call_structured(prompt, node="determine_compliance", schema=ComplianceResult)
+    except (StructuredOutputError, LLMDeadlineExceeded) as e:
+        # one unusable feature shouldn't sink the audit - flag it for a human
+        reason = "timed out" if isinstance(e, LLMDeadlineExceeded) else "unparseable model reply"
+        result = ComplianceResult(
+            status="needs_review",
+            notes=f"Automated determination failed ({reason}); review manually."
+        )
     
     finding = Finding(
         feature=state["current_feature"],
-        plan_value=state["current_feature_value"],
-        regulation=result.get("regulation", ""),
+        plan_value=state["current_feature_value"] or "",
+        regulation=result.regulation,
         source="Web Search",
-        status=result.get("status", "needs_review"),
-        notes=result.get("notes", ""),
+        status=result.status,
+        notes=result.notes,
         links=state.get("web_links", [])
     )
 
@@ -283,33 +401,31 @@ def determine_compliance(state: ComplianceState) -> dict:
 # NODE 7: Generate Final Report
 # ============================================================
 
-REPORT_PROMPT = """You are a compliance report writer. Generate a clear, professional compliance report.
-
-Plan Name: {plan_name}
-
-Findings:
-{findings}
-
-Generate a compliance report with:
-1. Executive Summary (2-3 sentences)
-2. Compliant Items (list with ✓)
-3. Gaps Found (list with ✗)  
-4. Items Needing Review (list with ⚠)
-5. Overall Risk Level (Low/Medium/High)
-6. Recommended Actions
-
-Be concise but thorough.
-"""
+def _stream_writer():
+    """LangGraph's custom stream writer, or a no-op outside a graph run"""
+    try:
+        return get_stream_writer()
+    except RuntimeError:
+        return lambda chunk: None
 
 
 def generate_report(state: ComplianceState) -> dict:
     """Generate the final compliance report"""
     
     plan_name = state.get("extracted_features", {}).get("plan_name", "Unknown Plan")
+    findings = state.get("findings", [])
+    risk = risk_level(findings)
+    
+    if state.get("report_mode") == "template":
+        # structured report only - deterministic, no LLM call
+        return {
+            "report": report_to_markdown(compile_report(plan_name or "Unknown Plan", risk, findings)),
+            "risk_level": risk
+        }
     
     # Format findings
     findings_text = ""
-    for f in state.get("findings", []):
+    for f in findings:
         findings_text += f"""
 Feature: {f['feature']}
 Plan Value: {f['plan_value']}
@@ -320,25 +436,95 @@ Notes: {f['notes']}
 ---
 """
     
-    prompt = REPORT_PROMPT.format(
+    prompt = get_prompt("report").messages(
         plan_name=plan_name,
         findings=findings_text
     )
     
-    response = llm.invoke(prompt)
+    # stream the narrative to graph.stream(stream_mode="custom") readers as it is written
+    write = _stream_writer()
+    streamed = []
+
+    def on_token(text: str):
+        streamed.append(text)
+        write({"report_token": text})
+
+    try:
+        response = stream_llm(prompt, node="generate_report", on_token=on_token)
+        report = response.content
+    except LLMDeadlineExceeded:
+        report = report_to_markdown(compile_report(plan_name or "Unknown Plan", risk, findings))
+        if streamed:
+            # readers already show part of the narrative; swap it for the report that replaces it
+            write({"report_replace": report})
     
-    # Determine risk level
-    gaps = [f for f in state.get("findings", []) if f["status"] == "gap"]
-    reviews = [f for f in state.get("findings", []) if f["status"] == "needs_review"]
+    return {
+        "report": report,
+        "risk_level": risk
+    }
+
+
+def risk_level(findings: list) -> str:
+    """Overall risk from the findings' statuses"""
+    gaps = [f for f in findings if f["status"] == "gap"]
+    reviews = [f for f in findings if f["status"] == "needs_review"]
     
     if len(gaps) >= 2:
-        risk = "High"
+        return "High"
     elif len(gaps) == 1 or len(reviews) >= 2:
-        risk = "Medium"
-    else:
-        risk = "Low"
+        return "Medium"
+    return "Low"
+
+
+# ============================================================
+# Partial report (audit stopped early - not a graph node)
+# ============================================================
+
+# Finding source for features the audit never reached
+NOT_EVALUATED = "Not evaluated"
+
+
+def partial_report(state: ComplianceState, reason: str) -> dict:
+    """
+    Close out an audit that was stopped before generate_report: every
+    feature not yet determined becomes needs_review, and the report is
+    assembled from the findings without another LLM call
+    """
+    findings = list(state.get("findings") or [])
+    done = {f["feature"] for f in findings}
+    extracted = state.get("extracted_features") or {}
+    
+    remaining = list(state.get("features_to_check") or [])
+    current = state.get("current_feature")
+    if current and current not in done:
+        remaining.insert(0, current)
+    
+    pending = [
+        Finding(
+            feature=feature,
+            plan_value=feature_value(extracted, feature) or "",
+            regulation="",
+            source=NOT_EVALUATED,
+            status="needs_review",
+            notes=f"Audit stopped before this feature was checked ({reason}); review manually.",
+            links=[]
+        )
+        for feature in remaining
+    ]
+    findings += pending
+    
+    marks = {"compliant": "✓", "gap": "✗", "needs_review": "⚠"}
+    lines = [
+        "## Partial Compliance Report",
+        "",
+        f"The audit stopped early ({reason}). {len(findings) - len(pending)} of "
+        f"{len(findings)} features were evaluated; the rest are marked for review.",
+        "",
+    ]
+    lines += [f"- {marks.get(f['status'], '•')} {f['feature']}: {f['notes']}" for f in findings]
     
     return {
-        "report": response.content,
-        "risk_level": risk
+        "findings": pending,
+        "report": "\n".join(lines),
+        "risk_level": risk_level(findings)
     }
\ No newline at end of file
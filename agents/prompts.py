@@ -0,0 +1,337 @@
+"""
+Prompt registry - versioned templates with a static prefix and a variable suffix
+
+Providers cache the longest prompt prefix they have recently seen and bill
+it at the cached input rate (OpenAI: prompts of 1024+ tokens, matched in
+128-token steps). A template therefore keeps what is the same on every
+call - role, instructions, output format - in its system message, and puts
+the per-call content (plan text, evidence, the plan's value) at the end of
+the user message:
+
+    prompt = get_prompt("determine_compliance")
+    messages = prompt.messages(feature=..., kb_results=..., plan_value=..., web_results=...)
+    call_structured(messages, node="determine_compliance", schema=ComplianceResult)
+    prompt.format(...)            # the same prompt as one string, e.g. to count its tokens
+
+evaluate_kb and determine_compliance share their system message and open
+their user message with the same feature + KB evidence block, so for each
+feature the determination reuses the prefix the sufficiency check just
+paid for, and plans audited against the same regulations reuse it too.
+
+Every version of a template stays registered. Nodes use the latest unless
+PROMPT_VERSIONS pins one ("determine_compliance=1,extraction=1"), so a
+layout can be compared or rolled back without a code change. Version 1
+of each template is the original single-message prompt, byte for byte,
+so cassettes recorded with it still replay under their exact keys.
+Rendered messages carry the template key ("evaluate_kb@v2"); call_llm
+records it on its span, and Trace.prompt_cache() breaks cached vs
+uncached input tokens down by node and prompt version.
+"""
+
+import hashlib
+import os
+from dataclasses import dataclass
+from typing import Optional
+
+from langchain_core.messages import HumanMessage, SystemMessage
+
+
+class PromptMessages(list):
+    """Rendered chat messages, tagged with the key of the template they came from"""
+
+    def __init__(self, messages, key: str = None):
+        super().__init__(messages)
+        self.key = key
+
+
+@dataclass(frozen=True)
+class PromptTemplate:
+    name: str
+    version: int
+    user: str
+    system: str = ""  # static prefix; "" sends the user message alone
+
+    @property
+    def key(self) -> str:
+        return f"{self.name}@v{self.version}"
+
+    @property
+    def digest(self) -> str:
+        return hashlib.sha256(f"{self.system}\x00{self.user}".encode("utf-8")).hexdigest()[:12]
+
+    def messages(self, **values) -> PromptMessages:
+        messages = [SystemMessage(content=self.system.format(**values))] if self.system else []
+        messages.append(HumanMessage(content=self.user.format(**values)))
+        return PromptMessages(messages, key=self.key)
+
+    def format(self, **values) -> str:
+        return prompt_text(self.messages(**values))
+
+
+def prompt_text(prompt) -> str:
+    """A prompt (string or message list) as the plain text the model reads"""
+    if isinstance(prompt, str):
+        return prompt
+    return "\n".join(str(getattr(m, "content", m)) for m in prompt)
+
+
+def prompt_key(prompt) -> Optional[str]:
+    """The registry key a prompt was rendered from, if any"""
+    return getattr(prompt, "key", None)
+
+
+# ============================================================
+# Registry
+# ============================================================
+
+_registry: dict[str, dict[int, PromptTemplate]] = {}
+
+
+def register(template: PromptTemplate) -> PromptTemplate:
+    versions = _registry.setdefault(template.name, {})
+    if template.version in versions:
+        raise ValueError(f"prompt {template.key} is already registered")
+    versions[template.version] = template
+    return template
+
+
+def pinned_versions() -> dict[str, int]:
+    """PROMPT_VERSIONS="evaluate_kb=1,determine_compliance=1" -> {"evaluate_kb": 1, ...}"""
+    pins = {}
+    for entry in os.getenv("PROMPT_VERSIONS", "").split(","):
+        name, _, version = entry.partition("=")
+        if name.strip() and version.strip():
+            pins[name.strip()] = int(version)
+    return pins
+
+
+def get_prompt(name: str, version: int = None) -> PromptTemplate:
+    """A registered template: the given version, the PROMPT_VERSIONS pin, or the latest"""
+    versions = _registry.get(name)
+    if not versions:
+        raise KeyError(f"no prompt named {name!r}")
+    version = version if version is not None else pinned_versions().get(name, max(versions))
+    if version not in versions:
+        raise KeyError(f"no version {version} of prompt {name!r} (have {sorted(versions)})")
+    return versions[version]
+
+
+def list_prompts() -> list[dict]:
+    """Every registered template version, for inspection"""
+    return [
+        {"key": t.key, "digest": t.digest, "system_chars": len(t.system), "user_chars": len(t.user)}
+        for name in sorted(_registry) for t in sorted(_registry[name].values(), key=lambda t: t.version)
+    ]
+
+
+# ============================================================
+# Extraction
+# ============================================================
+
+EXTRACTION_FIELDS = """{{
+  "plan_name": "string or null",
+  "effective_date": "string or null",
+  
+  "eligibility": {{
+    "age_requirement": "number or null",
+    "service_requirement": "string or null",
+    "entry_dates": "string or null"
+  }},
+  
+  "contributions": {{
+    "employer_match_formula": "string or null",
+    "match_cap": "string or null",
+    "catch_up_allowed": "boolean or null"
+  }},
+  
+  "vesting": {{
+    "type": "string or null (immediate, cliff, graded)",
+    "schedule": "string or null",
+    "years_to_full": "number or null"
+  }},
+  
+  "auto_enrollment": {{
+    "enabled": "boolean or null",
+    "default_rate": "number or null",
+    "auto_escalation": "boolean or null"
+  }},
+  
+  "distributions": {{
+    "hardship_allowed": "boolean or null",
+    "loans_allowed": "boolean or null"
+  }}
+}}"""
+
+# shared by every extraction prompt: whole documents, amendments and partial extractions
+EXTRACTION_SYSTEM = """You are an expert at extracting structured data from 401(k) plan documents.
+
+Each request gives you text from a plan document - the whole document, excerpts of it, or only the
+passages of a restated document that changed since its previous version - and says which features
+to extract. Extract them as the text states them. Use null for anything the text does not state.
+Return ONLY valid JSON, in this format (leave out features you were not asked for):
+
+""" + EXTRACTION_FIELDS
+
+register(PromptTemplate("extraction", 1, """You are an expert at extracting structured data from 401(k) plan documents.
+
+Extract the following features from this plan document. Return ONLY valid JSON.
+
+""" + EXTRACTION_FIELDS + """
+
+PLAN DOCUMENT:
+{pdf_text}
+"""))
+
+register(PromptTemplate("extraction", 2, system=EXTRACTION_SYSTEM, user="""Extract all of the features from this plan document.
+
+PLAN DOCUMENT:
+{pdf_text}
+"""))
+
+register(PromptTemplate("amendment_extraction", 1, """You are an expert at extracting structured data from 401(k) plan documents.
+
+Below are ONLY the passages of a restated plan document that changed since its previous version.
+Extract the following features as these passages state them. Use null for anything they do not
+state - the previous version's values are kept for those. Return ONLY valid JSON.
+
+""" + EXTRACTION_FIELDS + """
+
+CHANGED PASSAGES:
+{changes}
+"""))
+
+register(PromptTemplate("amendment_extraction", 2, system=EXTRACTION_SYSTEM, user="""Extract all of the features as these passages state them. They are ONLY the passages of a restated
+plan document that changed since its previous version; the previous version's values are kept for
+anything they do not state.
+
+CHANGED PASSAGES:
+{changes}
+"""))
+
+register(PromptTemplate("partial_extraction", 1, """You are an expert at extracting structured data from 401(k) plan documents.
+
+Extract the following features from these excerpts of a plan document. Use null for anything they
+do not state. Return ONLY valid JSON.
+
+{fields}
+
+PLAN DOCUMENT EXCERPTS:
+{passages}
+"""))
+
+register(PromptTemplate("partial_extraction", 2, system=EXTRACTION_SYSTEM, user="""Extract only these features from these excerpts of a plan document:
+
+{fields}
+
+PLAN DOCUMENT EXCERPTS:
+{passages}
+"""))
+
+
+# ============================================================
+# Sufficiency check and compliance determination
+# ============================================================
+
+# shared by evaluate_kb and determine_compliance. Each task's question and reply format stay
+# in its own suffix, so neither node's reply can drift into the other's format
+COMPLIANCE_SYSTEM = """You are a 401(k) compliance expert. Each request gives a plan feature, the regulations found
+for it in the knowledge base, the plan's value for that feature and, sometimes, results from
+official government sources. It ends with one task to carry out on them and the exact format
+to reply in. Reply in that format only."""
+
+# identical in both nodes' prompts up to the plan value, so the second call hits the cached prefix
+_FEATURE_EVIDENCE = """Feature: {feature}
+
+Knowledge base results:
+{kb_results}
+
+Plan value: {plan_value}"""
+
+register(PromptTemplate("evaluate_kb", 1, """You are a compliance expert evaluating if knowledge base results answer the question.
+
+Feature being checked: {feature}
+Plan value: {plan_value}
+
+Knowledge base results:
+{kb_results}
+
+Question: Do these results provide enough information to determine if the plan value is compliant?
+
+Respond with ONLY "sufficient" or "insufficient".
+"""))
+
+register(PromptTemplate("evaluate_kb", 2, system=COMPLIANCE_SYSTEM, user=_FEATURE_EVIDENCE + """
+
+Task: SUFFICIENCY. Do these results provide enough information to determine if the plan value is
+compliant?
+
+Respond with ONLY "sufficient" or "insufficient".
+"""))
+
+register(PromptTemplate("determine_compliance", 1, """You are a 401(k) compliance expert. Determine if the plan feature is compliant.
+
+Feature: {feature}
+Plan Value: {plan_value}
+
+Regulations Found:
+{regulations}
+
+Based on the regulations, is this plan feature compliant?
+
+Respond in this exact JSON format:
+{{
+  "status": "compliant" or "gap" or "needs_review",
+  "regulation": "the specific rule that applies",
+  "notes": "brief explanation"
+}}
+"""))
+
+register(PromptTemplate("determine_compliance", 2, system=COMPLIANCE_SYSTEM, user=_FEATURE_EVIDENCE + """{web_results}
+
+Task: DETERMINATION. Based on the regulations, is this plan feature compliant?
+
+Respond in this exact JSON format:
+{{
+  "status": "compliant" or "gap" or "needs_review",
+  "regulation": "the specific rule that applies",
+  "notes": "brief explanation"
+}}
+"""))
+
+
+# ============================================================
+# Report
+# ============================================================
+
+register(PromptTemplate("report", 1, """You are a compliance report writer. Generate a clear, professional compliance report.
+
+Plan Name: {plan_name}
+
+Findings:
+{findings}
+
+Generate a compliance report with:
+1. Executive Summary (2-3 sentences)
+2. Compliant Items (list with ✓)
+3. Gaps Found (list with ✗)  
+4. Items Needing Review (list with ⚠)
+5. Overall Risk Level (Low/Medium/High)
+6. Recommended Actions
+
+Be concise but thorough.
+"""))
+
+register(PromptTemplate("report", 2, system="""You are a compliance report writer. Generate a clear, professional compliance report from the
+findings you are given, with:
+1. Executive Summary (2-3 sentences)
+2. Compliant Items (list with ✓)
+3. Gaps Found (list with ✗)
+4. Items Needing Review (list with ⚠)
+5. Overall Risk Level (Low/Medium/High)
+6. Recommended Actions
+
+Be concise but thorough.""", user="""Plan Name: {plan_name}
+
+Findings:
+{findings}
+"""))
@@ -0,0 +1,333 @@
+"""
+Deadlines, hedged requests and rate-limit backoff for LLM calls
+
+Every model call runs under its node's deadline. With hedging on
+(LLM_HEDGE=1), a call still unanswered after the node's p95 latency gets
+a duplicate, and whichever answers first wins. Rate-limit (429) and
+transient 5xx errors back off exponentially, within the same deadline.
+Streamed replies (stream_with_policy) get the same deadline and backoff,
+but no hedging.
+
+Per-node settings come from NODE_POLICIES and can be overridden with
+LLM_TIMEOUT_<NODE> / LLM_HEDGE_AFTER_<NODE> (seconds), e.g.
+LLM_TIMEOUT_DETERMINE_COMPLIANCE=30.
+"""
+
+import contextvars
+import os
+import random
+import statistics
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Callable, Iterable, Iterator
+
+from tools.cancellation import current_token
+from tools.tracing import current_span
+from .governor import GovernorTimeout, Lease, get_governor
+
+
+class LLMDeadlineExceeded(TimeoutError):
+    """A node's LLM call did not finish within its deadline"""
+
+
+@dataclass
+class LLMPolicy:
+    timeout: float      # hard deadline for the call, retries included (seconds)
+    hedge_after: float  # fire a duplicate after this long, until enough latencies are observed
+
+
+NODE_POLICIES = {
+    "extract_features": LLMPolicy(timeout=120.0, hedge_after=40.0),
+    "evaluate_kb": LLMPolicy(timeout=30.0, hedge_after=6.0),
+    "determine_compliance": LLMPolicy(timeout=60.0, hedge_after=12.0),
+    "generate_report": LLMPolicy(timeout=120.0, hedge_after=40.0),
+}
+DEFAULT_POLICY = LLMPolicy(timeout=60.0, hedge_after=15.0)
+
+MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "4"))
+BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "0.5"))
+BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", "20"))
+
+# Hedge at the observed p95 once a node has this many samples
+MIN_SAMPLES = 20
+
+# How often a waiting call checks whether its audit was cancelled
+CANCEL_POLL_S = 0.25
+
+_pool = None
+_pool_lock = threading.Lock()
+
+STATS = {"calls": 0, "hedges": 0, "hedge_wins": 0, "retries": 0, "deadlines": 0}
+_stats_lock = threading.Lock()
+
+
+def hedging_enabled() -> bool:
+    return os.getenv("LLM_HEDGE", "").lower() in ("1", "true", "yes")
+
+
+def policy_for(node: str) -> LLMPolicy:
+    base = NODE_POLICIES.get(node, DEFAULT_POLICY)
+    key = node.upper()
+    return LLMPolicy(
+        timeout=float(os.getenv(f"LLM_TIMEOUT_{key}", base.timeout)),
+        hedge_after=float(os.getenv(f"LLM_HEDGE_AFTER_{key}", base.hedge_after)),
+    )
+
+
+def _count(name: str, n: int = 1):
+    with _stats_lock:
+        STATS[name] += n
+
+
+def _get_pool() -> ThreadPoolExecutor:
+    global _pool
+
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(
+                max_workers=int(os.getenv("LLM_POOL_SIZE", "16")),
+                thread_name_prefix="llm",
+            )
+    return _pool
+
+
+class LatencyTracker:
+    """Rolling window of successful call latencies per node"""
+
+    def __init__(self, window: int = 200):
+        self.window = window
+        self._samples: dict[str, deque] = {}
+        self._lock = threading.Lock()
+
+    def add(self, node: str, seconds: float):
+        with self._lock:
+            self._samples.setdefault(node, deque(maxlen=self.window)).append(seconds)
+
+    def p95(self, node: str):
+        with self._lock:
+            samples = list(self._samples.get(node, ()))
+        if len(samples) < MIN_SAMPLES:
+            return None
+        return statistics.quantiles(samples, n=20)[-1]
+
+
+latencies = LatencyTracker()
+
+
+def hedge_delay(node: str) -> float:
+    observed = latencies.p95(node)
+    return observed if observed is not None else policy_for(node).hedge_after
+
+
+def _status(error: BaseException):
+    """HTTP status of an openai / httpx exception, if it carries one"""
+    return getattr(error, "status_code", None) or getattr(getattr(error, "response", None), "status_code", None)
+
+
+def is_rate_limit(error: BaseException) -> bool:
+    return _status(error) == 429 or type(error).__name__ == "RateLimitError"
+
+
+def is_retryable(error: BaseException) -> bool:
+    """429s and transient server/connection errors"""
+    status = _status(error)
+    if is_rate_limit(error) or (isinstance(status, int) and status >= 500):
+        return True
+    return type(error).__name__ in ("APIConnectionError", "APITimeoutError", "InternalServerError")
+
+
+def _retry_after(error: BaseException):
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+def _used_tokens(result):
+    usage = getattr(result, "usage_metadata", None) or {}
+    if not usage:
+        return None
+    return usage.get("input_tokens", 0) + usage.get("output_tokens", 0)
+
+
+def _wait(futures, timeout: float, return_when: str = FIRST_COMPLETED):
+    """
+    futures.wait() that gives up when the audit is cancelled. The request
+    itself can't be interrupted; it is abandoned and frees its lease when done
+    """
+    token = current_token()
+    if token is None:
+        return wait(futures, timeout=timeout, return_when=return_when)
+
+    end = time.monotonic() + timeout
+    while True:
+        token.check()
+        done, pending = wait(futures, timeout=max(0.0, min(end - time.monotonic(), CANCEL_POLL_S)),
+                             return_when=return_when)
+        if done or time.monotonic() >= end:
+            return done, pending
+
+
+def _sleep(seconds: float):
+    token = current_token()
+    if token is None:
+        time.sleep(seconds)
+    elif token.wait(seconds):
+        token.check()
+
+
+def _submit(fn: Callable, node: str, lease: Lease):
+    """Run fn on the pool with the caller's context (trace span, cassette); frees the lease after"""
+    ctx = contextvars.copy_context()
+
+    def timed():
+        started = time.perf_counter()
+        result = None
+        try:
+            result = fn()
+            latencies.add(node, time.perf_counter() - started)
+            return result
+        finally:
+            lease.release(_used_tokens(result))
+
+    return _get_pool().submit(ctx.run, timed)
+
+
+def _acquire(node: str, deadline: float, tokens: int) -> Lease:
+    """Governor lease for one request, waiting no later than the deadline"""
+    queued = time.monotonic()
+    try:
+        lease = get_governor().acquire(tokens, timeout=max(0.0, deadline - queued))
+    except GovernorTimeout:
+        _count("deadlines")
+        raise LLMDeadlineExceeded(f"{node}: queued for LLM capacity past the deadline") from None
+    span = current_span()
+    if span is not None:
+        span.attrs["queue_ms"] = round(span.attrs.get("queue_ms", 0) + (time.monotonic() - queued) * 1000, 1)
+    return lease
+
+
+def _first_result(fn: Callable, node: str, deadline: float, hedge: bool, tokens: int):
+    governor = get_governor()
+    lease = _acquire(node, deadline, tokens)
+
+    primary = _submit(fn, node, lease)
+    pending = {primary}
+    hedged = None
+
+    if hedge:
+        done, _ = _wait(pending, timeout=max(0.0, min(hedge_delay(node), deadline - time.monotonic())))
+        if not done and time.monotonic() < deadline:
+            try:
+                # hedges only use spare capacity, they never queue
+                hedge_lease = governor.acquire(tokens, timeout=0)
+            except GovernorTimeout:
+                hedge_lease = None
+            if hedge_lease is not None:
+                hedged = _submit(fn, node, hedge_lease)
+                pending.add(hedged)
+                _count("hedges")
+
+    error = None
+    while pending:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        done, pending = _wait(pending, timeout=remaining)
+        for future in done:
+            if future.exception() is None:
+                if future is hedged:
+                    _count("hedge_wins")
+                span = current_span()
+                if span is not None:
+                    span.attrs["hedged"] = hedged is not None
+                    span.attrs["winner"] = "hedge" if future is hedged else "primary"
+                return future.result()
+            error = future.exception()
+
+    if error is not None and not pending:
+        raise error
+    _count("deadlines")
+    raise LLMDeadlineExceeded(f"{node}: no LLM reply within {policy_for(node).timeout:g}s")
+
+
+def call_with_policy(fn: Callable, node: str, tokens: int = 1000):
+    """
+    Run one LLM call under the node's deadline, hedging slow calls and
+    backing off on rate limits. Each request holds a governor lease sized
+    by the estimated tokens. Raises LLMDeadlineExceeded when time runs out,
+    or AuditCancelled as soon as the surrounding audit is cancelled.
+    """
+    deadline = time.monotonic() + policy_for(node).timeout
+    hedge = hedging_enabled()
+    _count("calls")
+
+    for attempt in range(MAX_RETRIES + 1):
+        try:
+            return _first_result(fn, node, deadline, hedge, tokens)
+        except LLMDeadlineExceeded:
+            raise
+        except Exception as e:
+            if not is_retryable(e) or attempt == MAX_RETRIES:
+                raise
+            _backoff(e, attempt, node, deadline)
+
+
+def _backoff(error: Exception, attempt: int, node: str, deadline: float):
+    """Wait before retrying a retryable error, or give up if that would pass the deadline"""
+    delay = _retry_after(error) or min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt)
+    delay *= random.uniform(0.8, 1.2)
+    if time.monotonic() + delay >= deadline:
+        _count("deadlines")
+        raise LLMDeadlineExceeded(f"{node}: rate limited until past the deadline") from error
+    _count("retries")
+    span = current_span()
+    if span is not None:
+        span.attrs["retries"] = attempt + 1
+    if is_rate_limit(error):
+        # the provider is saturated for everyone - hold all callers, not just this one;
+        # the next acquire() waits out the pause
+        get_governor().pause(delay)
+    else:
+        _sleep(delay)
+
+
+def stream_with_policy(stream: Callable[[], Iterable], node: str, tokens: int = 1000) -> Iterator:
+    """
+    Streaming counterpart of call_with_policy: yields chunks as they arrive,
+    under the node's deadline and a governor lease. Rate limits and transient
+    errors are retried only before the first chunk, and there is no hedging -
+    a duplicate can't take over a reply that is already being shown.
+    """
+    deadline = time.monotonic() + policy_for(node).timeout
+    token = current_token()
+    _count("calls")
+
+    for attempt in range(MAX_RETRIES + 1):
+        lease = _acquire(node, deadline, tokens)
+        started = time.perf_counter()
+        emitted, used = False, None
+        try:
+            for chunk in stream():
+                emitted = True
+                used = _used_tokens(chunk) or used
+                yield chunk
+                if token is not None:
+                    token.check()
+                if time.monotonic() > deadline:
+                    _count("deadlines")
+                    raise LLMDeadlineExceeded(f"{node}: reply still streaming after {policy_for(node).timeout:g}s")
+            latencies.add(node, time.perf_counter() - started)
+            return
+        except LLMDeadlineExceeded:
+            raise
+        except Exception as e:
+            if emitted or not is_retryable(e) or attempt == MAX_RETRIES:
+                raise
+            _backoff(e, attempt, node, deadline)
+        finally:
+            lease.release(used)
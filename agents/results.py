@@ -0,0 +1,112 @@
+"""
+Incremental audit results - fold streamed graph updates into the report
+
+    result = ResultAccumulator("plan.pdf")
+    for step in compliance_graph.stream(initial_state(text)):
+        result.add(step)
+    report = result.report()   # same structure as tools.report.compile_report
+
+Each update is applied once, as it arrives: findings and status counts
+are appended, sources are de-duplicated by URL, and the extraction and
+final report are kept. Steps themselves are not retained, so memory
+grows only with the findings, not with the number of steps.
+"""
+
+from datetime import datetime
+from typing import Any, Optional
+
+from tools.report import normalize_links
+from .nodes import NOT_EVALUATED, risk_level
+from .state import Finding
+
+
+class ResultAccumulator:
+    def __init__(self, plan_name: str = "Unknown Plan"):
+        self.plan_name = plan_name
+        self.extracted_features: dict[str, Any] = {}
+        self.features_total = 0
+        self.features_done = 0  # determined, not counting a partial report's placeholders
+        self.features_to_check: list[str] = []
+        self.plan_diff: Optional[dict] = None  # amendment reviews: what changed since the previous version
+        self.text_normalization: Optional[dict] = None  # plan text tokens before/after normalization
+        self.current_feature: Optional[str] = None
+        self.current_feature_value: Optional[str] = None
+        self.findings: list[Finding] = []
+        self.counts = {"compliant": 0, "gap": 0, "needs_review": 0}
+        self.sources: list[dict] = []
+        self.web_links: list[dict] = []  # current feature's web results
+        self.report_text = ""
+        self.steps = 0
+        self._risk_level: Optional[str] = None
+        self._seen_urls: set[str] = set()
+
+    @property
+    def risk_level(self) -> str:
+        """From generate_report when it ran, otherwise from the findings so far"""
+        return self._risk_level or risk_level(self.findings)
+
+    def add(self, step: dict) -> tuple[str, dict]:
+        """Apply one stream_mode="updates" item ({node: update}); returns (node, update)"""
+        node, update = next(iter(step.items()))
+        update = update or {}
+        self.steps += 1
+
+        if "extracted_features" in update:
+            self.extracted_features = update["extracted_features"] or {}
+            self.features_total = len(update.get("features_to_check") or [])
+        if update.get("plan_diff"):
+            self.plan_diff = update["plan_diff"]
+        if update.get("text_normalization"):
+            self.text_normalization = update["text_normalization"]
+        if "features_to_check" in update:
+            self.features_to_check = list(update["features_to_check"] or [])
+        if "current_feature" in update:
+            self.current_feature = update["current_feature"]
+            self.current_feature_value = update.get("current_feature_value")
+        if "web_links" in update:
+            self.web_links = update["web_links"] or []
+        for finding in update.get("findings") or []:
+            self.add_finding(finding)
+        if update.get("report"):
+            self.report_text = update["report"]
+        if update.get("risk_level"):
+            self._risk_level = update["risk_level"]
+        return node, update
+
+    def add_finding(self, finding: Finding):
+        self.findings.append(finding)
+        status = finding.get("status", "needs_review")
+        self.counts[status] = self.counts.get(status, 0) + 1
+        if finding.get("source") != NOT_EVALUATED:
+            self.features_done += 1
+        for link in normalize_links(finding.get("links")):
+            if link["url"] not in self._seen_urls:
+                self._seen_urls.add(link["url"])
+                self.sources.append(link)
+
+    def state(self) -> dict:
+        """The parts of the graph state needed to close out a stopped audit (partial_report)"""
+        return {
+            "extracted_features": self.extracted_features,
+            "findings": self.findings,
+            "features_to_check": self.features_to_check,
+            "current_feature": self.current_feature,
+            "current_feature_value": self.current_feature_value,
+        }
+
+    def report(self, plan_name: str = None, generated_at: float = None) -> dict:
+        """The compile_report structure, from what has been accumulated; generated_at defaults to now"""
+        generated = datetime.fromtimestamp(generated_at) if generated_at else datetime.now()
+        report = {
+            "meta": {
+                "plan_name": plan_name or self.plan_name,
+                "generated_at": generated.strftime("%Y-%m-%d %H:%M:%S"),
+                "risk_level": self.risk_level,
+                "counts": dict(self.counts),
+            },
+            "findings": list(self.findings),
+            "sources": list(self.sources),
+        }
+        if self.plan_diff:
+            report["changes"] = list(self.plan_diff.get("drift") or [])
+        return report
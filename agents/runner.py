@@ -0,0 +1,284 @@
+"""
+Background audit runner - worker pool, run registry and progress events
+
+RunRegistry.start() executes compliance_graph.stream() on a worker thread and
+turns each step into typed RunEvents on the run's append-only event log.
+Readers (the Streamlit UI, tests, batch scripts) poll events_since(seq)
+and apply them incrementally. Runs live in a process-wide registry, so a
+browser rerun or a new tab can reattach to a run by its id.
+
+A run can be cancelled, or given a deadline. Either way it stops at the
+next node boundary (in-flight LLM/web calls give up early too) and, by
+default, finishes with a partial report built from the findings so far.
+
+Given the previous version of the plan (baseline_text), a run is an
+amendment review: the previous version's extraction is looked up in the
+audit history by its text digest and only the changed passages are
+re-extracted.
+"""
+
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+
+from tools.blobstore import blob_scope
+from tools.cancellation import AuditCancelled, CancelToken, cancel_scope
+from tools.history import get_history
+from tools.tracing import Trace, iter_in_trace, trace_run
+from .governor import INTERACTIVE, llm_priority
+from .graph import compliance_graph
+from .nodes import partial_report
+from .results import ResultAccumulator
+from .state import initial_state
+
+GRAPH_CONFIG = {"recursion_limit": 300}
+
+# Event types
+RUN_STARTED = "run_started"
+NODE_FINISHED = "node_finished"
+FEATURES_EXTRACTED = "features_extracted"
+FEATURE_STARTED = "feature_started"
+FEATURES_DONE = "features_done"
+WEB_SOURCES = "web_sources"
+FINDING = "finding"
+REPORT_TOKEN = "report_token"
+REPORT_REPLACED = "report_replaced"  # the streamed draft is void; data["text"] is the report instead
+RUN_FINISHED = "run_finished"
+RUN_FAILED = "run_failed"
+RUN_CANCELLED = "run_cancelled"
+
+# Run status
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+
+@dataclass
+class RunEvent:
+    seq: int
+    type: str
+    node: Optional[str] = None
+    data: dict = field(default_factory=dict)
+    ts: float = field(default_factory=time.time)
+
+
+class AuditRun:
+    """One audit: status, event log, accumulated result and trace"""
+
+    def __init__(self, pdf_text: str, plan_name: str, priority: str, trace: Trace = None,
+                 deadline_s: float = None, partial: bool = True, report_mode: str = "llm",
+                 baseline_text: str = None):
+        self.run_id = trace.run_id if trace else uuid.uuid4().hex[:12]
+        self.plan_name = plan_name
+        self.priority = priority
+        self.pdf_text = pdf_text
+        self.baseline_text = baseline_text
+        self.text_digest: Optional[str] = None
+        self.status = QUEUED
+        self.error: Optional[str] = None
+        self.partial = partial
+        self.report_mode = report_mode
+        self.stopped: Optional[str] = None  # why the run ended early, if it did
+        self.deadline_s = deadline_s
+        self.token = CancelToken()
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.result = ResultAccumulator(plan_name)
+        self.trace = trace or Trace(self.run_id)
+        self.trace_path: Optional[str] = None
+        self.history_error: Optional[str] = None
+        self._events: list[RunEvent] = []
+        self._cond = threading.Condition()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (DONE, FAILED, CANCELLED)
+
+    @property
+    def progress(self) -> dict:
+        return {"features_total": self.result.features_total, "features_done": self.result.features_done}
+
+    def cancel(self, reason: str = "cancelled by user"):
+        """Stop at the next node boundary; in-flight calls are abandoned"""
+        self.token.cancel(reason)
+
+    def emit(self, type: str, node: str = None, **data):
+        with self._cond:
+            self._events.append(RunEvent(seq=len(self._events), type=type, node=node, data=data))
+            self._cond.notify_all()
+
+    def events_since(self, seq: int = 0, timeout: float = 0) -> list[RunEvent]:
+        """Events with seq >= seq; optionally block up to timeout for new ones"""
+        with self._cond:
+            if timeout and len(self._events) <= seq and not self.finished:
+                self._cond.wait(timeout)
+            return self._events[seq:]
+
+    def _record_step(self, step: dict):
+        """
+        Fold the step into the result and translate it into progress events:
+        NODE_FINISHED first, then any node-specific events
+        """
+        node, update = self.result.add(step)
+
+        self.emit(NODE_FINISHED, node)
+        if node == "extract_features":
+            self.emit(FEATURES_EXTRACTED, node, total=self.result.features_total)
+        elif node == "select_next_feature":
+            if update.get("current_feature"):
+                self.emit(FEATURE_STARTED, node, feature=update["current_feature"], value=update.get("current_feature_value"))
+            else:
+                self.emit(FEATURES_DONE, node)
+        elif node == "search_web":
+            self.emit(WEB_SOURCES, node, links=[l for l in update.get("web_links") or [] if l.get("url")])
+        elif node in ("determine_compliance", "partial_report"):
+            for finding in update.get("findings") or []:
+                self.emit(FINDING, node, feature=finding.get("feature"), status=finding.get("status"))
+
+    def execute(self):
+        if self.deadline_s:
+            # the deadline counts from when a worker picks the run up, not from queueing
+            self.token.set_deadline(self.deadline_s)
+        self.status = RUNNING
+        self.emit(RUN_STARTED, plan_name=self.plan_name)
+        try:
+            # the run's blobs stay pinned until it ends, then leave memory
+            with llm_priority(self.priority), cancel_scope(self.token), blob_scope():
+                state = initial_state(self.pdf_text, self.report_mode, self.baseline_text)
+                self.text_digest = state["pdf_text"].digest
+                if state["baseline_text"] is not None:
+                    state["baseline_features"] = self._previous_extraction(state["baseline_text"].digest)
+                stream = compliance_graph.stream(
+                    state,
+                    config=GRAPH_CONFIG,
+                    stream_mode=["updates", "custom"],
+                )
+                for mode, chunk in iter_in_trace(stream, self.trace):
+                    if mode == "custom" and "report_replace" in chunk:
+                        self.emit(REPORT_REPLACED, "generate_report", text=chunk["report_replace"])
+                    elif mode == "custom":
+                        # report narrative, written token by token inside generate_report
+                        self.emit(REPORT_TOKEN, "generate_report", text=chunk.get("report_token", ""))
+                    else:
+                        self._record_step(chunk)
+        except AuditCancelled as e:
+            self.stopped = e.reason
+            if self.partial:
+                self._record_step({"partial_report": partial_report(self.result.state(), e.reason)})
+        except Exception as e:
+            self.error = f"{type(e).__name__}: {e}"
+
+        # everything a reader needs is in place before the run reports finished
+        self.pdf_text = self.baseline_text = ""  # the plan text is only needed while running
+        self.finished_at = time.time()
+        if not self.error and (self.partial or not self.stopped):
+            self._save_history()
+        self.trace_path = self.trace.export_jsonl()
+        if self.error:
+            self.status = FAILED
+            self.emit(RUN_FAILED, error=self.error)
+        elif self.stopped and not self.partial:
+            self.status = CANCELLED
+            self.emit(RUN_CANCELLED, reason=self.stopped)
+        else:
+            self.status = DONE
+            self.emit(RUN_FINISHED, risk_level=self.result.risk_level, stopped=self.stopped)
+
+    def _previous_extraction(self, digest: str) -> dict:
+        """The baseline's features from an earlier audit; {} has extract_features extract it afresh"""
+        try:
+            history = get_history()
+            return (history.extraction(digest) if history is not None else None) or {}
+        except Exception:
+            return {}
+
+    def _save_history(self):
+        """Append the completed audit to the persistent history; a failure here doesn't fail the run"""
+        try:
+            history = get_history()
+            if history is not None:
+                # keyed by the plan's own name when extraction found one, so re-uploads line up
+                plan_name = self.result.extracted_features.get("plan_name") or self.plan_name
+                with trace_run(trace=self.trace):
+                    history.record_run(self.run_id, self.result.report(plan_name), file_name=self.plan_name,
+                                       report_mode=self.report_mode, stopped=self.stopped,
+                                       audited_at=self.finished_at)
+                    if self.result.extracted_features and self.text_digest:
+                        history.save_extraction(self.text_digest, self.result.extracted_features, plan_name,
+                                                self.finished_at)
+                    diff = self.result.plan_diff or {}
+                    if diff.get("baseline_features"):
+                        history.save_extraction(diff["baseline_digest"], diff["baseline_features"])
+        except Exception as e:
+            self.history_error = f"{type(e).__name__}: {e}"
+
+
+class RunRegistry:
+    """Process-wide map of run id -> AuditRun, executed on a small worker pool"""
+
+    def __init__(self, workers: int = 2, keep_finished: int = 50,
+                 on_finished: Callable[[AuditRun], None] = None):
+        self.keep_finished = keep_finished
+        self.on_finished = on_finished  # called on the worker thread once a run has finished
+        self._runs: dict[str, AuditRun] = {}
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="audit")
+
+    def start(self, pdf_text: str, plan_name: str, priority: str = INTERACTIVE, trace: Trace = None,
+              deadline_s: float = None, partial: bool = True, report_mode: str = "llm",
+              baseline_text: str = None) -> AuditRun:
+        """
+        Queue an audit; pass the trace that already holds e.g. the PDF parse
+        span. With deadline_s, the run stops after that many seconds of work.
+        report_mode="template" skips the LLM narrative. baseline_text (the
+        plan's previous version) makes it an amendment review
+        """
+        run = AuditRun(pdf_text, plan_name, priority, trace, deadline_s, partial, report_mode, baseline_text)
+        with self._lock:
+            self._runs[run.run_id] = run
+            self._evict()
+        self._pool.submit(self._execute, run)
+        return run
+
+    def _execute(self, run: AuditRun):
+        run.execute()
+        if self.on_finished is not None:
+            self.on_finished(run)
+
+    def get(self, run_id: str) -> Optional[AuditRun]:
+        with self._lock:
+            return self._runs.get(run_id)
+
+    def runs(self) -> list[AuditRun]:
+        with self._lock:
+            return sorted(self._runs.values(), key=lambda r: r.created_at, reverse=True)
+
+    def queued(self) -> int:
+        """Runs waiting for a worker"""
+        with self._lock:
+            return sum(1 for r in self._runs.values() if r.status == QUEUED)
+
+    def _evict(self):
+        finished = sorted((r for r in self._runs.values() if r.finished), key=lambda r: r.finished_at)
+        for run in finished[: max(0, len(finished) - self.keep_finished)]:
+            del self._runs[run.run_id]
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_registry() -> RunRegistry:
+    """Lazy initialization of the process-wide run registry"""
+    global _registry
+
+    with _registry_lock:
+        if _registry is None:
+            _registry = RunRegistry(workers=int(os.getenv("AUDIT_WORKERS", "2")))
+    return _registry
@@ -0,0 +1,245 @@
+"""
+Pydantic schemas for structured LLM replies, with a local repair step
+
+parse_reply() turns a raw model reply into a validated model. Before
+giving up it tries cheap local fixes (markdown fences, surrounding prose,
+trailing commas, Python-style literals) so that only genuinely unusable
+replies cost another LLM call.
+"""
+
+import ast
+import json
+import re
+from typing import Annotated, Literal, Optional, Type, TypeVar, Union
+
+from pydantic import BaseModel, BeforeValidator, ConfigDict, ValidationError, field_validator
+
+T = TypeVar("T", bound=BaseModel)
+
+
+class StructuredOutputError(ValueError):
+    """An LLM reply could not be parsed or validated against its schema"""
+
+
+def _to_number(value):
+    """Coerce "21 years" -> 21, "3.5%" -> 3.5; anything without a number -> None"""
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        number = float(value)
+    else:
+        match = re.search(r"-?\d+(?:\.\d+)?", str(value))
+        if not match:
+            return None
+        number = float(match.group())
+    return int(number) if number.is_integer() else number
+
+
+def _to_bool(value):
+    if value is None or isinstance(value, bool):
+        return value
+    text = str(value).strip().lower()
+    if text in ("true", "yes", "y", "1", "allowed", "enabled"):
+        return True
+    if text in ("false", "no", "n", "0", "not allowed", "disabled"):
+        return False
+    return None
+
+
+def _to_text(value):
+    if value is None or isinstance(value, str):
+        return value or None
+    return str(value)
+
+
+Number = Annotated[Optional[Union[int, float]], BeforeValidator(_to_number)]
+Flag = Annotated[Optional[bool], BeforeValidator(_to_bool)]
+Text = Annotated[Optional[str], BeforeValidator(_to_text)]
+
+
+def _section(value):
+    return value if isinstance(value, (dict, BaseModel)) else {}
+
+
+class _Section(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+
+
+class Eligibility(_Section):
+    age_requirement: Number = None
+    service_requirement: Text = None
+    entry_dates: Text = None
+
+
+class Contributions(_Section):
+    employer_match_formula: Text = None
+    match_cap: Text = None
+    catch_up_allowed: Flag = None
+
+
+class Vesting(_Section):
+    type: Text = None
+    schedule: Text = None
+    years_to_full: Number = None
+
+
+class AutoEnrollment(_Section):
+    enabled: Flag = None
+    default_rate: Number = None
+    auto_escalation: Flag = None
+
+
+class Distributions(_Section):
+    hardship_allowed: Flag = None
+    loans_allowed: Flag = None
+
+
+class PlanExtraction(_Section):
+    """Reply schema for extract_features"""
+    plan_name: Text = None
+    effective_date: Text = None
+    eligibility: Annotated[Eligibility, BeforeValidator(_section)] = Eligibility()
+    contributions: Annotated[Contributions, BeforeValidator(_section)] = Contributions()
+    vesting: Annotated[Vesting, BeforeValidator(_section)] = Vesting()
+    auto_enrollment: Annotated[AutoEnrollment, BeforeValidator(_section)] = AutoEnrollment()
+    distributions: Annotated[Distributions, BeforeValidator(_section)] = Distributions()
+
+
+# keys are lowercased, with punctuation dropped and separators collapsed to "_"
+STATUS_ALIASES = {
+    "compliant": "compliant",
+    "pass": "compliant",
+    "passed": "compliant",
+    "in_compliance": "compliant",
+    "meets_requirements": "compliant",
+    "gap": "gap",
+    "non_compliant": "gap",
+    "noncompliant": "gap",
+    "not_compliant": "gap",
+    "fail": "gap",
+    "failed": "gap",
+    "violation": "gap",
+    "needs_review": "needs_review",
+    "review": "needs_review",
+    "manual_review": "needs_review",
+    "needs_manual_review": "needs_review",
+    "unclear": "needs_review",
+    "uncertain": "needs_review",
+    "insufficient_information": "needs_review",
+}
+
+
+def _status_key(value) -> str:
+    """Lowercase words joined by "_", e.g. "Non-Compliant." -> non_compliant"""
+    words = re.sub(r"[^a-z0-9]+", " ", str(value).lower()).split()
+    return "_".join(words)
+
+
+class ComplianceResult(_Section):
+    """Reply schema for determine_compliance"""
+    status: Literal["compliant", "gap", "needs_review"] = "needs_review"
+    regulation: str = ""
+    notes: str = ""
+
+    @field_validator("status", mode="before")
+    @classmethod
+    def _status(cls, value):
+        status = STATUS_ALIASES.get(_status_key(value)) if value is not None else None
+        if status is None:
+            # rejected rather than guessed, so the node's repair retry can ask again
+            raise ValueError(f"status must be compliant, gap or needs_review, not {value!r}")
+        return status
+
+    @field_validator("regulation", "notes", mode="before")
+    @classmethod
+    def _text(cls, value):
+        return "" if value is None else str(value)
+
+
+# ============================================================
+# Parsing + local repair
+# ============================================================
+
+def _strip_fences(text: str) -> str:
+    text = text.strip()
+    text = re.sub(r"^```(?:json)?\s*", "", text)
+    return re.sub(r"\s*```$", "", text)
+
+
+def _outer_object(text: str) -> str:
+    """The first balanced {...} block, ignoring braces inside (single- or double-quoted) strings"""
+    start = text.find("{")
+    if start < 0:
+        return text
+    depth, quote, escaped = 0, None, False
+    for i in range(start, len(text)):
+        ch = text[i]
+        if quote:
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == quote:
+                quote = None
+        elif ch in "\"'":
+            quote = ch
+        elif ch == "{":
+            depth += 1
+        elif ch == "}":
+            depth -= 1
+            if depth == 0:
+                return text[start:i + 1]
+    # truncated reply - close what is open and let the parser try
+    return text[start:] + (quote or "") + "}" * depth
+
+
+_STRING_LITERAL = re.compile(r'"(?:[^"\\]|\\.)*"|\'(?:[^\'\\]|\\.)*\'', re.DOTALL)
+
+
+def _outside_strings(text: str, fix) -> str:
+    """Apply fix to the text between string literals, leaving the literals themselves alone"""
+    parts, end = [], 0
+    for match in _STRING_LITERAL.finditer(text):
+        parts += [fix(text[end:match.start()]), match.group()]
+        end = match.end()
+    parts.append(fix(text[end:]))
+    return "".join(parts)
+
+
+def _pythonic(code: str) -> str:
+    code = re.sub(r"\btrue\b", "True", code)
+    code = re.sub(r"\bfalse\b", "False", code)
+    return re.sub(r"\bnull\b", "None", code)
+
+
+def _load_object(text: str) -> dict:
+    """json.loads with local fixes for the usual ways models break JSON"""
+    candidate = _outer_object(_strip_fences(text))
+    try:
+        return json.loads(candidate)
+    except json.JSONDecodeError:
+        pass
+
+    fixed = _outside_strings(candidate, lambda code: re.sub(r",\s*([}\]])", r"\1", code))
+    try:
+        return json.loads(fixed)
+    except json.JSONDecodeError:
+        pass
+
+    # single quotes / True / None: Python literal syntax
+    try:
+        value = ast.literal_eval(_outside_strings(fixed, _pythonic))
+    except (ValueError, SyntaxError) as e:
+        raise StructuredOutputError(f"Reply is not a JSON object: {e}") from None
+    if not isinstance(value, dict):
+        raise StructuredOutputError("Reply is not a JSON object")
+    return value
+
+
+def parse_reply(content: str, schema: Type[T]) -> T:
+    """Parse and validate an LLM reply, repairing it locally where possible"""
+    data = _load_object(content or "")
+    try:
+        return schema.model_validate(data)
+    except ValidationError as e:
+        raise StructuredOutputError(str(e)) from None
@@ -2,8 +2,9 @@
 State definition for the Compliance Drift Detector graph
 """
 
-from typing import TypedDict, Annotated
+from typing import TypedDict, Annotated, Optional, Union
 from operator import add
+from tools.blobstore import BlobRef, put_blob
 
 
 class Finding(TypedDict):
@@ -18,10 +19,19 @@ class Finding(TypedDict):
 
 
 class ComplianceState(TypedDict):
-    """State that flows through the graph"""
+    """
+    State that flows through the graph. Bulky values (plan text, KB/web
+    evidence) are BlobRefs into tools.blobstore; read them with resolve()
+    """
     
     # Input
-    pdf_text: str
+    pdf_text: BlobRef
+    
+    # Amendment review: the previous version and, if it was audited before, its extraction
+    baseline_text: Optional[BlobRef]
+    baseline_features: dict
+    plan_diff: dict  # tools.plan_diff summary + field-level drift, set by extract_features
+    text_normalization: dict  # tools.text_normalizer summary (tokens saved), set by extract_features
     
     # Extracted from plan
     extracted_features: dict
@@ -32,15 +42,49 @@ class ComplianceState(TypedDict):
     current_feature_value: str
     
     # Knowledge base results
-    kb_results: str
+    kb_hits: BlobRef       # list[dict]
+    kb_results: BlobRef    # str
     kb_sufficient: bool
     
     # Web search results
-    web_results: str
+    web_results: BlobRef   # str
+    web_links: list[dict]
     
     # Findings accumulate
     findings: Annotated[list[Finding], add]
     
     # Final output
+    report_mode: str  # "llm" (streamed narrative) or "template" (no LLM call)
     report: str
-    risk_level: str  # "low", "medium", "high"
\ No newline at end of file
+    risk_level: str  # "low", "medium", "high"
+
+def _blob(text: Union[str, BlobRef]) -> BlobRef:
+    return text if isinstance(text, BlobRef) else put_blob(text)
+
+
+def initial_state(pdf_text: Union[str, BlobRef], report_mode: str = "llm",
+                  baseline_text: Union[str, BlobRef] = None, baseline_features: dict = None) -> ComplianceState:
+    """
+    Empty state for a new run over a plan document; with baseline_text
+    (the previous version), only the changed passages are re-extracted
+    """
+    return {
+        "pdf_text": _blob(pdf_text),
+        "baseline_text": _blob(baseline_text) if baseline_text is not None else None,
+        "baseline_features": baseline_features or {},
+        "plan_diff": {},
+        "text_normalization": {},
+        "extracted_features": {},
+        "features_to_check": [],
+        "current_feature": None,
+        "current_feature_value": None,
+        "kb_hits": [],
+        "kb_results": "",
+        "kb_sufficient": False,
+        "web_results": "",
+        "web_links": [],
+        "findings": [],
+        "report_mode": report_mode,
+        "report": "",
+        "risk_level": "",
+    }
@@ -6,17 +6,33 @@ Compliance Drift Detector - Streamlit App
 import time
 import html
 import base64
-from datetime import datetime
-from io import BytesIO
+from collections import deque
 from typing import Optional, List, Dict, Any
 import streamlit as st
 import streamlit.components.v1 as components
 from dotenv import load_dotenv
 import plotly.graph_objects as go
-from reportlab.lib.pagesizes import LETTER
-from reportlab.pdfgen import canvas
-from agents import compliance_graph
+from agents.governor import get_governor
+from agents.runner import (
+    CANCELLED,
+    FAILED,
+    FEATURE_STARTED,
+    FEATURES_DONE,
+    FEATURES_EXTRACTED,
+    FINDING,
+    NODE_FINISHED,
+    REPORT_REPLACED,
+    REPORT_TOKEN,
+    RUN_CANCELLED,
+    RUN_FAILED,
+    WEB_SOURCES,
+    get_registry,
+)
 from tools import extract_text_from_pdf
+from tools.history import get_history
+from tools.portfolio import FindingsColumns, history_version, load_plans, portfolio_summary
+from tools.report import render_report
+from tools.tracing import Trace, trace_run
 
 # Load env
 load_dotenv()
@@ -285,42 +301,6 @@ def show_pdf(file_bytes: bytes):
     )
 
 
-def markdown_to_simple_pdf_bytes(title: str, markdown_text: str) -> bytes:
-    """
-    NOTE: This renders Markdown as plain text (no bold/italics).
-    If you want true Markdown styling in PDF, we'd switch to an HTML->PDF approach.
-    """
-    buffer = BytesIO()
-    c = canvas.Canvas(buffer, pagesize=LETTER)
-    width, height = LETTER
-    x = 50
-    y = height - 60
-    c.setFont("Helvetica-Bold", 14)
-    c.drawString(x, y, title)
-    y -= 26
-    c.setFont("Helvetica", 10)
-    max_chars = 105
-
-    for line in markdown_text.splitlines():
-        if y < 60:
-            c.showPage()
-            y = height - 60
-            c.setFont("Helvetica", 10)
-        line = line.replace("\t", "    ")
-        chunks = [line[i : i + max_chars] for i in range(0, len(line), max_chars)] or [""]
-        for ch in chunks:
-            if y < 60:
-                c.showPage()
-                y = height - 60
-                c.setFont("Helvetica", 10)
-            c.drawString(x, y, ch)
-            y -= 12
-
-    c.save()
-    buffer.seek(0)
-    return buffer.getvalue()
-
-
 # ============================================================
 # Agent / Stage setup
 # ============================================================
@@ -367,6 +347,7 @@ def build_console_html(
     badge: str,
     agent_name: str = "Agent",
     links: Optional[List[Dict[str, Any]]] = None,
+    process_id: Optional[str] = None,
 ) -> str:
     # Progress dots
     dots_html = "".join(
@@ -429,7 +410,7 @@ def build_console_html(
               <span>{html.escape(agent_name)}</span>
               <span class="badge {badge_class}">{html.escape(badge)}</span>
             </div>
-            <div style="opacity:0.6; font-size:0.8rem; font-family:'JetBrains Mono'">PROCESS_ID: {int(time.time())}</div>
+            <div style="opacity:0.6; font-size:0.8rem; font-family:'JetBrains Mono'">PROCESS_ID: {html.escape(str(process_id or int(time.time())))}</div>
           </div>
 
           <div class="stage">
@@ -450,90 +431,286 @@ def build_console_html(
 
 
 # ============================================================
-# Report helpers
+# Run console (follows a background run's events)
 # ============================================================
-def normalize_links(links: Optional[List[Dict[str, Any]]]) -> List[Dict[str, str]]:
-    seen = set()
-    out: List[Dict[str, str]] = []
-    for l in (links or []):
-        url = (l.get("url") or "").strip()
-        if not url or url in seen:
-            continue
-        seen.add(url)
-        out.append(
-            {
-                "title": (l.get("title") or "Official source").strip(),
-                "url": url,
-                "snippet": (l.get("snippet") or "").strip(),
-            }
-        )
-    return out
-
+CONSOLE_HISTORY = 10
 
-def compile_report(plan_name: str, risk_level: str, findings: List[Dict[str, Any]]) -> Dict[str, Any]:
-    counts = {"compliant": 0, "gap": 0, "needs_review": 0}
-    for f in findings:
-        s = f.get("status", "needs_review")
-        counts[s] = counts.get(s, 0) + 1
-
-    all_sources: List[Dict[str, str]] = []
-    for f in findings:
-        all_sources.extend(normalize_links(f.get("links", [])))
-    all_sources = normalize_links(all_sources)
 
+def new_console() -> Dict[str, Any]:
+    """What the progress console shows; updated in place, one event at a time"""
     return {
-        "meta": {
-            "plan_name": plan_name,
-            "generated_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            "risk_level": risk_level,
-            "counts": counts,
-        },
-        "findings": findings,
-        "sources": all_sources,
+        "cursor": 0,
+        "closed": False,
+        "title": "Initializing Agents",
+        "desc": "Preparing document for analysis…",
+        "idx": 0,
+        "badge": "BOOT",
+        "agent_name": "System Boot",
+        "links": [],
+        "history": deque(maxlen=CONSOLE_HISTORY),
+        "total_features": 0,
+        "checked_count": 0,
+        "current_feature": None,
+        "report": [],  # narrative pieces streamed by generate_report
+        "drawn": None,  # (cursor, run status) the console slot last showed
     }
 
 
-def report_to_markdown(r: Dict[str, Any]) -> str:
-    meta = r["meta"]
-    c = meta["counts"]
-    lines: List[str] = []
-
-    lines.append(f"# Compliance Report — {meta['plan_name']}")
-    lines.append(f"**Generated:** {meta['generated_at']}")
-    lines.append(f"**Overall Risk:** {meta['risk_level']}")
-    lines.append("")
-    lines.append("## Executive Summary")
-    lines.append(f"- ✅ Compliant: **{c.get('compliant',0)}**")
-    lines.append(f"- ❌ Gaps: **{c.get('gap',0)}**")
-    lines.append(f"- ⚠ Needs Review: **{c.get('needs_review',0)}**")
-    lines.append("")
-    lines.append("## Findings")
-    for f in r["findings"]:
-        status = f.get("status", "needs_review")
-        icon = {"compliant": "✅", "gap": "❌", "needs_review": "⚠"}.get(status, "⚠")
-        feature = f.get("feature", "—")
-        plan_value = str(f.get("plan_value", "—"))
-        regulation = (f.get("regulation") or "—").replace("\n", " ")
-        notes = (f.get("notes") or "").strip() or "—"
-        lines.append(f"### {icon} {feature}")
-        lines.append(f"- **Plan Value:** {plan_value}")
-        lines.append(f"- **Regulation:** {regulation}")
-        lines.append(f"- **Notes:** {notes}")
-        links = normalize_links(f.get("links", []))
-        if links:
-            lines.append("- **Sources:**")
-            for l in links:
-                lines.append(f"  - [{l['title']}]({l['url']})")
-        lines.append("")
-
-    lines.append("## Appendix — All Official Sources")
-    if r["sources"]:
-        for l in r["sources"]:
-            lines.append(f"- [{l['title']}]({l['url']})")
-    else:
-        lines.append("_No official web sources were used for this run._")
-
-    return "\n".join(lines)
+def apply_event(c: Dict[str, Any], event) -> None:
+    node = event.node
+    data = event.data
+
+    if event.type == NODE_FINISHED:
+        c["title"], c["desc"] = NODE_COPY.get(node, ("Processing", "Agents are working..."))
+        c["idx"] = stage_index(node)
+        c["agent_name"] = AGENT_FRIENDLY.get(node, "Agent")
+        c["badge"] = "LIVE"
+        c["links"] = []
+        feature = (c["current_feature"] or "").replace("_", " ")
+        if node == "search_kb" and feature:
+            c["desc"] = f"Querying internal KB for {feature}..."
+        if node == "search_web" and feature:
+            c["desc"] = f"Verifying official sources for {feature}..."
+        if node == "generate_report":
+            c["badge"] = "DONE"
+            c["title"] = "Audit Complete"
+            c["desc"] = "Report generated successfully."
+            c["history"].append({"text": "Report compiled", "tone": "ok"})
+        if node == "partial_report":
+            c["idx"] = stage_index("generate_report")
+            c["agent_name"] = AGENT_FRIENDLY["generate_report"]
+            c["badge"] = "WARN"
+            c["title"] = "Audit Stopped"
+            c["desc"] = "Partial report generated from the findings so far."
+            c["history"].append({"text": "Partial report compiled", "tone": "warn"})
+
+    elif event.type == FEATURES_EXTRACTED:
+        c["total_features"] = data["total"]
+        c["title"] = "Feature Extraction"
+        c["desc"] = f"Identified {data['total']} compliance vectors to analyze."
+        c["history"].append({"text": f"Found {data['total']} rules in document", "tone": "ok"})
+
+    elif event.type == FEATURE_STARTED:
+        c["current_feature"] = data["feature"]
+        c["checked_count"] += 1
+        nice = data["feature"].replace("_", " ").upper()
+        denom = c["total_features"] or "?"
+        c["title"] = "Audit Protocol"
+        c["desc"] = f"Analyzing vector {c['checked_count']}/{denom}: {nice}"
+        c["history"].append({"text": f"Analyzing: {nice}", "tone": "ok"})
+
+    elif event.type == FEATURES_DONE:
+        c["current_feature"] = None
+        c["title"] = "Audit Finalization"
+        c["desc"] = "Synthesizing final compliance matrix."
+        c["history"].append({"text": "All vectors analyzed", "tone": "ok"})
+
+    elif event.type == WEB_SOURCES:
+        # IMPORTANT: show ONLY actual links returned by search_web
+        c["links"] = data["links"]
+
+    elif event.type == FINDING:
+        nice = (data.get("feature") or "Rule").replace("_", " ")
+        if data.get("status") == "compliant":
+            c["history"].append({"text": f"{nice} -> PASSED", "tone": "ok"})
+        elif data.get("status") == "gap":
+            c["history"].append({"text": f"{nice} -> FAILED", "tone": "bad"})
+            c["badge"] = "ALERT"
+        else:
+            c["history"].append({"text": f"{nice} -> REVIEW", "tone": "warn"})
+            c["badge"] = "WARN"
+
+    elif event.type == REPORT_TOKEN:
+        if not c["report"]:
+            c["idx"] = stage_index("generate_report")
+            c["agent_name"] = AGENT_FRIENDLY["generate_report"]
+            c["title"], c["desc"] = NODE_COPY["generate_report"]
+        c["report"].append(data["text"])
+
+    elif event.type == REPORT_REPLACED:
+        # the narrative ran out of time; the template report replaces the partial draft
+        c["report"] = [data["text"]]
+
+    elif event.type == RUN_FAILED:
+        c["title"] = "Audit Failed"
+        c["desc"] = data.get("error", "")
+        c["badge"] = "ALERT"
+        c["history"].append({"text": "Run failed", "tone": "bad"})
+
+    elif event.type == RUN_CANCELLED:
+        c["title"] = "Audit Cancelled"
+        c["desc"] = data.get("reason", "")
+        c["badge"] = "WARN"
+        c["history"].append({"text": "Run cancelled", "tone": "warn"})
+
+
+def render_console(run, c: Dict[str, Any], one_step_per_tick: bool, slot) -> None:
+    """
+    Fragment body: apply new events, then redraw the console once. The cost
+    per poll depends on the events since the last poll, not the run's length.
+    The console lives in `slot`, created outside the fragment so it persists
+    between ticks; a tick with no new events and the same run status leaves
+    it alone instead of reloading its iframe.
+    """
+    events = run.events_since(c["cursor"])
+    if one_step_per_tick:
+        # cinematic mode: reveal one node per tick, whatever the worker's pace
+        for i, event in enumerate(events):
+            if event.type == NODE_FINISHED and i > 0:
+                events = events[:i]
+                break
+
+    for event in events:
+        apply_event(c, event)
+        c["cursor"] = event.seq + 1
+
+    if c["drawn"] != (c["cursor"], run.status):
+        c["drawn"] = (c["cursor"], run.status)
+        with slot:
+            components.html(
+                build_console_html(
+                    c["title"],
+                    c["desc"],
+                    c["idx"],
+                    len(STAGE_ORDER),
+                    list(c["history"]),
+                    c["badge"],
+                    agent_name=c["agent_name"],
+                    links=c["links"],
+                    process_id=run.run_id,
+                ),
+                height=540,
+                scrolling=False,
+            )
+
+    if c["report"]:
+        st.markdown("#### 📝 Report Draft")
+        st.markdown("".join(c["report"]))
+
+    if not run.finished:
+        if run.token.cancelled:
+            st.caption("Stopping after the current step…")
+        elif st.button("⏹ Stop & Report", help="Stop the audit and report on the features checked so far"):
+            run.cancel()
+
+    if run.finished and c["cursor"] >= len(run.events_since(0)):
+        c["closed"] = True
+        st.rerun()
+
+
+# ============================================================
+# Portfolio dashboard (stored audit history)
+# ============================================================
+DRIFT_WINDOWS = {"Last 90 days": 90, "Last year": 365, "All time": 0}
+DRIFT_PERIODS = {"Weekly": "W", "Monthly": "M"}
+
+
+@st.cache_resource(show_spinner="Loading audit history…")
+def portfolio_findings(path: str) -> FindingsColumns:
+    """Shared by every session; refreshed with just the new rows when an audit is recorded"""
+    return FindingsColumns(path)
+
+
+@st.cache_data(max_entries=4, show_spinner=False)
+def portfolio_plans(path: str, version: tuple):
+    return load_plans(path)
+
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def portfolio_view(path: str, version: tuple, freq: str, days: int, top: int) -> Optional[dict]:
+    findings = portfolio_findings(path)
+    findings.refresh()
+    since = time.time() - days * 86400 if days else None
+    return portfolio_summary(findings, portfolio_plans(path, version), freq=freq, since=since, top=top)
+
+
+def _chart_layout(fig, height: int = 320):
+    fig.update_layout(
+        height=height,
+        margin=dict(l=0, r=0, t=10, b=0),
+        paper_bgcolor="rgba(0,0,0,0)",
+        plot_bgcolor="rgba(0,0,0,0)",
+        font=dict(color="#e5e7eb"),
+        legend=dict(font=dict(color="#e5e7eb")),
+    )
+    return fig
+
+
+def render_portfolio():
+    history = get_history()
+    if history is None:
+        st.info("Audit history is turned off (HISTORY_DB is empty).")
+        return
+
+    version = history_version(history.path)
+    if version[1] is None:
+        st.info("No audits recorded yet. Completed audits from this app and the audit service appear here.")
+        return
+
+    f1, f2, f3 = st.columns([1, 1, 1])
+    window = f1.selectbox("Drift Window", list(DRIFT_WINDOWS), index=1)
+    period = f2.selectbox("Drift Period", list(DRIFT_PERIODS))
+    top = f3.slider("Plans Listed", 5, 100, 20, 5)
+
+    view = portfolio_view(history.path, version, DRIFT_PERIODS[period], DRIFT_WINDOWS[window], top)
+    if view is None:
+        st.info("No audits recorded yet.")
+        return
+
+    risk = view["risk"]
+    m1, m2, m3, m4 = st.columns(4)
+    m1.metric("Plans", f"{view['plans']:,}")
+    m2.metric("Audits", f"{view['runs']:,}")
+    m3.metric("High Risk", f"{int(risk.get('High', 0)):,}")
+    m4.metric("Findings", f"{view['findings']:,}")
+
+    left, right = st.columns([1, 1], gap="large")
+    with left:
+        st.markdown("#### RISK DISTRIBUTION")
+        fig = go.Figure(data=[go.Pie(labels=list(risk.index), values=list(risk.values), hole=0.72,
+                                     sort=False, textinfo="none")])
+        st.plotly_chart(_chart_layout(fig), use_container_width=True, config={"displayModeBar": False})
+
+    with right:
+        st.markdown("#### GAP RATE BY FEATURE")
+        rates = view["gap_rates"]
+        fig = go.Figure(data=[
+            go.Bar(name="Gap", x=rates["gap_rate"] * 100, y=[f.replace("_", " ").title() for f in rates.index],
+                   orientation="h", marker_color="#ef4444"),
+            go.Bar(name="Review", x=rates["review_rate"] * 100, y=[f.replace("_", " ").title() for f in rates.index],
+                   orientation="h", marker_color="#eab308"),
+        ])
+        fig.update_layout(barmode="stack", xaxis=dict(title="% of plans (latest audit)"),
+                          yaxis=dict(autorange="reversed"))
+        st.plotly_chart(_chart_layout(fig), use_container_width=True, config={"displayModeBar": False})
+
+    st.markdown("#### DRIFT OVER TIME")
+    drift = view["drift"]
+    fig = go.Figure(data=[
+        go.Bar(name="Status changes", x=drift.index, y=drift["status_changes"], marker_color="#8b5cf6",
+               opacity=0.5, yaxis="y2"),
+        go.Scatter(name="Gap rate (%)", x=drift.index, y=drift["gap_rate"] * 100, mode="lines",
+                   line=dict(color="#ef4444")),
+    ])
+    fig.update_layout(yaxis=dict(title="Gap rate (%)"),
+                      yaxis2=dict(title="Status changes", overlaying="y", side="right", showgrid=False))
+    st.plotly_chart(_chart_layout(fig), use_container_width=True, config={"displayModeBar": False})
+
+    st.markdown("#### PLANS MOST OUT OF COMPLIANCE")
+    worst = view["worst"]
+    st.dataframe(
+        worst[["plan_name", "latest_risk", "gaps", "needs_review", "features", "latest_at"]],
+        use_container_width=True,
+        hide_index=True,
+        column_config={
+            "plan_name": "Plan",
+            "latest_risk": "Risk",
+            "gaps": "Gaps",
+            "needs_review": "Review",
+            "features": "Features",
+            "latest_at": st.column_config.DatetimeColumn("Last Audit", format="YYYY-MM-DD"),
+        },
+    )
 
 
 # ============================================================
@@ -578,7 +755,7 @@ HOW_STEPS = [
     },
 ]
 
-FEATURES_EXTRACTED = [
+FEATURES_CHECKED_LABELS = [
     "plan_name, effective_date",
     "eligibility: age_requirement, service_requirement, entry_dates",
     "contributions: employer_match_formula, match_cap, catch_up_allowed",
@@ -777,7 +954,7 @@ def build_how_it_works_html() -> str:
           <h3>Features extracted</h3>
           <div class="muted">These are the structured fields the Document Reader tries to pull from the PDF:</div>
           <ul>
-            {"".join([f"<li>{html.escape(x)}</li>" for x in FEATURES_EXTRACTED])}
+            {"".join([f"<li>{html.escape(x)}</li>" for x in FEATURES_CHECKED_LABELS])}
           </ul>
         </div>
       </div>
@@ -876,6 +1053,7 @@ def how_it_works_dialog():
 # ============================================================
 with st.sidebar:
     st.markdown("### ⚙️ System Control")
+    portfolio_mode = st.toggle("📊 Portfolio View", value=False, help="Risk and drift across every stored audit")
     st.markdown(
         """
         <div style="background:rgba(255,255,255,0.05); padding:15px; border-radius:10px; margin-bottom:20px;">
@@ -892,6 +1070,14 @@ with st.sidebar:
     st.markdown("---")
     demo_mode = st.toggle("🎬 Cinematic Mode", value=True)
     demo_delay = st.slider("Simulation Latency (s)", 0.0, 1.0, 0.25, 0.05) if demo_mode else 0.0
+    template_report = st.toggle(
+        "📋 Structured Report Only", value=False,
+        help="Skip the AI-written narrative; the report is built from the findings alone",
+    )
+    audit_deadline = st.number_input(
+        "Audit Deadline (s)", min_value=0, max_value=3600, value=0, step=30,
+        help="Stop after this long and report on what was checked; 0 = no deadline",
+    )
     st.markdown("---")
     st.caption("v2.4.0 • Built with LangGraph")
 
@@ -923,6 +1109,11 @@ with col2:
         )
 
 
+if portfolio_mode:
+    render_portfolio()
+    st.stop()
+
+
 # ============================================================
 # Upload Section
 # ============================================================
@@ -932,12 +1123,21 @@ uploaded_file = st.file_uploader(
     type=["pdf"],
     help="Upload a Summary Plan Description (SPD) or Plan Document",
 )
+with st.expander("🔁 Amendment Review", expanded=False):
+    previous_file = st.file_uploader(
+        "Previous version of this plan (optional)",
+        type=["pdf"],
+        help="Only the sections that changed since this version are re-extracted; "
+             "the report lists every field that changed",
+    )
 st.markdown("</div>", unsafe_allow_html=True)
 
 
 # ============================================================
 # Main Execution Logic
 # ============================================================
+registry = get_registry()
+
 if uploaded_file:
     with st.expander("📄 Document Preview", expanded=False):
         uploaded_file.seek(0)
@@ -949,384 +1149,363 @@ if uploaded_file:
         start_btn = st.button("🚀 Initialize Analysis", type="primary", use_container_width=True)
 
     if start_btn:
-        with st.spinner("Encrypting & Parsing Document..."):
+        trace = Trace()
+        with st.spinner("Encrypting & Parsing Document..."), trace_run(trace=trace):
             pdf_bytes = uploaded_file.read()
             pdf_text = extract_text_from_pdf(pdf_bytes)
+            baseline_text = extract_text_from_pdf(previous_file.getvalue()) if previous_file else None
+
+        # the audit runs on a background worker; this session just follows its events
+        run = registry.start(
+            pdf_text,
+            uploaded_file.name,
+            trace=trace,
+            deadline_s=audit_deadline or None,
+            report_mode="template" if template_report else "llm",
+            baseline_text=baseline_text,
+        )
+        st.session_state["run_id"] = run.run_id
+        st.session_state["console"] = new_console()
+        st.query_params["run"] = run.run_id
+
+# Reattach to a run from the URL (?run=<id>) after a reload or in a new tab
+run_id = st.query_params.get("run") or st.session_state.get("run_id")
+if run_id and run_id != st.session_state.get("run_id"):
+    st.session_state["run_id"] = run_id
+    st.session_state["console"] = new_console()
+
+run = registry.get(run_id) if run_id else None
+console = st.session_state.get("console")
+
+if run_id and run is None:
+    st.warning(f"Audit run {run_id} is no longer available on this server.")
+    st.session_state.pop("run_id", None)
+    del st.query_params["run"]
+
+elif run is not None and not console["closed"]:
+    poll_s = max(demo_delay, 0.2) if demo_mode else 0.3
+    console["drawn"] = None  # a full rerun starts from an empty slot
+    st.fragment(run_every=poll_s)(render_console)(run, console, demo_mode, st.empty())
+
+elif run is not None and run.status == FAILED:
+    st.error(f"Audit failed: {run.error}")
+
+elif run is not None and run.status == CANCELLED:
+    st.info(f"Audit stopped: {run.stopped}")
+
+elif run is not None:
+    # ============================================================
+    # Outputs (accumulated by the runner as the steps streamed in)
+    # ============================================================
+    result = run.result
+    trace = run.trace
+    trace_path = run.trace_path
+    plan_name = run.plan_name
+
+    if run.stopped:
+        st.warning(f"Audit stopped early ({run.stopped}). Features it didn't reach are marked Needs Review.")
+
+    all_findings = result.findings
+    extracted_features = result.extracted_features
+    report_pkg = result.report(plan_name, generated_at=run.finished_at)
+
+    # rendered once per run on first use, then served from the report cache on every rerun
+    def report_artifact(fmt: str):
+        return lambda: render_report(run.run_id, fmt, lambda: report_pkg)
+
+    # ============================================================
+    #  Results UI
+    # ============================================================
+    generated_at = report_pkg["meta"]["generated_at"]
+    risk = report_pkg["meta"]["risk_level"]
+
+    risk_chip_bg = {
+        "Low": "rgba(34,197,94,0.15)",
+        "Medium": "rgba(234,179,8,0.15)",
+        "High": "rgba(239,68,68,0.15)",
+    }.get(risk, "rgba(148,163,184,0.12)")
+    risk_chip_fg = {"Low": "#22c55e", "Medium": "#eab308", "High": "#ef4444"}.get(risk, "#a3a3a3")
+
+    hdr_l, hdr_r = st.columns([5, 1.35], vertical_alignment="center")
+    with hdr_l:
+        st.markdown(
+            f"""
+            <div class="report-header">
+              <div style="font-size:1.55rem; font-weight:900; color:#fff; line-height:1.1;">
+                {html.escape(plan_name.replace(".pdf",""))}
+              </div>
+              <div style="margin-top:8px; color:#9ca3af; font-size:0.92rem;">
+                Generated: {html.escape(generated_at)} &nbsp; • &nbsp; Risk Level:
+                <span class="chip" style="background:{risk_chip_bg}; color:{risk_chip_fg};">
+                  {html.escape(risk.upper())}
+                </span>
+              </div>
+            </div>
+            """,
+            unsafe_allow_html=True,
+        )
 
-        initial_state = {
-            "pdf_text": pdf_text,
-            "extracted_features": {},
-            "features_to_check": [],
-            "current_feature": None,
-            "current_feature_value": None,
-            "kb_results": "",
-            "kb_sufficient": False,
-            "web_results": "",
-            "web_links": [],
-            "findings": [],
-            "report": "",
-            "risk_level": "",
-        }
-
-        steps: List[Dict[str, Any]] = []
-        history: List[Dict[str, str]] = []
-        current_feature = None
-        total_features = 0
-        checked_count = 0
-
-        modal = st.empty()
-        modal_html = build_console_html(
-            "Initializing Agents",
-            "Preparing document for analysis…",
-            0,
-            len(STAGE_ORDER),
-            history,
-            "BOOT",
-            agent_name="System Boot",
-            links=[],
+    with hdr_r:
+        st.download_button(
+            "⬇️  Export Report",
+            data=report_artifact("pdf"),
+            file_name="audit_report.pdf",
+            mime="application/pdf",
+            on_click="ignore",
+            use_container_width=True,
+        )
+        st.download_button(
+            "⬇️  Markdown",
+            data=report_artifact("md"),
+            file_name="audit_report.md",
+            mime="text/markdown",
+            on_click="ignore",
+            type="tertiary",
+            use_container_width=True,
         )
-        with modal:
-            components.html(modal_html, height=540, scrolling=False)
-
-        # Stream graph
-        for step in compliance_graph.stream(initial_state, config={"recursion_limit": 300}):
-            steps.append(step)
-            node = list(step.keys())[0]
-
-            title, desc = NODE_COPY.get(node, ("Processing", "Agents are working..."))
-            idx = stage_index(node)
-            badge = "LIVE"
-
-            if node == "extract_features":
-                ftc = step[node].get("features_to_check")
-                if isinstance(ftc, list):
-                    total_features = len(ftc)
-                title = "Feature Extraction"
-                desc = f"Identified {total_features} compliance vectors to analyze."
-                history.append({"text": f"Found {total_features} rules in document", "tone": "ok"})
-
-            if node == "select_next_feature":
-                current_feature = step[node].get("current_feature")
-                if current_feature:
-                    checked_count += 1
-                    nice = current_feature.replace("_", " ").upper()
-                    denom = total_features if total_features else "?"
-                    title = "Audit Protocol"
-                    desc = f"Analyzing vector {checked_count}/{denom}: {nice}"
-                    history.append({"text": f"Analyzing: {nice}", "tone": "ok"})
-                else:
-                    title = "Audit Finalization"
-                    desc = "Synthesizing final compliance matrix."
-                    history.append({"text": "All vectors analyzed", "tone": "ok"})
-
-            if node == "search_kb" and current_feature:
-                desc = f"Querying internal KB for {current_feature.replace('_',' ')}..."
-
-            if node == "search_web" and current_feature:
-                desc = f"Verifying official sources for {current_feature.replace('_',' ')}..."
-
-            if node == "determine_compliance":
-                findings = step[node].get("findings", [])
-                if findings:
-                    status = findings[0].get("status", "needs_review")
-                    nice = (current_feature or "Rule").replace("_", " ")
-                    if status == "compliant":
-                        history.append({"text": f"{nice} -> PASSED", "tone": "ok"})
-                    elif status == "gap":
-                        history.append({"text": f"{nice} -> FAILED", "tone": "bad"})
-                        badge = "ALERT"
-                    else:
-                        history.append({"text": f"{nice} -> REVIEW", "tone": "warn"})
-                        badge = "WARN"
-
-            if node == "generate_report":
-                badge = "DONE"
-                title = "Audit Complete"
-                desc = "Report generated successfully."
-                history.append({"text": "Report compiled", "tone": "ok"})
-
-            agent_name = AGENT_FRIENDLY.get(node, "Agent")
-
-            # IMPORTANT: show ONLY actual links returned by search_web
-            links_for_modal: List[Dict[str, Any]] = []
-            if node == "search_web":
-                maybe_links = step[node].get("web_links", [])
-                if isinstance(maybe_links, list):
-                    links_for_modal = maybe_links
-
-            modal_html = build_console_html(
-                title,
-                desc,
-                idx,
-                len(STAGE_ORDER),
-                history,
-                badge,
-                agent_name=agent_name,
-                links=links_for_modal,
-            )
-            with modal:
-                components.html(modal_html, height=540, scrolling=False)
-
-            if demo_mode and demo_delay > 0:
-                time.sleep(demo_delay)
-
-        if demo_mode:
-            time.sleep(0.4)
-        modal.empty()
-
-        # ============================================================
-        # Build outputs from steps
-        # ============================================================
-        final_state = steps[-1].get("generate_report", {}) if steps else {}
-
-        # Pull findings
-        all_findings: List[Dict[str, Any]] = []
-        for s in steps:
-            if "determine_compliance" in s:
-                all_findings.extend(s["determine_compliance"].get("findings", []))
-
-        # Pull extracted features for Summary tab
-        extracted_features: Dict[str, Any] = {}
-        for s in steps:
-            if "extract_features" in s and isinstance(s["extract_features"], dict):
-                extracted_features = s["extract_features"].get("extracted_features", {}) or {}
-                break
 
-        risk = final_state.get("risk_level", "Unknown")
-        plan_name = uploaded_file.name
+    plan_diff = result.plan_diff
+    tabs = st.tabs(["Summary", "Details", "Sources"] + (["Changes"] if plan_diff else []))
+    tab_summary, tab_details, tab_sources = tabs[:3]
 
-        report_pkg = compile_report(plan_name, risk, all_findings)
-        md_report = report_to_markdown(report_pkg)
-        pdf_out = markdown_to_simple_pdf_bytes("Compliance Audit Report", md_report)
+    # -------------------------
+    # Summary
+    # -------------------------
+    with tab_summary:
+        c = report_pkg["meta"]["counts"]
+        left, right = st.columns([1, 1], gap="large")
 
-        # ============================================================
-        #  Results UI
-        # ============================================================
-        generated_at = report_pkg["meta"]["generated_at"]
-        risk = report_pkg["meta"]["risk_level"]
+        with left:
+            st.markdown('<div class="glass-card">', unsafe_allow_html=True)
+            st.markdown("#### COMPLIANCE BREAKDOWN")
 
-        risk_chip_bg = {
-            "Low": "rgba(34,197,94,0.15)",
-            "Medium": "rgba(234,179,8,0.15)",
-            "High": "rgba(239,68,68,0.15)",
-        }.get(risk, "rgba(148,163,184,0.12)")
-        risk_chip_fg = {"Low": "#22c55e", "Medium": "#eab308", "High": "#ef4444"}.get(risk, "#a3a3a3")
+            values = [c.get("compliant", 0), c.get("needs_review", 0), c.get("gap", 0)]
+            labels = ["Compliant", "Review", "Gaps"]
 
-        hdr_l, hdr_r = st.columns([5, 1.35], vertical_alignment="center")
-        with hdr_l:
-            st.markdown(
-                f"""
-                <div class="report-header">
-                  <div style="font-size:1.55rem; font-weight:900; color:#fff; line-height:1.1;">
-                    {html.escape(plan_name.replace(".pdf",""))}
-                  </div>
-                  <div style="margin-top:8px; color:#9ca3af; font-size:0.92rem;">
-                    Generated: {html.escape(generated_at)} &nbsp; • &nbsp; Risk Level:
-                    <span class="chip" style="background:{risk_chip_bg}; color:{risk_chip_fg};">
-                      {html.escape(risk.upper())}
-                    </span>
-                  </div>
+            fig = go.Figure(
+                data=[go.Pie(labels=labels, values=values, hole=0.72, sort=False, textinfo="none")]
+            )
+            fig.update_layout(
+                margin=dict(l=0, r=0, t=0, b=0),
+                showlegend=True,
+                paper_bgcolor="rgba(0,0,0,0)",
+                plot_bgcolor="rgba(0,0,0,0)",
+                legend=dict(font=dict(color="#e5e7eb")),
+            )
+            st.plotly_chart(fig, use_container_width=True, config={"displayModeBar": False})
+            st.markdown("</div>", unsafe_allow_html=True)
+
+        with right:
+            xf = extracted_features or {}
+            elig = xf.get("eligibility", {}) or {}
+            contrib = xf.get("contributions", {}) or {}
+            vest = xf.get("vesting", {}) or {}
+            auto = xf.get("auto_enrollment", {}) or {}
+
+            plan_nm = xf.get("plan_name") or "—"
+            eff_dt = xf.get("effective_date") or "—"
+            eligibility = f"Age: {elig.get('age_requirement') or '—'}, Service: {elig.get('service_requirement') or '—'}"
+            match = contrib.get("employer_match_formula") or "—"
+            vesting = f"{vest.get('type') or '—'} — {vest.get('schedule') or '—'}"
+            auto_enroll = f"{auto.get('enabled') if auto.get('enabled') is not None else '—'}, {auto.get('default_rate') or '—'}"
+
+            st.markdown('<div class="glass-card">', unsafe_allow_html=True)
+            st.markdown("#### EXTRACTED FEATURES")
+
+            def row(label, value, last=False):
+                border = "" if last else "border-bottom:1px solid rgba(255,255,255,0.06);"
+                return f"""
+                <div style="display:flex; justify-content:space-between; gap:16px; padding:10px 0; {border}">
+                  <span style="color:#9ca3af;">{html.escape(label)}</span>
+                  <span style="color:#fff; font-weight:800; text-align:right;">{html.escape(str(value))}</span>
                 </div>
-                """,
+                """
+
+            st.markdown(
+                row("Plan Name", plan_nm)
+                + row("Effective Date", eff_dt)
+                + row("Eligibility", eligibility)
+                + row("Employer Match", match)
+                + row("Vesting", vesting)
+                + row("Auto-Enrollment", auto_enroll, last=True),
                 unsafe_allow_html=True,
             )
+            st.markdown("</div>", unsafe_allow_html=True)
 
-        with hdr_r:
-            st.download_button(
-                "⬇️  Export Report",
-                data=pdf_out,
-                file_name="audit_report.pdf",
-                mime="application/pdf",
-                use_container_width=True,
-            )
+        narrative = result.report_text if run.report_mode == "llm" and not run.stopped else ""
+        if narrative:
+            st.markdown('<div class="glass-card">', unsafe_allow_html=True)
+            st.markdown("#### AUDITOR'S NARRATIVE")
+            st.markdown(narrative)
+            st.markdown("</div>", unsafe_allow_html=True)
 
-        tab_summary, tab_details, tab_sources = st.tabs(["Summary", "Details", "Sources"])
+    # -------------------------
+    # Details
+    # -------------------------
+    with tab_details:
+        for f in all_findings:
+            status = f.get("status", "needs_review")
+            status_label = {"compliant": "COMPLIANT", "gap": "GAP", "needs_review": "REVIEW"}.get(status, "REVIEW")
+
+            status_bg = {
+                "compliant": "rgba(34,197,94,0.12)",
+                "gap": "rgba(239,68,68,0.12)",
+                "needs_review": "rgba(234,179,8,0.12)",
+            }.get(status, "rgba(234,179,8,0.12)")
+            status_fg = {"compliant": "#22c55e", "gap": "#ef4444", "needs_review": "#eab308"}.get(
+                status, "#eab308"
+            )
 
-        # -------------------------
-        # Summary
-        # -------------------------
-        with tab_summary:
-            c = report_pkg["meta"]["counts"]
-            left, right = st.columns([1, 1], gap="large")
+            feature_title = (f.get("feature") or "Unknown Feature").replace("_", " ").title()
+            plan_value = f.get("plan_value", "—")
+            regulation = f.get("regulation", "—")
+            notes = (f.get("notes") or "").strip()
 
-            with left:
-                st.markdown('<div class="glass-card">', unsafe_allow_html=True)
-                st.markdown("#### COMPLIANCE BREAKDOWN")
+            icon = "✓" if status == "compliant" else ("×" if status == "gap" else "!")
 
-                values = [c.get("compliant", 0), c.get("needs_review", 0), c.get("gap", 0)]
-                labels = ["Compliant", "Review", "Gaps"]
+            st.markdown(
+                f"""
+                <div style="
+                  background: rgba(255,255,255,0.04);
+                  border: 1px solid rgba(255,255,255,0.08);
+                  border-radius: 16px;
+                  padding: 18px;
+                  margin-bottom: 14px;
+                ">
+                  <div style="display:flex; justify-content:space-between; align-items:center; gap:14px;">
+                    <div style="display:flex; align-items:center; gap:10px;">
+                      <div style="width:28px; height:28px; border-radius:8px;
+                                  background: rgba(255,255,255,0.06);
+                                  display:flex; align-items:center; justify-content:center;
+                                  color:#e5e7eb; font-weight:900;">
+                        {icon}
+                      </div>
+                      <div style="color:#fff; font-weight:950; font-size:1.05rem;">
+                        {html.escape(feature_title)}
+                      </div>
+                    </div>
+                    <div style="
+                      padding:6px 10px;
+                      border-radius:999px;
+                      background:{status_bg};
+                      color:{status_fg};
+                      font-weight:950;
+                      font-size:0.8rem;
+                      letter-spacing:0.04em;
+                      border:1px solid rgba(255,255,255,0.06);
+                    ">{html.escape(status_label)}</div>
+                  </div>
 
-                fig = go.Figure(
-                    data=[go.Pie(labels=labels, values=values, hole=0.72, sort=False, textinfo="none")]
-                )
-                fig.update_layout(
-                    margin=dict(l=0, r=0, t=0, b=0),
-                    showlegend=True,
-                    paper_bgcolor="rgba(0,0,0,0)",
-                    plot_bgcolor="rgba(0,0,0,0)",
-                    legend=dict(font=dict(color="#e5e7eb")),
-                )
-                st.plotly_chart(fig, use_container_width=True, config={"displayModeBar": False})
-                st.markdown("</div>", unsafe_allow_html=True)
-
-            with right:
-                xf = extracted_features or {}
-                elig = xf.get("eligibility", {}) or {}
-                contrib = xf.get("contributions", {}) or {}
-                vest = xf.get("vesting", {}) or {}
-                auto = xf.get("auto_enrollment", {}) or {}
-
-                plan_nm = xf.get("plan_name") or "—"
-                eff_dt = xf.get("effective_date") or "—"
-                eligibility = f"Age: {elig.get('age_requirement') or '—'}, Service: {elig.get('service_requirement') or '—'}"
-                match = contrib.get("employer_match_formula") or "—"
-                vesting = f"{vest.get('type') or '—'} — {vest.get('schedule') or '—'}"
-                auto_enroll = f"{auto.get('enabled') if auto.get('enabled') is not None else '—'}, {auto.get('default_rate') or '—'}"
-
-                st.markdown('<div class="glass-card">', unsafe_allow_html=True)
-                st.markdown("#### EXTRACTED FEATURES")
-
-                def row(label, value, last=False):
-                    border = "" if last else "border-bottom:1px solid rgba(255,255,255,0.06);"
-                    return f"""
-                    <div style="display:flex; justify-content:space-between; gap:16px; padding:10px 0; {border}">
-                      <span style="color:#9ca3af;">{html.escape(label)}</span>
-                      <span style="color:#fff; font-weight:800; text-align:right;">{html.escape(str(value))}</span>
+                  <div style="display:flex; gap:18px; margin-top:12px; flex-wrap:wrap;">
+                    <div style="min-width:220px;">
+                      <div style="color:#9ca3af; font-size:0.85rem;">Plan Value</div>
+                      <div style="color:#fff; font-weight:900; margin-top:2px;">{html.escape(str(plan_value))}</div>
+                    </div>
+                    <div style="min-width:260px;">
+                      <div style="color:#9ca3af; font-size:0.85rem;">Regulation</div>
+                      <div style="color:#fff; font-weight:900; margin-top:2px;">{html.escape(str(regulation))}</div>
                     </div>
-                    """
+                  </div>
 
-                st.markdown(
-                    row("Plan Name", plan_nm)
-                    + row("Effective Date", eff_dt)
-                    + row("Eligibility", eligibility)
-                    + row("Employer Match", match)
-                    + row("Vesting", vesting)
-                    + row("Auto-Enrollment", auto_enroll, last=True),
-                    unsafe_allow_html=True,
-                )
-                st.markdown("</div>", unsafe_allow_html=True)
-
-        # -------------------------
-        # Details
-        # -------------------------
-        with tab_details:
-            for f in all_findings:
-                status = f.get("status", "needs_review")
-                status_label = {"compliant": "COMPLIANT", "gap": "GAP", "needs_review": "REVIEW"}.get(status, "REVIEW")
-
-                status_bg = {
-                    "compliant": "rgba(34,197,94,0.12)",
-                    "gap": "rgba(239,68,68,0.12)",
-                    "needs_review": "rgba(234,179,8,0.12)",
-                }.get(status, "rgba(234,179,8,0.12)")
-                status_fg = {"compliant": "#22c55e", "gap": "#ef4444", "needs_review": "#eab308"}.get(
-                    status, "#eab308"
-                )
+                  <div style="
+                    margin-top:14px;
+                    background: rgba(0,0,0,0.20);
+                    border: 1px solid rgba(255,255,255,0.06);
+                    border-radius: 12px;
+                    padding: 12px 14px;
+                    color:#cbd5e1;
+                    line-height:1.5;
+                  ">
+                    {html.escape(notes) if notes else "—"}
+                  </div>
+                </div>
+                """,
+                unsafe_allow_html=True,
+            )
 
-                feature_title = (f.get("feature") or "Unknown Feature").replace("_", " ").title()
-                plan_value = f.get("plan_value", "—")
-                regulation = f.get("regulation", "—")
-                notes = (f.get("notes") or "").strip()
+    # -------------------------
+    # Sources
+    # -------------------------
+    with tab_sources:
+        st.markdown('<div class="glass-card">', unsafe_allow_html=True)
 
-                icon = "✓" if status == "compliant" else ("×" if status == "gap" else "!")
+        sources = report_pkg.get("sources", []) or []
+        if sources:
+            for l in sources:
+                title = l.get("title") or "Official source"
+                url = l.get("url") or ""
 
                 st.markdown(
                     f"""
-                    <div style="
-                      background: rgba(255,255,255,0.04);
-                      border: 1px solid rgba(255,255,255,0.08);
-                      border-radius: 16px;
-                      padding: 18px;
-                      margin-bottom: 14px;
-                    ">
-                      <div style="display:flex; justify-content:space-between; align-items:center; gap:14px;">
-                        <div style="display:flex; align-items:center; gap:10px;">
-                          <div style="width:28px; height:28px; border-radius:8px;
-                                      background: rgba(255,255,255,0.06);
-                                      display:flex; align-items:center; justify-content:center;
-                                      color:#e5e7eb; font-weight:900;">
-                            {icon}
-                          </div>
-                          <div style="color:#fff; font-weight:950; font-size:1.05rem;">
-                            {html.escape(feature_title)}
-                          </div>
-                        </div>
-                        <div style="
-                          padding:6px 10px;
-                          border-radius:999px;
-                          background:{status_bg};
-                          color:{status_fg};
-                          font-weight:950;
-                          font-size:0.8rem;
-                          letter-spacing:0.04em;
-                          border:1px solid rgba(255,255,255,0.06);
-                        ">{html.escape(status_label)}</div>
-                      </div>
-
-                      <div style="display:flex; gap:18px; margin-top:12px; flex-wrap:wrap;">
-                        <div style="min-width:220px;">
-                          <div style="color:#9ca3af; font-size:0.85rem;">Plan Value</div>
-                          <div style="color:#fff; font-weight:900; margin-top:2px;">{html.escape(str(plan_value))}</div>
-                        </div>
-                        <div style="min-width:260px;">
-                          <div style="color:#9ca3af; font-size:0.85rem;">Regulation</div>
-                          <div style="color:#fff; font-weight:900; margin-top:2px;">{html.escape(str(regulation))}</div>
-                        </div>
-                      </div>
-
-                      <div style="
-                        margin-top:14px;
-                        background: rgba(0,0,0,0.20);
-                        border: 1px solid rgba(255,255,255,0.06);
-                        border-radius: 12px;
-                        padding: 12px 14px;
-                        color:#cbd5e1;
-                        line-height:1.5;
-                      ">
-                        {html.escape(notes) if notes else "—"}
+                    <div style="display:flex; justify-content:space-between; align-items:center;
+                                padding:12px 0; border-bottom:1px solid rgba(255,255,255,0.06);">
+                      <div>
+                        <div style="font-weight:950; color:#a78bfa;">{html.escape(title)}</div>
+                        <div style="color:#9ca3af; font-size:0.9rem;">{html.escape(url)}</div>
                       </div>
+                      <div style="opacity:0.7;">↗</div>
                     </div>
                     """,
                     unsafe_allow_html=True,
                 )
+                if url:
+                    st.link_button("Open", url)
+        else:
+            st.info("No external web sources were used for this audit.")
+
+        st.markdown("</div>", unsafe_allow_html=True)
+
+    # -------------------------
+    # Changes (amendment review)
+    # -------------------------
+    if plan_diff:
+        with tabs[3]:
+            sent, full = plan_diff.get("tokens_sent", 0), plan_diff.get("tokens_full", 0)
+            c1, c2, c3 = st.columns(3)
+            c1.metric("Document Changed", f"{plan_diff['changed_fraction']:.1%}")
+            c2.metric("Changed Passages", plan_diff["hunks"])
+            c3.metric("Extraction Tokens", f"{sent:,}", f"{sent - full:,} vs full document", delta_color="inverse")
+            if plan_diff["mode"] == "full":
+                st.caption("Most of the document changed, so it was re-extracted in full.")
+            if plan_diff.get("tokens_baseline"):
+                st.caption(
+                    f"Includes {plan_diff['tokens_baseline']:,} tokens to extract the previous version, which had "
+                    "no stored audit. With audit history on it is stored, so later reviews against it skip this step."
+                )
 
-        # -------------------------
-        # Sources
-        # -------------------------
-        with tab_sources:
-            st.markdown('<div class="glass-card">', unsafe_allow_html=True)
-
-            sources = report_pkg.get("sources", []) or []
-            if sources:
-                for l in sources:
-                    title = l.get("title") or "Official source"
-                    url = l.get("url") or ""
-
-                    st.markdown(
-                        f"""
-                        <div style="display:flex; justify-content:space-between; align-items:center;
-                                    padding:12px 0; border-bottom:1px solid rgba(255,255,255,0.06);">
-                          <div>
-                            <div style="font-weight:950; color:#a78bfa;">{html.escape(title)}</div>
-                            <div style="color:#9ca3af; font-size:0.9rem;">{html.escape(url)}</div>
-                          </div>
-                          <div style="opacity:0.7;">↗</div>
-                        </div>
-                        """,
-                        unsafe_allow_html=True,
-                    )
-                    if url:
-                        st.link_button("Open", url)
+            changes = report_pkg.get("changes") or []
+            if changes:
+                labels = {"changed": "Changed", "added": "Added", "removed": "Removed",
+                          "review": "Provision removed - review"}
+                st.dataframe(
+                    [{"Field": ch["field"], "Previous": "—" if ch["old"] is None else str(ch["old"]),
+                      "Restated": "—" if ch["new"] is None else str(ch["new"]),
+                      "Change": labels.get(ch["change"], ch["change"])} for ch in changes],
+                    use_container_width=True,
+                    hide_index=True,
+                )
             else:
-                st.info("No external web sources were used for this audit.")
-
-            st.markdown("</div>", unsafe_allow_html=True)
-
-        # Optional: keep raw markdown available but not in the main UI
-        with st.expander("Developer Output (Markdown)", expanded=False):
-            st.code(md_report, language="markdown")
-
-else:
+                st.info("No extracted field changed since the previous version.")
+
+    # Optional: keep raw markdown and run timings available but not in the main UI
+    with st.expander("Developer Output", expanded=False):
+        st.markdown("#### Run Trace")
+        st.dataframe(trace.summary(), use_container_width=True, hide_index=True)
+        st.caption(f"Run {trace.run_id} • spans exported to {trace_path}")
+        normalization = result.text_normalization
+        if normalization:
+            st.caption(
+                f"Plan text normalized: {normalization['tokens_before']:,} → {normalization['tokens_after']:,} "
+                f"tokens ({normalization['tokens_saved']:,} saved)"
+            )
+        st.markdown("#### Prompt Cache")
+        st.dataframe(trace.prompt_cache(), use_container_width=True, hide_index=True)
+        st.markdown("#### LLM Governor")
+        st.json(get_governor().metrics())
+        st.markdown("#### Markdown Report")
+        st.code(report_artifact("md")(), language="markdown")
+
+elif not uploaded_file:
     st.markdown(
         """
         <div style="text-align: center; padding: 60px 20px; color: #666;">
@@ -0,0 +1,5 @@
+"""
+Benchmarks for the Compliance Drift Detector
+
+Each module is runnable on its own, e.g. `python -m benchmarks.bench_rerank`.
+"""
@@ -0,0 +1,80 @@
+"""
+Resident memory of back-to-back audits on large plans
+
+Runs audits through RunRegistry against a synthetic replay cassette (no
+OpenAI, Pinecone or DuckDuckGo calls), each on a distinct multi-MB plan,
+and reports process RSS (current and peak, from /proc - Linux only) with
+the blob store's cached and pinned bytes once every run has finished.
+
+Usage:
+    python -m benchmarks.bench_blobs
+    python -m benchmarks.bench_blobs --runs 24 --workers 4 --plan-mb 3.5
+"""
+
+import argparse
+import gc
+import json
+import os
+import tempfile
+
+from .suite import _text, synthetic_cassette
+
+
+def _rss_mb() -> dict:
+    """VmRSS and VmHWM (peak RSS) of this process, in MB"""
+    with open("/proc/self/status") as f:
+        fields = dict(line.split(":", 1) for line in f if ":" in line)
+    return {key: round(int(fields[key].split()[0]) / 1024, 1) for key in ("VmRSS", "VmHWM")}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="RSS across audits of large plans")
+    parser.add_argument("--runs", type=int, default=12)
+    parser.add_argument("--workers", type=int, default=3)
+    parser.add_argument("--plan-mb", type=float, default=2.0, help="Size of each synthetic plan")
+    parser.add_argument("--features", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cassette = os.path.join(tmp, "blobs.jsonl")
+        synthetic_cassette(cassette, args.features)
+        os.environ.update({
+            "CASSETTE_PATH": cassette,
+            "CASSETTE_MODE": "replay",
+            "CASSETTE_LATENCY": "0",
+            "TRACE_DIR": os.path.join(tmp, "traces"),
+            "HISTORY_DB": os.path.join(tmp, "history.sqlite"),
+        })
+        from agents.runner import RunRegistry
+        from tools.blobstore import get_blob_store
+
+        words = int(args.plan_mb * 1024 * 1024 / 7)  # ~7 bytes per synthetic word
+        before = _rss_mb()
+        registry = RunRegistry(workers=args.workers)
+        runs = [registry.start(_text(words, seed), f"plan-{seed}.pdf", report_mode="template")
+                for seed in range(args.runs)]
+        for run in runs:
+            while not run.finished:
+                run.events_since(len(run.events_since()), timeout=1)
+        gc.collect()
+        after = _rss_mb()
+        blobs = get_blob_store().metrics()
+
+    print(json.dumps({
+        "benchmark": "blob_memory",
+        "runs": args.runs,
+        "workers": args.workers,
+        "plan_mb": args.plan_mb,
+        "failed": sum(1 for run in runs if run.error),
+        "rss_mb_before": before["VmRSS"],
+        "rss_mb_after": after["VmRSS"],
+        "rss_mb_peak": after["VmHWM"],
+        "blob_cached_mb": round(blobs["cached_bytes"] / 1024 / 1024, 1),
+        "blobs_pinned": blobs["pinned"],
+        "blob_evictions": blobs["evictions"],
+        "blob_releases": blobs["releases"],
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Full-graph benchmark from a recorded cassette
+
+Record one live run (needs OpenAI, the KB and network), then replay it
+offline as often as needed with synthetic latency and concurrency.
+
+Usage:
+    python -m benchmarks.bench_graph record plan.pdf --cassette runs/acme.jsonl
+    python -m benchmarks.bench_graph replay --cassette runs/acme.jsonl --runs 20 --concurrency 4
+    python -m benchmarks.bench_graph replay --cassette runs/acme.jsonl --latency 0   # pure CPU cost
+"""
+
+import argparse
+import json
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from agents import ResultAccumulator, compliance_graph, initial_state
+from tools import extract_text_from_pdf
+from tools.cassette import intercept, use_cassette
+from tools.tracing import Trace, trace_run
+
+GRAPH_CONFIG = {"recursion_limit": 300}
+
+
+def _percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def _plan_text(pdf_path: str = None) -> str:
+    """The plan text is stored in the cassette too, so replays need no PDF"""
+    def extract():
+        with open(pdf_path, "rb") as f:
+            return extract_text_from_pdf(f.read())
+
+    return intercept("input", {}, extract)
+
+
+def run_once(pdf_text: str) -> dict:
+    trace = Trace()
+    started = time.perf_counter()
+    result = ResultAccumulator()
+    with trace_run(trace=trace):
+        for step in compliance_graph.stream(initial_state(pdf_text), config=GRAPH_CONFIG):
+            result.add(step)
+    return {
+        "wall_ms": (time.perf_counter() - started) * 1000,
+        "findings": len(result.findings),
+        "trace": trace,
+    }
+
+
+def record(pdf_path: str, cassette_path: str) -> dict:
+    with use_cassette(cassette_path, mode="record") as cassette:
+        run = run_once(_plan_text(pdf_path))
+    return {"cassette": cassette_path, "recorded_calls": cassette.stats["recorded"],
+            "wall_ms": round(run["wall_ms"], 1), "findings": run["findings"]}
+
+
+def replay(cassette_path: str, runs: int, concurrency: int, latency, latency_scale: float, strict: bool) -> dict:
+    results = []
+    started = time.perf_counter()
+
+    # one cassette per run so each replay walks the recording from the start
+    def one(_):
+        with use_cassette(cassette_path, latency=latency, latency_scale=latency_scale, strict=strict):
+            return run_once(_plan_text())
+
+    if concurrency <= 1:
+        results = [one(i) for i in range(runs)]
+    else:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = list(pool.map(one, range(runs)))
+
+    elapsed = time.perf_counter() - started
+    walls = [r["wall_ms"] for r in results]
+
+    nodes: dict[str, list[float]] = {}
+    for r in results:
+        for row in r["trace"].summary():
+            if row["kind"] == "node":
+                nodes.setdefault(row["name"], []).append(row["wall_ms_total"])
+
+    return {
+        "benchmark": "graph_replay",
+        "cassette": cassette_path,
+        "runs": runs,
+        "concurrency": concurrency,
+        "latency": latency,
+        "latency_scale": latency_scale,
+        "wall_ms_p50": round(statistics.median(walls), 1),
+        "wall_ms_p95": round(_percentile(walls, 95), 1),
+        "runs_per_min": round(runs / elapsed * 60, 2),
+        "findings": results[0]["findings"],
+        "node_ms_p50": {name: round(statistics.median(v), 1) for name, v in nodes.items()},
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Record or replay full compliance_graph runs")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    rec = sub.add_parser("record", help="Run the graph live and record every LLM/KB/web call")
+    rec.add_argument("pdf")
+    rec.add_argument("--cassette", required=True)
+
+    rep = sub.add_parser("replay", help="Replay a cassette offline")
+    rep.add_argument("--cassette", required=True)
+    rep.add_argument("--runs", type=int, default=5)
+    rep.add_argument("--concurrency", type=int, default=1)
+    rep.add_argument("--latency", default="recorded", help='"recorded" or seconds per call')
+    rep.add_argument("--latency-scale", type=float, default=1.0)
+    rep.add_argument("--strict", action="store_true", help="Fail on prompts that differ from the recording")
+
+    args = parser.parse_args(argv)
+    if args.command == "record":
+        result = record(args.pdf, args.cassette)
+    else:
+        latency = args.latency if args.latency == "recorded" else float(args.latency)
+        result = replay(args.cassette, args.runs, args.concurrency, latency, args.latency_scale, args.strict)
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
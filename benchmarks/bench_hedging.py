@@ -0,0 +1,132 @@
+"""
+Hedged LLM requests vs. tail latency
+
+Drives call_llm() against a FakeLLM whose latency is log-normal with a
+heavy tail (occasional very slow completions), once without hedging and
+once with it. Reports per-audit p50/p95/p99 (an audit being the graph's
+sequence of LLM calls) and how many extra model calls the hedges cost.
+
+Usage:
+    python -m benchmarks.bench_hedging
+    python -m benchmarks.bench_hedging --audits 300 --tail-prob 0.05 --tail-factor 10 --rate-limit-prob 0.01
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import threading
+import time
+
+from agents import llm, resilience
+
+# LLM calls in a six-feature audit, in graph order
+AUDIT_CALLS = ["extract_features"] + ["evaluate_kb", "determine_compliance"] * 6 + ["generate_report"]
+
+
+class FakeRateLimitError(Exception):
+    status_code = 429
+
+
+def make_latency(base_ms: float, sigma: float, tail_prob: float, tail_factor: float, seed: int):
+    rng = random.Random(seed)
+    lock = threading.Lock()
+
+    def latency() -> float:
+        with lock:
+            seconds = rng.lognormvariate(0, sigma) * base_ms / 1000
+            if rng.random() < tail_prob:
+                seconds *= tail_factor
+        return seconds
+
+    return latency
+
+
+def _percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def run_mode(hedge: bool, audits: int, latency, rate_limit_prob: float, seed: int) -> dict:
+    rng = random.Random(seed)
+    lock = threading.Lock()
+
+    def responder(prompt: str) -> str:
+        with lock:
+            limited = rng.random() < rate_limit_prob
+        if limited:
+            raise FakeRateLimitError("429 Too Many Requests")
+        return "sufficient"
+
+    fake = llm.FakeLLM(responder, latency=latency)
+    llm.set_llm(fake)
+    os.environ["LLM_HEDGE"] = "1" if hedge else "0"
+    resilience.latencies = resilience.LatencyTracker()
+    for key in resilience.STATS:
+        resilience.STATS[key] = 0
+
+    # learn each node's p95 before measuring
+    for _ in range(resilience.MIN_SAMPLES):
+        for node in set(AUDIT_CALLS):
+            llm.call_llm("warmup", node=node)
+    fake.calls = 0
+    for key in resilience.STATS:
+        resilience.STATS[key] = 0
+
+    audit_ms, call_ms = [], []
+    for _ in range(audits):
+        started = time.perf_counter()
+        for node in AUDIT_CALLS:
+            call_started = time.perf_counter()
+            llm.call_llm("benchmark prompt", node=node)
+            call_ms.append((time.perf_counter() - call_started) * 1000)
+        audit_ms.append((time.perf_counter() - started) * 1000)
+
+    logical = audits * len(AUDIT_CALLS)
+    return {
+        "hedging": hedge,
+        "audit_ms_mean": round(statistics.mean(audit_ms), 1),
+        "audit_ms_p50": round(_percentile(audit_ms, 50), 1),
+        "audit_ms_p95": round(_percentile(audit_ms, 95), 1),
+        "audit_ms_p99": round(_percentile(audit_ms, 99), 1),
+        "call_ms_p99": round(_percentile(call_ms, 99), 1),
+        "model_calls_per_logical_call": round(fake.calls / logical, 3),
+        "stats": dict(resilience.STATS),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark hedged LLM requests on a fake model")
+    parser.add_argument("--audits", type=int, default=200)
+    parser.add_argument("--base-ms", type=float, default=20.0, help="Median completion latency")
+    parser.add_argument("--sigma", type=float, default=0.3, help="Log-normal spread")
+    parser.add_argument("--tail-prob", type=float, default=0.03, help="Chance a completion is pathologically slow")
+    parser.add_argument("--tail-factor", type=float, default=10.0)
+    parser.add_argument("--rate-limit-prob", type=float, default=0.0, help="Chance a call returns a 429")
+    parser.add_argument("--seed", type=int, default=11)
+    args = parser.parse_args(argv)
+
+    resilience.BACKOFF_BASE = args.base_ms / 1000  # scale backoff to the simulated latencies
+    results = []
+    try:
+        for hedge in (False, True):
+            latency = make_latency(args.base_ms, args.sigma, args.tail_prob, args.tail_factor, args.seed)
+            results.append(run_mode(hedge, args.audits, latency, args.rate_limit_prob, args.seed))
+    finally:
+        llm.set_llm(None)
+        os.environ.pop("LLM_HEDGE", None)
+
+    baseline, hedged = results
+    print(json.dumps({
+        "benchmark": "hedging",
+        "calls_per_audit": len(AUDIT_CALLS),
+        "results": results,
+        "audit_p99_reduction": round(1 - hedged["audit_ms_p99"] / baseline["audit_ms_p99"], 3),
+        "extra_cost": round(hedged["model_calls_per_logical_call"] / baseline["model_calls_per_logical_call"] - 1, 3),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
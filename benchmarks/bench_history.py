@@ -0,0 +1,163 @@
+"""
+Audit history benchmark - indexed drift queries over a large synthetic history
+
+Fills a fresh history file with synthetic audits (plans re-audited over
+time, each finding's status drifting now and then), then times the drift
+queries against the same query forced to scan the findings table, and
+checks with EXPLAIN QUERY PLAN that none of them scans it. Then times
+the portfolio dashboard: the first columnar load, a restart from the
+saved columns, and recomputing every view.
+
+Usage:
+    python -m benchmarks.bench_history
+    python -m benchmarks.bench_history --findings 2000000 --plans 20000 --repeat 50
+"""
+
+import argparse
+import json
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+
+from tools.history import HistoryStore, to_timestamp
+from tools.portfolio import FindingsColumns, load_plans, portfolio_summary
+
+FEATURES = ["eligibility_age", "eligibility_service", "vesting", "employer_match", "auto_enrollment",
+            "hardship_distributions"]
+STATUSES = ["compliant", "gap", "needs_review"]
+RISKS = ["Low", "Medium", "High"]
+DAY_S = 86400.0
+
+
+def _percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def synthetic_history(history: HistoryStore, findings: int, plans: int, days: int, seed: int = 7) -> dict:
+    """Record audits until `findings` findings exist; returns load timings"""
+    rng = random.Random(seed)
+    status = {(p, f): rng.choice(STATUSES) for p in range(plans) for f in FEATURES}
+    start = time.time() - days * DAY_S
+    runs = findings // len(FEATURES)
+
+    started = time.perf_counter()
+    for i in range(runs):
+        plan = rng.randrange(plans)
+        audited_at = start + days * DAY_S * i / runs
+        rows = []
+        for feature in FEATURES:
+            if rng.random() < 0.1:  # drift since this plan's last audit
+                status[plan, feature] = rng.choice(STATUSES)
+            rows.append({"feature": feature, "status": status[plan, feature], "plan_value": f"value {i}",
+                         "regulation": "IRC 411(a)", "source": "kb", "notes": "",
+                         "links": [{"title": "IRS", "url": f"https://www.irs.gov/{feature}"}]})
+        counts = {s: sum(1 for r in rows if r["status"] == s) for s in STATUSES}
+        report = {
+            "meta": {"plan_name": f"Plan {plan:06d} 401(k)", "risk_level": RISKS[min(counts["gap"], 2)],
+                     "counts": counts},
+            "findings": rows,
+            "sources": [link for r in rows for link in r["links"]],
+        }
+        history.record_run(f"{i:012x}", report, file_name=f"plan-{plan}.pdf", report_mode="template",
+                           audited_at=audited_at)
+    elapsed = time.perf_counter() - started
+    return {"runs": runs, "findings": runs * len(FEATURES), "load_s": round(elapsed, 1),
+            "runs_per_s": round(runs / elapsed, 1)}
+
+
+def _time(fn, repeat: int) -> dict:
+    times = []
+    for i in range(repeat):
+        started = time.perf_counter()
+        fn(i)
+        times.append((time.perf_counter() - started) * 1000)
+    return {"p50_ms": round(_percentile(times, 50), 3), "p95_ms": round(_percentile(times, 95), 3),
+            "mean_ms": round(statistics.mean(times), 3)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the audit history store")
+    parser.add_argument("--findings", type=int, default=1_000_000)
+    parser.add_argument("--plans", type=int, default=10_000)
+    parser.add_argument("--days", type=int, default=730, help="Span of the synthetic history")
+    parser.add_argument("--repeat", type=int, default=30, help="Timed repetitions per query")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "history.sqlite")
+        history = HistoryStore(path)
+        load = synthetic_history(history, args.findings, args.plans, args.days)
+        since = time.time() - 30 * DAY_S  # "since date X": the last month
+
+        def plan(i: int) -> str:
+            return f"Plan {(i * 7919) % args.plans:06d} 401(k)"
+
+        queries = {
+            "gaps_since": lambda i: history.plans_with_status(FEATURES[i % len(FEATURES)], "gap", since=since),
+            "status_changes": lambda i: history.status_changes(plan(i)),
+            "status_history": lambda i: history.status_history(plan(i), "vesting"),
+            "portfolio_counts": lambda i: history.portfolio_counts(),
+        }
+        timings = {name: _time(fn, args.repeat) for name, fn in queries.items()}
+
+        # the same questions answered by scanning, for comparison and to read the plans
+        db = sqlite3.connect(path)
+        key = "plan 000000 401 k"
+        scans = {
+            "gaps_since": ("SELECT plan_key, MAX(audited_at) FROM findings {hint} "
+                           "WHERE feature = ? AND status = ? AND audited_at >= ? GROUP BY plan_key",
+                           ("vesting", "gap", to_timestamp(since))),
+            "status_changes": ("SELECT feature, status FROM findings {hint} WHERE plan_key = ? "
+                               "ORDER BY feature, audited_at", (key,)),
+            "portfolio_counts": ("SELECT risk_level, COUNT(DISTINCT plan_key) FROM runs {hint} "
+                                 "GROUP BY risk_level", ()),
+        }
+        full_scan, plans_used = {}, {}
+        for name, (sql, params) in scans.items():
+            full_scan[name] = _time(lambda i: db.execute(sql.format(hint="NOT INDEXED"), params).fetchall(),
+                                    max(3, args.repeat // 10))
+            plan_rows = db.execute("EXPLAIN QUERY PLAN " + sql.format(hint=""), params).fetchall()
+            plans_used[name] = [row[-1] for row in plan_rows]
+        plans_used["portfolio_counts"] = [row[-1] for row in db.execute(
+            "EXPLAIN QUERY PLAN SELECT latest_risk, COUNT(*) FROM plans GROUP BY latest_risk").fetchall()]
+        size_mb = os.path.getsize(path) / 1e6
+        db.close()
+
+        portfolio = {}
+        for name in ("first_load_ms", "load_from_snapshot_ms"):  # the first load saves the snapshot
+            started = time.perf_counter()
+            findings = FindingsColumns(path)
+            portfolio[name] = round((time.perf_counter() - started) * 1000, 1)
+        portfolio["plans_load"] = _time(lambda i: load_plans(path), 3)
+        plans = load_plans(path)
+        started = time.perf_counter()
+        portfolio_summary(findings, plans, since=since)
+        portfolio["summary_after_new_audit_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        portfolio["summary"] = _time(
+            lambda i: portfolio_summary(findings, plans, freq="WM"[i % 2], since=since if i % 3 else None),
+            args.repeat,
+        )
+        history.close()
+
+    scanning = [name for name, steps in plans_used.items()
+                if any(s.startswith("SCAN findings") or s.startswith("SCAN runs") for s in steps)]
+    print(json.dumps({
+        "benchmark": "history",
+        **load,
+        "plans": args.plans,
+        "db_mb": round(size_mb, 1),
+        "indexed": timings,
+        "full_scan": full_scan,
+        "query_plans": plans_used,
+        "scanning_queries": scanning,
+        "portfolio": portfolio,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Official-source mirror benchmark - web step latency and evidence size
+
+Builds a mirror from synthetic official pages (an in-memory stand-in for
+the network), then runs the web step's feature queries against it. For
+each path the report shows search latency and the evidence tokens that
+reach determine_compliance: a mirror hit carries its passage, a live
+DDGS hit only a title, URL and a search-engine blurb.
+
+Usage:
+    python -m benchmarks.bench_mirror
+    python -m benchmarks.bench_mirror --pages 2000 --repeats 50
+    python -m benchmarks.bench_mirror --live            # also time live DDGS (needs network)
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from agents.evidence import items_from_links
+from agents.nodes import FEATURE_QUERIES
+from tools import official_mirror
+from tools.tokens import count_tokens
+
+_VOCAB = (
+    "plan participant employer employee contribution vesting eligibility service year age "
+    "deferral match safe harbor automatic enrollment escalation catch-up limit section code "
+    "regulation distribution hardship loan nondiscrimination testing compensation highly "
+    "compensated notice amendment effective date plan year elective arrangement"
+).split()
+_DOMAINS = ["www.irs.gov", "www.dol.gov", "www.ecfr.gov", "www.federalregister.gov"]
+
+
+def synthetic_pages(n: int, seed: int = 5) -> dict[str, tuple[str, str]]:
+    rng = random.Random(seed)
+    pages = {}
+    for i in range(n):
+        text = "\n\n".join(" ".join(rng.choice(_VOCAB) for _ in range(rng.randint(60, 140))) + "."
+                           for _ in range(rng.randint(2, 8)))
+        pages[f"https://{rng.choice(_DOMAINS)}/retirement-plans/topic-{i}"] = (f"Retirement Topic {i}", text)
+    return pages
+
+
+def _evidence_tokens(results: list[dict]) -> int:
+    return sum(count_tokens(f"{item['header']}\n{item['content']}") for item in items_from_links(results))
+
+
+def _timed(search, queries: list[str], repeats: int) -> tuple[list[float], list[int]]:
+    times, tokens = [], []
+    for _ in range(repeats):
+        for query in queries:
+            started = time.perf_counter()
+            results = search(query)
+            times.append((time.perf_counter() - started) * 1000)
+            tokens.append(_evidence_tokens(results))
+    return times, tokens
+
+
+def _stats(times: list[float], tokens: list[int]) -> dict:
+    times = sorted(times)
+    return {
+        "p50_ms": round(statistics.median(times), 2),
+        "p95_ms": round(times[int(len(times) * 0.95) - 1], 2),
+        "evidence_tokens_mean": round(statistics.mean(tokens), 1),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the official-source mirror against live search")
+    parser.add_argument("--pages", type=int, default=500)
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--live", action="store_true", help="Also time live DDGS searches")
+    args = parser.parse_args(argv)
+
+    queries = [q + " 2024 2025" for q in FEATURE_QUERIES.values()]
+    with tempfile.TemporaryDirectory() as root:
+        os.environ["OFFICIAL_MIRROR_DIR"] = root
+        pages = synthetic_pages(args.pages)
+        started = time.perf_counter()
+        built = official_mirror.refresh(list(pages), official_mirror.static_fetcher(pages))
+        refresh_s = time.perf_counter() - started
+
+        official_mirror.search_mirror(queries[0], 3)  # open the index
+        report = {
+            "benchmark": "official_mirror",
+            "pages": built["pages"],
+            "passages": built["passages"],
+            "refresh_s": round(refresh_s, 2),
+            "mirror": _stats(*_timed(lambda q: official_mirror.search_mirror(q, 3), queries, args.repeats)),
+        }
+        if args.live:
+            from tools.web_search import _search_live
+
+            report["live"] = _stats(*_timed(lambda q: _search_live(q, 3), queries, 1))
+        official_mirror.get_mirror().index.close()
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Plan text normalization benchmark - tokens saved and time per page
+
+Builds synthetic plan text the way extract_text_from_pdf returns it: a
+"--- Page N ---" marker per page, a running header and footer, page
+numbers, a table of contents, a disclaimer repeated on every page and
+body text justified with words hyphenated across line breaks. For each
+document length: normalization time (it should grow linearly, so ms per
+page stays flat) and the tokens before and after.
+
+Usage:
+    python -m benchmarks.bench_normalizer
+    python -m benchmarks.bench_normalizer --pages 10 100 1000
+    python -m benchmarks.bench_normalizer plans/*.pdf       # real documents instead
+"""
+
+import argparse
+import json
+import random
+import statistics
+import time
+
+from tools.text_normalizer import normalize_text
+
+VOCAB = ("the plan participant employer shall contribution account year service benefit distribution "
+         "trustee amount section provided under any such which may be eligible compensation").split()
+HEADER = "ACME MANUFACTURING COMPANY 401(k) RETIREMENT SAVINGS PLAN\nAmended and Restated Effective January 1, 2024"
+DISCLAIMER = ("This summary does not create any contractual rights. In the event of a conflict the "
+              "Plan document governs.")
+
+
+def _hyphenated(paragraph: str, width: int) -> str:
+    """Wrap like a justified PDF: the word crossing the margin is split with a hyphen"""
+    lines, line = [], ""
+    for word in paragraph.split():
+        if len(line) + len(word) + 1 > width and len(word) > 6:
+            cut = width - len(line) - 2
+            if cut >= 3:
+                lines.append(f"{line} {word[:cut]}-".strip())
+                line = word[cut:]
+                continue
+        if len(line) + len(word) + 1 > width:
+            lines.append(line)
+            line = word
+        else:
+            line = f"{line} {word}".strip()
+    return "\n".join(lines + [line])
+
+
+def synthetic_text(pages: int, seed: int = 7) -> str:
+    rng = random.Random(seed)
+    toc_pages = max(1, pages // 40)
+    out = []
+    for n in range(1, pages + 1):
+        body = [HEADER, ""]
+        if n <= toc_pages:
+            body.append("TABLE OF CONTENTS")
+            body += [f"Article {rng.randint(1, 20)} {rng.choice(VOCAB).title()} {'.' * 40} {rng.randint(1, pages)}"
+                     for _ in range(30)]
+        else:
+            for _ in range(4):
+                paragraph = " ".join(rng.choice(VOCAB + ["participation", "distributions", "compensation"])
+                                     for _ in range(rng.randint(60, 110))) + "."
+                body += [_hyphenated(paragraph, 78), "", ""]
+        body += [DISCLAIMER, f"Page {n} of {pages}"]
+        out.append(f"--- Page {n} ---\n" + "\n".join(body))
+    return "\n\n".join(out)
+
+
+def measure(text: str, pages: int, repeats: int) -> dict:
+    times = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        normalized = normalize_text(text)
+        times.append((time.perf_counter() - started) * 1000)
+    p50 = statistics.median(times)
+    return {
+        "pages": pages,
+        "p50_ms": round(p50, 2),
+        "ms_per_page": round(p50 / max(pages, 1), 4),
+        **{k: v for k, v in normalized.summary().items() if k != "pages"},
+        "saved_share": round(normalized.tokens_saved / max(normalized.tokens_before, 1), 3),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark plan text normalization")
+    parser.add_argument("documents", nargs="*", help="Plan PDFs to use instead of synthetic text")
+    parser.add_argument("--pages", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    cases = []
+    if args.documents:
+        from tools import extract_text_from_pdf
+
+        for path in args.documents:
+            with open(path, "rb") as f:
+                text = extract_text_from_pdf(f.read())
+            cases.append({"document": path, **measure(text, text.count("--- Page "), args.repeats)})
+    else:
+        for pages in args.pages:
+            cases.append(measure(synthetic_text(pages), pages, args.repeats))
+    print(json.dumps({"benchmark": "text_normalizer", "cases": cases}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Amendment review benchmark - extraction tokens sent for a restated plan
+
+Builds a synthetic plan document, then restatements of it with a growing
+share of sections rewritten. Every restatement is also re-flowed to a
+different line width and re-paginated, as a re-exported PDF would be, so
+the diff has to see past layout. For each one: the diff time, how much
+of the document it flags as changed, and the extraction prompt tokens
+against sending the whole document.
+
+Usage:
+    python -m benchmarks.bench_plan_diff
+    python -m benchmarks.bench_plan_diff --sections 600 --changed 0 0.01 0.1 0.3
+"""
+
+import argparse
+import json
+import random
+import textwrap
+import time
+
+from agents.nodes import AMENDMENT_MAX_CHANGED, EXTRACTION_CHARS
+from agents.prompts import get_prompt
+from tools.plan_diff import diff_documents
+from tools.tokens import count_tokens
+
+VOCAB = ("the plan participant employer shall contribution account year service benefit distribution "
+         "trustee amount section provided under any such which may be eligible compensation").split()
+
+
+def _section(rng: random.Random, n: int) -> str:
+    return f"Section {n}. " + " ".join(rng.choice(VOCAB) for _ in range(rng.randint(40, 140))) + "."
+
+
+def _layout(sections: list[str], width: int, per_page: int) -> str:
+    """Wrap to a line width and insert page footers, like text pulled from a PDF"""
+    pages, out = (len(sections) + per_page - 1) // per_page, []
+    for i, section in enumerate(sections):
+        out.append(textwrap.fill(section, width))
+        if i % per_page == per_page - 1:
+            out.append(f"Page {i // per_page + 1} of {pages}")
+    return "\n\n".join(out)
+
+
+def restatement(sections: list[str], changed: float, seed: int) -> list[str]:
+    rng = random.Random(seed)
+    restated = list(sections)
+    for i in rng.sample(range(len(sections)), round(changed * len(sections))):
+        restated[i] = _section(rng, i)
+    return restated
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark amendment-review extraction")
+    parser.add_argument("--sections", type=int, default=60, help="~5k words: within what one extraction reads")
+    parser.add_argument("--changed", type=float, nargs="+", default=[0, 0.01, 0.05, 0.2, 0.5])
+    args = parser.parse_args(argv)
+
+    rng = random.Random(11)
+    sections = [_section(rng, n) for n in range(args.sections)]
+    previous = _layout(sections, width=90, per_page=10)
+
+    cases = []
+    for changed in args.changed:
+        restated = _layout(restatement(sections, changed, seed=int(changed * 1000)), width=72, per_page=8)
+        started = time.perf_counter()
+        diff = diff_documents(previous, restated)
+        diff_ms = (time.perf_counter() - started) * 1000
+
+        full = count_tokens(get_prompt("extraction").format(pdf_text=restated[:EXTRACTION_CHARS]))
+        if diff.identical:
+            sent = 0
+        elif diff.changed_fraction > AMENDMENT_MAX_CHANGED:
+            sent = full
+        else:
+            sent = count_tokens(get_prompt("amendment_extraction").format(changes=diff.excerpt()[:EXTRACTION_CHARS]))
+        cases.append({
+            "sections_changed": changed,
+            "diff_ms": round(diff_ms, 1),
+            "changed_fraction": round(diff.changed_fraction, 4),
+            "passages": len(diff.passages),
+            "tokens_full": full,
+            "tokens_sent": sent,
+            "tokens_saved": round(1 - sent / full, 3),
+        })
+
+    print(json.dumps({"benchmark": "plan_diff", "sections": args.sections,
+                      "words": len(previous.split()), "cases": cases}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
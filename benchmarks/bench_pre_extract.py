@@ -0,0 +1,256 @@
+"""
+Pre-extraction benchmark - pattern pass vs LLM-only extraction
+
+Generates plan documents with known answers (varied wording, vesting
+tables, page footers and filler between the provisions) and compares
+two ways of filling the extraction schema:
+
+  llm_only   the extraction prompt over the whole document, as before
+  hybrid     tools.pre_extract first; only the fields it isn't confident
+             about, and only the passages about them, go to the LLM
+
+Offline (the default) the LLM is skipped: the report shows how many
+fields the pattern pass settles, how accurate those are, and the prompt
+tokens each path would send. With --live, both paths call the model and
+accuracy and latency are measured end to end (needs OPENAI_API_KEY).
+Synthetic wording is friendlier than real documents; pass real plan PDFs
+to score the hybrid path by its agreement with LLM-only extraction.
+
+Usage:
+    python -m benchmarks.bench_pre_extract
+    python -m benchmarks.bench_pre_extract --plans 200 --threshold 0.7
+    python -m benchmarks.bench_pre_extract --live --plans 10
+    python -m benchmarks.bench_pre_extract --live plans/*.pdf
+"""
+
+import argparse
+import json
+import random
+import statistics
+import textwrap
+import time
+from typing import Optional
+
+from agents.amendments import flatten
+from agents.nodes import EXTRACTION_CHARS, PRE_EXTRACT_MIN_CONFIDENCE, extract_document, pre_extraction_prompt
+from agents.prompts import get_prompt, prompt_text
+from tools.pre_extract import pre_extract
+from tools.tokens import count_tokens
+
+FILLER = ("the plan administrator shall maintain records for each participant and may adopt rules for the "
+          "uniform administration of the plan including procedures for claims and appeals and the trustee "
+          "shall hold all assets in trust for the exclusive benefit of participants and beneficiaries").split()
+
+
+def _filler(rng: random.Random, sentences: int) -> str:
+    return " ".join(
+        " ".join(rng.sample(FILLER, rng.randint(12, 24))).capitalize() + "." for _ in range(sentences)
+    )
+
+
+def synthetic_plan(rng: random.Random) -> tuple[str, dict]:
+    """A plan document and the values it states, as flattened extraction fields"""
+    company = rng.choice(["Acme", "Northwind", "Globex", "Initech", "Umbrella", "Stark"])
+    name = f"{company} {rng.choice(['Corporation', 'Industries', 'Holdings'])} 401(k) {rng.choice(['Plan', 'Savings Plan', 'Retirement Plan'])}"
+    month = rng.choice(["January", "April", "July"])
+    effective = f"{month} 1, {rng.choice([2021, 2023, 2024, 2025])}"
+    age = rng.choice([18, 21])
+    months = rng.choice([0, 3, 12])
+    entry = rng.choice(["monthly", "quarterly", "semi-annual", "immediate"])
+    first, rate = rng.choice([(3, 100), (6, 50), (4, 100), (5, 100)])
+    catch_up = rng.random() < 0.8
+    auto = rng.random() < 0.5
+    default_rate = rng.choice([3, 4, 6])
+    escalate = auto and rng.random() < 0.5
+    hardship, loans = rng.random() < 0.7, rng.random() < 0.6
+    vesting = rng.choice(["immediate", "cliff", "graded", "graded_table", "cliff_table"])
+
+    truth = {
+        "plan_name": name,
+        "effective_date": effective,
+        "eligibility.age_requirement": age,
+        "eligibility.service_requirement": {0: "None", 3: "3 months", 12: "1 year"}[months],
+        "eligibility.entry_dates": entry,
+        "contributions.employer_match_formula": f"{rate}% of first {first}%",
+        "contributions.catch_up_allowed": catch_up,
+        "auto_enrollment.enabled": auto,
+        "distributions.hardship_allowed": hardship,
+        "distributions.loans_allowed": loans,
+    }
+    sections = [f"{name.upper()}\n\nSummary Plan Description\n\n"
+                f"{rng.choice(['The effective date of the Plan is', 'This restatement is effective'])} {effective}."]
+
+    service = {0: "There is no service requirement to join the Plan.",
+               3: "You are eligible to participate after completing three (3) months of service.",
+               12: "You are eligible to participate after completing one (1) Year of Service in which you work at least 1,000 hours."}[months]
+    entry_text = {"immediate": "You will enter the Plan on an immediate entry basis.",
+                  "monthly": "The Plan has monthly entry dates.",
+                  "quarterly": "Entry dates are the first day of each plan quarter, so the Plan uses quarterly entry.",
+                  "semi-annual": "The Plan has semi-annual entry dates on January 1 and July 1."}[entry]
+    sections.append(f"ELIGIBILITY\n\nYou are eligible to participate in the Plan once you attain age {age}. "
+                    f"{service} {entry_text}")
+    sections.append(f"EMPLOYER MATCHING CONTRIBUTIONS\n\nThe Employer will make a matching contribution equal to "
+                    f"{rate}% of the first {first}% of compensation you defer.")
+    sections.append("CATCH-UP CONTRIBUTIONS\n\n" + (
+        "If you are age 50 or older by the end of the year, you may make catch-up contributions."
+        if catch_up else "The Plan does not permit catch-up contributions."))
+
+    if vesting == "immediate":
+        text = "You are always 100% vested in your own contributions. Employer matching contributions are 100% vested immediately."
+        truth.update({"vesting.type": "immediate", "vesting.years_to_full": 0})
+    elif vesting == "cliff":
+        years = rng.choice([2, 3])
+        text = f"You are always 100% vested in your own contributions. You become 100% vested in employer matching contributions after {years} years of service."
+        truth.update({"vesting.type": "cliff", "vesting.years_to_full": years})
+    elif vesting == "graded":
+        step = rng.choice([20, 25])
+        text = "Employer matching contributions vest at 20% per year of service." if step == 20 else \
+            "Employer matching contributions vest at 25% for each year of service."
+        truth.update({"vesting.type": "graded", "vesting.years_to_full": 100 // step})
+    else:
+        graded = vesting == "graded_table"
+        rows = ([(1, 0), (2, 20), (3, 40), (4, 60), (5, 80), (6, 100)] if graded
+                else [(1, 0), (2, 0), (3, 100)])
+        table = "\n".join(f"{y} {'Year' if y == 1 else 'Years'}    {p}%" for y, p in rows)
+        text = f"Employer contributions vest according to the following schedule:\nYears of Service    Vested Percentage\n{table}"
+        truth.update({"vesting.type": "graded" if graded else "cliff", "vesting.years_to_full": rows[-1][0]})
+    sections.append("VESTING\n\n" + text)
+
+    if auto:
+        sections.append(f"AUTOMATIC ENROLLMENT\n\nIf you do not make an election, you will be automatically enrolled "
+                        f"at a default contribution rate of {default_rate}% of compensation. " + (
+                            "Your contribution rate will increase by 1% each plan year up to 10%." if escalate
+                            else "Your contribution rate will not increase automatically."))
+        truth.update({"auto_enrollment.default_rate": default_rate, "auto_enrollment.auto_escalation": escalate})
+    else:
+        sections.append("ENROLLMENT\n\nThe Plan does not provide for automatic enrollment; you must elect to defer.")
+    sections.append("DISTRIBUTIONS\n\n" + (
+        "Hardship withdrawals are permitted for immediate and heavy financial needs. " if hardship
+        else "Hardship withdrawals are not permitted under the Plan. ") + (
+        "Loans are available from your vested account balance." if loans else "Loans are not permitted under the Plan."))
+
+    pages, body = [], []
+    for section in sections:
+        body.append(section)
+        body.append(_filler(rng, rng.randint(3, 10)))
+    for i, chunk in enumerate(body):
+        pages.append("\n".join(textwrap.fill(p, 84) if not p.startswith(("Years", "1 ", "2 ")) else p
+                               for p in chunk.split("\n")))
+        if i % 3 == 2:
+            pages.append(f"Page {i // 3 + 1}")
+    return "\n\n".join(pages), truth
+
+
+def _equal(field: str, got, want) -> bool:
+    if isinstance(want, str) and isinstance(got, str):
+        norm = lambda v: " ".join(v.lower().replace("(", "").replace(")", "").split())
+        return norm(want) == norm(got) or (field.endswith("service_requirement") and norm(want) in norm(got))
+    return got == want
+
+
+def offline(plans: list[tuple[str, Optional[dict]]], threshold: float) -> dict:
+    """Pattern pass alone: fields it settles, how many of those are right, prompt tokens left"""
+    settled = correct = checked = stated = 0
+    wrong = {}
+    times, tokens_full, tokens_hybrid = [], [], []
+    for text, truth in plans:
+        started = time.perf_counter()
+        guesses = pre_extract(text)
+        times.append((time.perf_counter() - started) * 1000)
+        confident = {f: g.value for f, g in guesses.items() if g.confidence >= threshold}
+        settled += len(confident)
+        if truth is not None:
+            stated += len(truth)
+            for f, v in confident.items():
+                if f not in truth:
+                    continue  # free text the generator doesn't state an answer for
+                checked += 1
+                if _equal(f, v, truth[f]):
+                    correct += 1
+                else:
+                    wrong.setdefault(f, []).append({"got": v, "want": truth[f]})
+        tokens_full.append(count_tokens(get_prompt("extraction").format(pdf_text=text[:EXTRACTION_CHARS])))
+        tokens_hybrid.append(count_tokens(prompt_text(pre_extraction_prompt(text, threshold)[1])))
+    report = {
+        "pre_extract_ms_p50": round(statistics.median(times), 2),
+        "pre_extract_ms_max": round(max(times), 2),
+        "fields_settled": settled,
+        "llm_skipped": sum(1 for t in tokens_hybrid if t == 0),
+        "tokens_llm_only": sum(tokens_full),
+        "tokens_hybrid": sum(tokens_hybrid),
+    }
+    if stated:
+        report.update({
+            "precision": round(correct / max(checked, 1), 4),   # of the settled fields with a known answer
+            "coverage": round(correct / stated, 4),              # of all known answers
+            "wrong": {f: w[:3] for f, w in wrong.items()},
+        })
+    return report
+
+
+def live(plans: list[tuple[str, Optional[dict]]], threshold: float) -> dict:
+    """
+    Both paths against the model. Accuracy is against the known answers;
+    for real documents (no answers), hybrid is scored by agreement with llm_only
+    """
+    from agents.nodes import _extract
+
+    timings = {"llm_only": [], "hybrid": []}
+    right = {"llm_only": 0, "hybrid": 0}
+    stated = agree = compared = 0
+    for text, truth in plans:
+        started = time.perf_counter()
+        llm_only = flatten(_extract(get_prompt("extraction").messages(pdf_text=text[:EXTRACTION_CHARS])))
+        timings["llm_only"].append((time.perf_counter() - started) * 1000)
+        started = time.perf_counter()
+        hybrid = flatten(extract_document(text, threshold=threshold)[0])
+        timings["hybrid"].append((time.perf_counter() - started) * 1000)
+
+        if truth is not None:
+            stated += len(truth)
+            for name, found in (("llm_only", llm_only), ("hybrid", hybrid)):
+                right[name] += sum(1 for f, v in truth.items() if _equal(f, found.get(f), v))
+        else:
+            fields = [f for f, v in llm_only.items() if v is not None]
+            compared += len(fields)
+            agree += sum(1 for f in fields if _equal(f, hybrid.get(f), llm_only[f]))
+
+    report = {name: {"p50_ms": round(statistics.median(ms), 1), "mean_ms": round(statistics.mean(ms), 1)}
+              for name, ms in timings.items()}
+    if stated:
+        for name in right:
+            report[name]["accuracy"] = round(right[name] / stated, 4)
+    if compared:
+        report["hybrid"]["agreement_with_llm_only"] = round(agree / compared, 4)
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark pattern pre-extraction against LLM-only extraction")
+    parser.add_argument("documents", nargs="*", help="Plan PDFs to use instead of synthetic plans")
+    parser.add_argument("--plans", type=int, default=100, help="Synthetic plans, when no documents are given")
+    parser.add_argument("--threshold", type=float, default=PRE_EXTRACT_MIN_CONFIDENCE)
+    parser.add_argument("--live", action="store_true", help="Call the model for both paths")
+    parser.add_argument("--seed", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    if args.documents:
+        from tools import extract_text_from_pdf
+
+        plans = []
+        for path in args.documents:
+            with open(path, "rb") as f:
+                plans.append((extract_text_from_pdf(f.read()), None))
+    else:
+        rng = random.Random(args.seed)
+        plans = [synthetic_plan(rng) for _ in range(args.plans)]
+
+    report = {"benchmark": "pre_extract", "plans": len(plans), "synthetic": not args.documents,
+              "threshold": args.threshold, "offline": offline(plans, args.threshold)}
+    if args.live:
+        report["live"] = live(plans, args.threshold)
+    print(json.dumps(report, indent=2, default=str))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+"""
+Prompt cache benchmark - cached vs uncached input tokens per prompt version
+
+Audits synthetic plans feature by feature - evaluate_kb, then
+determine_compliance, with official-source evidence for part of the
+features - once per prompt layout: version 1 (the original single-message
+prompts) and the latest registered version (static system prefix, shared
+feature + KB evidence block, variable content last). Each feature has the
+same regulations in every plan of an era, as retrieval returns them.
+
+Offline (the default) a FakeLLM reports cached tokens the way OpenAI's
+prompt caching does (the longest prefix shared with a recent prompt, in
+128-token steps, from 1024 tokens), so the report shows how much of each
+node's input each layout lets the provider serve from its cache, and the
+cost against the cost with no caching. With --live the same calls go to
+the model, which reports its real cache reads and latency (needs
+OPENAI_API_KEY). --traces aggregates exported run traces instead.
+
+--compare-cassettes checks that a layout change didn't change answers:
+given cassettes of the same audits recorded under two prompt versions, it
+pairs their evaluate_kb calls by feature and compares the sufficiency
+decisions, exiting with status 1 on any disagreement.
+
+Usage:
+    python -m benchmarks.bench_prompt_cache
+    python -m benchmarks.bench_prompt_cache --plans 50 --eras 3
+    python -m benchmarks.bench_prompt_cache --live --plans 5
+    python -m benchmarks.bench_prompt_cache --traces .traces/*.jsonl
+
+    PROMPT_VERSIONS=evaluate_kb=1,determine_compliance=1 \
+        python -m benchmarks.bench_graph record plan.pdf --cassette runs/v1.jsonl
+    python -m benchmarks.bench_graph record plan.pdf --cassette runs/v2.jsonl
+    python -m benchmarks.bench_prompt_cache --compare-cassettes runs/v1.jsonl runs/v2.jsonl
+"""
+
+import argparse
+import json
+import os
+import random
+import re
+import sys
+from collections import Counter
+
+from agents import llm
+from agents.nodes import FEATURE_QUERIES, determine_compliance, evaluate_kb, is_sufficient
+from agents.prompts import get_prompt
+from tools.tracing import load_spans, prompt_cache_summary, trace_run
+
+NODES = ("evaluate_kb", "determine_compliance")
+
+# the feature line of the evaluate_kb prompt, in either layout
+_FEATURE_LINE = re.compile(r"^Feature(?: being checked)?: (.+)$", re.MULTILINE)
+
+_VOCAB = (
+    "plan participant employer employee contribution vesting eligibility service year age "
+    "deferral match safe harbor automatic enrollment escalation catch-up limit section code "
+    "regulation distribution hardship loan nondiscrimination testing compensation highly "
+    "compensated notice amendment effective date plan year elective arrangement"
+).split()
+
+_PLAN_VALUES = {
+    "eligibility_age": ["18", "21", "25"],
+    "eligibility_service": ["None", "6 months", "1 year", "2 years"],
+    "vesting": ["immediate - N/A", "cliff - 3 years", "graded - 20% per year over 6 years"],
+    "employer_match": ["100% of first 3%", "50% of first 6%", "100% of first 4%"],
+    "auto_enrollment": ["Enabled: True, Rate: 3%", "Enabled: False, Rate: None%"],
+    "catch_up": ["True", "False"],
+}
+
+
+def _sentences(rng: random.Random, chars: int) -> str:
+    text = []
+    while sum(len(s) for s in text) < chars:
+        text.append(" ".join(rng.choice(_VOCAB) for _ in range(rng.randint(10, 24))).capitalize() + ".")
+    return " ".join(text)
+
+
+def regulations(feature: str, era: int) -> list[dict]:
+    """The top KB hits for a feature: the same in every plan of an era (~1500-char chunks, as ingested)"""
+    rng = random.Random(f"{feature}:{era}")
+    return [
+        {"id": f"{feature}-{era}-{i}#0", "score": 0.9 - i / 20,
+         "metadata": {"source_name": f"IRC / ERISA {feature} ({era}) {i}", "content": _sentences(rng, 1500)}}
+        for i in range(3)
+    ]
+
+
+def official_links(feature: str, rng: random.Random) -> list[dict]:
+    return [
+        {"title": f"IRS guidance on {feature} {i}", "url": f"https://www.irs.gov/{feature}-{i}",
+         "snippet": _sentences(rng, 300)}
+        for i in range(3)
+    ]
+
+
+def _responder(text: str) -> str:
+    if "Task: DETERMINATION" in text or ("exact JSON format" in text and "Task: SUFFICIENCY" not in text):
+        return json.dumps({"status": "compliant", "regulation": "IRC 410(a)", "notes": "Within statutory limits."})
+    return "insufficient"
+
+
+def audit(plans: int, eras: int, web_share: float, seed: int) -> list:
+    """evaluate_kb and determine_compliance for every feature of every plan; the run's spans"""
+    rng = random.Random(seed)
+    with trace_run() as trace:
+        for plan in range(plans):
+            era = plan % eras
+            for feature in FEATURE_QUERIES:
+                state = {
+                    "current_feature": feature,
+                    "current_feature_value": rng.choice(_PLAN_VALUES[feature]),
+                    "kb_hits": regulations(feature, era),
+                    "web_links": [],
+                }
+                evaluate_kb(state)
+                if rng.random() < web_share:
+                    state["web_links"] = official_links(feature, rng)
+                determine_compliance(state)
+    return trace.spans
+
+
+def _totals(rows: list[dict]) -> dict:
+    input_tokens = sum(r["input_tokens"] for r in rows)
+    cached = sum(r["cached_tokens"] for r in rows)
+    cost, uncached_cost = sum(r["cost_usd"] for r in rows), sum(r["cost_uncached_usd"] for r in rows)
+    return {
+        "input_tokens": input_tokens,
+        "cached_tokens": cached,
+        "cached_share": round(cached / input_tokens, 3) if input_tokens else 0.0,
+        "cost_usd": round(cost, 6),
+        "cost_uncached_usd": round(uncached_cost, 6),
+        "cost_saved_share": round(1 - cost / uncached_cost, 3) if uncached_cost else 0.0,
+    }
+
+
+def run_layout(version: int, args) -> dict:
+    """One audit pass with evaluate_kb / determine_compliance pinned to a prompt version"""
+    os.environ["PROMPT_VERSIONS"] = ",".join(f"{node}={version}" for node in NODES)
+    if not args.live:
+        llm.set_llm(llm.FakeLLM(_responder, prompt_cache=True))  # a cold cache per layout
+    rows = prompt_cache_summary(audit(args.plans, args.eras, args.web_share, args.seed))
+    if not args.live:
+        # a FakeLLM's wall time says nothing about a provider's cached-prefix latency
+        rows = [{k: v for k, v in row.items() if not k.startswith("wall_ms")} for row in rows]
+    return {"rows": rows, "total": _totals(rows)}
+
+
+def sufficiency_decisions(path: str) -> dict[tuple[str, int], bool]:
+    """Recorded evaluate_kb verdicts, keyed by (feature, nth check of it)"""
+    decisions, seen = {}, Counter()
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            entry = json.loads(line)
+            payload = entry.get("payload") or {}
+            if entry.get("kind") != "llm" or payload.get("node") != "evaluate_kb":
+                continue
+            match = _FEATURE_LINE.search(payload.get("prompt", ""))
+            feature = match.group(1).strip() if match else "?"
+            decisions[(feature, seen[feature])] = is_sufficient((entry.get("response") or {}).get("content", ""))
+            seen[feature] += 1
+    return decisions
+
+
+def compare_cassettes(before: str, after: str) -> dict:
+    """Sufficiency decisions of two recordings of the same audits, side by side"""
+    a, b = sufficiency_decisions(before), sufficiency_decisions(after)
+    paired = sorted(set(a) & set(b))
+    mismatches = [{"feature": feature, "check": n, "before": a[(feature, n)], "after": b[(feature, n)]}
+                  for feature, n in paired if a[(feature, n)] != b[(feature, n)]]
+    return {
+        "benchmark": "prompt_cache",
+        "compared": len(paired),
+        "agree": len(paired) - len(mismatches),
+        "unpaired": len(set(a) ^ set(b)),
+        "mismatches": mismatches,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark provider prompt caching per prompt layout")
+    parser.add_argument("--plans", type=int, default=20)
+    parser.add_argument("--eras", type=int, default=2, help="Distinct regulation sets across the plans")
+    parser.add_argument("--web-share", type=float, default=0.5, help="Share of features with web evidence")
+    parser.add_argument("--seed", type=int, default=11)
+    parser.add_argument("--live", action="store_true", help="Call the model instead of a FakeLLM")
+    parser.add_argument("--traces", nargs="+", help="Aggregate exported trace files instead")
+    parser.add_argument("--compare-cassettes", nargs=2, metavar=("BEFORE", "AFTER"),
+                        help="Compare sufficiency decisions of two recorded cassettes instead")
+    args = parser.parse_args(argv)
+
+    if args.compare_cassettes:
+        report = compare_cassettes(*args.compare_cassettes)
+        print(json.dumps(report, indent=2))
+        sys.exit(1 if report["mismatches"] else 0)
+
+    if args.traces:
+        rows = prompt_cache_summary(load_spans(args.traces))
+        print(json.dumps({"benchmark": "prompt_cache", "traces": len(args.traces), "rows": rows,
+                          "total": _totals(rows)}, indent=2))
+        return
+
+    pinned = os.environ.pop("PROMPT_VERSIONS", None)
+    latest = max(get_prompt(node).version for node in NODES)
+    try:
+        report = {
+            "benchmark": "prompt_cache",
+            "mode": "live" if args.live else "offline",
+            "model": llm.MODEL_NAME,
+            "plans": args.plans,
+            "features": args.plans * len(FEATURE_QUERIES),
+            "layouts": {"v1": run_layout(1, args), f"v{latest}": run_layout(latest, args)},
+        }
+    finally:
+        llm.set_llm(None)
+        os.environ.pop("PROMPT_VERSIONS", None)
+        if pinned is not None:
+            os.environ["PROMPT_VERSIONS"] = pinned
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
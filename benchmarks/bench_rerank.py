@@ -0,0 +1,129 @@
+"""
+Rerank cost vs. LLM tokens saved
+
+For each query, compares sending all retrieved candidates to the LLM
+against reranking them locally and sending only the top few. Reports
+cold (uncached) and warm (cached) rerank latency next to the input
+tokens and estimated dollars saved per LLM call.
+
+Usage:
+    python -m benchmarks.bench_rerank                       # synthetic candidates
+    python -m benchmarks.bench_rerank --kb --candidates 20  # candidates from the configured KB
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from tools import format_hits, retrieve
+from tools import reranker
+from tools.tokens import count_tokens
+
+QUERIES = [
+    "401k plan maximum age requirement eligibility ERISA",
+    "401k vesting schedule requirements cliff graded maximum years ERISA",
+    "401k employer matching contribution requirements safe harbor",
+    "401k automatic enrollment requirements SECURE 2.0 2025",
+    "401k catch-up contribution limits age 50 SECURE 2.0",
+    "IRC 411(a)(2) vesting",
+    "§ 414(v) catch-up contributions",
+]
+
+_VOCAB = (
+    "plan participant employer employee contribution vesting eligibility service year age "
+    "deferral match safe harbor automatic enrollment escalation catch-up limit section code "
+    "regulation distribution hardship loan nondiscrimination testing compensation highly "
+    "compensated notice amendment effective date plan year elective arrangement"
+).split()
+
+
+def synthetic_candidates(query: str, n: int, words_per_chunk: int, rng: random.Random) -> list[dict]:
+    """Regulation-sized chunks; a few mention the query terms"""
+    hits = []
+    for i in range(n):
+        words = [rng.choice(_VOCAB) for _ in range(words_per_chunk)]
+        if i % 4 == 0:
+            words[: len(query.split())] = query.split()
+        text = " ".join(words)
+        sentences = [text[j:j + 120].strip().capitalize() + "." for j in range(0, len(text), 120)]
+        hits.append({
+            "id": f"synthetic-{i}",
+            "score": 1.0 - i / n,
+            "metadata": {"source_name": f"Synthetic Reg {i}", "content": " ".join(sentences)},
+        })
+    return hits
+
+
+def _timed(fn):
+    started = time.perf_counter()
+    result = fn()
+    return result, (time.perf_counter() - started) * 1000
+
+
+def run(candidates: int, top_n: int, use_kb: bool, price_per_mtok: float, seed: int) -> dict:
+    rng = random.Random(seed)
+
+    # fresh cache file so the first pass is genuinely cold
+    with tempfile.TemporaryDirectory() as tmp:
+        reranker._cache = reranker.RerankCache(os.path.join(tmp, "rerank.sqlite"))
+        reranker._get_cross_encoder()  # model load is a one-off, keep it out of the timings
+
+        rows = []
+        for query in QUERIES:
+            if use_kb:
+                hits = retrieve(query, top_k=candidates)
+            else:
+                hits = synthetic_candidates(query, candidates, 220, rng)
+
+            top, cold_ms = _timed(lambda: reranker.rerank(query, hits, top_n))
+            _, warm_ms = _timed(lambda: reranker.rerank(query, hits, top_n))
+
+            all_tokens = count_tokens(format_hits(hits))
+            top_tokens = count_tokens(format_hits(top))
+            rows.append({
+                "query": query,
+                "candidates": len(hits),
+                "rerank_cold_ms": round(cold_ms, 2),
+                "rerank_warm_ms": round(warm_ms, 2),
+                "tokens_all_candidates": all_tokens,
+                "tokens_reranked": top_tokens,
+                "tokens_saved": all_tokens - top_tokens,
+            })
+
+        reranker._cache = None
+
+    saved = [r["tokens_saved"] for r in rows]
+    return {
+        "benchmark": "rerank",
+        "model": reranker.RERANK_MODEL_NAME,
+        "top_n": top_n,
+        "queries": rows,
+        "summary": {
+            "rerank_cold_ms_p50": statistics.median(r["rerank_cold_ms"] for r in rows),
+            "rerank_warm_ms_p50": statistics.median(r["rerank_warm_ms"] for r in rows),
+            "tokens_saved_per_call_mean": round(statistics.mean(saved), 1),
+            # evaluate_kb and determine_compliance both consume the KB evidence
+            "usd_saved_per_feature": round(2 * statistics.mean(saved) * price_per_mtok / 1_000_000, 6),
+        },
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark cross-encoder rerank cost vs tokens saved")
+    parser.add_argument("--candidates", type=int, default=reranker.RERANK_CANDIDATES)
+    parser.add_argument("--top-n", type=int, default=3)
+    parser.add_argument("--kb", action="store_true", help="Use the configured KB instead of synthetic chunks")
+    parser.add_argument("--price-per-mtok", type=float, default=0.05, help="LLM input price, USD per 1M tokens")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args(argv)
+
+    result = run(args.candidates, args.top_n, args.kb, args.price_per_mtok, args.seed)
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+Load test for the headless audit service
+
+Starts the service in-process on a free port, backed by a synthetic
+replay cassette (no OpenAI, Pinecone or DuckDuckGo calls), then drives
+it over HTTP: concurrent clients submit PDFs, poll until their run is
+done and fetch the JSON report. Documents repeat across submissions, so
+the numbers include single-flight coalescing and stored-result hits.
+
+Usage:
+    python -m benchmarks.bench_service
+    python -m benchmarks.bench_service --submissions 200 --unique 20 --clients 16 --workers 4 --latency 0.05
+"""
+
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from .suite import synthetic_cassette, synthetic_pdf
+
+
+def _percentile(values: list[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def _request(method: str, url: str, body: bytes = None):
+    request = urllib.request.Request(url, data=body, method=method,
+                                     headers={"Content-Type": "application/pdf"} if body else {})
+    try:
+        with urllib.request.urlopen(request, timeout=120) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read() or b"{}")
+
+
+def client(base: str, pdf_bytes: bytes, name: str, poll_s: float, report_mode: str) -> dict:
+    """One submission through to its report; timings in ms"""
+    started = time.perf_counter()
+    status, body = _request("POST", f"{base}/runs?name={name}&report_mode={report_mode}", pdf_bytes)
+    submitted = time.perf_counter()
+    if status == 503:
+        return {"outcome": "rejected", "submit_ms": (submitted - started) * 1000}
+    if status >= 400:
+        return {"outcome": "error", "error": body.get("error"), "submit_ms": (submitted - started) * 1000}
+
+    run_id = body["run_id"]
+    outcome = "cached" if body.get("cached") else "coalesced" if body.get("coalesced") else "started"
+    polls = 0
+    while body["status"] not in ("done", "failed", "cancelled"):
+        time.sleep(poll_s)
+        _, body = _request("GET", f"{base}/runs/{run_id}")
+        polls += 1
+
+    status, report = _request("GET", f"{base}/runs/{run_id}/report.json")
+    return {
+        "outcome": outcome if status == 200 else "error",
+        "error": report.get("error") if status != 200 else None,
+        "submit_ms": (submitted - started) * 1000,
+        "total_ms": (time.perf_counter() - started) * 1000,
+        "polls": polls,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test the audit service against offline fakes")
+    parser.add_argument("--submissions", type=int, default=60)
+    parser.add_argument("--unique", type=int, default=10, help="Distinct documents among the submissions")
+    parser.add_argument("--clients", type=int, default=8, help="Concurrent HTTP clients")
+    parser.add_argument("--workers", type=int, default=4, help="Service worker pool size")
+    parser.add_argument("--max-queue", type=int, default=50)
+    parser.add_argument("--features", type=int, default=3, help="Features per synthetic plan")
+    parser.add_argument("--pages", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.02, help="Seconds per replayed LLM/KB/web call")
+    parser.add_argument("--poll", type=float, default=0.05, help="Client poll interval (s)")
+    parser.add_argument("--report-mode", choices=["llm", "template"], default="llm")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cassette = os.path.join(tmp, "service.jsonl")
+        synthetic_cassette(cassette, args.features)
+        # the env cassette is the one audit worker threads see
+        os.environ.update({
+            "CASSETTE_PATH": cassette,
+            "CASSETTE_MODE": "replay",
+            "CASSETTE_LATENCY": str(args.latency),
+            "TRACE_DIR": os.path.join(tmp, "traces"),
+            "HISTORY_DB": os.path.join(tmp, "history.sqlite"),
+        })
+        from service import AuditService, ResultStore, make_server
+
+        service = AuditService(args.workers, args.max_queue, store=ResultStore(os.path.join(tmp, "results")))
+        server = make_server(service, port=0)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base = f"http://127.0.0.1:{server.server_address[1]}"
+
+        documents = [synthetic_pdf(args.pages, seed=i + 1) for i in range(args.unique)]
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.clients) as pool:
+            def submission(i: int) -> dict:
+                doc = i % args.unique
+                return client(base, documents[doc], f"plan-{doc}.pdf", args.poll, args.report_mode)
+
+            results = list(pool.map(submission, range(args.submissions)))
+        elapsed = time.perf_counter() - started
+
+        list_started = time.perf_counter()
+        _request("GET", f"{base}/runs?limit=100")
+        list_ms = (time.perf_counter() - list_started) * 1000
+        server.shutdown()
+
+    completed = [r for r in results if "total_ms" in r]
+    outcomes = {k: sum(1 for r in results if r["outcome"] == k)
+                for k in ("started", "coalesced", "cached", "rejected", "error")}
+    print(json.dumps({
+        "benchmark": "service",
+        "submissions": args.submissions,
+        "unique_documents": args.unique,
+        "clients": args.clients,
+        "workers": args.workers,
+        "outcomes": outcomes,
+        "audits_run": service.counters["started"],
+        "submit_ms_p50": round(_percentile([r["submit_ms"] for r in results], 50), 1),
+        "submit_ms_p95": round(_percentile([r["submit_ms"] for r in results], 95), 1),
+        "end_to_end_ms_p50": round(_percentile([r["total_ms"] for r in completed], 50), 1),
+        "end_to_end_ms_p95": round(_percentile([r["total_ms"] for r in completed], 95), 1),
+        "end_to_end_ms_mean": round(statistics.mean([r["total_ms"] for r in completed]), 1) if completed else 0.0,
+        "submissions_per_min": round(len(completed) / elapsed * 60, 1),
+        "list_runs_ms": round(list_ms, 1),
+        "errors": [r["error"] for r in results if r["outcome"] == "error"][:5],
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
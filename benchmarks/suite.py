@@ -0,0 +1,418 @@
+"""
+Offline benchmark suite with regression gates
+
+Covers PDF extraction across page counts, embedding throughput, KB query
+latency, full-graph latency per feature count, report rendering and peak
+memory. The graph runs against a synthetic cassette (tools/cassette.py),
+so no OpenAI, Pinecone or DuckDuckGo calls are made. Embedding uses the
+real model when it can be loaded, or a hashing embedder with --fake-embedder.
+
+Usage:
+    python -m benchmarks.suite run --save baseline
+    python -m benchmarks.suite run --save current --repeats 20
+    python -m benchmarks.suite compare baseline current --threshold 0.15
+
+compare exits with status 1 when any case's p50 or p95 regressed by more
+than the threshold (and by more than --min-delta-ms, to ignore noise on
+sub-millisecond cases).
+"""
+
+import argparse
+import gc
+import hashlib
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from io import BytesIO
+
+import numpy as np
+from reportlab.lib.pagesizes import LETTER
+from reportlab.pdfgen import canvas
+
+BASELINE_DIR = os.path.join(os.path.dirname(__file__), "baselines")
+
+_WORDS = (
+    "plan participant employer employee contribution vesting eligibility service year age "
+    "deferral match safe harbor automatic enrollment escalation catch-up limit section code "
+    "regulation distribution hardship loan nondiscrimination testing compensation highly "
+    "compensated notice amendment effective date plan year elective arrangement"
+).split()
+
+_FEATURE_BLOCKS = [
+    ("eligibility", "age_requirement", 21),
+    ("eligibility", "service_requirement", "1 year"),
+    ("vesting", "type", "graded"),
+    ("contributions", "employer_match_formula", "100% of first 3%"),
+    ("auto_enrollment", "enabled", True),
+    ("contributions", "catch_up_allowed", True),
+]
+
+
+def _text(n_words: int, seed: int) -> str:
+    return " ".join(_WORDS[(seed * 7 + i * 13) % len(_WORDS)] for i in range(n_words))
+
+
+def _percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def measure(fn, repeats: int, warmup: int = 1) -> dict:
+    """p50/p95 wall time over repeats, then one traced call for peak memory"""
+    for _ in range(warmup):
+        fn()
+
+    times = []
+    for _ in range(repeats):
+        gc.collect()
+        started = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - started) * 1000)
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "repeats": repeats,
+        "p50_ms": round(statistics.median(times), 3),
+        "p95_ms": round(_percentile(times, 95), 3),
+        "mean_ms": round(statistics.mean(times), 3),
+        "peak_kb": round(peak / 1024, 1),
+    }
+
+
+class HashEmbedder:
+    """Deterministic bag-of-words vectors; stands in for SentenceTransformer offline"""
+
+    def __init__(self, dim: int = 768):
+        self.dim = dim
+
+    def encode(self, texts, batch_size: int = 32, **kwargs):
+        single = isinstance(texts, str)
+        rows = np.zeros((1 if single else len(texts), self.dim), dtype=np.float32)
+        for row, text in zip(rows, [texts] if single else texts):
+            for word in text.lower().split():
+                row[int(hashlib.md5(word.encode()).hexdigest()[:8], 16) % self.dim] += 1.0
+        return rows[0] if single else rows
+
+
+def _embedder(fake: bool):
+    if fake:
+        return HashEmbedder(), "hash"
+    from tools import pinecone_search
+    return pinecone_search._get_embedding_model(), pinecone_search.EMBEDDING_MODEL_NAME
+
+
+# ============================================================
+# Cases
+# ============================================================
+
+def synthetic_pdf(pages: int, seed: int = 0) -> bytes:
+    """A text PDF of the given length; different seeds give different documents"""
+    buffer = BytesIO()
+    c = canvas.Canvas(buffer, pagesize=LETTER)
+    if seed:
+        c.drawString(50, 760, f"Plan document {seed}")
+    for page in range(pages):
+        for line in range(45):
+            c.drawString(50, 740 - line * 15, _text(14, page * 45 + line))
+        c.showPage()
+    c.save()
+    return buffer.getvalue()
+
+
+def bench_pdf_extraction(repeats: int, page_counts=(1, 20, 100)) -> dict:
+    from tools import extract_text_from_pdf
+
+    results = {}
+    for pages in page_counts:
+        pdf_bytes = synthetic_pdf(pages)
+        results[f"pdf_extract[pages={pages}]"] = measure(lambda: extract_text_from_pdf(pdf_bytes), repeats)
+    return results
+
+
+def bench_embedding(repeats: int, fake: bool, batch: int = 64) -> dict:
+    model, name = _embedder(fake)
+    chunks = [_text(220, i) for i in range(batch)]
+    result = measure(lambda: model.encode(chunks, batch_size=32), repeats)
+    result["chunks_per_s"] = round(batch / (result["p50_ms"] / 1000), 1)
+    result["model"] = name
+    return {f"embed[batch={batch}]": result}
+
+
+def bench_kb_query(repeats: int, fake: bool, docs: int = 2000) -> dict:
+    from tools import pinecone_search, retrieve
+    from tools.kb_filters import build_filter
+    from tools.lexical_index import LexicalIndex
+    from tools.local_index import LocalIndex
+
+    model, _ = _embedder(fake)
+    queries = [
+        "401k vesting schedule requirements cliff graded maximum years ERISA",
+        "IRC 411(a)(2) vesting",
+        "401k automatic enrollment requirements SECURE 2.0 2025",
+    ]
+    saved = (pinecone_search._index, pinecone_search._embedding_model, pinecone_search._lexical_index)
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        index = LocalIndex(os.path.join(tmp, "vectors"))
+        lexical = LexicalIndex(os.path.join(tmp, "lexical"))
+        texts = [_text(200, i) + f" section {400 + i % 30}(a)({i % 5})" for i in range(docs)]
+        vectors = model.encode(texts, batch_size=64)
+        records = []
+        for i, (text, vector) in enumerate(zip(texts, vectors)):
+            metadata = {
+                "content": text,
+                "source_name": f"Reg {i}",
+                "features": [["vesting", "eligibility", "match", "auto_enrollment", "catch_up"][i % 5]],
+                "effective_from": 20000101,
+                "effective_to": 99991231,
+            }
+            records.append({"id": f"doc-{i}", "values": vector.tolist(), "metadata": metadata})
+            lexical.add(f"doc-{i}", text, metadata)
+        index.upsert(vectors=records)
+        lexical.save()
+        results[f"kb_lexical_open[docs={docs}]"] = measure(
+            lambda: LexicalIndex(lexical.path).close(), repeats)
+
+        try:
+            pinecone_search._index, pinecone_search._embedding_model = index, model
+            pinecone_search._lexical_index = None
+            results[f"kb_query_vector[docs={docs}]"] = measure(
+                lambda: [retrieve(q, top_k=5) for q in queries], repeats)
+
+            pinecone_search._lexical_index = lexical
+            results[f"kb_query_hybrid[docs={docs}]"] = measure(
+                lambda: [retrieve(q, top_k=5) for q in queries], repeats)
+
+            where = build_filter("vesting", "2024-01-01")
+            results[f"kb_query_hybrid_filtered[docs={docs}]"] = measure(
+                lambda: [retrieve(q, top_k=5, filter=where) for q in queries], repeats)
+        finally:
+            lexical.close()
+            pinecone_search._index, pinecone_search._embedding_model, pinecone_search._lexical_index = saved
+
+    return results
+
+
+def synthetic_cassette(path: str, n_features: int):
+    """
+    Write a replay cassette that drives the graph through n_features
+    features, each taking the KB -> web -> adjudication path
+    """
+    from tools.cassette import Cassette
+
+    extracted = {"plan_name": "Benchmark 401(k) Plan", "effective_date": "January 1, 2024"}
+    for section, field, value in _FEATURE_BLOCKS[:n_features]:
+        extracted.setdefault(section, {})[field] = value
+
+    hits = [
+        {"id": f"reg-{i}#0", "score": 1.0 - i / 10,
+         "metadata": {"source_name": f"Regulation {i}", "content": _text(180, i) + "."}}
+        for i in range(5)
+    ]
+    links = [
+        {"title": f"IRS guidance {i}", "url": f"https://www.irs.gov/guidance-{i}", "snippet": _text(40, i)}
+        for i in range(3)
+    ]
+    finding = {"status": "compliant", "regulation": "IRC 411(a)", "notes": "Within statutory limits."}
+
+    entries = [
+        ("llm", {"node": "extract_features"}, json.dumps(extracted)),
+        ("llm", {"node": "evaluate_kb"}, "insufficient"),
+        ("llm", {"node": "determine_compliance"}, json.dumps(finding)),
+        ("llm", {"node": "generate_report"}, "Executive summary: " + _text(200, 1)),
+        ("kb", {}, hits),
+        ("web", {}, links),
+    ]
+    with open(path, "w", encoding="utf-8") as f:
+        for kind, payload, response in entries:
+            if kind == "llm":
+                response = {"content": response, "usage_metadata": {
+                    "input_tokens": 800, "output_tokens": 120, "total_tokens": 920}}
+            f.write(json.dumps({
+                "kind": kind,
+                "key": Cassette.key(kind, payload),
+                "bucket": Cassette.bucket(kind, payload),
+                "payload": payload,
+                "response": response,
+                "duration_ms": 0,
+            }) + "\n")
+
+
+def bench_graph(repeats: int, latency: float, feature_counts=(1, 3, 6)) -> dict:
+    from agents import compliance_graph, initial_state
+    from tools.cassette import use_cassette
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in feature_counts:
+            path = os.path.join(tmp, f"graph-{n}.jsonl")
+            synthetic_cassette(path, n)
+
+            def run():
+                with use_cassette(path, latency=latency):
+                    compliance_graph.invoke(initial_state(_text(3000, n)), config={"recursion_limit": 300})
+
+            results[f"graph[features={n}]"] = measure(run, repeats)
+    return results
+
+
+def _findings(n: int) -> list[dict]:
+    statuses = ["compliant", "gap", "needs_review"]
+    return [
+        {
+            "feature": f"feature_{i}",
+            "plan_value": _text(8, i),
+            "regulation": _text(40, i),
+            "source": "Knowledge Base",
+            "status": statuses[i % 3],
+            "notes": _text(60, i + 1),
+            "links": [{"title": f"Source {i}", "url": f"https://www.irs.gov/{i}", "snippet": ""}],
+        }
+        for i in range(n)
+    ]
+
+
+def bench_report(repeats: int, finding_counts=(6, 60, 600)) -> dict:
+    from tools.report import compile_report, markdown_to_simple_pdf_bytes, report_to_markdown
+
+    results = {}
+    for n in finding_counts:
+        report = compile_report("Benchmark 401(k) Plan", "medium", _findings(n))
+        markdown = report_to_markdown(report)
+        results[f"report_markdown[findings={n}]"] = measure(lambda: report_to_markdown(report), repeats)
+        results[f"report_pdf[findings={n}]"] = measure(
+            lambda: markdown_to_simple_pdf_bytes("Compliance Audit Report", markdown), repeats)
+    return results
+
+
+# ============================================================
+# Run / compare
+# ============================================================
+
+def run_suite(repeats: int, fake_embedder: bool, graph_latency: float, only: list[str] = None) -> dict:
+    benches = {
+        "pdf": lambda: bench_pdf_extraction(repeats),
+        "embed": lambda: bench_embedding(repeats, fake_embedder),
+        "kb": lambda: bench_kb_query(repeats, fake_embedder),
+        "graph": lambda: bench_graph(repeats, graph_latency),
+        "report": lambda: bench_report(repeats),
+    }
+
+    cases = {}
+    for name, bench in benches.items():
+        if only and name not in only:
+            continue
+        try:
+            cases.update(bench())
+        except ImportError as e:
+            # e.g. sentence-transformers not installed; rerun with --fake-embedder
+            cases[name] = {"skipped": f"{type(e).__name__}: {e}"}
+
+    return {
+        "meta": {
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "repeats": repeats,
+            "fake_embedder": fake_embedder,
+            "graph_latency_s": graph_latency,
+        },
+        "cases": cases,
+    }
+
+
+def _baseline_path(name: str) -> str:
+    if name.endswith(".json") or os.sep in name:
+        return name
+    return os.path.join(BASELINE_DIR, f"{name}.json")
+
+
+def compare(baseline: dict, current: dict, threshold: float, min_delta_ms: float) -> list[dict]:
+    """One row per case and metric present in both runs; regressed=True past the gate"""
+    rows = []
+    for case, base in baseline["cases"].items():
+        now = current["cases"].get(case)
+        if now is None or "skipped" in base or "skipped" in now:
+            continue
+        for metric in ("p50_ms", "p95_ms"):
+            before, after = base[metric], now[metric]
+            change = (after - before) / before if before else 0.0
+            rows.append({
+                "case": case,
+                "metric": metric,
+                "baseline": before,
+                "current": after,
+                "change": round(change, 3),
+                "regressed": change > threshold and after - before > min_delta_ms,
+            })
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline benchmark suite with regression gates")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run = sub.add_parser("run", help="Run the suite and store a JSON baseline")
+    run.add_argument("--save", default="current", help="Baseline name (benchmarks/baselines/<name>.json) or path")
+    run.add_argument("--repeats", type=int, default=10)
+    run.add_argument("--fake-embedder", action="store_true", help="Use a hashing embedder instead of the real model")
+    run.add_argument("--graph-latency", type=float, default=0.0, help="Synthetic seconds per LLM/KB/web call")
+    run.add_argument("--only", nargs="*", choices=["pdf", "embed", "kb", "graph", "report"])
+
+    cmp = sub.add_parser("compare", help="Fail if p50/p95 regressed past the threshold")
+    cmp.add_argument("baseline")
+    cmp.add_argument("current")
+    cmp.add_argument("--threshold", type=float, default=0.15, help="Allowed fractional slowdown")
+    cmp.add_argument("--min-delta-ms", type=float, default=0.5)
+
+    args = parser.parse_args(argv)
+
+    if args.command == "run":
+        result = run_suite(args.repeats, args.fake_embedder, args.graph_latency, args.only)
+        path = _baseline_path(args.save)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+        for case, stats in result["cases"].items():
+            if "skipped" in stats:
+                print(f"{case:45} skipped ({stats['skipped']})")
+            else:
+                print(f"{case:45} p50 {stats['p50_ms']:>10.2f} ms  p95 {stats['p95_ms']:>10.2f} ms  peak {stats['peak_kb']:>9.1f} KB")
+        print(f"Saved {path}")
+        return 0
+
+    with open(_baseline_path(args.baseline), encoding="utf-8") as f:
+        baseline = json.load(f)
+    with open(_baseline_path(args.current), encoding="utf-8") as f:
+        current = json.load(f)
+
+    rows = compare(baseline, current, args.threshold, args.min_delta_ms)
+    for r in rows:
+        flag = "REGRESSED" if r["regressed"] else "ok"
+        print(f"{r['case']:45} {r['metric']:6} {r['baseline']:>10.2f} -> {r['current']:>10.2f} ms  {r['change']:+7.1%}  {flag}")
+
+    regressions = [r for r in rows if r["regressed"]]
+    if regressions:
+        print(f"{len(regressions)} regression(s) past {args.threshold:.0%}")
+        return 1
+    print("No regressions")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
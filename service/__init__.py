@@ -0,0 +1,4 @@
+from .server import AuditService, make_server
+from .store import ResultStore
+
+__all__ = ["AuditService", "make_server", "ResultStore"]
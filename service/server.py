@@ -0,0 +1,296 @@
+"""
+Headless audit service - submit PDFs, poll runs, fetch reports over HTTP
+
+    POST /runs                      body: the PDF bytes -> 202 {"run_id", ...}
+         ?name=plan.pdf&report_mode=llm|template&deadline=120&force=1
+    GET  /runs?limit=50             newest first, live and stored runs
+    GET  /runs/<id>                 status and progress
+    GET  /runs/<id>/report.json     (also .md and .pdf) once the run is done
+    GET  /healthz
+
+Jobs run on a bounded worker pool (SERVICE_WORKERS) at batch LLM priority,
+so the Streamlit UI on the same governor is served first. A submission is
+turned away with 503 when SERVICE_MAX_QUEUE runs are already waiting.
+Resubmitting a document (same SHA-256) that is still running joins that
+run (single-flight); if it already finished, the stored result is returned
+unless force=1.
+
+Usage:
+    python -m service --port 8080
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import threading
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+from urllib.parse import parse_qs, urlparse
+
+from agents.governor import BATCH, INTERACTIVE
+from agents.runner import DONE, AuditRun, RunRegistry
+from tools import extract_text_from_pdf
+from tools.report import compile_report, render_report
+from tools.tracing import Trace, trace_run
+from .store import ResultStore, result_from_run, summary
+
+MAX_UPLOAD_BYTES = int(os.getenv("SERVICE_MAX_UPLOAD_MB", "25")) * 1024 * 1024
+REPORT_MODES = ("llm", "template")
+
+
+class ServiceError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class AuditService:
+    """Run registry + result store + single-flight by document hash"""
+
+    def __init__(self, workers: int = 2, max_queue: int = 20, store: ResultStore = None,
+                 priority: str = BATCH):
+        self.max_queue = max_queue
+        self.priority = priority
+        self.store = store or ResultStore()
+        self.registry = RunRegistry(workers=workers, on_finished=self._finished)
+        self._lock = threading.Lock()
+        self._inflight: dict[str, AuditRun] = {}  # doc key -> running audit
+        self._doc_hash: dict[str, str] = {}       # run id -> document hash
+        self.counters = {"submitted": 0, "started": 0, "coalesced": 0, "cached": 0, "rejected": 0}
+
+    def submit(self, pdf_bytes: bytes, name: str, report_mode: str = "llm",
+               deadline_s: float = None, force: bool = False) -> dict:
+        if report_mode not in REPORT_MODES:
+            raise ServiceError(400, f"report_mode must be one of {', '.join(REPORT_MODES)}")
+        if not pdf_bytes.startswith(b"%PDF"):
+            raise ServiceError(400, "request body is not a PDF")
+
+        doc_hash = hashlib.sha256(pdf_bytes).hexdigest()
+        key = f"{doc_hash}:{report_mode}"
+
+        with self._lock:
+            self.counters["submitted"] += 1
+            early = self._existing(key, doc_hash, report_mode, force)
+        if early is not None:
+            return early
+
+        # parse outside the lock; a duplicate racing us may parse too, but only one audit starts
+        trace = Trace()
+        try:
+            with trace_run(trace=trace):
+                pdf_text = extract_text_from_pdf(pdf_bytes)
+        except Exception as e:
+            raise ServiceError(400, f"could not read PDF: {e}") from None
+
+        with self._lock:
+            early = self._existing(key, doc_hash, report_mode, force)
+            if early is not None:
+                return early
+            if self.registry.queued() >= self.max_queue:
+                self.counters["rejected"] += 1
+                raise ServiceError(503, "audit queue is full, retry later")
+
+            run = self.registry.start(pdf_text, name, priority=self.priority, trace=trace,
+                                      deadline_s=deadline_s, report_mode=report_mode)
+            self._inflight[key] = run
+            self._doc_hash[run.run_id] = doc_hash
+            self.counters["started"] += 1
+            return self._status(run)
+
+    def _existing(self, key: str, doc_hash: str, report_mode: str, force: bool) -> Optional[dict]:
+        """The in-flight run or stored result that answers this submission; caller holds the lock"""
+        run = self._inflight.get(key)
+        if run is not None:
+            self.counters["coalesced"] += 1
+            return self._status(run, coalesced=True)
+
+        stored = None if force else self.store.find(doc_hash, report_mode)
+        if stored is not None:
+            self.counters["cached"] += 1
+            return {**summary(self.store.get(stored)), "cached": True}
+        return None
+
+    def _finished(self, run: AuditRun):
+        """Worker callback: persist the result, then release the single-flight slot"""
+        with self._lock:  # submit() records the hash under this lock, after starting the run
+            doc_hash = self._doc_hash.get(run.run_id, "")
+        try:
+            self.store.save(result_from_run(run, doc_hash))
+        finally:
+            with self._lock:
+                self._inflight.pop(f"{doc_hash}:{run.report_mode}", None)
+                self._doc_hash.pop(run.run_id, None)
+
+    def _status(self, run: AuditRun, **extra) -> dict:
+        return {
+            "run_id": run.run_id,
+            "doc_hash": self._doc_hash.get(run.run_id),
+            "plan_name": run.plan_name,
+            "status": run.status,
+            "report_mode": run.report_mode,
+            "progress": dict(run.progress),
+            "error": run.error,
+            "stopped": run.stopped,
+            "created_at": run.created_at,
+            "finished_at": run.finished_at,
+            **extra,
+        }
+
+    def status(self, run_id: str) -> dict:
+        run = self.registry.get(run_id)
+        if run is not None and not run.finished:
+            return self._status(run)
+        result = self.store.get(run_id)
+        if result is None:
+            if run is not None:
+                return self._status(run)  # finished, result still being written
+            raise ServiceError(404, f"unknown run {run_id}")
+        progress = {"features_total": len(result["findings"]), "features_done": len(result["findings"])}
+        return {**summary(result), "error": result["error"], "progress": progress}
+
+    def result(self, run_id: str) -> dict:
+        result = self.store.get(run_id)
+        if result is None:
+            run = self.registry.get(run_id)
+            if run is None:
+                raise ServiceError(404, f"unknown run {run_id}")
+            raise ServiceError(409, f"run {run_id} is {run.status}")
+        if result["status"] != DONE:
+            raise ServiceError(409, f"run {run_id} {result['status']}: {result['error'] or result['stopped']}")
+        return result
+
+    def runs(self, limit: int = 50) -> list[dict]:
+        listed = {s["run_id"]: s for s in self.store.summaries()}
+        for run in self.registry.runs():
+            if run.run_id not in listed:
+                listed[run.run_id] = summary(self._status(run))
+        return sorted(listed.values(), key=lambda s: s["created_at"] or 0, reverse=True)[:limit]
+
+    def health(self) -> dict:
+        return {"ok": True, "queued": self.registry.queued(), "inflight": len(self._inflight), **self.counters}
+
+
+def structured_report(result: dict) -> dict:
+    report = compile_report(result["plan_name"], result["risk_level"], result["findings"])
+    report["narrative"] = result["report"] if result["report_mode"] == "llm" else ""
+    report["meta"]["run_id"] = result["run_id"]
+    if result["finished_at"]:
+        report["meta"]["generated_at"] = datetime.fromtimestamp(result["finished_at"]).strftime("%Y-%m-%d %H:%M:%S")
+    report["meta"]["stopped"] = result["stopped"]
+    return report
+
+
+# ============================================================
+# HTTP
+# ============================================================
+
+RUN_PATH = re.compile(r"^/runs/([0-9a-f]+)$")
+REPORT_PATH = re.compile(r"^/runs/([0-9a-f]+)/report\.(json|md|pdf)$")
+
+
+def make_handler(service: AuditService):
+    class Handler(BaseHTTPRequestHandler):
+        server_version = "ComplianceAudit/1.0"
+
+        def log_message(self, format, *args):
+            pass  # quiet by default; put a proxy in front for access logs
+
+        def _send(self, status: int, body, content_type: str = "application/json"):
+            if content_type == "application/json":
+                body = json.dumps(body, default=str).encode("utf-8")
+            elif isinstance(body, str):
+                body = body.encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            if status == 503:
+                self.send_header("Retry-After", "5")
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _dispatch(self, route):
+            try:
+                route()
+            except ServiceError as e:
+                self._send(e.status, {"error": str(e)})
+            except ValueError as e:
+                self._send(400, {"error": f"bad parameter: {e}"})
+
+        def do_GET(self):
+            self._dispatch(self._get)
+
+        def do_POST(self):
+            self._dispatch(self._post)
+
+        def _get(self):
+            url = urlparse(self.path)
+            query = parse_qs(url.query)
+            if url.path == "/healthz":
+                return self._send(200, service.health())
+            if url.path == "/runs":
+                limit = int(query.get("limit", ["50"])[0])
+                return self._send(200, {"runs": service.runs(limit)})
+            match = RUN_PATH.match(url.path)
+            if match:
+                return self._send(200, service.status(match.group(1)))
+            match = REPORT_PATH.match(url.path)
+            if match:
+                result = service.result(match.group(1))
+                fmt = match.group(2)
+                if fmt == "json":
+                    return self._send(200, structured_report(result))
+                # rendered on the first request for this run, then served from the report cache
+                body = render_report(result["run_id"], fmt, lambda: structured_report(result))
+                return self._send(200, body, "text/markdown; charset=utf-8" if fmt == "md" else "application/pdf")
+            raise ServiceError(404, f"no route for GET {url.path}")
+
+        def _post(self):
+            url = urlparse(self.path)
+            if url.path != "/runs":
+                raise ServiceError(404, f"no route for POST {url.path}")
+            query = parse_qs(url.query)
+            length = int(self.headers.get("Content-Length") or 0)
+            if not length:
+                raise ServiceError(400, "empty body; send the PDF bytes")
+            if length > MAX_UPLOAD_BYTES:
+                raise ServiceError(413, f"PDF larger than {MAX_UPLOAD_BYTES // (1024 * 1024)} MB")
+            deadline = query.get("deadline", [None])[0]
+            response = service.submit(
+                self.rfile.read(length),
+                name=query.get("name", ["plan.pdf"])[0],
+                report_mode=query.get("report_mode", ["llm"])[0],
+                deadline_s=float(deadline) if deadline else None,
+                force=query.get("force", ["0"])[0] in ("1", "true", "yes"),
+            )
+            self._send(200 if response.get("cached") else 202, response)
+
+    return Handler
+
+
+def make_server(service: AuditService, host: str = "127.0.0.1", port: int = 8080) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer((host, port), make_handler(service))
+    server.daemon_threads = True
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless compliance audit service")
+    parser.add_argument("--host", default=os.getenv("SERVICE_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("SERVICE_PORT", "8080")))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("SERVICE_WORKERS", "2")))
+    parser.add_argument("--max-queue", type=int, default=int(os.getenv("SERVICE_MAX_QUEUE", "20")))
+    parser.add_argument("--interactive", action="store_true", help="Run audits at interactive LLM priority")
+    args = parser.parse_args(argv)
+
+    service = AuditService(args.workers, args.max_queue, priority=INTERACTIVE if args.interactive else BATCH)
+    server = make_server(service, args.host, args.port)
+    print(f"Audit service listening on http://{args.host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
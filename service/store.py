@@ -0,0 +1,95 @@
+"""
+On-disk result store for the audit service
+
+One JSON file per finished run under RESULTS_DIR (default .results/).
+A summary of every stored run is kept in memory for listing and for
+finding an earlier result for the same document.
+"""
+
+import json
+import os
+import threading
+from typing import Optional
+
+from agents.runner import DONE, AuditRun
+
+SUMMARY_FIELDS = ("run_id", "doc_hash", "plan_name", "status", "risk_level",
+                  "report_mode", "stopped", "created_at", "finished_at")
+
+
+def result_from_run(run: AuditRun, doc_hash: str) -> dict:
+    """Everything a client can fetch about a finished run"""
+    result = run.result
+    return {
+        "run_id": run.run_id,
+        "doc_hash": doc_hash,
+        "plan_name": run.plan_name,
+        "status": run.status,
+        "error": run.error,
+        "stopped": run.stopped,
+        "report_mode": run.report_mode,
+        "risk_level": result.risk_level if result.steps else None,
+        "extracted_features": result.extracted_features,
+        "plan_diff": result.plan_diff,
+        "text_normalization": result.text_normalization,
+        "findings": result.findings,
+        "report": result.report_text,
+        "created_at": run.created_at,
+        "finished_at": run.finished_at,
+        "trace_path": run.trace_path,
+    }
+
+
+def summary(result: dict) -> dict:
+    return {k: result.get(k) for k in SUMMARY_FIELDS}
+
+
+class ResultStore:
+    def __init__(self, root: str = None):
+        self.root = root or os.getenv("RESULTS_DIR", ".results")
+        os.makedirs(self.root, exist_ok=True)
+        self._lock = threading.Lock()
+        self._summaries: dict[str, dict] = {}
+        for name in os.listdir(self.root):
+            if name.endswith(".json"):
+                try:
+                    with open(os.path.join(self.root, name), encoding="utf-8") as f:
+                        result = json.load(f)
+                except (OSError, ValueError):
+                    continue  # half-written or foreign file
+                self._summaries[result["run_id"]] = summary(result)
+
+    def _path(self, run_id: str) -> str:
+        return os.path.join(self.root, f"{run_id}.json")
+
+    def save(self, result: dict):
+        # write-then-rename, so readers never see a partial file
+        tmp = self._path(result["run_id"]) + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, default=str)
+        os.replace(tmp, self._path(result["run_id"]))
+        with self._lock:
+            self._summaries[result["run_id"]] = summary(result)
+
+    def get(self, run_id: str) -> Optional[dict]:
+        with self._lock:
+            if run_id not in self._summaries:
+                return None
+        with open(self._path(run_id), encoding="utf-8") as f:
+            return json.load(f)
+
+    def find(self, doc_hash: str, report_mode: str) -> Optional[str]:
+        """Latest complete (not stopped early) run for this document and report mode"""
+        with self._lock:
+            matches = [
+                s for s in self._summaries.values()
+                if s["doc_hash"] == doc_hash and s["report_mode"] == report_mode
+                and s["status"] == DONE and not s["stopped"]
+            ]
+        if not matches:
+            return None
+        return max(matches, key=lambda s: s["finished_at"] or 0)["run_id"]
+
+    def summaries(self) -> list[dict]:
+        with self._lock:
+            return list(self._summaries.values())
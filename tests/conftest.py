@@ -0,0 +1,20 @@
+"""
+Shared fixtures: every test runs in its own working directory, so the
+caches, blob store and indexes that default to relative paths stay out
+of the checkout, and no test reaches the model or the network
+"""
+
+import pytest
+
+from agents import llm
+
+
+@pytest.fixture(autouse=True)
+def isolated(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("OFFICIAL_MIRROR", "only")
+    monkeypatch.setenv("OFFICIAL_MIRROR_DIR", str(tmp_path / "mirror"))
+    monkeypatch.delenv("PROMPT_VERSIONS", raising=False)
+    monkeypatch.delenv("CASSETTE_PATH", raising=False)
+    yield tmp_path
+    llm.set_llm(None)
@@ -0,0 +1,66 @@
+import threading
+
+import pytest
+
+from tools.blobstore import BlobMissing, BlobStore
+
+
+def test_text_is_sized_in_encoded_bytes():
+    store = BlobStore()
+    ref = store.put("§ 401(k) – ½")
+    assert ref.size == len("§ 401(k) – ½".encode("utf-8"))
+    assert store.metrics()["cached_bytes"] == ref.size
+
+
+def test_the_lru_evicts_past_max_bytes():
+    store = BlobStore(max_bytes=10)
+    first = store.put("é" * 4)  # 8 bytes
+    store.put("é" * 4 + "x")
+    assert store.metrics()["evictions"] == 1
+    with pytest.raises(BlobMissing):
+        store.get(first)
+
+
+def test_a_scope_pins_its_blobs_until_it_exits():
+    store = BlobStore(max_bytes=10)
+    with store.scope():
+        plan = store.put("plan text")
+        store.put("evidence 1")
+        store.put("evidence 2")
+        assert store.get(plan) == "plan text"
+        assert store.metrics()["evictions"] == 0
+    metrics = store.metrics()
+    assert (metrics["blobs"], metrics["cached_bytes"], metrics["pinned"], metrics["releases"]) == (0, 0, 0, 3)
+
+
+def test_a_blob_shared_by_two_runs_stays_until_both_finish():
+    store = BlobStore()
+    ref = store.put("plan text")
+    inside, finish = threading.Event(), threading.Event()
+
+    def other_run():
+        with store.scope():
+            store.get(ref)
+            inside.set()
+            finish.wait()
+
+    thread = threading.Thread(target=other_run)
+    thread.start()
+    inside.wait()
+    with store.scope():
+        store.put("plan text")
+    assert store.get(ref) == "plan text"
+
+    finish.set()
+    thread.join()
+    with pytest.raises(BlobMissing):
+        store.get(ref)
+
+
+def test_released_blobs_are_read_back_from_blob_dir(tmp_path):
+    store = BlobStore(root=str(tmp_path))
+    with store.scope():
+        ref = store.put({"hits": [1, 2, 3]})
+    assert store.metrics()["blobs"] == 0
+    assert store.get(ref) == {"hits": [1, 2, 3]}
+    assert store.stats["disk_reads"] == 1
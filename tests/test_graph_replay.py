@@ -0,0 +1,117 @@
+"""
+The full graph, driven by a cassette: record one audit against a FakeLLM
+and canned KB / web results, then replay it strictly with no model at all
+"""
+
+import json
+
+import pytest
+
+from agents import ResultAccumulator, compliance_graph, initial_state, llm
+from benchmarks.suite import _text, synthetic_cassette
+from tools import pinecone_search, web_search
+from tools.cassette import CassetteMiss, use_cassette
+
+GRAPH_CONFIG = {"recursion_limit": 300}
+
+PLAN = """ACME CORPORATION 401(K) PLAN
+
+The Plan is effective January 1, 2024.
+
+An Employee is eligible to participate upon attaining age 21 and completing one Year of Service.
+
+The Employer will make a matching contribution equal to 100% of elective deferrals up to 4% of
+Compensation.
+
+A Participant's Employer contributions vest 100% after 3 Years of Service.
+
+Participants who have attained age 50 may make catch-up contributions.
+"""
+
+HITS = [
+    {"id": f"reg-{i}#0", "score": 0.9 - i / 10,
+     "metadata": {"source_name": f"IRC 411 guidance {i}", "content": "A plan may require up to two years of "
+                  "service and age 21. Employer contributions must vest under a 3-year cliff schedule."}}
+    for i in range(3)
+]
+LINKS = [{"title": "Retirement topics - vesting", "url": "https://www.irs.gov/vesting",
+          "snippet": "Employer contributions must vest at least as fast as a 3-year cliff."}]
+
+
+def respond(text: str) -> str:
+    if "Task: SUFFICIENCY" in text:
+        # web evidence for vesting, the KB settles everything else
+        return "insufficient" if "Feature: vesting" in text else "sufficient"
+    if "Task: DETERMINATION" in text:
+        status = "gap" if "Feature: employer_match" in text else "compliant"
+        return json.dumps({"status": status, "regulation": "IRC 411(a)", "notes": "Checked against the KB."})
+    if "extracting structured data" in text:
+        # only asked for what the patterns left open
+        return json.dumps({"contributions": {"employer_match_formula": "100% of first 4%"},
+                           "vesting": {"type": "cliff", "schedule": "100% after 3 years", "years_to_full": 3}})
+    return "Executive Summary: one gap found in the employer match."
+
+
+def run(text: str) -> ResultAccumulator:
+    result = ResultAccumulator()
+    for step in compliance_graph.stream(initial_state(text), config=GRAPH_CONFIG):
+        result.add(step)
+    return result
+
+
+def _no_model(text: str) -> str:
+    raise AssertionError("a replay called the model")
+
+
+@pytest.fixture
+def recorded(tmp_path, monkeypatch):
+    """A cassette of one audit, and the result it recorded"""
+    path = str(tmp_path / "audit.jsonl")
+    with monkeypatch.context() as patch:
+        patch.setattr(pinecone_search, "_retrieve", lambda query, top_k, filter: HITS)
+        patch.setattr(web_search, "_search_official_sources", lambda query, max_results: LINKS)
+        llm.set_llm(llm.FakeLLM(respond))
+        with use_cassette(path, mode="record") as cassette:
+            result = run(PLAN)
+    assert cassette.stats["recorded"] > 0
+    return path, result
+
+
+def test_replay_matches_recording(recorded):
+    path, recorded_result = recorded
+    llm.set_llm(llm.FakeLLM(_no_model))
+
+    with use_cassette(path, latency=0, strict=True) as cassette:
+        result = run(PLAN)
+
+    assert cassette.stats["fallbacks"] == 0
+    assert cassette.stats["hits"] > 0
+    assert result.findings == recorded_result.findings
+    assert result.counts == recorded_result.counts == {"compliant": len(result.findings) - 1, "gap": 1,
+                                                      "needs_review": 0}
+    assert result.report_text == recorded_result.report_text
+    vesting = next(f for f in result.findings if f["feature"] == "vesting")
+    assert [link["url"] for link in vesting["links"]] == ["https://www.irs.gov/vesting"]
+
+
+def test_strict_replay_misses_on_a_changed_plan(recorded):
+    path, _ = recorded
+    llm.set_llm(llm.FakeLLM(_no_model))
+
+    with pytest.raises(CassetteMiss):
+        with use_cassette(path, latency=0, strict=True):
+            run(PLAN.replace("age 21", "age 18"))
+
+
+def test_synthetic_cassette_replays_every_feature(tmp_path):
+    path = str(tmp_path / "synthetic.jsonl")
+    synthetic_cassette(path, 3)
+    llm.set_llm(llm.FakeLLM(_no_model))
+
+    with use_cassette(path, latency=0) as cassette:
+        result = run(_text(3000, 3))
+
+    assert cassette.stats["hits"] == 0 and cassette.stats["fallbacks"] > 0
+    assert result.counts == {"compliant": 3, "gap": 0, "needs_review": 0}
+    assert all(f["source"] == "Web Search" for f in result.findings)
+    assert result.report_text.startswith("Executive summary:")
@@ -0,0 +1,103 @@
+import random
+
+import pytest
+
+from benchmarks.suite import HashEmbedder
+from tools import kb_ingest, pinecone_search
+from tools.lexical_index import LexicalIndex
+from tools.local_index import LocalIndex
+
+_VOCAB = ("participant employer vesting service year age deferral match safe harbor section code distribution "
+          "hardship loan contribution plan notice").split()
+
+
+def paragraphs(n: int = 120) -> list[str]:
+    rng = random.Random(n)
+    return [" ".join(rng.choice(_VOCAB) for _ in range(rng.randint(20, 90))).capitalize() + "." for _ in range(n)]
+
+
+@pytest.fixture
+def kb(isolated, monkeypatch):
+    """A local-backend KB in the test's directory, embedded with HashEmbedder"""
+    monkeypatch.setattr(pinecone_search, "_embedding_model", HashEmbedder(dim=64))
+    monkeypatch.setattr(pinecone_search, "_index", None)
+    monkeypatch.setattr(pinecone_search, "_lexical_index", None)
+    monkeypatch.setenv("KB_BACKEND", "local")
+    sources = isolated / "regulations"
+    sources.mkdir()
+
+    def ingest(texts: list[str]) -> dict:
+        (sources / "reg.txt").write_text("\n\n".join(texts), encoding="utf-8")
+        pinecone_search._index = None  # a fresh process would reopen it from disk
+        return kb_ingest.ingest(str(sources), state_dir=str(isolated / ".kb_state"), batch_size=8)
+
+    return ingest
+
+
+def test_chunk_ids_follow_content(tmp_path):
+    (tmp_path / "a.txt").write_text("\n\n".join(paragraphs()), encoding="utf-8")
+    ids = [chunk_id for chunk_id, _, _ in kb_ingest.iter_chunks(str(tmp_path), 1500, 200)]
+    assert len(ids) == len(set(ids))
+    assert all(chunk_id.startswith("a.txt#") for chunk_id in ids)
+
+    (tmp_path / "b.txt").write_text("\n\n".join(paragraphs()), encoding="utf-8")
+    same = [chunk_id.split("#")[1] for chunk_id, _, _ in kb_ingest.iter_chunks(str(tmp_path), 1500, 200)
+            if chunk_id.startswith("b.txt#")]
+    assert same == [chunk_id.split("#")[1] for chunk_id in ids]
+
+
+def test_reingest_only_embeds_what_changed(kb):
+    texts = paragraphs()
+    first = kb(texts)
+    assert first["changed"] == first["upserted"] > 10
+    assert kb(texts) == {"changed": 0, "removed": 0, "upserted": 0}
+
+    texts.insert(3, "A paragraph inserted near the top about hardship loans.")
+    second = kb(texts)
+    assert second["changed"] <= 2 and second["removed"] <= 2
+
+    assert len(LocalIndex(".kb_local")._ids) == first["upserted"] + second["changed"] - second["removed"]
+    assert len(LexicalIndex(".kb_lexical")) == len(LocalIndex(".kb_local")._ids)
+
+
+def test_an_edited_chunk_continues_its_version_history(kb, isolated):
+    texts = paragraphs()
+    kb(texts)
+    texts[60] = texts[60].replace(".", " under a three year cliff schedule.")
+    second = kb(texts)
+    assert second["changed"] == second["removed"] == 1
+
+    chunks = kb_ingest.load_manifest(str(isolated / ".kb_state"))["chunks"]
+    (new_id, edited), = [(cid, e) for cid, e in chunks.items() if e["version"] == 2]
+    old = chunks[edited["previous"]]
+    assert old["deleted"] and old["replaced_by"] == new_id
+    assert [h["version"] for h in edited["history"]] == [1, 2]
+    assert edited["history"][0]["hash"] == old["hash"]
+    assert old["history"][-1]["hash"] is None and old["history"][-1]["replaced_by"] == new_id
+
+
+def test_local_index_checkpoint_is_replayed_on_load(tmp_path):
+    index = LocalIndex(str(tmp_path))
+    index.upsert([{"id": "a", "values": [1.0, 0.0], "metadata": {"n": 1}},
+                  {"id": "b", "values": [0.0, 1.0], "metadata": {"n": 2}}])
+    index.save()
+    index.upsert([{"id": "a", "values": [0.0, 3.0], "metadata": {"n": 3}}])
+    index.delete(["b"])
+    index.checkpoint()
+
+    reopened = LocalIndex(str(tmp_path))
+    matches = reopened.query([0.0, 1.0], top_k=2).matches
+    assert [(m.id, m.metadata) for m in matches] == [("a", {"n": 3})]
+    assert matches[0].score == pytest.approx(1.0)
+
+    reopened.save()
+    assert not (tmp_path / "journal.jsonl").exists()
+    assert LocalIndex(str(tmp_path)).describe_index_stats() == {"total_vector_count": 1}
+
+
+def test_local_index_filters_before_scoring(tmp_path):
+    index = LocalIndex(str(tmp_path))
+    index.upsert([{"id": "v", "values": [1.0, 0.0], "metadata": {"features": ["vesting"]}},
+                  {"id": "c", "values": [0.9, 0.1], "metadata": {"features": ["catch_up"]}}])
+    matches = index.query([1.0, 0.0], top_k=5, filter={"features": {"$in": ["catch_up"]}}).matches
+    assert [m.id for m in matches] == ["c"]
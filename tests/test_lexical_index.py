@@ -0,0 +1,88 @@
+import os
+
+from tools.lexical_index import LexicalIndex, tokenize
+
+DOCS = {
+    "vesting#0": ("Employer contributions vest under IRC 411(a)(2): a 3-year cliff or 6-year graded schedule.",
+                  {"features": ["vesting"]}),
+    "catch_up#0": ("Participants age 50 or over may make catch-up contributions under section 414(v).",
+                   {"features": ["catch_up"]}),
+    "eligibility#0": ("A plan may not require more than one year of service or an age above 21 under 410(a).",
+                      {"features": ["eligibility"]}),
+}
+
+
+def build(path) -> LexicalIndex:
+    index = LexicalIndex(str(path))
+    for doc_id, (text, metadata) in DOCS.items():
+        index.add(doc_id, text, {**metadata, "content": text})
+    return index
+
+
+def ids(hits: list[dict]) -> list[str]:
+    return [h["id"] for h in hits]
+
+
+def test_tokenize_expands_citations():
+    tokens = tokenize("Under IRC 411(a)(2) and the 401k rules")
+    assert {"411(a)(2)", "411(a)", "411", "401(k)"} <= set(tokens)
+    assert "the" not in tokens
+
+
+def test_search_before_and_after_save(tmp_path):
+    index = build(tmp_path)
+    assert ids(index.search("411(a)"))[0] == "vesting#0"
+    index.save()
+    index.close()
+
+    reopened = LexicalIndex(str(tmp_path))
+    assert len(reopened) == 3
+    assert ids(reopened.search("411(a)"))[0] == "vesting#0"
+    assert reopened.search("catch-up 414(v)")[0]["metadata"]["content"] == DOCS["catch_up#0"][0]
+
+
+def test_lexicon_holds_only_terms(tmp_path):
+    build(tmp_path).save()
+    with open(tmp_path / "lexicon.json", encoding="utf-8") as f:
+        lexicon = f.read()
+    assert "contributions" in lexicon
+    assert "Participants age 50" not in lexicon
+
+
+def test_filter_applies_to_metadata(tmp_path):
+    index = build(tmp_path)
+    index.save()
+    hits = index.search("contributions", filter={"features": {"$in": ["catch_up"]}})
+    assert ids(hits) == ["catch_up#0"]
+
+
+def test_updates_and_removals_survive_compaction(tmp_path):
+    index = build(tmp_path)
+    index.save()
+    index.add("vesting#0", "Employer contributions are always 100% vested.", {"content": "rewritten"})
+    index.remove("catch_up#0")
+    assert sorted(index.doc_ids()) == ["eligibility#0", "vesting#0"]
+    assert index.search("411(a)") == []
+    index.save()
+
+    reopened = LexicalIndex(str(tmp_path))
+    assert sorted(reopened.doc_ids()) == ["eligibility#0", "vesting#0"]
+    assert ids(reopened.search("vested")) == ["vesting#0"]
+    assert reopened.search("vested")[0]["metadata"] == {"content": "rewritten"}
+    assert reopened.search("414(v)") == []
+
+
+def test_checkpoint_is_replayed_on_load(tmp_path):
+    index = build(tmp_path)
+    index.checkpoint()
+    index.remove("eligibility#0")
+    index.checkpoint()
+    assert not os.path.exists(tmp_path / "lexicon.json")
+
+    reopened = LexicalIndex(str(tmp_path))
+    assert sorted(reopened.doc_ids()) == ["catch_up#0", "vesting#0"]
+    assert ids(reopened.search("411(a)(2)")) == ["vesting#0"]
+
+    reopened.save()
+    assert not os.path.exists(tmp_path / "journal.jsonl")
+    assert sorted(LexicalIndex(str(tmp_path)).doc_ids()) == ["catch_up#0", "vesting#0"]
@@ -0,0 +1,66 @@
+import pytest
+
+from agents import llm, nodes
+from agents.resilience import LLMDeadlineExceeded
+
+FINDINGS = [
+    {"feature": "vesting", "plan_value": "cliff - 3 years", "regulation": "IRC 411(a)", "source": "Knowledge Base",
+     "status": "compliant", "notes": "Within the 3-year cliff limit.", "links": []},
+    {"feature": "employer_match", "plan_value": "100% of first 4%", "regulation": "IRC 401(m)",
+     "source": "Knowledge Base", "status": "gap", "notes": "Safe harbor requires 4% on 5%.", "links": []},
+]
+STATE = {"extracted_features": {"plan_name": "Acme 401(k) Plan"}, "findings": FINDINGS, "report_mode": "llm"}
+
+
+@pytest.fixture
+def written(monkeypatch):
+    """What generate_report sends to graph.stream(stream_mode="custom") readers"""
+    chunks = []
+    monkeypatch.setattr(nodes, "_stream_writer", lambda: chunks.append)
+    return chunks
+
+
+def test_the_report_narrative_is_streamed(written):
+    llm.set_llm(llm.FakeLLM(lambda text: "Executive Summary: one gap in the employer match."))
+    update = nodes.generate_report(STATE)
+    assert "".join(c["report_token"] for c in written) == update["report"]
+    assert update["risk_level"] == "Medium"
+
+
+def test_a_report_past_its_deadline_replaces_the_streamed_draft(written, monkeypatch):
+    monkeypatch.setenv("LLM_TIMEOUT_GENERATE_REPORT", "0.2")
+    llm.set_llm(llm.FakeLLM(lambda text: " ".join(["narrative"] * 50), latency=1.0))
+    update = nodes.generate_report(STATE)
+
+    assert "narrative" not in update["report"]
+    assert update["report"].startswith("# Compliance Report")
+    tokens = [c for c in written if "report_token" in c]
+    assert 0 < len(tokens) < 50
+    assert written[-1] == {"report_replace": update["report"]}
+
+
+def test_a_report_with_nothing_streamed_falls_back_quietly(written):
+    def no_reply(text: str) -> str:
+        raise LLMDeadlineExceeded("generate_report: queued for LLM capacity past the deadline")
+
+    llm.set_llm(llm.FakeLLM(no_reply))
+    update = nodes.generate_report(STATE)
+    assert update["report"].startswith("# Compliance Report")
+    assert written == []
+
+
+def test_a_partial_report_gives_unreached_features_their_plan_values():
+    state = {
+        "extracted_features": {"vesting": {"type": "cliff", "schedule": "3 years"}, "contributions": {}},
+        "findings": FINDINGS[:1],
+        "current_feature": "employer_match",
+        "features_to_check": ["catch_up", "auto_enrollment"],
+    }
+    update = nodes.partial_report(state, "deadline reached")
+
+    pending = {f["feature"]: f for f in update["findings"]}
+    assert list(pending) == ["employer_match", "catch_up", "auto_enrollment"]
+    assert all(isinstance(f["plan_value"], str) for f in pending.values())
+    assert pending["employer_match"]["plan_value"] == ""
+    assert all(f["source"] == nodes.NOT_EVALUATED and f["status"] == "needs_review" for f in pending.values())
+    assert "1 of 4 features were evaluated" in update["report"]
@@ -0,0 +1,96 @@
+import json
+import os
+
+import pytest
+
+from tools import official_mirror
+from tools.official_mirror import (current_version, list_versions, load_manifest, queue_urls, refresh,
+                                   search_mirror, static_fetcher, use_version)
+
+VESTING = "https://www.irs.gov/retirement-plans/vesting"
+CATCH_UP = "https://www.irs.gov/retirement-plans/catch-up-contributions"
+
+
+def pages(vesting: str = "Employer contributions must vest under a 3-year cliff or 6-year graded schedule.") -> dict:
+    return {
+        VESTING: ("Retirement topics - vesting", vesting),
+        CATCH_UP: ("Catch-up contributions", "Participants age 50 or over may make catch-up contributions."),
+    }
+
+
+@pytest.fixture
+def root(isolated):
+    path = str(isolated / "mirror")
+    official_mirror._mirror = None
+    yield path
+    official_mirror._mirror = None
+
+
+def page_files(root: str) -> list[str]:
+    return [name for _, _, files in os.walk(os.path.join(root, "pages")) for name in files]
+
+
+def test_refresh_indexes_pages_and_switches_current(root):
+    stats = refresh([VESTING, CATCH_UP], fetch=static_fetcher(pages()), root=root)
+    assert stats["new"] == 2 and stats["failed"] == 0
+    assert current_version(root) == stats["version"]
+
+    results = search_mirror("cliff vesting schedule")
+    assert results[0]["url"] == VESTING
+    assert "3-year cliff" in results[0]["snippet"]
+    assert results[0]["mirror_version"] == stats["version"]
+
+
+def test_refresh_keeps_unchanged_pages_and_last_good_copies(root):
+    first = refresh([VESTING, CATCH_UP], fetch=static_fetcher(pages()), root=root)
+    # the catch-up page now fails to fetch; the vesting page changed
+    changed = {VESTING: pages("Employer contributions must vest under a 2-year cliff.")[VESTING]}
+    second = refresh([VESTING, CATCH_UP], fetch=static_fetcher(changed), root=root)
+
+    assert (second["changed"], second["failed"], second["pages"]) == (1, 1, 2)
+    manifest = load_manifest(root)
+    assert manifest["previous"] == first["version"]
+    assert manifest["pages"][CATCH_UP]["error"] == "HTTP 404"
+    assert "2-year cliff" in search_mirror("cliff vesting")[0]["snippet"]
+    assert search_mirror("catch-up contributions age 50")[0]["url"] == CATCH_UP
+
+
+def test_rollback_switches_searches_to_an_older_version(root):
+    first = refresh([VESTING], fetch=static_fetcher(pages()), root=root)
+    second = refresh([VESTING], fetch=static_fetcher(pages("Contributions vest under a 2-year cliff.")), root=root)
+    assert "2-year cliff" in search_mirror("cliff")[0]["snippet"]
+
+    use_version(first["version"], root)
+    assert current_version(root) == first["version"]
+    assert "3-year cliff" in search_mirror("cliff")[0]["snippet"]
+    assert [v["current"] for v in list_versions(root)] == [True, False]
+
+    with pytest.raises(ValueError):
+        use_version("no-such-version", root)
+    assert second["version"] in [v["version"] for v in list_versions(root)]
+
+
+def test_prune_keeps_the_newest_versions_and_their_pages(root):
+    texts = [f"Contributions vest under a {years}-year cliff." for years in (2, 3, 4)]
+    versions = [refresh([VESTING], fetch=static_fetcher(pages(text)), root=root, keep=2)["version"]
+                for text in texts]
+
+    assert [v["version"] for v in list_versions(root)] == versions[1:]
+    # the first version's copy of the page went with it
+    assert len(page_files(root)) == 2
+
+
+def test_live_urls_are_queued_once_and_only_for_an_existing_mirror(root):
+    queue_urls([CATCH_UP], root)
+    assert not os.path.exists(root)
+
+    refresh([VESTING], fetch=static_fetcher(pages()), root=root)
+    queue_urls([CATCH_UP, VESTING, "https://example.com/not-official"], root)
+    queue_urls([CATCH_UP, CATCH_UP], root)
+    with open(os.path.join(root, "pending.json"), encoding="utf-8") as f:
+        assert json.load(f) == [CATCH_UP]
+
+    stats = refresh([VESTING], fetch=static_fetcher(pages()), root=root)
+    assert stats["pages"] == 2
+    with open(os.path.join(root, "pending.json"), encoding="utf-8") as f:
+        assert json.load(f) == []
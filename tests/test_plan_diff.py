@@ -0,0 +1,65 @@
+import random
+
+from tools.plan_diff import MAX_WORDS, chunk_text, diff_documents, groups_in
+
+# filler that names no extraction group, so only the edits in a test touch any
+_VOCAB = ("the plan administrator trustee shall keep records of each account and report to the "
+          "committee within days after the end of every quarter as required by law").split()
+
+
+def document(sections: int = 40) -> list[str]:
+    rng = random.Random(sections)
+    return [f"Section {n}. " + " ".join(rng.choice(_VOCAB) for _ in range(60)).capitalize() + "."
+            for n in range(sections)]
+
+
+def test_identical_documents():
+    text = "\n\n".join(document())
+    diff = diff_documents(text, text)
+    assert diff.identical
+    assert diff.changed_fraction == 0.0
+    assert diff.excerpt() == ""
+
+
+def test_chunks_cover_the_text_within_size_limits():
+    text, chunks = chunk_text("\n\n".join(document()))
+    assert chunks[0].start == 0
+    assert all(c.words <= MAX_WORDS for c in chunks)
+    assert all(a.end <= b.start for a, b in zip(chunks, chunks[1:]))
+
+
+def test_reflowed_and_repaginated_text_is_not_a_change():
+    sections = document()
+    original = "\n\n".join(sections)
+    reflowed = "\n\n".join(s.replace(" ", "\n", 3) for s in sections[:20]) + "\n\n--- Page 2 ---\n\n" + \
+        "\n\n".join(sections[20:])
+    assert diff_documents(original, reflowed).identical
+
+
+def test_an_edit_only_touches_the_chunks_around_it():
+    sections = document()
+    restated = sections[:]
+    restated[25] = ("Section 25. Employer contributions vest under a 3-year cliff vesting schedule for Plan Years "
+                    "beginning after the restatement.")
+    diff = diff_documents("\n\n".join(sections), "\n\n".join(restated))
+
+    assert not diff.identical
+    assert 0 < diff.changed_fraction < 0.2
+    assert "3-year cliff vesting schedule" in diff.excerpt()
+    assert "Section 5." not in diff.excerpt()
+    assert "vesting" in diff.touched_groups()
+
+
+def test_deletions_report_the_groups_they_cleared():
+    sections = document()
+    sections.insert(10, "Section 10a. Participants may take hardship distributions for an immediate and heavy "
+                        "financial need.")
+    restated = sections[:10] + sections[11:]
+    diff = diff_documents("\n\n".join(sections), "\n\n".join(restated))
+    assert diff.removed_words > 0
+    assert diff.touched_groups(removed=True) == ["distributions"]
+
+
+def test_groups_in():
+    assert groups_in("Employer contributions vest under a graded vesting schedule.") == ["vesting"]
+    assert groups_in("Participants may borrow through a loan program.") == ["distributions"]
@@ -0,0 +1,77 @@
+import pytest
+
+from tools.pre_extract import pre_extract, relevant_passages
+
+
+def values(text: str) -> dict:
+    return {path: guess.value for path, guess in pre_extract(text).items()}
+
+
+@pytest.mark.parametrize("text, field, expected", [
+    ("The Plan permits participant loans.", "distributions.loans_allowed", True),
+    ("Participant loans are not permitted under the Plan.", "distributions.loans_allowed", False),
+    ("Hardship withdrawals are permitted under the Plan.", "distributions.hardship_allowed", True),
+    ("Hardship withdrawals are not available under this Plan.", "distributions.hardship_allowed", False),
+    ("Participants age 50 or older may make catch-up contributions.", "contributions.catch_up_allowed", True),
+    ("Catch-up contributions are not permitted.", "contributions.catch_up_allowed", False),
+])
+def test_flags_follow_negation(text, field, expected):
+    assert values(text)[field] is expected
+
+
+def test_no_automatic_enrollment_clears_rate_and_escalation():
+    found = values("The Plan does not provide for automatic enrollment.")
+    assert found["auto_enrollment.enabled"] is False
+    assert found["auto_enrollment.default_rate"] is None
+    assert found["auto_enrollment.auto_escalation"] is None
+
+
+@pytest.mark.parametrize("escalation, expected", [
+    ("Deferrals increase automatically by 1% each year.", True),
+    ("The rate will not increase automatically.", False),
+])
+def test_escalation_follows_negation(escalation, expected):
+    found = values("The Plan provides for automatic enrollment. Eligible Employees will be enrolled at a "
+                   "default deferral rate of 3%. " + escalation)
+    assert found["auto_enrollment.enabled"] is True
+    assert found["auto_enrollment.default_rate"] == 3
+    assert found["auto_enrollment.auto_escalation"] is expected
+
+
+def test_eligibility():
+    guesses = pre_extract("An Employee is eligible to participate upon attaining age 21 and completing one "
+                          "Year of Service.")
+    assert guesses["eligibility.age_requirement"].value == 21
+    assert guesses["eligibility.service_requirement"].value == "1 year"
+    assert "age 21" in guesses["eligibility.age_requirement"].evidence
+
+
+@pytest.mark.parametrize("sentence", [
+    "An Employee who completes 1,000 hours of service in a Plan Year (as defined in 1970 guidance) is eligible "
+    "to participate upon attaining age 21.",
+    "Under Section 4.72, an Employee is eligible to participate upon attaining age 21.",
+    "An Employee earning at least $73 per week is eligible to participate upon attaining age 21.",
+])
+def test_eligibility_age_ignores_unrelated_numbers(sentence):
+    assert values(sentence)["eligibility.age_requirement"] == 21
+
+
+@pytest.mark.parametrize("sentence", [
+    "A Participant who has attained age 73 is eligible for required minimum distributions.",
+    "A Participant who has attained age 70 1/2 may elect to participate in in-service withdrawals at age 21.",
+    "Participants eligible to participate who reach age 59½ may withdraw; employees join at age 21.",
+])
+def test_eligibility_age_skips_retirement_ages(sentence):
+    assert "eligibility.age_requirement" not in values(sentence)
+
+
+def test_unstated_fields_are_absent():
+    assert values("This document describes the Plan.") == {}
+
+
+def test_relevant_passages_keep_only_the_asked_groups():
+    text = ("Section 1. " + "Participants may take hardship distributions for immediate need. " * 20 + "\n\n"
+            + "Section 2. " + "Employer contributions vest under a six year graded vesting schedule. " * 20)
+    passages = relevant_passages(text, ["vesting"])
+    assert "vesting schedule" in passages
+    assert len(passages) < len(text)
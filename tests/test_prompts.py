@@ -0,0 +1,50 @@
+import os
+
+import pytest
+
+from agents.nodes import is_sufficient
+from agents.prompts import PromptTemplate, get_prompt, prompt_key, prompt_text, register
+
+VALUES = {"feature": "vesting", "kb_results": "[Source: IRC 411] Cliff vesting after 3 years.",
+          "plan_value": "cliff - 3 years", "web_results": "", "regulations": "[Source: IRC 411] ..."}
+
+
+@pytest.mark.parametrize("reply, expected", [
+    ("sufficient", True),
+    ("Sufficient.", True),
+    ("The results are sufficient to decide.", True),
+    ("insufficient", False),
+    ("INSUFFICIENT", False),
+    ("Not sufficient - the results don't mention cliff vesting.", False),
+    ("", False),
+    ('{"status": "compliant"}', False),
+])
+def test_is_sufficient(reply, expected):
+    assert is_sufficient(reply) is expected
+
+
+def test_sufficiency_and_determination_share_their_prefix():
+    check = prompt_text(get_prompt("evaluate_kb").messages(**VALUES))
+    determination = prompt_text(get_prompt("determine_compliance").messages(**VALUES))
+    shared = os.path.commonprefix([check, determination])
+    assert shared.endswith("Plan value: cliff - 3 years\n\nTask: ")
+    # each task's reply format stays in its own suffix
+    assert "sufficient" not in shared and '"status"' not in shared
+    assert "Task: SUFFICIENCY" in check and "Task: DETERMINATION" in determination
+
+
+def test_pinned_version(monkeypatch):
+    monkeypatch.setenv("PROMPT_VERSIONS", "evaluate_kb=1")
+    messages = get_prompt("evaluate_kb").messages(**VALUES)
+    assert prompt_key(messages) == "evaluate_kb@v1"
+    assert len(messages) == 1
+    assert get_prompt("determine_compliance").version > 1
+
+
+def test_unknown_prompts_and_duplicate_versions():
+    with pytest.raises(KeyError):
+        get_prompt("no_such_prompt")
+    with pytest.raises(KeyError):
+        get_prompt("evaluate_kb", version=99)
+    with pytest.raises(ValueError):
+        register(PromptTemplate("evaluate_kb", 1, "{feature}"))
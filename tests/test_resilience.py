@@ -0,0 +1,132 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from agents import governor, llm, resilience
+from agents.resilience import LLMDeadlineExceeded, call_with_policy
+
+NODE = "evaluate_kb"
+
+
+class RateLimited(Exception):
+    status_code = 429
+
+    def __init__(self, retry_after: float = None):
+        super().__init__("429 Too Many Requests")
+        self.response = SimpleNamespace(headers={"retry-after": str(retry_after)} if retry_after else {})
+
+
+def in_turn(*seconds: float):
+    """A FakeLLM latency: each value in turn, then the last one for every later call"""
+    remaining = iter(seconds)
+    return lambda: next(remaining, seconds[-1])
+
+
+def replies(*outcomes):
+    """A FakeLLM responder that raises or returns each outcome in turn, then "sufficient\""""
+    remaining = iter(outcomes)
+
+    def respond(text: str) -> str:
+        outcome = next(remaining, "sufficient")
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    return respond
+
+
+def call(fake: llm.FakeLLM):
+    return call_with_policy(lambda: fake.invoke("Task: SUFFICIENCY"), NODE)
+
+
+@pytest.fixture(autouse=True)
+def policy(monkeypatch):
+    """A fresh governor, latency window and counters; short hedge and backoff delays"""
+    monkeypatch.setattr(governor, "_governor", governor.Governor())
+    monkeypatch.setattr(resilience, "latencies", resilience.LatencyTracker())
+    for key in resilience.STATS:
+        monkeypatch.setitem(resilience.STATS, key, 0)
+    monkeypatch.setattr(resilience, "BACKOFF_BASE", 0.01)
+    monkeypatch.setenv("LLM_TIMEOUT_EVALUATE_KB", "2")
+    monkeypatch.setenv("LLM_HEDGE_AFTER_EVALUATE_KB", "0.05")
+    monkeypatch.setenv("LLM_HEDGE", "1")
+
+
+def test_a_slow_call_is_hedged_and_the_faster_reply_wins():
+    fake = llm.FakeLLM(replies(), latency=in_turn(0.6, 0.01))
+    started = time.monotonic()
+    assert call(fake).content == "sufficient"
+
+    assert time.monotonic() - started < 0.4
+    assert fake.calls == 2
+    assert resilience.STATS["hedges"] == resilience.STATS["hedge_wins"] == 1
+
+
+def test_without_hedging_the_slow_call_is_waited_out(monkeypatch):
+    monkeypatch.setenv("LLM_HEDGE", "0")
+    fake = llm.FakeLLM(replies(), latency=in_turn(0.3, 0.01))
+    started = time.monotonic()
+    assert call(fake).content == "sufficient"
+
+    assert time.monotonic() - started >= 0.3
+    assert fake.calls == 1
+    assert resilience.STATS["hedges"] == 0
+
+
+def test_hedges_fire_at_the_observed_p95(monkeypatch):
+    # the configured delay alone would never hedge this call
+    monkeypatch.setenv("LLM_HEDGE_AFTER_EVALUATE_KB", "10")
+    for _ in range(resilience.MIN_SAMPLES):
+        resilience.latencies.add(NODE, 0.02)
+    assert resilience.hedge_delay(NODE) == pytest.approx(0.02)
+
+    fake = llm.FakeLLM(replies(), latency=in_turn(0.6, 0.01))
+    started = time.monotonic()
+    call(fake)
+    assert time.monotonic() - started < 0.4
+    assert resilience.STATS["hedge_wins"] == 1
+
+
+def test_a_hedge_waits_for_the_primary_when_it_is_slower_too():
+    fake = llm.FakeLLM(replies(), latency=in_turn(0.2, 0.6))
+    started = time.monotonic()
+    call(fake)
+    assert 0.2 <= time.monotonic() - started < 0.5
+    assert resilience.STATS["hedges"] == 1 and resilience.STATS["hedge_wins"] == 0
+
+
+def test_the_deadline_raises(monkeypatch):
+    monkeypatch.setenv("LLM_TIMEOUT_EVALUATE_KB", "0.1")
+    fake = llm.FakeLLM(replies(), latency=0.5)
+    started = time.monotonic()
+    with pytest.raises(LLMDeadlineExceeded):
+        call(fake)
+    assert time.monotonic() - started < 0.4
+    assert resilience.STATS["deadlines"] == 1
+
+
+def test_a_rate_limit_backs_off_and_retries():
+    fake = llm.FakeLLM(replies(RateLimited(), RateLimited()))
+    assert call(fake).content == "sufficient"
+
+    assert fake.calls == 3
+    assert resilience.STATS["retries"] == 2
+    # a 429 holds every caller through the governor, not just this one
+    assert governor.get_governor().metrics()["pauses"] == 2
+
+
+def test_a_retry_after_past_the_deadline_gives_up_at_once():
+    fake = llm.FakeLLM(replies(RateLimited(retry_after=30)))
+    started = time.monotonic()
+    with pytest.raises(LLMDeadlineExceeded):
+        call(fake)
+    assert time.monotonic() - started < 0.5
+    assert fake.calls == 1
+
+
+def test_other_errors_are_not_retried():
+    fake = llm.FakeLLM(replies(ValueError("bad request")))
+    with pytest.raises(ValueError):
+        call(fake)
+    assert fake.calls == 1 and resilience.STATS["retries"] == 0
@@ -0,0 +1,67 @@
+import pytest
+
+from agents import llm
+from agents.schemas import ComplianceResult, PlanExtraction, StructuredOutputError, parse_reply
+
+
+@pytest.mark.parametrize("status, expected", [
+    ("compliant", "compliant"),
+    ("Compliant.", "compliant"),
+    (" PASS ", "compliant"),
+    ("non-compliant", "gap"),
+    ("Non Compliant", "gap"),
+    ("gap", "gap"),
+    ("Needs Review", "needs_review"),
+    ("needs-review", "needs_review"),
+])
+def test_status_spellings_are_normalized(status, expected):
+    assert parse_reply(f'{{"status": "{status}"}}', ComplianceResult).status == expected
+
+
+@pytest.mark.parametrize("status", ['"partially compliant"', '"maybe"', '""', "null", "3"])
+def test_unknown_statuses_are_rejected(status):
+    # a guess would hide the model's answer; rejecting it lets the node's repair retry ask again
+    with pytest.raises(StructuredOutputError):
+        parse_reply(f'{{"status": {status}}}', ComplianceResult)
+
+
+def test_a_missing_status_defaults_to_review():
+    assert parse_reply('{"regulation": "IRC 411(a)"}', ComplianceResult).status == "needs_review"
+
+
+def test_fences_prose_and_trailing_commas_are_repaired():
+    reply = 'Here you go:\n```json\n{"status": "gap", "regulation": "IRC 401(m)", "notes": "a, b",}\n```'
+    result = parse_reply(reply, ComplianceResult)
+    assert (result.status, result.regulation, result.notes) == ("gap", "IRC 401(m)", "a, b")
+
+
+def test_python_literals_are_repaired_outside_strings_only():
+    reply = "{'status': 'gap', 'notes': 'The waiver is null and void; true vesting is false.', 'extra': null,}"
+    result = parse_reply(reply, ComplianceResult)
+    assert result.notes == "The waiver is null and void; true vesting is false."
+
+    reply = "{'plan_name': 'Acme, Inc. ,}', 'auto_enrollment': {'enabled': true, 'auto_escalation': false}}"
+    extraction = parse_reply(reply, PlanExtraction)
+    assert extraction.plan_name == "Acme, Inc. ,}"
+    assert (extraction.auto_enrollment.enabled, extraction.auto_enrollment.auto_escalation) == (True, False)
+
+
+def test_values_are_coerced():
+    reply = '{"eligibility": {"age_requirement": "21 years"}, "contributions": {"catch_up_allowed": "yes"}}'
+    extraction = parse_reply(reply, PlanExtraction)
+    assert extraction.eligibility.age_requirement == 21
+    assert extraction.contributions.catch_up_allowed is True
+
+
+def test_unusable_replies_raise():
+    with pytest.raises(StructuredOutputError):
+        parse_reply("I could not determine the status.", ComplianceResult)
+
+
+def test_a_rejected_status_gets_one_repair_call():
+    replies = iter(['{"status": "partially compliant"}', '{"status": "Non-Compliant."}'])
+    fake = llm.FakeLLM(lambda text: next(replies))
+    llm.set_llm(fake)
+    result = llm.call_structured("Task: DETERMINATION", node="determine_compliance", schema=ComplianceResult)
+    assert result.status == "gap"
+    assert fake.calls == 2
@@ -0,0 +1,83 @@
+from benchmarks.suite import _text
+from tools.text_normalizer import BOILERPLATE_PARAGRAPH_CHARS, normalize_text
+
+
+def body(n: int, i: int) -> str:
+    # unique per page: a line repeated on most pages would be boilerplate
+    return _text(14, n * 10 + i).capitalize() + "."
+
+
+def paged(pages: int, header: str = "ACME CORPORATION 401(K) PLAN", footer: str = "Page {n} of {total}") -> str:
+    out = []
+    for n in range(1, pages + 1):
+        lines = [header] + [body(n, i) for i in range(6)] + [footer.format(n=n, total=pages)]
+        out.append(f"--- Page {n} ---\n" + "\n".join(lines))
+    return "\n".join(out)
+
+
+def test_repeated_headers_are_kept_once_and_page_numbers_dropped():
+    result = normalize_text(paged(6))
+    assert result.text.count("ACME CORPORATION 401(K) PLAN") == 1
+    assert result.text.startswith("ACME CORPORATION 401(K) PLAN")
+    assert "Page 3 of 6" not in result.text
+    assert "--- Page" not in result.text
+    assert all(body(4, i) in result.text for i in range(6))
+    assert result.removed["repeated_lines"] == 5
+    assert result.removed["page_numbers"] == 6
+    assert result.tokens_saved > 0
+
+
+def test_lone_page_numbers_are_dropped_only_when_they_match_the_page():
+    result = normalize_text(paged(4, footer="- {n} -"))
+    assert result.removed["page_numbers"] == 4
+    assert not any(line in ("- 1 -", "- 4 -") for line in result.text.splitlines())
+
+
+def test_number_closing_a_page_that_is_not_its_page_number_is_kept():
+    # the last row of a table that runs on to the next page
+    pages = [f"--- Page {n} ---\n" + "\n".join(body(n, i) for i in range(6)) + f"\n{n * 1250}" for n in range(1, 4)]
+    result = normalize_text("\n".join(pages))
+    assert all(str(n * 1250) in result.text.splitlines() for n in range(1, 4))
+    assert "page_numbers" not in result.removed
+
+
+def test_short_documents_keep_their_first_and_last_lines():
+    text = paged(2)
+    assert normalize_text(text).text.startswith("ACME CORPORATION 401(K) PLAN")
+
+
+def test_repeated_paragraph_is_removed_once_seen():
+    disclaimer = ("This summary does not replace the Plan document; if anything in it differs from the Plan "
+                  "document, the Plan document governs. Participants should consult the Plan Administrator "
+                  "before acting on any information in this summary.")
+    assert len(disclaimer) >= BOILERPLATE_PARAGRAPH_CHARS
+    result = normalize_text(f"{disclaimer}\n\nSection 1. Eligibility.\n\n{disclaimer}\n\nSection 2. Vesting.")
+    assert result.text.count(disclaimer) == 1
+    assert result.removed["repeated_paragraphs"] == 1
+    assert "Section 2. Vesting." in result.text
+
+
+def test_paragraphs_that_differ_only_in_numbers_are_both_kept():
+    rule = ("The Employer will match {pct}% of the elective deferrals a Participant makes for the Plan Year, "
+            "up to {cap}% of the Participant's Compensation, and will deposit the matching contribution with "
+            "the Trustee within thirty days after the end of each quarter of the Plan Year.")
+    first, second = rule.format(pct=100, cap=3), rule.format(pct=50, cap=6)
+    result = normalize_text(f"{first}\n\n{second}")
+    assert first in result.text and second in result.text
+    assert "repeated_paragraphs" not in result.removed
+
+
+def test_lines_that_differ_only_in_numbers_are_not_boilerplate():
+    pages = [f"--- Page {n} ---\nSection {n}. Body text for page {n}.\n"
+             f"The Employer will contribute {n}% of Compensation for each eligible Participant.\nEnd."
+             for n in range(1, 7)]
+    result = normalize_text("\n".join(pages))
+    for n in range(1, 7):
+        assert f"contribute {n}% of Compensation" in result.text
+
+
+def test_hyphenated_line_breaks_are_joined_but_compounds_kept():
+    result = normalize_text("Employer contributions are nonforfeit-\nable. Participants may make catch-\nup "
+                            "contributions.")
+    assert "nonforfeitable" in result.text
+    assert "catch-up" in result.text
@@ -1,9 +1,13 @@
 from .pdf_extractor import extract_text_from_pdf
-from .pinecone_search import search_knowledge_base
+from .pinecone_search import search_knowledge_base, retrieve, format_hits
+from .kb_filters import build_filter
 from .web_search import search_official_sources
 
 __all__ = [
     "extract_text_from_pdf",
     "search_knowledge_base", 
+    "retrieve",
+    "format_hits",
+    "build_filter",
     "search_official_sources"
 ]
\ No newline at end of file
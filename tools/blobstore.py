@@ -0,0 +1,213 @@
+"""
+Content-addressed blob store for bulky graph state
+
+The plan text and KB/web evidence are stored once, keyed by their SHA-256,
+and ComplianceState carries a small BlobRef instead. Nodes resolve a ref
+only when they need the payload. Each super-step update and each
+streamed step then stays a few hundred bytes, however large the document.
+
+Blobs live in a process-local LRU (BLOB_CACHE_MB, default 256). With
+BLOB_DIR set they are also written to disk, so nothing is lost when the
+LRU evicts, and several processes can share them. An audit runs inside
+blob_scope(): the blobs it puts or reads are pinned - never evicted -
+until the run finishes, and then released from memory.
+"""
+
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any, Optional
+
+from .tracing import span
+
+
+class BlobMissing(KeyError):
+    """A BlobRef whose payload is in neither the cache nor BLOB_DIR"""
+
+
+@dataclass(frozen=True)
+class BlobRef:
+    digest: str
+    size: int    # encoded bytes
+    kind: str    # "text" or "json"
+
+    def __repr__(self):
+        return f"BlobRef({self.kind}, {self.size} B, {self.digest[:12]})"
+
+
+def _encode(value: Any) -> tuple[bytes, str]:
+    if isinstance(value, str):
+        return value.encode("utf-8"), "text"
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8"), "json"
+
+
+def _decode(data: bytes, kind: str) -> Any:
+    text = data.decode("utf-8")
+    return text if kind == "text" else json.loads(text)
+
+
+def _text_digest(text: str) -> tuple[str, int]:
+    """SHA-256 and UTF-8 size of text, without materialising a full encoded copy"""
+    h, size, step = hashlib.sha256(), 0, 1 << 20
+    for i in range(0, len(text), step):
+        chunk = text[i:i + step].encode("utf-8")
+        h.update(chunk)
+        size += len(chunk)
+    return h.hexdigest(), size
+
+
+class BlobStore:
+    def __init__(self, root: str = None, max_bytes: int = 256 * 1024 * 1024):
+        self.root = root
+        self.max_bytes = max_bytes
+        # digest -> (payload, encoded bytes). Text is cached as the str itself
+        # (immutable, shared freely); JSON as bytes, so every reader decodes
+        # its own copy and can't mutate another's
+        self._blobs: OrderedDict[str, tuple[Any, int]] = OrderedDict()
+        self._pins: dict[str, int] = {}  # digest -> runs holding it
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.stats = {"puts": 0, "dedup_hits": 0, "gets": 0, "disk_reads": 0, "evictions": 0, "releases": 0}
+        if root:
+            os.makedirs(root, exist_ok=True)
+
+    def _path(self, digest: str) -> str:
+        return os.path.join(self.root, digest[:2], digest)
+
+    def _cache(self, digest: str, data: Any, size: int):
+        """Insert as most recent, then evict unpinned blobs past max_bytes; caller holds the lock"""
+        self._blobs[digest] = (data, size)
+        self._bytes += size
+        for old in list(self._blobs)[:-1]:
+            if self._bytes <= self.max_bytes:
+                break
+            if old not in self._pins:
+                self._bytes -= self._blobs.pop(old)[1]
+                self.stats["evictions"] += 1
+
+    def _pin(self, digest: str):
+        """Hold digest for the current blob_scope, once per scope; caller holds the lock"""
+        scope = _scope.get()
+        if scope is not None and scope[0] is self and digest not in scope[1]:
+            scope[1].add(digest)
+            self._pins[digest] = self._pins.get(digest, 0) + 1
+
+    def release(self, digests):
+        """Unpin digests; a blob no run holds any more leaves memory (BLOB_DIR keeps its file)"""
+        with self._lock:
+            for digest in digests:
+                held = self._pins.get(digest, 0) - 1
+                if held > 0:
+                    self._pins[digest] = held
+                    continue
+                self._pins.pop(digest, None)
+                if digest in self._blobs:
+                    self._bytes -= self._blobs.pop(digest)[1]
+                    self.stats["releases"] += 1
+
+    @contextmanager
+    def scope(self):
+        """Pin every blob put or read inside the block until it exits"""
+        pinned: set[str] = set()
+        reset = _scope.set((self, pinned))
+        try:
+            yield
+        finally:
+            _scope.reset(reset)
+            self.release(pinned)
+
+    def put(self, value: Any) -> BlobRef:
+        if isinstance(value, str):
+            data, kind = value, "text"
+            digest, size = _text_digest(value)
+        else:
+            data, kind = _encode(value)
+            digest, size = hashlib.sha256(data).hexdigest(), len(data)
+        ref = BlobRef(digest, size, kind)
+
+        with self._lock:
+            self.stats["puts"] += 1
+            self._pin(digest)
+            if digest in self._blobs:
+                self.stats["dedup_hits"] += 1
+                self._blobs.move_to_end(digest)
+                return ref
+            self._cache(digest, data, size)
+
+        if self.root and not os.path.exists(self._path(digest)):
+            os.makedirs(os.path.dirname(self._path(digest)), exist_ok=True)
+            tmp = f"{self._path(digest)}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(data.encode("utf-8") if kind == "text" else data)
+            os.replace(tmp, self._path(digest))
+        return ref
+
+    def get(self, ref: BlobRef) -> Any:
+        with self._lock:
+            self.stats["gets"] += 1
+            self._pin(ref.digest)
+            cached = self._blobs.get(ref.digest)
+            if cached is not None:
+                self._blobs.move_to_end(ref.digest)
+        data = cached[0] if cached is not None else None
+
+        if data is None:
+            if not self.root or not os.path.exists(self._path(ref.digest)):
+                raise BlobMissing(f"{ref!r} is no longer stored; set BLOB_DIR to keep blobs on disk")
+            with span("blob.read", size_bytes=ref.size):
+                with open(self._path(ref.digest), "rb") as f:
+                    data = f.read()
+            size = len(data)
+            if ref.kind == "text":
+                data = data.decode("utf-8")
+            with self._lock:
+                self.stats["disk_reads"] += 1
+                self._cache(ref.digest, data, size)
+
+        return data if ref.kind == "text" else _decode(data, ref.kind)
+
+    def metrics(self) -> dict:
+        with self._lock:
+            return {"blobs": len(self._blobs), "cached_bytes": self._bytes, "pinned": len(self._pins), **self.stats}
+
+
+# (store, digests pinned so far) for the run in progress
+_scope: ContextVar[Optional[tuple[BlobStore, set]]] = ContextVar("blob_scope", default=None)
+
+_store: Optional[BlobStore] = None
+_store_lock = threading.Lock()
+
+
+def get_blob_store() -> BlobStore:
+    """Lazy initialization of the process-wide blob store"""
+    global _store
+
+    with _store_lock:
+        if _store is None:
+            _store = BlobStore(
+                root=os.getenv("BLOB_DIR") or None,
+                max_bytes=int(float(os.getenv("BLOB_CACHE_MB", "256")) * 1024 * 1024),
+            )
+    return _store
+
+
+def blob_scope():
+    """Pin the blobs a run puts or reads until the block exits, then release them"""
+    return get_blob_store().scope()
+
+
+def put_blob(value: Any) -> BlobRef:
+    """Store value (str or JSON-serialisable) and return its ref"""
+    return get_blob_store().put(value)
+
+
+def resolve(value: Any) -> Any:
+    """The payload behind a BlobRef; anything else is returned unchanged"""
+    if isinstance(value, BlobRef):
+        return get_blob_store().get(value)
+    return value
@@ -0,0 +1,106 @@
+"""
+Cooperative cancellation - a per-audit token with an optional deadline
+
+The runner installs a CancelToken for the audit with cancel_scope().
+Like trace spans, the token rides along in contextvars, so graph nodes,
+pooled LLM calls and tool calls all see it without extra parameters.
+Code checks it between units of work (check()) and bounds its waits by
+it (remaining()). In-flight requests that can't be interrupted are
+abandoned rather than awaited.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+
+class AuditCancelled(Exception):
+    """The audit was cancelled or ran past its deadline"""
+
+    def __init__(self, reason: str, deadline: bool = False):
+        super().__init__(reason)
+        self.reason = reason
+        self.deadline = deadline
+
+
+class CancelToken:
+    def __init__(self, timeout: float = None):
+        self.deadline: Optional[float] = None
+        self.timeout: Optional[float] = None
+        self.reason: Optional[str] = None
+        self._event = threading.Event()
+        if timeout:
+            self.set_deadline(timeout)
+
+    def set_deadline(self, timeout: float):
+        """Expire timeout seconds from now"""
+        self.timeout = timeout
+        self.deadline = time.monotonic() + timeout
+
+    def cancel(self, reason: str = "cancelled"):
+        if not self._event.is_set():
+            self.reason = reason
+            self._event.set()
+
+    @property
+    def expired(self) -> bool:
+        return self.deadline is not None and time.monotonic() >= self.deadline
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set() or self.expired
+
+    def remaining(self) -> Optional[float]:
+        """Seconds to the deadline (0 once cancelled), None if unbounded"""
+        if self._event.is_set():
+            return 0.0
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - time.monotonic())
+
+    def check(self):
+        """Raise AuditCancelled if the audit should stop"""
+        if self._event.is_set():
+            raise AuditCancelled(self.reason)
+        if self.expired:
+            raise AuditCancelled(f"deadline of {self.timeout:g}s reached", deadline=True)
+
+    def wait(self, seconds: float) -> bool:
+        """Sleep up to seconds, waking early on cancel; True if cancelled"""
+        remaining = self.remaining()
+        if remaining is not None:
+            seconds = min(seconds, remaining)
+        return self._event.wait(seconds) or self.cancelled
+
+
+_current: ContextVar[Optional[CancelToken]] = ContextVar("cancel_token", default=None)
+
+
+@contextmanager
+def cancel_scope(token: CancelToken):
+    """Make token the current one for everything run inside the block"""
+    reset = _current.set(token)
+    try:
+        yield token
+    finally:
+        _current.reset(reset)
+
+
+def current_token() -> Optional[CancelToken]:
+    return _current.get()
+
+
+def check_cancelled():
+    """Raise AuditCancelled if the current audit (if any) should stop"""
+    token = _current.get()
+    if token is not None:
+        token.check()
+
+
+def bound_timeout(seconds: float) -> float:
+    """seconds, capped by the current audit's remaining time"""
+    token = _current.get()
+    remaining = token.remaining() if token is not None else None
+    return seconds if remaining is None else min(seconds, remaining)
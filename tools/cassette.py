@@ -0,0 +1,183 @@
+"""
+Record/replay cassettes for external I/O (LLM, KB, web search)
+
+In "record" mode every intercepted call runs for real and its payload,
+response and duration are appended to a JSONL cassette. In "replay" mode
+responses are served from the cassette, so no network or model is
+touched, with configurable synthetic latency.
+
+    with use_cassette("runs/acme.jsonl", mode="replay", latency="recorded"):
+        compliance_graph.invoke(state)
+
+Or set CASSETTE_PATH / CASSETTE_MODE (and CASSETTE_LATENCY) in the environment.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Optional, Union
+
+
+class CassetteMiss(KeyError):
+    """Replay found no recorded response for a call"""
+
+
+class Cassette:
+    """
+    latency: "recorded" (sleep the recorded duration x latency_scale),
+    a number of seconds, or 0 for no delay.
+    strict: when False, a replay miss falls back to the next unused recording
+    of the same kind/node in recorded order (useful after prompt edits).
+    """
+
+    def __init__(
+        self,
+        path: str,
+        mode: str = "replay",
+        latency: Union[str, float] = "recorded",
+        latency_scale: float = 1.0,
+        strict: bool = False,
+    ):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Unknown cassette mode: {mode}")
+
+        self.path = path
+        self.mode = mode
+        self.latency = latency
+        self.latency_scale = latency_scale
+        self.strict = strict
+
+        self._lock = threading.Lock()
+        self._by_key: dict[str, list[dict]] = {}
+        self._by_bucket: dict[str, list[dict]] = {}
+        self._key_cursor: dict[str, int] = {}
+        self._bucket_cursor: dict[str, int] = {}
+        self.stats = {"hits": 0, "fallbacks": 0, "recorded": 0}
+
+        if mode == "replay":
+            self._load()
+        else:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    @staticmethod
+    def key(kind: str, payload: dict) -> str:
+        blob = json.dumps({"kind": kind, "payload": payload}, sort_keys=True, default=str)
+        return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def bucket(kind: str, payload: dict) -> str:
+        return f"{kind}:{payload.get('node', '')}"
+
+    def _load(self):
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                self._by_key.setdefault(entry["key"], []).append(entry)
+                self._by_bucket.setdefault(entry["bucket"], []).append(entry)
+
+    def _next(self, index: dict[str, list[dict]], cursors: dict[str, int], name: str) -> Optional[dict]:
+        """Recordings for a name are served in order; the last one repeats"""
+        entries = index.get(name)
+        if not entries:
+            return None
+        position = cursors.get(name, 0)
+        cursors[name] = position + 1
+        return entries[min(position, len(entries) - 1)]
+
+    def _sleep(self, entry: dict):
+        if self.latency == "recorded":
+            delay = entry.get("duration_ms", 0) / 1000 * self.latency_scale
+        else:
+            delay = float(self.latency or 0)
+        if delay > 0:
+            time.sleep(delay)
+
+    def intercept(self, kind: str, payload: dict, call: Callable[[], object]):
+        """Run (record) or look up (replay) a JSON-serialisable call"""
+        key = self.key(kind, payload)
+        bucket = self.bucket(kind, payload)
+
+        if self.mode == "replay":
+            with self._lock:
+                entry = self._next(self._by_key, self._key_cursor, key)
+                if entry is not None:
+                    self.stats["hits"] += 1
+                elif not self.strict:
+                    entry = self._next(self._by_bucket, self._bucket_cursor, bucket)
+                    if entry is not None:
+                        self.stats["fallbacks"] += 1
+            if entry is None:
+                raise CassetteMiss(f"No recording for {bucket} ({key[:12]})")
+            self._sleep(entry)
+            return entry["response"]
+
+        started = time.perf_counter()
+        response = call()
+        entry = {
+            "kind": kind,
+            "key": key,
+            "bucket": bucket,
+            "payload": payload,
+            "response": response,
+            "duration_ms": round((time.perf_counter() - started) * 1000, 2),
+        }
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, default=str) + "\n")
+            self.stats["recorded"] += 1
+        return response
+
+
+_current: ContextVar[Optional[Cassette]] = ContextVar("current_cassette", default=None)
+_from_env: Optional[Cassette] = None
+_env_checked = False
+
+
+def active_cassette() -> Optional[Cassette]:
+    """The cassette in use, if any (use_cassette() or CASSETTE_PATH)"""
+    global _from_env, _env_checked
+
+    cassette = _current.get()
+    if cassette is not None:
+        return cassette
+
+    if not _env_checked:
+        _env_checked = True
+        path = os.getenv("CASSETTE_PATH")
+        if path:
+            latency = os.getenv("CASSETTE_LATENCY", "recorded")
+            _from_env = Cassette(
+                path,
+                mode=os.getenv("CASSETTE_MODE", "replay"),
+                latency=latency if latency == "recorded" else float(latency),
+            )
+
+    return _from_env
+
+
+@contextmanager
+def use_cassette(path: str, mode: str = "replay", **kwargs):
+    """
+    Activate a cassette for every intercepted call made inside the block.
+    Scoped to the current context, so concurrent runs can replay separately.
+    """
+    cassette = Cassette(path, mode=mode, **kwargs)
+    token = _current.set(cassette)
+    try:
+        yield cassette
+    finally:
+        _current.reset(token)
+
+
+def intercept(kind: str, payload: dict, call: Callable[[], object]):
+    """Route a call through the active cassette, or just run it"""
+    cassette = active_cassette()
+    if cassette is None:
+        return call()
+    return cassette.intercept(kind, payload, call)
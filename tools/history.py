@@ -0,0 +1,322 @@
+"""
+Persistent audit history - every finished run's meta, findings and sources
+
+One SQLite file (HISTORY_DB, default .cache/history.sqlite; empty to turn
+off) shared by the Streamlit UI, the audit service and batch scripts: the
+run registry records each completed audit here. Queries are answered from
+indexes, not by scanning the findings:
+
+    history = get_history()
+    history.plans_with_status("vesting", "gap", since="2026-01-01")
+    history.status_changes("Acme Corp 401(k) Plan")
+    history.portfolio_counts()           # {"High": 12, "Medium": 40, ...}
+
+Plans are matched by plan_key(), a normalised plan name, so the same plan
+audited from differently named files lines up over time.
+
+Usage:
+    python -m tools.history portfolio
+    python -m tools.history gaps vesting --since 2026-01-01
+    python -m tools.history changes "Acme Corp 401(k) Plan" --feature vesting
+"""
+
+import argparse
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date, datetime
+from typing import Any, Optional, Union
+
+from .report import normalize_links
+from .tracing import span
+
+Since = Union[None, float, int, str, date, datetime]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT PRIMARY KEY,
+    plan_key TEXT NOT NULL,
+    plan_name TEXT,
+    file_name TEXT,
+    risk_level TEXT,
+    report_mode TEXT,
+    stopped TEXT,
+    compliant INTEGER,
+    gap INTEGER,
+    needs_review INTEGER,
+    audited_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS findings (
+    -- never reused, so readers can pick up new rows with "id > last seen"
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    run_id TEXT NOT NULL,
+    plan_key TEXT NOT NULL,
+    feature TEXT NOT NULL,
+    status TEXT NOT NULL,
+    plan_value TEXT,
+    regulation TEXT,
+    source TEXT,
+    notes TEXT,
+    audited_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS sources (
+    run_id TEXT NOT NULL,
+    url TEXT NOT NULL,
+    title TEXT,
+    PRIMARY KEY (run_id, url)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS plans (
+    plan_key TEXT PRIMARY KEY,
+    plan_name TEXT,
+    latest_run_id TEXT,
+    latest_risk TEXT,
+    latest_at REAL,
+    runs INTEGER NOT NULL DEFAULT 0
+);
+-- extracted features per document text (SHA-256, as tools.blobstore), for amendment reviews
+CREATE TABLE IF NOT EXISTS extractions (
+    digest TEXT PRIMARY KEY,
+    plan_key TEXT NOT NULL,
+    features TEXT NOT NULL,
+    extracted_at REAL NOT NULL
+) WITHOUT ROWID;
+-- "plans with a <feature> <status> since X"
+CREATE INDEX IF NOT EXISTS findings_feature_status ON findings (feature, status, audited_at, plan_key);
+-- "status of plan P over time"
+CREATE INDEX IF NOT EXISTS findings_plan ON findings (plan_key, feature, audited_at);
+CREATE INDEX IF NOT EXISTS findings_run ON findings (run_id);
+CREATE INDEX IF NOT EXISTS runs_plan ON runs (plan_key, audited_at);
+CREATE INDEX IF NOT EXISTS runs_time ON runs (audited_at);
+-- portfolio counts by each plan's latest risk level
+CREATE INDEX IF NOT EXISTS plans_risk ON plans (latest_risk);
+"""
+
+
+def plan_key(name: Optional[str]) -> str:
+    """Normalised plan name: lower case, no .pdf suffix, punctuation folded to single spaces"""
+    name = re.sub(r"\.pdf$", "", (name or "").strip(), flags=re.IGNORECASE)
+    return re.sub(r"[^a-z0-9]+", " ", name.lower()).strip() or "unknown plan"
+
+
+def to_timestamp(value: Since) -> Optional[float]:
+    """Epoch seconds from an epoch number, a date/datetime or an ISO date string"""
+    if value is None or isinstance(value, (int, float)):
+        return value
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if not isinstance(value, datetime):
+        value = datetime(value.year, value.month, value.day)
+    return value.timestamp()
+
+
+class HistoryStore:
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+
+    @contextmanager
+    def _transaction(self):
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._db
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def _query(self, sql: str, params=()) -> list[dict]:
+        with self._lock:
+            return [dict(row) for row in self._db.execute(sql, params).fetchall()]
+
+    # ------------------------------------------------------------
+    # Writes
+    # ------------------------------------------------------------
+
+    def record_run(self, run_id: str, report: dict, file_name: str = None, report_mode: str = None,
+                   stopped: str = None, audited_at: float = None):
+        """
+        Store one audit: report is the compile_report structure (meta,
+        findings, sources). Re-recording a run id replaces it
+        """
+        meta = report["meta"]
+        audited_at = audited_at or time.time()
+        key = plan_key(meta.get("plan_name") or file_name)
+        counts = meta.get("counts") or {}
+        findings = report.get("findings") or []
+        sources = normalize_links(report.get("sources"))
+
+        with span("history.write", findings=len(findings)), self._transaction() as db:
+            replaced = db.execute("SELECT plan_key FROM runs WHERE run_id = ?", (run_id,)).fetchone()
+            if replaced is not None:
+                db.execute("DELETE FROM findings WHERE run_id = ?", (run_id,))
+                db.execute("DELETE FROM sources WHERE run_id = ?", (run_id,))
+                db.execute("DELETE FROM runs WHERE run_id = ?", (run_id,))
+                db.execute("UPDATE plans SET runs = runs - 1 WHERE plan_key = ?", (replaced["plan_key"],))
+
+            db.execute(
+                "INSERT INTO runs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (run_id, key, meta.get("plan_name"), file_name, meta.get("risk_level"), report_mode, stopped,
+                 counts.get("compliant", 0), counts.get("gap", 0), counts.get("needs_review", 0), audited_at),
+            )
+            db.executemany(
+                "INSERT INTO findings (run_id, plan_key, feature, status, plan_value, regulation, source, notes, "
+                "audited_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [(run_id, key, f.get("feature") or "", f.get("status") or "needs_review", f.get("plan_value"),
+                  f.get("regulation"), f.get("source"), f.get("notes"), audited_at) for f in findings],
+            )
+            db.executemany(
+                "INSERT OR IGNORE INTO sources VALUES (?, ?, ?)",
+                [(run_id, s["url"], s["title"]) for s in sources],
+            )
+            # the plan row follows its most recent audit, whatever order runs are recorded in
+            db.execute(
+                "INSERT INTO plans VALUES (?, ?, ?, ?, ?, 1) "
+                "ON CONFLICT (plan_key) DO UPDATE SET runs = runs + 1, "
+                "plan_name = CASE WHEN excluded.latest_at >= latest_at THEN excluded.plan_name ELSE plan_name END, "
+                "latest_run_id = CASE WHEN excluded.latest_at >= latest_at THEN excluded.latest_run_id ELSE latest_run_id END, "
+                "latest_risk = CASE WHEN excluded.latest_at >= latest_at THEN excluded.latest_risk ELSE latest_risk END, "
+                "latest_at = MAX(latest_at, excluded.latest_at)",
+                (key, meta.get("plan_name") or file_name, run_id, meta.get("risk_level"), audited_at),
+            )
+
+    def save_extraction(self, digest: str, features: dict, plan_name: str = None, extracted_at: float = None):
+        """Remember a document's extracted features, so a later restatement can inherit them"""
+        with self._transaction() as db:
+            db.execute(
+                "INSERT OR REPLACE INTO extractions VALUES (?, ?, ?, ?)",
+                (digest, plan_key(plan_name or features.get("plan_name")), json.dumps(features, default=str),
+                 extracted_at or time.time()),
+            )
+
+    # ------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------
+
+    def extraction(self, digest: str) -> Optional[dict]:
+        """Extracted features of the document with this text digest, if it was audited before"""
+        rows = self._query("SELECT features FROM extractions WHERE digest = ?", (digest,))
+        return json.loads(rows[0]["features"]) if rows else None
+
+    def plans_with_status(self, feature: str, status: str = "gap", since: Since = None,
+                          until: Since = None) -> list[dict]:
+        """Plans with at least one <feature> finding of <status> in the window; the latest such finding per plan"""
+        # MAX() makes SQLite return the other bare columns from the row holding the maximum
+        return self._query(
+            "SELECT plan_key, run_id, MAX(audited_at) AS audited_at, plan_value, regulation, notes, "
+            "COUNT(*) AS occurrences FROM findings "
+            "WHERE feature = ? AND status = ? AND audited_at >= ? AND audited_at < ? "
+            "GROUP BY plan_key ORDER BY audited_at DESC",
+            (feature, status, to_timestamp(since) or 0, to_timestamp(until) or float("inf")),
+        )
+
+    def status_history(self, plan: str, feature: str = None) -> list[dict]:
+        """Every finding recorded for a plan (by name or plan_key), oldest first"""
+        sql = ("SELECT run_id, feature, status, plan_value, notes, audited_at FROM findings "
+               "WHERE plan_key = ?")
+        params = [plan_key(plan)]
+        if feature:
+            sql += " AND feature = ?"
+            params.append(feature)
+        return self._query(sql + " ORDER BY feature, audited_at", params)
+
+    def status_changes(self, plan: str, feature: str = None) -> list[dict]:
+        """Audits where a feature's status differed from the plan's previous audit of it"""
+        where, params = "plan_key = ?", [plan_key(plan)]
+        if feature:
+            where += " AND feature = ?"
+            params.append(feature)
+        return self._query(
+            "SELECT * FROM ("
+            "  SELECT feature, run_id, audited_at, status, "
+            "  LAG(status) OVER (PARTITION BY feature ORDER BY audited_at) AS previous_status, "
+            "  plan_value, notes "
+            f"  FROM findings WHERE {where}"
+            ") WHERE previous_status IS NOT NULL AND previous_status != status "
+            "ORDER BY audited_at, feature",
+            params,
+        )
+
+    def runs_for_plan(self, plan: str, limit: int = 50) -> list[dict]:
+        """A plan's audits, newest first"""
+        return self._query(
+            "SELECT * FROM runs WHERE plan_key = ? ORDER BY audited_at DESC LIMIT ?",
+            (plan_key(plan), limit),
+        )
+
+    def portfolio_counts(self) -> dict[str, int]:
+        """Plans per risk level of their latest audit"""
+        rows = self._query("SELECT latest_risk, COUNT(*) AS plans FROM plans GROUP BY latest_risk")
+        return {row["latest_risk"] or "UNKNOWN": row["plans"] for row in rows}
+
+    def plans(self, risk_level: str = None) -> list[dict]:
+        """Every plan with its latest audit, optionally only those at one risk level"""
+        if risk_level:
+            return self._query("SELECT * FROM plans WHERE latest_risk = ? ORDER BY latest_at DESC", (risk_level,))
+        return self._query("SELECT * FROM plans ORDER BY latest_at DESC")
+
+    def sources(self, run_id: str) -> list[dict]:
+        return self._query("SELECT url, title FROM sources WHERE run_id = ?", (run_id,))
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+_history: Optional[HistoryStore] = None
+_history_lock = threading.Lock()
+
+
+def get_history() -> Optional[HistoryStore]:
+    """Lazy initialization of the process-wide history store; None when HISTORY_DB is empty"""
+    global _history
+
+    with _history_lock:
+        if _history is None:
+            path = os.getenv("HISTORY_DB", ".cache/history.sqlite")
+            if not path:
+                return None
+            _history = HistoryStore(path)
+    return _history
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Query the audit history")
+    parser.add_argument("--db", default=None, help="History file (default HISTORY_DB)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("portfolio", help="Plans per latest risk level")
+    gaps = commands.add_parser("gaps", help="Plans with a feature at a status since a date")
+    gaps.add_argument("feature")
+    gaps.add_argument("--status", default="gap")
+    gaps.add_argument("--since", default=None, help="ISO date, e.g. 2026-01-01")
+    changes = commands.add_parser("changes", help="Status changes for one plan over time")
+    changes.add_argument("plan")
+    changes.add_argument("--feature", default=None)
+    args = parser.parse_args(argv)
+
+    history = HistoryStore(args.db) if args.db else get_history()
+    if history is None:
+        parser.error("HISTORY_DB is empty; pass --db")
+
+    result: Any
+    if args.command == "portfolio":
+        result = history.portfolio_counts()
+    elif args.command == "gaps":
+        result = history.plans_with_status(args.feature, args.status, since=args.since)
+    else:
+        result = history.status_changes(args.plan, args.feature)
+    print(json.dumps(result, indent=2, default=str))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+"""
+Append-only update journal for the file-backed indexes
+"""
+
+import json
+import os
+
+
+class Journal:
+    """
+    Updates made since an index was last saved. flush() appends them to a
+    JSONL file that replay() feeds back through the index on load; clear()
+    drops the file once a save holds everything in it.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._pending: list[dict] = []
+
+    def append(self, update: dict):
+        self._pending.append(update)
+
+    def replay(self, apply):
+        """Call apply(update) for every update on disk; replayed updates are not re-journaled"""
+        if os.path.exists(self.path):
+            with open(self.path, encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        apply(json.loads(line))
+        self._pending = []
+
+    def flush(self):
+        """Append the pending updates to the file and fsync it"""
+        if not self._pending:
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.writelines(json.dumps(update) + "\n" for update in self._pending)
+            f.flush()
+            os.fsync(f.fileno())
+        self._pending = []
+
+    def clear(self):
+        # replaying a journal the saved index already holds is harmless, so callers do this last
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        self._pending = []
@@ -0,0 +1,129 @@
+"""
+KB record tagging and metadata filters
+
+Records are tagged with the feature categories they cover and the date
+range their regulation is in force, so searches can be narrowed to the
+current feature and the plan's effective date. Filters use Pinecone's
+metadata filter syntax; matches_filter() evaluates the same syntax for
+the local backends.
+"""
+
+import re
+from datetime import datetime
+from typing import Optional
+
+# Keywords that mark a chunk as relevant to a feature category
+FEATURE_CATEGORIES = {
+    "eligibility": ["eligib", "minimum age", "age 21", "year of service", "1,000 hours", "long-term, part-time", "entry date"],
+    "vesting": ["vest", "forfeit", "nonforfeitable", "cliff", "graded", "411(a)"],
+    "match": ["matching contribution", "employer match", "safe harbor", "401(m)", "acp test", "matching formula"],
+    "auto_enrollment": ["automatic enrollment", "auto-enrollment", "automatic contribution arrangement", "eaca", "qaca", "auto-escalation", "automatically enrolled"],
+    "catch_up": ["catch-up", "catch up", "414(v)", "age 50"],
+}
+
+# Graph features -> KB categories
+FEATURE_TO_CATEGORY = {
+    "eligibility_age": "eligibility",
+    "eligibility_service": "eligibility",
+    "vesting": "vesting",
+    "employer_match": "match",
+    "auto_enrollment": "auto_enrollment",
+    "catch_up": "catch_up",
+}
+
+# Open-ended effective-date bounds (dates are stored as YYYYMMDD ints)
+EARLIEST_DATE = 19000101
+LATEST_DATE = 99991231
+
+_DATE_FORMATS = ["%Y-%m-%d", "%m/%d/%Y", "%m/%d/%y", "%B %d, %Y", "%b %d, %Y", "%B %d %Y", "%d %B %Y", "%B %Y", "%Y"]
+
+
+def categorize(text: str) -> list[str]:
+    """Feature categories whose keywords appear in the text"""
+    lowered = text.lower()
+    return [cat for cat, words in FEATURE_CATEGORIES.items() if any(w in lowered for w in words)]
+
+
+def parse_date(value) -> Optional[int]:
+    """
+    Parse a free-text date ("January 1, 2024", "2024-01-01", "Plan year 2025")
+    into a YYYYMMDD int. Falls back to Jan 1 of the first year mentioned.
+    """
+    if value is None:
+        return None
+    text = str(value).strip().replace("Sept ", "Sep ")
+    text = re.sub(r"(\d)(st|nd|rd|th)\b", r"\1", text)
+
+    for fmt in _DATE_FORMATS:
+        try:
+            return int(datetime.strptime(text, fmt).strftime("%Y%m%d"))
+        except ValueError:
+            continue
+
+    year = re.search(r"\b(19|20)\d{2}\b", text)
+    return int(year.group(0)) * 10000 + 101 if year else None
+
+
+def build_filter(feature: str = None, effective_date=None) -> Optional[dict]:
+    """Pinecone-style filter for the KB records relevant to a feature and plan date"""
+    clauses = {}
+
+    category = FEATURE_TO_CATEGORY.get(feature)
+    if category:
+        clauses["features"] = {"$in": [category]}
+
+    date = parse_date(effective_date)
+    if date:
+        clauses["effective_from"] = {"$lte": date}
+        clauses["effective_to"] = {"$gte": date}
+
+    return clauses or None
+
+
+def _match_condition(value, condition) -> bool:
+    if not isinstance(condition, dict):
+        condition = {"$eq": condition}
+
+    values = value if isinstance(value, list) else [value]
+    for op, target in condition.items():
+        if op == "$eq":
+            ok = target in values
+        elif op == "$ne":
+            ok = target not in values
+        elif op == "$in":
+            ok = any(v in target for v in values)
+        elif op == "$nin":
+            ok = not any(v in target for v in values)
+        elif op in ("$gt", "$gte", "$lt", "$lte"):
+            if value is None or isinstance(value, list):
+                return False
+            ok = {
+                "$gt": value > target,
+                "$gte": value >= target,
+                "$lt": value < target,
+                "$lte": value <= target,
+            }[op]
+        else:
+            raise ValueError(f"Unsupported filter operator: {op}")
+        if not ok:
+            return False
+    return True
+
+
+def matches_filter(metadata: dict, filter: Optional[dict]) -> bool:
+    """Evaluate a Pinecone metadata filter against a record's metadata"""
+    if not filter:
+        return True
+
+    for key, condition in filter.items():
+        if key == "$and":
+            if not all(matches_filter(metadata, sub) for sub in condition):
+                return False
+        elif key == "$or":
+            if not any(matches_filter(metadata, sub) for sub in condition):
+                return False
+        elif key not in metadata:
+            return False
+        elif not _match_condition(metadata[key], condition):
+            return False
+    return True
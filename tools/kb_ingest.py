@@ -0,0 +1,456 @@
+"""
+Knowledge base ingestion - builds the compliance-regulations index
+
+Reads regulation sources (.txt/.md, .pdf, .html) from a local directory,
+chunks them, and embeds + upserts only chunks whose content hash changed
+since the last run. A manifest keeps a per-chunk version history; an
+edited chunk gets a new id and carries its predecessor's history forward.
+Chunks are tagged with feature categories and an effective-date range
+(see tools/kb_filters.py) so searches can be filtered.
+
+Usage:
+    python -m tools.kb_ingest ./regulations
+    python -m tools.kb_ingest ./regulations --backend local --batch-size 64
+"""
+
+import argparse
+import difflib
+import hashlib
+import json
+import os
+import re
+import time
+from datetime import datetime, timezone
+from html.parser import HTMLParser
+
+from .kb_filters import EARLIEST_DATE, LATEST_DATE, categorize, parse_date
+from .lexical_index import LexicalIndex
+from .pdf_extractor import extract_text_from_pdf
+
+TEXT_EXTENSIONS = {".txt", ".md"}
+HTML_EXTENSIONS = {".html", ".htm"}
+PDF_EXTENSIONS = {".pdf"}
+
+DEFAULT_CHUNK_CHARS = 1500
+DEFAULT_OVERLAP_CHARS = 200
+DEFAULT_BATCH_SIZE = 64
+UPSERT_BATCH_SIZE = 100
+
+
+# ============================================================
+# Source loading
+# ============================================================
+
+class _HTMLTextExtractor(HTMLParser):
+    """Collects visible text from an HTML page"""
+
+    SKIP_TAGS = {"script", "style", "nav", "header", "footer", "noscript"}
+    BLOCK_TAGS = {"p", "div", "br", "li", "h1", "h2", "h3", "h4", "h5", "h6", "tr", "section", "article"}
+
+    def __init__(self):
+        super().__init__()
+        self.parts: list[str] = []
+        self._skip_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIP_TAGS:
+            self._skip_depth += 1
+        elif tag in self.BLOCK_TAGS:
+            self.parts.append("\n\n")
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIP_TAGS and self._skip_depth:
+            self._skip_depth -= 1
+
+    def handle_data(self, data):
+        if not self._skip_depth:
+            self.parts.append(data)
+
+
+def html_to_text(raw_html: str) -> str:
+    """Strip tags, scripts and styles from an HTML document"""
+    parser = _HTMLTextExtractor()
+    parser.feed(raw_html)
+    return "".join(parser.parts)
+
+
+def load_source(path: str) -> str:
+    """Read a regulation source file as plain text"""
+    ext = os.path.splitext(path)[1].lower()
+
+    if ext in PDF_EXTENSIONS:
+        with open(path, "rb") as f:
+            return extract_text_from_pdf(f.read())
+
+    with open(path, encoding="utf-8", errors="replace") as f:
+        raw = f.read()
+
+    if ext in HTML_EXTENSIONS:
+        return html_to_text(raw)
+    return raw
+
+
+def iter_source_files(source_dir: str):
+    """Yield supported source files under a directory, in a stable order"""
+    supported = TEXT_EXTENSIONS | HTML_EXTENSIONS | PDF_EXTENSIONS
+    for root, dirs, files in os.walk(source_dir):
+        dirs.sort()
+        for name in sorted(files):
+            if os.path.splitext(name)[1].lower() in supported:
+                yield os.path.join(root, name)
+
+
+# ============================================================
+# Chunking & hashing
+# ============================================================
+
+def normalize_text(text: str) -> str:
+    """Collapse whitespace so cosmetic edits don't change chunk hashes"""
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+def chunk_text(text: str, chunk_chars: int = DEFAULT_CHUNK_CHARS, overlap: int = DEFAULT_OVERLAP_CHARS) -> list[str]:
+    """
+    Pack paragraphs into chunks of roughly chunk_chars characters.
+    Paragraphs longer than a chunk are split on sentence boundaries,
+    and each chunk carries the tail of the previous one as overlap.
+    """
+    paragraphs = [normalize_text(p) for p in re.split(r"\n\s*\n", text)]
+    paragraphs = [p for p in paragraphs if p]
+
+    pieces: list[str] = []
+    for p in paragraphs:
+        if len(p) <= chunk_chars:
+            pieces.append(p)
+            continue
+        sentence_buf = ""
+        for sentence in re.split(r"(?<=[.;:])\s+", p):
+            if sentence_buf and len(sentence_buf) + len(sentence) + 1 > chunk_chars:
+                pieces.append(sentence_buf)
+                sentence_buf = ""
+            sentence_buf = f"{sentence_buf} {sentence}".strip()
+        if sentence_buf:
+            pieces.append(sentence_buf)
+
+    chunks: list[str] = []
+    current = ""
+    for piece in pieces:
+        if current and len(current) + len(piece) + 2 > chunk_chars:
+            chunks.append(current)
+            tail = current[-overlap:] if overlap else ""
+            # start the overlap on a word boundary
+            tail = tail[tail.find(" ") + 1:] if " " in tail else tail
+            current = f"{tail}\n\n{piece}" if tail else piece
+        else:
+            current = f"{current}\n\n{piece}" if current else piece
+    if current:
+        chunks.append(current)
+
+    return chunks
+
+
+def source_id_for(path: str, source_dir: str) -> str:
+    """Stable, Pinecone-safe id prefix for a source file"""
+    rel = os.path.relpath(path, source_dir).replace(os.sep, "/")
+    return re.sub(r"[^A-Za-z0-9_.\-/]", "_", rel)
+
+
+def source_name_for(path: str) -> str:
+    """Human-readable source label shown in search results"""
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return re.sub(r"[_\-]+", " ", stem).strip()
+
+
+# ============================================================
+# Manifest (per-chunk hashes + version history, chunk order per source)
+# ============================================================
+
+def _manifest_path(state_dir: str) -> str:
+    return os.path.join(state_dir, "manifest.json")
+
+
+def load_manifest(state_dir: str) -> dict:
+    path = _manifest_path(state_dir)
+    if not os.path.exists(path):
+        return {"chunks": {}, "sources": {}}
+    with open(path, encoding="utf-8") as f:
+        manifest = json.load(f)
+    manifest.setdefault("sources", {})
+    return manifest
+
+
+def save_manifest(state_dir: str, manifest: dict):
+    os.makedirs(state_dir, exist_ok=True)
+    path = _manifest_path(state_dir)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(path + ".tmp", path)
+
+
+# ============================================================
+# Ingestion
+# ============================================================
+
+def load_source_tags(path: str) -> dict:
+    """
+    Optional sidecar "<file>.meta.json" overriding a source's tags, e.g.
+    {"features": ["vesting"], "effective_from": "2025-01-01", "effective_to": null}
+    """
+    sidecar = os.path.splitext(path)[0] + ".meta.json"
+    if not os.path.exists(sidecar):
+        return {}
+    with open(sidecar, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def iter_chunks(source_dir: str, chunk_chars: int, overlap: int):
+    """Yield (chunk id, chunk text, record metadata) for every source chunk"""
+    for path in iter_source_files(source_dir):
+        source_id = source_id_for(path, source_dir)
+        source_name = source_name_for(path)
+        tags = load_source_tags(path)
+        effective_from = parse_date(tags.get("effective_from")) or EARLIEST_DATE
+        effective_to = parse_date(tags.get("effective_to")) or LATEST_DATE
+
+        seen: set[str] = set()
+        for chunk in chunk_text(load_source(path), chunk_chars, overlap):
+            # ids follow the content, not the position, so a paragraph inserted near the
+            # top of a source doesn't shift (and re-embed) every chunk after it
+            chunk_id = f"{source_id}#{content_hash(chunk)[:16]}"
+            if chunk_id in seen:
+                continue
+            seen.add(chunk_id)
+            yield chunk_id, chunk, {
+                "source_name": source_name,
+                "source_path": source_id,
+                "content": chunk,
+                "features": tags.get("features") or categorize(chunk) or ["general"],
+                "effective_from": effective_from,
+                "effective_to": effective_to,
+            }
+
+
+def _tag_signature(metadata: dict) -> list:
+    return [sorted(metadata["features"]), metadata["effective_from"], metadata["effective_to"]]
+
+
+def _lineage(old_ids: list[str], new_ids: list[str], changed: set[str]) -> dict[str, str]:
+    """
+    Pair each new chunk id with the one it replaced in the same source:
+    chunks that changed in place between unchanged neighbours, matched by position
+    """
+    lineage = {}
+    matcher = difflib.SequenceMatcher(None, old_ids, new_ids, autojunk=False)
+    for op, i1, i2, j1, j2 in matcher.get_opcodes():
+        if op != "replace":
+            continue
+        for old_id, new_id in zip(old_ids[i1:i2], new_ids[j1:j2]):
+            if new_id in changed and old_id not in new_ids:
+                lineage[new_id] = old_id
+    return lineage
+
+
+def plan_ingestion(source_dir: str, manifest: dict, chunk_chars: int, overlap: int) -> tuple[list[dict], list[str], dict]:
+    """
+    Diff the sources against the manifest.
+    Returns (records that need embedding, chunk ids that disappeared,
+    each source's chunk ids in order). A changed record replacing an old
+    chunk in place names it as "previous".
+    """
+    changed: list[dict] = []
+    order: dict[str, list[str]] = {}
+    known = manifest["chunks"]
+
+    for chunk_id, chunk, metadata in iter_chunks(source_dir, chunk_chars, overlap):
+        order.setdefault(metadata["source_path"], []).append(chunk_id)
+
+        digest = content_hash(chunk)
+        entry = known.get(chunk_id)
+        if (
+            entry
+            and entry["hash"] == digest
+            and entry.get("tags") == _tag_signature(metadata)
+            and not entry.get("deleted")
+        ):
+            continue
+
+        changed.append({"id": chunk_id, "hash": digest, "content": chunk, "metadata": metadata})
+
+    changed_ids = {record["id"] for record in changed if record["id"] not in known}
+    lineage: dict[str, str] = {}
+    for source, ids in order.items():
+        lineage.update(_lineage(manifest["sources"].get(source, []), ids, changed_ids))
+    for record in changed:
+        if record["id"] in lineage:
+            record["previous"] = lineage[record["id"]]
+
+    seen_ids = {chunk_id for ids in order.values() for chunk_id in ids}
+    removed = [cid for cid, entry in known.items() if cid not in seen_ids and not entry.get("deleted")]
+    return changed, removed, order
+
+
+def _batched(items: list, size: int):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def _persist(index, compact: bool = False):
+    """Journal (or, with compact, save) a LocalIndex's pending updates; Pinecone persists each call itself"""
+    from .local_index import LocalIndex
+
+    if not isinstance(index, LocalIndex):
+        return
+    if compact:
+        index.save()
+    else:
+        index.checkpoint()
+
+
+def _lexical_dir() -> str:
+    return os.getenv("KB_LEXICAL_DIR", ".kb_lexical")
+
+
+def build_lexical_index(source_dir: str, chunk_chars: int = DEFAULT_CHUNK_CHARS, overlap: int = DEFAULT_OVERLAP_CHARS) -> int:
+    """Rebuild the BM25 index from sources without embedding anything"""
+    lexical = LexicalIndex(_lexical_dir())
+    seen: set[str] = set()
+
+    for chunk_id, chunk, metadata in iter_chunks(source_dir, chunk_chars, overlap):
+        seen.add(chunk_id)
+        lexical.add(chunk_id, chunk, metadata)
+
+    for stale in [doc_id for doc_id in lexical.doc_ids() if doc_id not in seen]:
+        lexical.remove(stale)
+
+    lexical.save()
+    return len(lexical)
+
+
+def ingest(
+    source_dir: str,
+    state_dir: str = ".kb_state",
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    chunk_chars: int = DEFAULT_CHUNK_CHARS,
+    overlap: int = DEFAULT_OVERLAP_CHARS,
+    dry_run: bool = False,
+) -> dict:
+    """Embed and upsert new/changed chunks; delete chunks whose source text is gone"""
+    from .pinecone_search import _get_index
+
+    manifest = load_manifest(state_dir)
+    changed, removed, order = plan_ingestion(source_dir, manifest, chunk_chars, overlap)
+    stats = {"changed": len(changed), "removed": len(removed), "upserted": 0}
+
+    if dry_run or (not changed and not removed):
+        if not dry_run and manifest["sources"] != order:
+            # a manifest from before source order was kept
+            manifest["sources"] = order
+            save_manifest(state_dir, manifest)
+        return stats
+
+    index, model = _get_index()
+    lexical = LexicalIndex(_lexical_dir())
+    now = datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+    for batch in _batched(changed, batch_size):
+        embeddings = model.encode([r["content"] for r in batch], batch_size=batch_size)
+
+        vectors = []
+        for record, embedding in zip(batch, embeddings):
+            entry = manifest["chunks"].get(record["id"])
+            if entry is None and "previous" in record:
+                # an edit: the new id continues the old chunk's history
+                previous = manifest["chunks"][record["previous"]]
+                previous["replaced_by"] = record["id"]
+                entry = {"version": previous["version"], "history": list(previous["history"]),
+                         "previous": record["previous"]}
+            entry = entry or {"version": 0, "history": []}
+            version = entry["version"] + 1
+            vectors.append({
+                "id": record["id"],
+                "values": embedding.tolist(),
+                "metadata": {**record["metadata"], "content_hash": record["hash"], "version": version},
+            })
+            lexical.add(record["id"], record["content"], vectors[-1]["metadata"])
+            entry.update({
+                "hash": record["hash"],
+                "tags": _tag_signature(record["metadata"]),
+                "version": version,
+                "updated_at": now,
+                "deleted": False,
+            })
+            entry["history"].append({"version": version, "hash": record["hash"], "updated_at": now})
+            manifest["chunks"][record["id"]] = entry
+
+        for upsert_batch in _batched(vectors, UPSERT_BATCH_SIZE):
+            index.upsert(vectors=upsert_batch)
+            stats["upserted"] += len(upsert_batch)
+
+        # checkpoint so an interrupted run resumes where it stopped; the local indexes
+        # journal the batch and are compacted once, at the end
+        _persist(index)
+        lexical.checkpoint()
+        save_manifest(state_dir, manifest)
+
+    for delete_batch in _batched(removed, UPSERT_BATCH_SIZE):
+        index.delete(ids=delete_batch)
+        for chunk_id in delete_batch:
+            lexical.remove(chunk_id)
+            entry = manifest["chunks"][chunk_id]
+            entry.update({"deleted": True, "updated_at": now})
+            tombstone = {"version": entry["version"], "hash": None, "updated_at": now}
+            if entry.get("replaced_by"):
+                tombstone["replaced_by"] = entry["replaced_by"]
+            entry["history"].append(tombstone)
+
+    _persist(index, compact=True)
+    lexical.save()
+    # only once every batch is in, so a resumed run still pairs edits with what they replaced
+    manifest["sources"] = order
+    save_manifest(state_dir, manifest)
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build or refresh the compliance regulations KB")
+    parser.add_argument("source_dir", help="Directory of regulation sources (.txt, .md, .pdf, .html)")
+    parser.add_argument("--backend", choices=["pinecone", "local"], help="Overrides KB_BACKEND")
+    parser.add_argument("--state-dir", default=os.getenv("KB_STATE_DIR", ".kb_state"))
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--chunk-chars", type=int, default=DEFAULT_CHUNK_CHARS)
+    parser.add_argument("--overlap", type=int, default=DEFAULT_OVERLAP_CHARS)
+    parser.add_argument("--dry-run", action="store_true", help="Report changes without embedding")
+    parser.add_argument("--lexical-only", action="store_true", help="Only rebuild the BM25 index")
+    args = parser.parse_args(argv)
+
+    if args.lexical_only:
+        count = build_lexical_index(args.source_dir, args.chunk_chars, args.overlap)
+        print(f"BM25 index rebuilt with {count} chunks")
+        return
+
+    if args.backend:
+        os.environ["KB_BACKEND"] = args.backend
+
+    started = time.perf_counter()
+    stats = ingest(
+        args.source_dir,
+        state_dir=args.state_dir,
+        batch_size=args.batch_size,
+        chunk_chars=args.chunk_chars,
+        overlap=args.overlap,
+        dry_run=args.dry_run,
+    )
+    elapsed = time.perf_counter() - started
+
+    print(
+        f"{stats['changed']} new/changed chunks, {stats['removed']} removed, "
+        f"{stats['upserted']} upserted in {elapsed:.1f}s"
+    )
+
+
+if __name__ == "__main__":
+    main()
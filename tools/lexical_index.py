@@ -0,0 +1,277 @@
+"""
+Lexical (BM25) inverted index over KB chunks, with citation-aware tokens
+"""
+
+import json
+import math
+import mmap
+import os
+import re
+import struct
+from collections import Counter, defaultdict
+
+from .journal import Journal
+from .kb_filters import matches_filter
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+_POSTING = struct.Struct("<II")  # (doc number, term frequency)
+_DOC = struct.Struct("<QII")  # (metadata offset, metadata size, doc length in tokens)
+
+# segment files; the lexicon holds only term -> [postings offset, count]
+LEXICON = "lexicon.json"
+POSTINGS = "postings.bin"
+DOC_IDS = "doc_ids.json"
+DOCS = "docs.bin"
+METADATA = "metadata.bin"
+JOURNAL = "journal.jsonl"
+
+_CITATION = re.compile(r"\d+[a-z]?(?:\([a-z0-9]+\))+")
+_SHORT_CITATION = re.compile(r"\b(\d{3})([a-z])\b")  # 401k -> 401(k)
+_WORD = re.compile(r"[a-z0-9]+(?:\.[0-9]+)?")
+
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "has", "in", "is",
+    "it", "its", "of", "on", "or", "that", "the", "this", "to", "was", "were", "will", "with",
+}
+
+
+def tokenize(text: str) -> list[str]:
+    """
+    Lowercased word tokens plus citation tokens.
+    "411(a)(2)" yields "411(a)(2)", "411(a)" and "411" so partial cites still match.
+    """
+    text = _SHORT_CITATION.sub(r"\1(\2)", text.lower().replace("§", " "))
+
+    tokens: list[str] = []
+    for cite in _CITATION.findall(text):
+        parts = re.findall(r"\([a-z0-9]+\)", cite)
+        base = cite[: len(cite) - len("".join(parts))]
+        tokens.append(base)
+        for i in range(1, len(parts) + 1):
+            tokens.append(base + "".join(parts[:i]))
+
+    remainder = _CITATION.sub(" ", text)
+    tokens.extend(t for t in _WORD.findall(remainder) if t not in STOPWORDS)
+    return tokens
+
+
+class LexicalIndex:
+    """Incrementally maintained BM25 index with memory-mapped postings and document segments"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._journal = Journal(os.path.join(path, JOURNAL))
+        self._reset()
+        self._load()
+
+    def _reset(self):
+        # document table (segment + delta share numbering)
+        self._doc_ids: list[str] = []
+        self._live: dict[str, int] = {}  # doc id -> doc number
+        self._dead: set[int] = set()
+        self._total_length = 0  # tokens across live docs
+
+        # on-disk segment
+        self._lexicon: dict[str, list[int]] = {}  # term -> [offset, count]
+        self._segment_docs = 0
+        self._files_open: list = []
+        self._postings = None
+        self._docs = None  # one _DOC entry per segment doc
+        self._metadata = None  # their JSON metadata records, back to back
+
+        # in-memory delta (doc numbers from _segment_docs up)
+        self._delta: dict[str, list[tuple[int, int]]] = defaultdict(list)
+        self._delta_lengths: list[int] = []
+        self._delta_metadata: list[dict] = []
+
+    # ------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def _mmap(self, name: str):
+        if not os.path.getsize(self._file(name)):
+            return None
+        f = open(self._file(name), "rb")
+        self._files_open.append(f)
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def _load(self):
+        if os.path.exists(self._file(LEXICON)):
+            with open(self._file(LEXICON), encoding="utf-8") as f:
+                self._lexicon = json.load(f)
+            with open(self._file(DOC_IDS), encoding="utf-8") as f:
+                self._doc_ids = json.load(f)
+
+            self._segment_docs = len(self._doc_ids)
+            self._live = {doc_id: n for n, doc_id in enumerate(self._doc_ids)}
+            self._postings = self._mmap(POSTINGS)
+            self._docs = self._mmap(DOCS)
+            self._metadata = self._mmap(METADATA)
+            if self._docs is not None:
+                self._total_length = sum(length for _, _, length in _DOC.iter_unpack(self._docs))
+
+        self._journal.replay(self._apply)  # updates checkpointed since the segment was written
+
+    def close(self):
+        for m in (self._postings, self._docs, self._metadata):
+            if m is not None:
+                m.close()
+        for f in self._files_open:
+            f.close()
+        self._postings = self._docs = self._metadata = None
+        self._files_open = []
+
+    def checkpoint(self):
+        """Persist the updates since the last checkpoint without compacting"""
+        self._journal.flush()
+
+    def save(self):
+        """Compact segment + delta (dropping removed docs) into a new segment on disk"""
+        os.makedirs(self.path, exist_ok=True)
+
+        # renumber live docs densely
+        live_numbers = sorted(self._live.values())
+        renumber = {old: new for new, old in enumerate(live_numbers)}
+
+        merged: dict[str, list[tuple[int, int]]] = defaultdict(list)
+        for term in set(self._lexicon) | set(self._delta):
+            for doc_num, tf in self._iter_postings(term):
+                if doc_num in renumber:
+                    merged[term].append((renumber[doc_num], tf))
+
+        terms: dict[str, list[int]] = {}
+        with open(self._file(POSTINGS) + ".tmp", "wb") as f:
+            offset = 0
+            for term in sorted(merged):
+                postings = sorted(merged[term])
+                f.write(b"".join(_POSTING.pack(n, tf) for n, tf in postings))
+                terms[term] = [offset, len(postings)]
+                offset += len(postings) * _POSTING.size
+
+        with open(self._file(DOCS) + ".tmp", "wb") as docs, open(self._file(METADATA) + ".tmp", "wb") as metadata:
+            offset = 0
+            for n in live_numbers:
+                record = self._metadata_record(n)
+                docs.write(_DOC.pack(offset, len(record), self._doc_length(n)))
+                metadata.write(record)
+                offset += len(record)
+
+        with open(self._file(LEXICON) + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(terms, f)
+        with open(self._file(DOC_IDS) + ".tmp", "w", encoding="utf-8") as f:
+            json.dump([self._doc_ids[n] for n in live_numbers], f)
+
+        self.close()
+        for name in (POSTINGS, DOCS, METADATA, LEXICON, DOC_IDS):
+            os.replace(self._file(name) + ".tmp", self._file(name))
+        self._journal.clear()
+
+        self._reset()
+        self._load()
+
+    # ------------------------------------------------------------
+    # Updates
+    # ------------------------------------------------------------
+
+    def add(self, doc_id: str, text: str, metadata: dict = None):
+        """Index (or re-index) a chunk"""
+        self._apply({"op": "add", "id": doc_id, "text": text, "metadata": metadata or {}})
+
+    def remove(self, doc_id: str):
+        if doc_id in self._live:
+            self._apply({"op": "remove", "id": doc_id})
+
+    def _apply(self, update: dict):
+        self._journal.append(update)
+        self._drop(update["id"])
+        if update["op"] != "add":
+            return
+
+        tokens = tokenize(update["text"])
+        doc_num = len(self._doc_ids)
+        self._doc_ids.append(update["id"])
+        self._delta_lengths.append(len(tokens))
+        self._delta_metadata.append(update["metadata"])
+        self._live[update["id"]] = doc_num
+        self._total_length += len(tokens)
+
+        for term, tf in Counter(tokens).items():
+            self._delta[term].append((doc_num, tf))
+
+    def _drop(self, doc_id: str):
+        doc_num = self._live.pop(doc_id, None)
+        if doc_num is not None:
+            self._dead.add(doc_num)
+            self._total_length -= self._doc_length(doc_num)
+
+    def __len__(self) -> int:
+        return len(self._live)
+
+    def doc_ids(self) -> list[str]:
+        return list(self._live)
+
+    # ------------------------------------------------------------
+    # Documents
+    # ------------------------------------------------------------
+
+    def _doc_length(self, n: int) -> int:
+        if n >= self._segment_docs:
+            return self._delta_lengths[n - self._segment_docs]
+        return _DOC.unpack_from(self._docs, n * _DOC.size)[2]
+
+    def _metadata_record(self, n: int) -> bytes:
+        if n >= self._segment_docs:
+            return json.dumps(self._delta_metadata[n - self._segment_docs]).encode("utf-8")
+        offset, size, _ = _DOC.unpack_from(self._docs, n * _DOC.size)
+        return self._metadata[offset:offset + size]
+
+    def _doc_metadata(self, n: int) -> dict:
+        if n >= self._segment_docs:
+            return self._delta_metadata[n - self._segment_docs]
+        return json.loads(self._metadata_record(n))
+
+    # ------------------------------------------------------------
+    # Search
+    # ------------------------------------------------------------
+
+    def _iter_postings(self, term: str):
+        entry = self._lexicon.get(term)
+        if entry and self._postings is not None:
+            offset, count = entry
+            yield from _POSTING.iter_unpack(self._postings[offset:offset + count * _POSTING.size])
+        yield from self._delta.get(term, ())
+
+    def search(self, query: str, top_k: int = 10, filter: dict = None) -> list[dict]:
+        """BM25 search; returns [{"id", "score", "metadata"}] best first"""
+        if not self._live:
+            return []
+
+        n_docs = len(self._live)
+        avgdl = self._total_length / n_docs or 1.0
+
+        scores: dict[int, float] = defaultdict(float)
+        for term in set(tokenize(query)):
+            postings = [(n, tf) for n, tf in self._iter_postings(term) if n not in self._dead]
+            if not postings:
+                continue
+            idf = math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+            for n, tf in postings:
+                norm = K1 * (1 - B + B * self._doc_length(n) / avgdl)
+                scores[n] += idf * tf * (K1 + 1) / (tf + norm)
+
+        # metadata is decoded only for scored docs, best first, until top_k pass the filter
+        hits = []
+        for n, score in sorted(scores.items(), key=lambda item: item[1], reverse=True):
+            metadata = self._doc_metadata(n)
+            if filter and not matches_filter(metadata, filter):
+                continue
+            hits.append({"id": self._doc_ids[n], "score": score, "metadata": metadata})
+            if len(hits) == top_k:
+                break
+        return hits
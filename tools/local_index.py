@@ -0,0 +1,176 @@
+"""
+Local vector index - a file-backed stand-in for the Pinecone index
+"""
+
+import json
+import os
+from types import SimpleNamespace
+
+import numpy as np
+
+from .journal import Journal
+from .kb_filters import matches_filter
+
+
+class LocalIndex:
+    """
+    Minimal Pinecone-compatible index kept on local disk.
+
+    Supports the subset of the Pinecone Index API the app uses:
+    upsert(vectors=...), delete(ids=...), query(vector=..., top_k=..., include_metadata=..., filter=...).
+    Vectors live in a single .npy matrix, ids and metadata in a JSON sidecar.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._ids: list[str] = []
+        self._metadata: list[dict] = []
+        self._vectors = None
+        self._new_rows: list = []  # rows appended since the matrix was last stacked
+        self._positions: dict[str, int] = {}
+        self._journal = Journal(os.path.join(path, "journal.jsonl"))
+        self._load()
+
+    # ------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------
+
+    def _files(self) -> tuple[str, str]:
+        return os.path.join(self.path, "vectors.npy"), os.path.join(self.path, "records.json")
+
+    def _load(self):
+        vectors_file, records_file = self._files()
+        if os.path.exists(records_file):
+            with open(records_file, encoding="utf-8") as f:
+                records = json.load(f)
+
+            self._ids = records["ids"]
+            self._metadata = records["metadata"]
+            self._vectors = np.load(vectors_file) if self._ids else None
+            self._positions = {vid: i for i, vid in enumerate(self._ids)}
+
+        self._journal.replay(self._replay)  # updates checkpointed since the matrix was written
+
+    def _replay(self, update: dict):
+        if "vectors" in update:
+            self.upsert(update["vectors"])
+        else:
+            self.delete(update["ids"])
+
+    def _matrix(self):
+        """The vectors as one matrix, stacking any rows appended since it was last built"""
+        if self._new_rows:
+            stacked = np.vstack(self._new_rows)
+            self._vectors = stacked if self._vectors is None else np.vstack([self._vectors, stacked])
+            self._new_rows = []
+        return self._vectors
+
+    def checkpoint(self):
+        """Persist the updates since the last checkpoint without rewriting the matrix"""
+        self._journal.flush()
+
+    def save(self):
+        """Write the index to disk atomically"""
+        os.makedirs(self.path, exist_ok=True)
+        vectors_file, records_file = self._files()
+
+        if self._matrix() is not None:
+            with open(vectors_file + ".tmp", "wb") as f:
+                np.save(f, self._vectors)
+            os.replace(vectors_file + ".tmp", vectors_file)
+
+        with open(records_file + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({"ids": self._ids, "metadata": self._metadata}, f)
+        os.replace(records_file + ".tmp", records_file)
+
+        self._journal.clear()
+
+    # ------------------------------------------------------------
+    # Pinecone-style API
+    # ------------------------------------------------------------
+
+    def upsert(self, vectors: list[dict]) -> dict:
+        """Insert or replace records given as {"id", "values", "metadata"} dicts"""
+        if not vectors:
+            return {"upserted_count": 0}
+
+        stacked = 0 if self._vectors is None else len(self._vectors)
+        for record in vectors:
+            values = np.asarray(record["values"], dtype=np.float32)
+            norm = np.linalg.norm(values)
+            if norm:
+                values = values / norm
+
+            vid = record["id"]
+            if vid in self._positions:
+                pos = self._positions[vid]
+                if pos < stacked:
+                    self._vectors[pos] = values
+                else:
+                    self._new_rows[pos - stacked] = values
+                self._metadata[pos] = record.get("metadata", {})
+            else:
+                self._positions[vid] = len(self._ids)
+                self._ids.append(vid)
+                self._metadata.append(record.get("metadata", {}))
+                self._new_rows.append(values)
+
+        self._journal.append({"vectors": [
+            {"id": r["id"], "values": [float(v) for v in r["values"]], "metadata": r.get("metadata", {})}
+            for r in vectors
+        ]})
+        return {"upserted_count": len(vectors)}
+
+    def delete(self, ids: list[str]) -> dict:
+        """Remove records by id"""
+        doomed = {self._positions[i] for i in ids if i in self._positions}
+        if not doomed:
+            return {}
+
+        vectors = self._matrix()
+        keep = [i for i in range(len(self._ids)) if i not in doomed]
+        self._ids = [self._ids[i] for i in keep]
+        self._metadata = [self._metadata[i] for i in keep]
+        self._vectors = vectors[keep] if keep else None
+        self._positions = {vid: i for i, vid in enumerate(self._ids)}
+
+        self._journal.append({"ids": list(ids)})
+        return {}
+
+    def query(self, vector, top_k: int = 5, include_metadata: bool = True, filter: dict = None, **kwargs):
+        """Cosine-similarity search returning a Pinecone-shaped response"""
+        if self._matrix() is None or not self._ids:
+            return SimpleNamespace(matches=[])
+
+        q = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(q)
+        if norm:
+            q = q / norm
+
+        # only score the rows that pass the metadata filter
+        if filter:
+            rows = np.array([i for i, m in enumerate(self._metadata) if matches_filter(m, filter)], dtype=np.int64)
+            if not len(rows):
+                return SimpleNamespace(matches=[])
+        else:
+            rows = np.arange(len(self._ids))
+
+        scores = self._vectors[rows] @ q
+        k = min(top_k, len(scores))
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best])]
+        top = rows[best]
+        scores = dict(zip(top.tolist(), scores[best].tolist()))
+
+        matches = [
+            SimpleNamespace(
+                id=self._ids[i],
+                score=scores[i],
+                metadata=self._metadata[i] if include_metadata else {},
+            )
+            for i in top.tolist()
+        ]
+        return SimpleNamespace(matches=matches)
+
+    def describe_index_stats(self) -> dict:
+        return {"total_vector_count": len(self._ids)}
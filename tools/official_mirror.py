@@ -0,0 +1,463 @@
+"""
+Offline mirror of official-source pages for the web verification step
+
+Each refresh fetches the allowed official domains into a new version with
+a BM25 index over its passages; CURRENT names the version searches read.
+
+Usage:
+    python -m tools.official_mirror refresh
+    python -m tools.official_mirror refresh --seeds urls.txt
+    python -m tools.official_mirror refresh --from-dir ./saved_pages
+    python -m tools.official_mirror versions
+    python -m tools.official_mirror use 20261019T053800Z      # roll back
+    python -m tools.official_mirror search "vesting schedule 411(a)"
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Callable, Optional
+from urllib.parse import urlparse
+
+from .kb_ingest import chunk_text, html_to_text, iter_source_files, load_source, source_name_for
+from .lexical_index import LexicalIndex
+
+PASSAGE_CHARS = 800        # one passage is one search result's snippet
+PASSAGE_OVERLAP = 100
+FETCH_TIMEOUT_S = 15.0
+FETCH_WORKERS = 4
+KEEP_VERSIONS = int(os.getenv("MIRROR_KEEP_VERSIONS", "3"))
+USER_AGENT = "compliance-drift-detector-mirror/1.0"
+
+# Pages that cover the audited features; refresh also re-fetches everything already mirrored
+DEFAULT_SEEDS = [
+    "https://www.irs.gov/retirement-plans/plan-participant-employee/retirement-topics-vesting",
+    "https://www.irs.gov/retirement-plans/plan-participant-employee/retirement-topics-catch-up-contributions",
+    "https://www.irs.gov/retirement-plans/plan-participant-employee/retirement-topics-401k-and-profit-sharing-plan-contribution-limits",
+    "https://www.irs.gov/retirement-plans/plan-participant-employee/retirement-topics-hardship-distributions",
+    "https://www.irs.gov/retirement-plans/401k-plan-qualification-requirements",
+    "https://www.irs.gov/retirement-plans/a-guide-to-common-qualified-plan-requirements",
+    "https://www.irs.gov/retirement-plans/retirement-plans-faqs-regarding-loans",
+    "https://www.irs.gov/retirement-plans/faqs-auto-enrollment-are-there-different-types-of-automatic-enrollment-contribution-arrangements-for-retirement-plans",
+    "https://www.dol.gov/agencies/ebsa/about-ebsa/our-activities/resource-center/publications/what-you-should-know-about-your-retirement-plan",
+    "https://www.ecfr.gov/current/title-26/section-1.411(a)-3",
+    "https://www.ecfr.gov/current/title-26/section-1.410(a)-3",
+    "https://www.ecfr.gov/current/title-26/section-1.414(v)-1",
+    "https://www.ecfr.gov/current/title-29/section-2550.404c-5",
+]
+
+_TITLE = re.compile(r"<title[^>]*>(.*?)</title>", re.IGNORECASE | re.DOTALL)
+_SUFFIXES = {".html", ".htm", ".txt", ".md"}
+
+
+def mirror_dir() -> str:
+    return os.getenv("OFFICIAL_MIRROR_DIR", ".official_mirror")
+
+
+def mirror_mode() -> str:
+    """"auto": mirror first, live search when it has nothing; "only": never go live; "off": live only"""
+    return os.getenv("OFFICIAL_MIRROR", "auto").lower()
+
+
+def allowed(url: str) -> bool:
+    from .web_search import ALLOWED_DOMAINS
+
+    host = (urlparse(url).hostname or "").lower()
+    return any(host == d or host.endswith("." + d) for d in ALLOWED_DOMAINS)
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+
+# ============================================================
+# Fetchers
+# ============================================================
+
+@dataclass
+class Fetched:
+    url: str
+    status: int            # 200, 304 (unchanged since the stored copy), other = failed
+    title: str = ""
+    text: str = ""
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    error: str = ""
+
+
+Fetcher = Callable[[str, dict], Fetched]  # (url, previous manifest entry or {}) -> Fetched
+
+
+def _title(raw_html: str) -> str:
+    m = _TITLE.search(raw_html)
+    return re.sub(r"\s+", " ", m.group(1)).strip() if m else ""
+
+
+def http_fetch(url: str, previous: dict) -> Fetched:
+    """Live fetch, conditional on the stored copy's validators"""
+    import requests
+
+    from .pdf_extractor import extract_text_from_pdf
+
+    headers = {"User-Agent": USER_AGENT}
+    if previous.get("etag"):
+        headers["If-None-Match"] = previous["etag"]
+    if previous.get("last_modified"):
+        headers["If-Modified-Since"] = previous["last_modified"]
+
+    response = requests.get(url, headers=headers, timeout=FETCH_TIMEOUT_S)
+    if response.status_code != 200:
+        return Fetched(url, response.status_code)
+
+    content_type = response.headers.get("Content-Type", "").lower()
+    if "pdf" in content_type or url.lower().endswith(".pdf"):
+        title, text = "", extract_text_from_pdf(response.content)
+    elif "html" in content_type or response.text.lstrip().startswith("<"):
+        title, text = _title(response.text), html_to_text(response.text)
+    else:
+        title, text = "", response.text
+    return Fetched(url, 200, title, text, response.headers.get("ETag"), response.headers.get("Last-Modified"))
+
+
+def directory_fetcher(source_dir: str) -> tuple[list[str], Fetcher]:
+    """
+    Saved pages standing in for the network. A page's URL comes from an
+    optional "<file>.meta.json" sidecar ({"url": ..., "title": ...}), else
+    from its path: www.irs.gov/retirement-plans/vesting.html ->
+    https://www.irs.gov/retirement-plans/vesting
+    """
+    pages = {}
+    for path in iter_source_files(source_dir):
+        sidecar = os.path.splitext(path)[0] + ".meta.json"
+        meta = {}
+        if os.path.exists(sidecar):
+            with open(sidecar, encoding="utf-8") as f:
+                meta = json.load(f)
+        rel, ext = os.path.splitext(os.path.relpath(path, source_dir).replace(os.sep, "/"))
+        url = meta.get("url") or "https://" + (rel if ext.lower() in _SUFFIXES else rel + ext)
+        pages[url] = (path, meta.get("title"))
+
+    def fetch(url: str, previous: dict) -> Fetched:
+        if url not in pages:
+            return Fetched(url, 404)
+        path, title = pages[url]
+        if title is None and path.lower().endswith((".html", ".htm")):
+            with open(path, encoding="utf-8", errors="replace") as f:
+                title = _title(f.read())
+        return Fetched(url, 200, title or source_name_for(path), load_source(path))
+
+    return list(pages), fetch
+
+
+def static_fetcher(pages: dict[str, tuple[str, str]]) -> Fetcher:
+    """In-memory stand-in: {url: (title, text)}"""
+    def fetch(url: str, previous: dict) -> Fetched:
+        if url not in pages:
+            return Fetched(url, 404)
+        title, text = pages[url]
+        return Fetched(url, 200, title, text)
+    return fetch
+
+
+# ============================================================
+# Versions
+# ============================================================
+
+def _version_dir(root: str, version: str) -> str:
+    return os.path.join(root, "versions", version)
+
+
+def _page_path(root: str, digest: str) -> str:
+    return os.path.join(root, "pages", digest[:2], digest + ".txt")
+
+
+def current_version(root: str = None) -> Optional[str]:
+    path = os.path.join(root or mirror_dir(), "CURRENT")
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return f.read().strip() or None
+
+
+def _set_current(root: str, version: str):
+    path = os.path.join(root, "CURRENT")
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        f.write(version)
+    os.replace(path + ".tmp", path)
+
+
+def load_manifest(root: str = None, version: str = None) -> dict:
+    root = root or mirror_dir()
+    version = version or current_version(root)
+    path = os.path.join(_version_dir(root, version), "manifest.json") if version else ""
+    if not version or not os.path.exists(path):
+        return {"version": None, "pages": {}}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def list_versions(root: str = None) -> list[dict]:
+    root = root or mirror_dir()
+    versions_dir = os.path.join(root, "versions")
+    if not os.path.isdir(versions_dir):
+        return []
+    current = current_version(root)
+    rows = []
+    for version in sorted(os.listdir(versions_dir)):
+        manifest = load_manifest(root, version)
+        rows.append({"version": version, "created_at": manifest.get("created_at"),
+                     "pages": len(manifest["pages"]), "current": version == current})
+    return rows
+
+
+def use_version(version: str, root: str = None):
+    """Point searches at an existing version (roll back / forward)"""
+    root = root or mirror_dir()
+    if not os.path.exists(os.path.join(_version_dir(root, version), "manifest.json")):
+        raise ValueError(f"No mirror version {version!r}")
+    _set_current(root, version)
+
+
+def _prune(root: str, keep: int):
+    """Drop all but the newest `keep` versions (never CURRENT) and the page copies only they used"""
+    current = current_version(root)
+    versions = sorted(os.listdir(os.path.join(root, "versions")))
+    for version in versions[:-keep] if keep > 0 else []:
+        if version != current:
+            shutil.rmtree(_version_dir(root, version), ignore_errors=True)
+
+    live = set()
+    for version in os.listdir(os.path.join(root, "versions")):
+        live.update(p["digest"] for p in load_manifest(root, version)["pages"].values())
+    pages_dir = os.path.join(root, "pages")
+    for shard in os.listdir(pages_dir) if os.path.isdir(pages_dir) else []:
+        for name in os.listdir(os.path.join(pages_dir, shard)):
+            if name[:-len(".txt")] not in live:
+                os.remove(os.path.join(pages_dir, shard, name))
+
+
+# ============================================================
+# Refresh job
+# ============================================================
+
+_pending_lock = threading.Lock()
+
+
+def queue_urls(urls: list[str], root: str = None):
+    """
+    Remember official URLs the live fallback found, for the next refresh to
+    mirror. Only once a mirror exists; each URL is queued once
+    """
+    root = root or mirror_dir()
+    if current_version(root) is None:
+        return
+    with _pending_lock:
+        queued = _pending(root)
+        mirrored = load_manifest(root)["pages"]
+        new = [u for u in dict.fromkeys(urls) if u and allowed(u) and u not in mirrored and u not in queued]
+        if new:
+            _save_pending(root, queued + new)
+
+
+def _pending(root: str) -> list[str]:
+    path = os.path.join(root, "pending.json")
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _save_pending(root: str, urls: list[str]):
+    path = os.path.join(root, "pending.json")
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(urls, f, indent=2)
+    os.replace(path + ".tmp", path)
+
+
+def _fetch(fetch: Fetcher, url: str, previous: dict) -> Fetched:
+    try:
+        return fetch(url, previous)
+    except Exception as e:
+        return Fetched(url, 0, error=str(e))
+
+
+def refresh(urls: list[str] = None, fetch: Fetcher = http_fetch, root: str = None,
+            workers: int = FETCH_WORKERS, keep: int = KEEP_VERSIONS) -> dict:
+    """
+    Fetch the seed URLs, everything already mirrored and the queued URLs
+    into a new version, index it, and make it CURRENT
+    """
+    root = root or mirror_dir()
+    previous = load_manifest(root)
+    # after a rollback CURRENT is not the newest version; pages only the newer ones had are kept too
+    newest = list_versions(root)[-1:]
+    known = load_manifest(root, newest[0]["version"])["pages"] if newest else {}
+    pending = _pending(root)
+    urls = list(urls or DEFAULT_SEEDS) + list(previous["pages"]) + list(known) + pending
+    urls = [u for u in dict.fromkeys(urls) if allowed(u)]
+
+    version = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    while os.path.exists(_version_dir(root, version)):
+        version += "+"
+    os.makedirs(_version_dir(root, version))
+
+    now = _now()
+    pages, stats = {}, {"new": 0, "changed": 0, "unchanged": 0, "failed": 0}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        fetched_pages = pool.map(lambda u: _fetch(fetch, u, previous["pages"].get(u, {})), urls)
+        for fetched in fetched_pages:
+            old = previous["pages"].get(fetched.url)
+            if fetched.status == 304 and old:
+                pages[fetched.url] = {**old, "checked_at": now}
+                stats["unchanged"] += 1
+            elif fetched.status == 200 and fetched.text.strip():
+                text = fetched.text.strip()
+                digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+                path = _page_path(root, digest)
+                if not os.path.exists(path):
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    with open(path + ".tmp", "w", encoding="utf-8") as f:
+                        f.write(text)
+                    os.replace(path + ".tmp", path)
+                unchanged = old is not None and old["digest"] == digest
+                pages[fetched.url] = {
+                    "title": fetched.title or (old or {}).get("title") or fetched.url,
+                    "digest": digest,
+                    "domain": urlparse(fetched.url).hostname,
+                    "fetched_at": old["fetched_at"] if unchanged else now,
+                    "checked_at": now,
+                    "etag": fetched.etag,
+                    "last_modified": fetched.last_modified,
+                }
+                stats["unchanged" if unchanged else "changed" if old else "new"] += 1
+            else:
+                stats["failed"] += 1
+                if old:
+                    # keep the last good copy; the failure is recorded, not served
+                    pages[fetched.url] = {**old, "error": fetched.error or f"HTTP {fetched.status}"}
+
+    index = LexicalIndex(os.path.join(_version_dir(root, version), "index"))
+    for url, page in pages.items():
+        with open(_page_path(root, page["digest"]), encoding="utf-8") as f:
+            text = f.read()
+        for n, passage in enumerate(chunk_text(text, PASSAGE_CHARS, PASSAGE_OVERLAP)):
+            index.add(f"{url}#{n}", passage, {"url": url, "title": page["title"], "content": passage})
+    index.save()
+    index.close()
+
+    manifest = {"version": version, "created_at": now, "previous": previous["version"], "pages": pages}
+    with open(os.path.join(_version_dir(root, version), "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    _set_current(root, version)
+
+    if pending:
+        # URLs queued while this refresh ran stay for the next one
+        with _pending_lock:
+            done = set(pending)
+            _save_pending(root, [u for u in _pending(root) if u not in done])
+    _prune(root, keep)
+    return {"version": version, "pages": len(pages), "passages": len(index), **stats}
+
+
+# ============================================================
+# Search
+# ============================================================
+
+class Mirror:
+    """One mirror version, opened for search"""
+
+    def __init__(self, root: str, version: str):
+        self.version = version
+        self.manifest = load_manifest(root, version)
+        self.index = LexicalIndex(os.path.join(_version_dir(root, version), "index"))
+
+    def search(self, query: str, max_results: int = 5) -> list[dict]:
+        """Best passage of each of the best-matching pages"""
+        results, seen = [], set()
+        for hit in self.index.search(query, top_k=max_results * 4):
+            url = hit["metadata"]["url"]
+            if url in seen:
+                continue
+            seen.add(url)
+            page = self.manifest["pages"].get(url, {})
+            results.append({
+                "title": hit["metadata"]["title"],
+                "url": url,
+                "snippet": hit["metadata"]["content"],
+                "mirror_version": self.version,
+                "fetched_at": page.get("fetched_at"),
+            })
+            if len(results) == max_results:
+                break
+        return results
+
+
+_mirror: Optional[Mirror] = None
+_mirror_lock = threading.Lock()
+
+
+def get_mirror() -> Optional[Mirror]:
+    """The CURRENT version, reopened when a refresh switches it; None before the first refresh"""
+    global _mirror
+
+    root = mirror_dir()
+    version = current_version(root)
+    if version is None:
+        return None
+    if _mirror is None or _mirror.version != version:
+        with _mirror_lock:
+            if _mirror is None or _mirror.version != version:
+                # the old index is left open: another thread may still be searching it. Its
+                # mmap and file close when the last reference goes
+                _mirror = Mirror(root, version)
+    return _mirror
+
+
+def search_mirror(query: str, max_results: int = 5) -> list[dict]:
+    mirror = get_mirror()
+    return mirror.search(query, max_results) if mirror is not None else []
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Maintain the offline mirror of official sources")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_refresh = sub.add_parser("refresh", help="Fetch pages into a new version and switch to it")
+    p_refresh.add_argument("--seeds", help="File of URLs, one per line (default: built-in seed list)")
+    p_refresh.add_argument("--from-dir", help="Mirror saved pages from a directory instead of the network")
+    p_refresh.add_argument("--workers", type=int, default=FETCH_WORKERS)
+    sub.add_parser("versions", help="List mirror versions")
+    p_use = sub.add_parser("use", help="Make an existing version current")
+    p_use.add_argument("version")
+    p_search = sub.add_parser("search", help="Search the current version")
+    p_search.add_argument("query")
+    p_search.add_argument("--max-results", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    if args.command == "refresh":
+        urls, fetch = None, http_fetch
+        if args.from_dir:
+            urls, fetch = directory_fetcher(args.from_dir)
+        if args.seeds:
+            with open(args.seeds, encoding="utf-8") as f:
+                urls = [line.strip() for line in f if line.strip() and not line.startswith("#")]
+        print(json.dumps(refresh(urls, fetch, workers=args.workers), indent=2))
+    elif args.command == "versions":
+        for row in list_versions():
+            print(f"{'*' if row['current'] else ' '} {row['version']}  {row['pages']} pages  {row['created_at']}")
+    elif args.command == "use":
+        use_version(args.version)
+        print(f"Mirror now serving {args.version}")
+    else:
+        for r in search_mirror(args.query, args.max_results):
+            print(f"{r['title']} ({r['url']})\n    {r['snippet'][:200]}")
+
+
+if __name__ == "__main__":
+    main()
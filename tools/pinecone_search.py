@@ -3,55 +3,172 @@ Pinecone knowledge base search tool
 """
 
 import os
-from pinecone import Pinecone
+from typing import Optional
 from sentence_transformers import SentenceTransformer
+from .cassette import intercept
+from .tracing import span
 
 # Initialize once
 _pc = None
 _index = None
 _embedding_model = None
+_lexical_index = None
+
+EMBEDDING_MODEL_NAME = "all-mpnet-base-v2"
+
+# Reciprocal-rank fusion damping constant
+RRF_K = 60
+
+
+def _get_backend() -> str:
+    """Which vector store holds the KB: "pinecone" (default) or "local" """
+    return os.getenv("KB_BACKEND", "pinecone").lower()
+
+
+def _get_embedding_model() -> SentenceTransformer:
+    """Lazy initialization of the embedding model"""
+    global _embedding_model
+
+    if _embedding_model is None:
+        _embedding_model = SentenceTransformer(EMBEDDING_MODEL_NAME)
+
+    return _embedding_model
 
 
 def _get_index():
-    """Lazy initialization of Pinecone index"""
-    global _pc, _index, _embedding_model
-    
+    """Lazy initialization of the KB index (Pinecone or local)"""
+    global _pc, _index
+
     if _index is None:
-        _pc = Pinecone(api_key=os.getenv("PINECONE_API_KEY"))
-        _index = _pc.Index(os.getenv("PINECONE_INDEX_NAME", "compliance-regulations"))
-        _embedding_model = SentenceTransformer("all-mpnet-base-v2")
-    
-    return _index, _embedding_model
+        if _get_backend() == "local":
+            from .local_index import LocalIndex
+            _index = LocalIndex(os.getenv("KB_LOCAL_DIR", ".kb_local"))
+        else:
+            from pinecone import Pinecone
+            _pc = Pinecone(api_key=os.getenv("PINECONE_API_KEY"))
+            _index = _pc.Index(os.getenv("PINECONE_INDEX_NAME", "compliance-regulations"))
 
+    return _index, _get_embedding_model()
 
-def search_knowledge_base(query: str, top_k: int = 5) -> str:
-    """
-    Search the compliance regulations knowledge base.
-    Returns formatted string of relevant regulations.
-    """
-    
+
+def _get_lexical_index():
+    """Lazy load of the BM25 index; None when it hasn't been built"""
+    global _lexical_index
+
+    if _lexical_index is None:
+        path = os.getenv("KB_LEXICAL_DIR", ".kb_lexical")
+        if os.path.exists(os.path.join(path, "lexicon.json")):
+            from .lexical_index import LexicalIndex
+            _lexical_index = LexicalIndex(path)
+
+    return _lexical_index
+
+
+def _vector_hits(query: str, top_k: int, filter: dict = None) -> list[dict]:
     index, model = _get_index()
-    
+
     # Embed query
-    query_embedding = model.encode(query).tolist()
-    
+    with span("kb.embed", model=EMBEDDING_MODEL_NAME):
+        query_embedding = model.encode(query).tolist()
+
     # Search
-    results = index.query(
-        vector=query_embedding,
-        top_k=top_k,
-        include_metadata=True
+    with span("kb.index.query", backend=_get_backend(), top_k=top_k, filtered=bool(filter)):
+        results = index.query(
+            vector=query_embedding,
+            top_k=top_k,
+            include_metadata=True,
+            filter=filter
+        )
+
+    return [{"id": m.id, "score": m.score, "metadata": m.metadata or {}} for m in results.matches]
+
+
+def fuse_rankings(rankings: list[list[dict]], method: str = "rrf", weights: list[float] = None) -> list[dict]:
+    """
+    Merge several best-first hit lists into one.
+    "rrf" is reciprocal-rank fusion; "weighted" sums min-max normalised scores.
+    """
+    weights = weights or [1.0] * len(rankings)
+    fused: dict[str, dict] = {}
+
+    for hits, weight in zip(rankings, weights):
+        if not hits:
+            continue
+        lo = min(h["score"] for h in hits)
+        hi = max(h["score"] for h in hits)
+
+        for rank, hit in enumerate(hits):
+            if method == "weighted":
+                contribution = weight * ((hit["score"] - lo) / (hi - lo) if hi > lo else 1.0)
+            else:
+                contribution = weight / (RRF_K + rank + 1)
+
+            entry = fused.setdefault(hit["id"], {"id": hit["id"], "score": 0.0, "metadata": hit["metadata"]})
+            entry["score"] += contribution
+
+    return sorted(fused.values(), key=lambda h: h["score"], reverse=True)
+
+
+def retrieve(query: str, top_k: int = 5, filter: dict = None) -> list[dict]:
+    """
+    Retrieve KB chunks as [{"id", "score", "metadata"}], best first.
+    Fuses vector and BM25 rankings when a lexical index is available.
+    filter is a Pinecone metadata filter (see tools/kb_filters.py).
+    Under a replay cassette the index and embedder are never touched.
+    """
+    return intercept(
+        "kb",
+        {"query": query, "top_k": top_k, "filter": filter},
+        lambda: _retrieve(query, top_k, filter),
     )
-    
-    if not results.matches:
+
+
+def _retrieve(query: str, top_k: int, filter: Optional[dict]) -> list[dict]:
+    lexical = _get_lexical_index()
+    if lexical is None or not len(lexical):
+        return _vector_hits(query, top_k, filter)
+
+    pool = top_k * int(os.getenv("KB_HYBRID_POOL", "4"))
+    method = os.getenv("KB_FUSION", "rrf").lower()
+    alpha = float(os.getenv("KB_HYBRID_ALPHA", "0.5"))  # weight of the vector side
+
+    vector_hits = _vector_hits(query, pool, filter)
+    with span("kb.bm25", top_k=pool, filtered=bool(filter)):
+        lexical_hits = lexical.search(query, pool, filter)
+
+    fused = fuse_rankings(
+        [vector_hits, lexical_hits],
+        method=method,
+        weights=[alpha, 1 - alpha] if method == "weighted" else None,
+    )[:top_k]
+
+    # report relevance relative to the best hit so the scale matches across fusion methods
+    top = fused[0]["score"] if fused else 1.0
+    for hit in fused:
+        hit["score"] = hit["score"] / top if top else 0.0
+    return fused
+
+
+def format_hits(hits: list[dict]) -> str:
+    """Render retrieved chunks as the text block the LLM prompts expect"""
+    if not hits:
         return "No relevant regulations found in knowledge base."
-    
+
     # Format results
     formatted = []
-    for match in results.matches:
-        source = match.metadata.get("source_name", "Unknown")
-        content = match.metadata.get("content", "")
-        score = match.score
-        
+    for hit in hits:
+        source = hit["metadata"].get("source_name", "Unknown")
+        content = hit["metadata"].get("content", "")
+        score = hit["score"]
+
         formatted.append(f"[Source: {source}] (Relevance: {score:.2f})\n{content}")
-    
-    return "\n\n---\n\n".join(formatted)
\ No newline at end of file
+
+    return "\n\n---\n\n".join(formatted)
+
+
+def search_knowledge_base(query: str, top_k: int = 5, filter: dict = None) -> str:
+    """
+    Search the compliance regulations knowledge base.
+    Returns formatted string of relevant regulations.
+    """
+    return format_hits(retrieve(query, top_k=top_k, filter=filter))
@@ -0,0 +1,237 @@
+"""
+Structural diff between two versions of a plan document
+
+A restated plan is mostly the previous document again. Both versions are
+cut into content-defined chunks: a rolling hash over the normalised words
+marks a boundary wherever its low bits are zero, so an edit only moves the
+boundaries next to it and every untouched passage hashes the same in both
+versions, wherever it now sits. The chunk hashes are then aligned with
+difflib, and the runs that differ become hunks:
+
+    diff = diff_documents(previous_text, restated_text)
+    diff.changed_fraction                 # share of the restated text that changed
+    diff.excerpt()                        # only the changed passages, with context
+    diff.touched_groups(removed=True)     # extraction groups a deletion may have cleared
+
+Normalising (case, punctuation, PDF page markers, hyphenated line breaks)
+keeps re-flowed or re-paginated text from reading as a change.
+"""
+
+import difflib
+import hashlib
+import re
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+
+from .kb_filters import FEATURE_CATEGORIES
+
+WINDOW = 8           # words in the rolling hash window
+BOUNDARY_MASK = 31   # a boundary where hash & mask == 0: one every ~32 words past the minimum
+MIN_WORDS = 12
+MAX_WORDS = 128
+CONTEXT_CHARS = 300  # a passage is widened to whole sentences, up to this much either side
+
+_MIX = np.uint64(0x9E3779B97F4A7C15)
+
+# page footers, bare page numbers and extract_text_from_pdf's own "--- Page N ---" markers
+_PAGE_MARKER = re.compile(r"^[ \t]*(?:-*[ \t]*page[ \t]+\d+(?:[ \t]+of[ \t]+\d+)?[ \t]*-*"
+                          r"|-?[ \t]*\d{1,4}[ \t]*-?)[ \t]*$", re.IGNORECASE | re.MULTILINE)
+_HYPHEN_BREAK = re.compile(r"(\w)-\n[ \t]*(\w)")
+_WORD = re.compile(r"([\w$%]+)")
+_SENTENCE_END = re.compile(r"[.;:]\s|\n\s*\n")
+
+# Extraction groups (PlanExtraction sections) and the KB categories that speak to them
+CATEGORY_GROUPS = {
+    "eligibility": "eligibility",
+    "vesting": "vesting",
+    "match": "contributions",
+    "catch_up": "contributions",
+    "auto_enrollment": "auto_enrollment",
+}
+GROUP_KEYWORDS = {
+    "plan": ["plan name", "effective date", "restate", "restatement", "name of the plan"],
+    "distributions": ["hardship", "loan", "in-service withdrawal"],
+    "auto_enrollment": ["default rate", "default contribution"],
+}
+
+
+@dataclass
+class Chunk:
+    start: int   # character offsets into the (hyphen-joined) text
+    end: int
+    words: int
+    digest: bytes
+
+
+@dataclass
+class Hunk:
+    """A run of chunks that differ; either side may be empty (pure insertion / deletion)"""
+    old_text: str
+    new_text: str
+    old_words: int
+    new_words: int
+
+
+@dataclass
+class PlanDiff:
+    old_words: int
+    new_words: int
+    old_chunks: int
+    new_chunks: int
+    hunks: list[Hunk] = field(default_factory=list)
+    passages: list[str] = field(default_factory=list)  # changed new text widened to sentences, merged
+
+    @property
+    def identical(self) -> bool:
+        return not self.hunks
+
+    @property
+    def changed_words(self) -> int:
+        return sum(h.new_words for h in self.hunks)
+
+    @property
+    def removed_words(self) -> int:
+        return sum(h.old_words for h in self.hunks)
+
+    @property
+    def changed_fraction(self) -> float:
+        """Share of the restated document inside changed chunks (deletions count against the old size)"""
+        if self.identical:
+            return 0.0
+        return min(1.0, max(self.changed_words / max(self.new_words, 1),
+                            self.removed_words / max(self.old_words, 1)))
+
+    def excerpt(self, separator: str = "\n[...]\n") -> str:
+        """The changed passages of the restated document, in order, with their context"""
+        return separator.join(self.passages)
+
+    def touched_groups(self, removed: bool = False) -> list[str]:
+        """
+        Extraction groups whose keywords appear in the changed text; with
+        removed=True, only those a hunk's old text mentions and its new text no longer does
+        """
+        groups = set()
+        for h in self.hunks:
+            before, after = groups_in(h.old_text), groups_in(h.new_text)
+            groups.update(set(before) - set(after) if removed else before + after)
+        return sorted(groups)
+
+    def summary(self) -> dict:
+        return {
+            "old_words": self.old_words,
+            "new_words": self.new_words,
+            "old_chunks": self.old_chunks,
+            "new_chunks": self.new_chunks,
+            "hunks": len(self.hunks),
+            "changed_words": self.changed_words,
+            "removed_words": self.removed_words,
+            "changed_fraction": round(self.changed_fraction, 4),
+        }
+
+
+def groups_in(text: str) -> list[str]:
+    """Extraction groups a passage speaks to, by keyword"""
+    lowered = text.lower()
+    groups = {CATEGORY_GROUPS[cat] for cat, words in FEATURE_CATEGORIES.items() if any(w in lowered for w in words)}
+    groups.update(g for g, words in GROUP_KEYWORDS.items() if any(w in lowered for w in words))
+    return sorted(groups)
+
+
+def _words(text: str) -> tuple[list[str], np.ndarray]:
+    """Normalised words and their character offsets (start, end pairs) in the text, skipping page markers"""
+    # blank the markers out in place, so offsets still point into the text
+    blanked = _PAGE_MARKER.sub(lambda m: " " * len(m.group()), text)
+    # [gap, word, gap, word, ..., gap]: plain strings, so no per-word Match objects for the GC to walk
+    parts = _WORD.split(blanked)
+    words = parts[1::2]
+    offsets = np.cumsum(np.fromiter(map(len, parts), dtype=np.int64, count=len(parts)))
+    return (" ".join(words).lower().split(" ") if words else []), offsets[:-1].reshape(-1, 2)
+
+
+def _boundaries(words: list[str]) -> list[int]:
+    """Index of the last word of each chunk"""
+    if not words:
+        return []
+    # rolling hash: the sum of the last WINDOW word hashes, mixed so its low bits are well spread
+    sums = np.cumsum(pd.util.hash_array(np.asarray(words, dtype=object)))
+    sums[WINDOW:] -= sums[:-WINDOW].copy()
+    candidates = np.flatnonzero(((sums * _MIX) >> np.uint64(40)) & np.uint64(BOUNDARY_MASK) == 0)
+
+    ends, start = [], 0
+    for end in candidates[candidates < len(words) - 1].tolist() + [len(words) - 1]:
+        while end + 1 - start > MAX_WORDS:
+            ends.append(start + MAX_WORDS - 1)
+            start += MAX_WORDS
+        if end + 1 - start >= MIN_WORDS or end == len(words) - 1:
+            ends.append(end)
+            start = end + 1
+    return ends
+
+
+def chunk_text(text: str) -> tuple[str, list[Chunk]]:
+    """Content-defined chunks of the text; returns the hyphen-joined text the offsets refer to"""
+    text = _HYPHEN_BREAK.sub(r"\1\2", text or "")
+    words, offsets = _words(text)
+    chunks, start = [], 0
+    for end in _boundaries(words):
+        digest = hashlib.blake2b(" ".join(words[start:end + 1]).encode(), digest_size=12).digest()
+        chunks.append(Chunk(int(offsets[start, 0]), int(offsets[end, 1]), end + 1 - start, digest))
+        start = end + 1
+    return text, chunks
+
+
+def _span(text: str, chunks: list[Chunk], lo: int, hi: int) -> str:
+    return text[chunks[lo].start:chunks[hi - 1].end] if hi > lo else ""
+
+
+def _sentence_bounds(text: str, start: int, end: int, context: int) -> tuple[int, int]:
+    """Widen [start, end) out to the enclosing sentence ends, by at most context chars either side"""
+    lo, hi = max(0, start - context), min(len(text), end + context)
+    before = [m.end() for m in _SENTENCE_END.finditer(text, lo, start)]
+    after = _SENTENCE_END.search(text, end, hi)
+    # no sentence end within reach: stop at a word break at least
+    if before:
+        lo = before[-1]
+    elif lo > 0:
+        lo = text.find(" ", lo, start) + 1 or lo
+    if after:
+        hi = after.start() + 1
+    elif hi < len(text):
+        cut = text.rfind(" ", end, hi)
+        hi = cut if cut > end else hi
+    return lo, hi
+
+
+def diff_documents(old_text: str, new_text: str, context: int = CONTEXT_CHARS) -> PlanDiff:
+    """Align the two versions chunk by chunk; unchanged chunks are matched wherever they moved to"""
+    old_text, old_chunks = chunk_text(old_text)
+    new_text, new_chunks = chunk_text(new_text)
+    matcher = difflib.SequenceMatcher(None, [c.digest for c in old_chunks], [c.digest for c in new_chunks],
+                                      autojunk=False)
+    diff = PlanDiff(
+        old_words=sum(c.words for c in old_chunks), new_words=sum(c.words for c in new_chunks),
+        old_chunks=len(old_chunks), new_chunks=len(new_chunks),
+    )
+    windows = []  # character ranges of the new text to send, overlapping ones merged
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            continue
+        diff.hunks.append(Hunk(
+            old_text=_span(old_text, old_chunks, i1, i2),
+            new_text=_span(new_text, new_chunks, j1, j2),
+            old_words=sum(c.words for c in old_chunks[i1:i2]),
+            new_words=sum(c.words for c in new_chunks[j1:j2]),
+        ))
+        if new_chunks:
+            # a deletion still sends the sentences around where the text used to be
+            at = (new_chunks[j1].start if j1 < len(new_chunks) else len(new_text),
+                  new_chunks[j2 - 1].end if j2 > j1 else new_chunks[min(j1, len(new_chunks) - 1)].start)
+            lo, hi = _sentence_bounds(new_text, min(at), max(at), context)
+            if windows and lo <= windows[-1][1]:
+                windows[-1][1] = max(windows[-1][1], hi)
+            else:
+                windows.append([lo, hi])
+    diff.passages = [new_text[lo:hi].strip() for lo, hi in windows]
+    return diff
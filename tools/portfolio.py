@@ -0,0 +1,293 @@
+"""
+Portfolio aggregates over the audit history
+
+The history's findings are held in memory as dictionary-encoded NumPy
+columns (plan, feature and status codes, plus the audit time).
+refresh() appends only the rows recorded since the last read, so
+after the first load a new audit costs milliseconds, not a re-read of
+millions of rows. The columns are also saved next to the history
+(<HISTORY_DB>.columns.npz), so a restarted app picks up where it left
+off instead of decoding every row again. Every dashboard view is a vectorized pass over the
+columns (bincount / lexsort), with only the small results turned into
+pandas frames.
+
+    findings = FindingsColumns(path)      # once per process; refresh() per new audit
+    plans = load_plans(path)
+    portfolio_summary(findings, plans)    # risk, gap rates, drift, worst plans
+"""
+
+import os
+import sqlite3
+import threading
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from .history import Since, to_timestamp
+
+RISK_ORDER = ["High", "Medium", "Low"]
+STATUSES = ["compliant", "gap", "needs_review"]
+GAP = STATUSES.index("gap")
+NEEDS_REVIEW = STATUSES.index("needs_review")
+DAY_S = 86400
+
+
+def _connect(path: str) -> sqlite3.Connection:
+    # a reader of its own: WAL lets it run alongside the run registry's writes
+    return sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+
+
+def history_version(path: str) -> tuple:
+    """Changes whenever a run is recorded; a cache key for derived views"""
+    db = _connect(path)
+    try:
+        return tuple(db.execute(
+            "SELECT (SELECT MAX(id) FROM findings), (SELECT MAX(rowid) FROM runs), (SELECT MAX(audited_at) FROM runs)"
+        ).fetchone())
+    finally:
+        db.close()
+
+
+class _Dictionary:
+    """Append-only value <-> code mapping; codes never change once given out"""
+
+    def __init__(self, values: list = ()):
+        self.values: list = list(values)
+        self.codes = {v: i for i, v in enumerate(self.values)}
+
+    def encode(self, values: tuple, dtype) -> np.ndarray:
+        # factorize the batch in C, then map only its distinct values through the dict
+        local, uniques = pd.factorize(np.asarray(values, dtype=object))
+        mapping = np.empty(len(uniques), dtype=dtype)
+        for i, value in enumerate(uniques):
+            code = self.codes.get(value)
+            if code is None:
+                code = self.codes[value] = len(self.values)
+                self.values.append(value)
+            mapping[i] = code
+        return mapping[local]
+
+
+class FindingsColumns:
+    """Every finding in the history as parallel NumPy columns, in id (insertion) order"""
+
+    COLUMNS = ("plan", "feature", "status", "audited_at")
+    DICTIONARIES = ("plans", "features", "statuses")
+
+    def __init__(self, path: str, snapshot: bool = True):
+        self.path = path
+        self.snapshot_path = f"{path}.columns.npz" if snapshot else None
+        self._lock = threading.Lock()
+        self._reset()
+        if self.snapshot_path and os.path.exists(self.snapshot_path):
+            self._load_snapshot()
+        self.refresh()
+
+    def _reset(self):
+        self.plans = _Dictionary()
+        self.features = _Dictionary()
+        self.statuses = _Dictionary(STATUSES)
+        self._last_id = 0
+        self._columns = {
+            "plan": np.empty(0, np.int32), "feature": np.empty(0, np.int16),
+            "status": np.empty(0, np.int8), "audited_at": np.empty(0, np.float64),
+        }
+        self._derived: Optional[tuple] = None  # (columns, changed, latest)
+
+    def __len__(self) -> int:
+        return len(self._columns["plan"])
+
+    def columns(self) -> dict[str, np.ndarray]:
+        """A consistent snapshot of the columns (refresh() swaps them all at once)"""
+        return self._columns
+
+    def refresh(self) -> int:
+        """Append rows recorded since the last read; returns how many were added"""
+        with self._lock:
+            added, total = self._append()
+            if total != len(self):
+                # a re-recorded run deleted rows we already hold: start over
+                self._reset()
+                added, _ = self._append()
+            if added and self.snapshot_path:
+                self._save_snapshot()
+            return added
+
+    def _append(self) -> tuple[int, int]:
+        db = _connect(self.path)
+        try:
+            rows = db.execute(
+                "SELECT id, plan_key, feature, status, audited_at FROM findings WHERE id > ? ORDER BY id",
+                (self._last_id,),
+            ).fetchall()
+            total = db.execute("SELECT COUNT(*) FROM findings").fetchone()[0]
+        finally:
+            db.close()
+
+        if rows:
+            ids, plan, feature, status, audited_at = zip(*rows)
+            added = {
+                "plan": self.plans.encode(plan, np.int32),
+                "feature": self.features.encode(feature, np.int16),
+                "status": self.statuses.encode(status, np.int8),
+                "audited_at": np.asarray(audited_at, dtype=np.float64),
+            }
+            self._columns = {k: np.concatenate([self._columns[k], added[k]]) for k in self.COLUMNS}
+            self._last_id = ids[-1]
+        return len(rows), total
+
+    def _save_snapshot(self):
+        tmp = f"{self.snapshot_path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            np.savez(
+                f, last_id=self._last_id, **self._columns,
+                **{name: np.asarray(getattr(self, name).values, dtype=str) for name in self.DICTIONARIES},
+            )
+        os.replace(tmp, self.snapshot_path)
+
+    def _load_snapshot(self):
+        try:
+            with np.load(self.snapshot_path, allow_pickle=False) as saved:
+                columns = {k: saved[k] for k in self.COLUMNS}
+                dictionaries = {name: _Dictionary(saved[name].tolist()) for name in self.DICTIONARIES}
+                last_id = int(saved["last_id"])
+        except (OSError, KeyError, ValueError):
+            return  # unreadable or from an older layout: rebuilt by refresh()
+        self._columns, self._last_id = columns, last_id
+        for name, dictionary in dictionaries.items():
+            setattr(self, name, dictionary)
+
+    def _derive(self) -> tuple:
+        """
+        One sort by (plan, feature, audited_at) per snapshot gives both
+        per-finding flags: changed (status differs from the same plan's
+        previous audit of that feature) and latest (newest for its plan/feature)
+        """
+        columns = self._columns
+        derived = self._derived
+        if derived is None or derived[0] is not columns:
+            order = np.lexsort((columns["audited_at"], columns["feature"], columns["plan"]))
+            plan, feature, status = (columns[k][order] for k in ("plan", "feature", "status"))
+            same_series = (plan[1:] == plan[:-1]) & (feature[1:] == feature[:-1])
+            changed = np.zeros(len(order), dtype=bool)
+            changed[order[1:]] = same_series & (status[1:] != status[:-1])
+            latest = np.zeros(len(order), dtype=bool)
+            latest[order] = np.append(~same_series, True)
+            derived = self._derived = (columns, changed, latest)
+        return derived
+
+    def changed(self) -> np.ndarray:
+        return self._derive()[1]
+
+    def latest(self) -> np.ndarray:
+        return self._derive()[2]
+
+
+def load_plans(path: str) -> pd.DataFrame:
+    """One row per plan with its latest audit"""
+    db = _connect(path)
+    try:
+        plans = pd.read_sql_query(
+            "SELECT plan_key, plan_name, latest_run_id, latest_risk, latest_at, runs FROM plans", db
+        )
+    finally:
+        db.close()
+    plans["latest_at"] = pd.to_datetime(plans["latest_at"], unit="s")
+    return plans
+
+
+def risk_distribution(plans: pd.DataFrame) -> pd.Series:
+    """Plans per latest risk level, High first"""
+    counts = plans["latest_risk"].fillna("Unknown").value_counts()
+    order = RISK_ORDER + sorted(set(counts.index) - set(RISK_ORDER))
+    return counts.reindex(order, fill_value=0)
+
+
+def gap_rates(findings: FindingsColumns) -> pd.DataFrame:
+    """Per feature, over each plan's latest audit of it: plans checked and the share with a gap / needing review"""
+    columns = findings.columns()
+    latest = findings.latest()
+    feature, status = columns["feature"][latest], columns["status"][latest]
+    n = len(findings.features.values)
+    checked = np.bincount(feature, minlength=n)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        rates = pd.DataFrame({
+            "plans": checked,
+            "gap_rate": np.bincount(feature, weights=status == GAP, minlength=n) / checked,
+            "review_rate": np.bincount(feature, weights=status == NEEDS_REVIEW, minlength=n) / checked,
+        }, index=pd.Index(findings.features.values, name="feature"))
+    return rates[rates["plans"] > 0].sort_values("gap_rate", ascending=False)
+
+
+def _period_start(days: np.ndarray, freq: str) -> np.ndarray:
+    """Start of the week (Monday) or month containing each day number, as datetime64[D]"""
+    if freq == "W":
+        return (days - (days + 3) % 7).astype("datetime64[D]")  # 1970-01-01 was a Thursday
+    return days.astype("datetime64[D]").astype("datetime64[M]").astype("datetime64[D]")
+
+
+def drift_over_time(findings: FindingsColumns, freq: str = "W", since: Since = None) -> pd.DataFrame:
+    """Per week ("W") or month ("M"): findings recorded, gap rate and statuses changed since the previous audit"""
+    columns = findings.columns()
+    changed = findings.changed()
+    audited_at, status = columns["audited_at"], columns["status"]
+    if since is not None:
+        window = audited_at >= to_timestamp(since)
+        audited_at, status, changed = audited_at[window], status[window], changed[window]
+    if not len(audited_at):
+        return pd.DataFrame({"findings": [], "gap_rate": [], "status_changes": []},
+                            index=pd.DatetimeIndex([], name="period"))
+
+    # bin by day in one O(n) pass, then fold the (few hundred) days into periods
+    days = (audited_at // DAY_S).astype(np.int64)
+    first = days.min()
+    day_findings = np.bincount(days - first)
+    day_gaps = np.bincount(days - first, weights=status == GAP)
+    day_changes = np.bincount(days - first, weights=changed)
+    periods, index = np.unique(_period_start(np.arange(first, first + len(day_findings)), freq),
+                               return_inverse=True)
+    counts = np.bincount(index, weights=day_findings, minlength=len(periods))
+    keep = counts > 0
+    return pd.DataFrame({
+        "findings": counts.astype(int),
+        "gap_rate": np.bincount(index, weights=day_gaps, minlength=len(periods)) / np.maximum(counts, 1),
+        "status_changes": np.bincount(index, weights=day_changes, minlength=len(periods)).astype(int),
+    }, index=pd.DatetimeIndex(periods, name="period"))[keep]
+
+
+def worst_plans(findings: FindingsColumns, plans: pd.DataFrame, n: int = 20) -> pd.DataFrame:
+    """Plans most out of compliance as last audited: most gaps, then most open reviews"""
+    columns = findings.columns()
+    latest = findings.latest()
+    plan, status = columns["plan"][latest], columns["status"][latest]
+    size = len(findings.plans.values)
+    gaps = np.bincount(plan, weights=status == GAP, minlength=size).astype(int)
+    reviews = np.bincount(plan, weights=status == NEEDS_REVIEW, minlength=size).astype(int)
+    checked = np.bincount(plan, minlength=size)
+
+    candidates = np.flatnonzero(gaps + reviews)
+    top = candidates[np.lexsort((-reviews[candidates], -gaps[candidates]))][:n]
+    worst = pd.DataFrame({
+        "plan_key": [findings.plans.values[i] for i in top],
+        "gaps": gaps[top],
+        "needs_review": reviews[top],
+        "features": checked[top],
+    })
+    return worst.merge(plans[["plan_key", "plan_name", "latest_risk", "latest_at"]], on="plan_key", how="left")
+
+
+def portfolio_summary(findings: FindingsColumns, plans: pd.DataFrame, freq: str = "W",
+                      since: Since = None, top: int = 20) -> Optional[dict]:
+    """Every dashboard view in one pass; None when nothing has been recorded yet"""
+    if plans.empty:
+        return None
+    return {
+        "plans": len(plans),
+        "runs": int(plans["runs"].sum()),
+        "findings": len(findings),
+        "risk": risk_distribution(plans),
+        "gap_rates": gap_rates(findings),
+        "drift": drift_over_time(findings, freq, since),
+        "worst": worst_plans(findings, plans, top),
+    }
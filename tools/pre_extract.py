@@ -0,0 +1,417 @@
+"""
+Local pre-extraction of plan features - patterns and table heuristics
+
+Plan documents state most extraction fields in very regular language
+("attained age 21", "one Year of Service", a years/percent vesting
+table). pre_extract() fills what it can from compiled patterns, each
+value with a confidence, keyed by dotted field path like
+agents.amendments.flatten():
+
+    guesses = pre_extract(text)
+    guesses["eligibility.age_requirement"]   # FieldGuess(value=21, confidence=0.9, evidence="...")
+    relevant_passages(text, ["vesting"])     # just the passages an LLM needs for what is left
+
+A field is only guessed from sentences that are about it (eligibility
+wording for the age, employer contributions for vesting), and conflicting
+matches lower the confidence, so a low score means "ask the LLM".
+"""
+
+import re
+from collections import Counter
+from dataclasses import dataclass
+from typing import Any, Optional
+
+from .plan_diff import chunk_text, groups_in
+
+TITLE_CHARS = 1500  # plan name and effective date are stated up front
+
+
+@dataclass
+class FieldGuess:
+    value: Any
+    confidence: float
+    evidence: str = ""
+
+
+# ============================================================
+# Sentences
+# ============================================================
+
+_SENTENCE_SPLIT = re.compile(r"(?<=[.;!?])\s+(?=[A-Z(\"])|\n\s*\n")
+_SPACE = re.compile(r"\s+")
+_NEGATION = re.compile(r"\b(?:not|no|never|cannot|neither|nor|does not|do not|may not|is not|are not)\b",
+                       re.IGNORECASE)
+_LINE_HYPHEN = re.compile(r"(\w)-[ \t]*\n\s*(\w)")
+
+
+def _sentences(text: str) -> list[str]:
+    # a hyphen at a line break is kept ("semi-annual", "catch-up" wrap there too)
+    text = _LINE_HYPHEN.sub(r"\1-\2", text)
+    return [_SPACE.sub(" ", s).strip() for s in _SENTENCE_SPLIT.split(text) if s and s.strip()]
+
+
+def _about(sentences: list[str], *keywords: str, without: tuple = ()) -> list[str]:
+    """Sentences mentioning any keyword and none of `without` (all lower case)"""
+    found = []
+    for s in sentences:
+        lowered = s.lower()
+        if any(k in lowered for k in keywords) and not any(w in lowered for w in without):
+            found.append(s)
+    return found
+
+
+def _negated(sentence: str, start: int) -> bool:
+    """A negation in the clause leading up to position start"""
+    clause = re.split(r"[,;:]", sentence[:start])[-1]
+    return bool(_NEGATION.search(clause))
+
+
+def _vote(candidates: list[tuple[Any, str]], confidence: float) -> Optional[FieldGuess]:
+    """The most common value; every disagreeing match costs confidence"""
+    if not candidates:
+        return None
+    counts = Counter(value for value, _ in candidates)
+    value, n = counts.most_common(1)[0]
+    agreement = n / len(candidates)
+    evidence = next(e for v, e in candidates if v == value)
+    return FieldGuess(value, round(confidence * agreement ** 2, 3), evidence[:240])
+
+
+# ============================================================
+# Plan header
+# ============================================================
+
+_PLAN_NAME = re.compile(
+    r"\b((?:The\s+)?[A-Z][\w&.,'’-]*(?:\s+[A-Z0-9(][\w&.,'’()-]*){0,8}?\s+"
+    r"(?i:401\s*\(k\)|403\s*\(b\)|Retirement|Savings|Profit[- ]Sharing|Thrift)"
+    r"(?:\s+[A-Z(][\w&()-]*){0,4}?\s+(?i:Plan))\b"
+)
+_DATE = r"((?:January|February|March|April|May|June|July|August|September|October|November|December)\s+\d{1,2},?\s+\d{4}|\d{1,2}/\d{1,2}/\d{4})"
+_EFFECTIVE = re.compile(r"effective(?:\s+date)?(?:\s+of\s+(?:the|this)\s+(?:plan|restatement))?\s*(?:is|:|as of|on)?\s*" + _DATE,
+                        re.IGNORECASE)
+
+
+def _name_case(name: str) -> str:
+    """An all-caps cover-page title in the case the body text uses"""
+    if not name.isupper():
+        return name
+    return " ".join(w.capitalize() for w in name.split()).replace("(K)", "(k)").replace("(B)", "(b)")
+
+
+def _plan_name(text: str) -> Optional[FieldGuess]:
+    names = [(_name_case(_SPACE.sub(" ", m.group(1))).removeprefix("The "), m.group(0))
+             for m in _PLAN_NAME.finditer(text[:TITLE_CHARS])]
+    guess = _vote(names, 0.85)
+    if guess and len(names) > 1 and names[0][0] != guess.value:
+        guess.confidence = min(guess.confidence, 0.6)  # the title isn't the name repeated most
+    return guess
+
+
+def _effective_date(text: str, sentences: list[str]) -> Optional[FieldGuess]:
+    dates = [(_SPACE.sub(" ", m.group(1)), m.group(0)) for m in _EFFECTIVE.finditer(text[:TITLE_CHARS])]
+    if not dates:
+        dates = [(_SPACE.sub(" ", m.group(1)), m.group(0)) for s in _about(sentences, "effective")
+                 for m in _EFFECTIVE.finditer(s)]
+        return _vote(dates, 0.7)
+    return _vote(dates, 0.9)
+
+
+# ============================================================
+# Eligibility
+# ============================================================
+
+_WORD_NUMBERS = {"one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6, "seven": 7, "eight": 8,
+                 "nine": 9, "ten": 10, "twelve": 12, "eighteen": 18}
+_NUMBER = r"(\d{1,2}|" + "|".join(_WORD_NUMBERS) + r")"
+_AGE = re.compile(r"\b(?:attain(?:ed|s|ment of)?|reach(?:ed|es)?|age of|at least|minimum age(?: of| is)?)\s+(?:age\s+)?(\d{2})\b"
+                  r"|\bage\s+(\d{2})\b", re.IGNORECASE)
+_SERVICE = re.compile(r"\b" + _NUMBER + r"\s*(?:\(\d+\)\s*)?(year|month)s?\s+of\s+(?:eligibility\s+)?service"
+                      r"(?:\s*\(?(?:in which|with|during which)[^.;)]*?([\d,]{3,5})\s+hours)?", re.IGNORECASE)
+_NO_SERVICE = re.compile(r"\b(?:no (?:minimum )?service requirement|(?:immediately|immediate) eligib\w*"
+                         r"|eligible (?:to participate )?(?:immediately|on your (?:date of hire|first day))"
+                         r"|first day of employment)", re.IGNORECASE)
+_ENTRY_NAMED = re.compile(r"\b(immediate|daily|monthly|quarterly|semi-annual(?:ly)?|annual(?:ly)?)\s+entry\b",
+                          re.IGNORECASE)
+_ENTRY_DESCRIBED = re.compile(r"\bentry dates?\s+(?:are|is|shall be|will be)\s+(?:the\s+)?([^.;]{5,120})",
+                              re.IGNORECASE)
+_ELIGIBILITY_WORDS = ("eligib", "participa", "enter the plan", "entry date", "join the plan")
+# retirement / catch-up / RMD ages, matched as whole numbers so "1970", "4.72" or "$73" don't count
+_NOT_ELIGIBILITY = re.compile(r"catch[- ]up|normal retirement|early retirement|required minimum|distribution"
+                              r"|\bage\s+(?:50|70(?:½|\s?1/2)?|72|73)(?!\d)"
+                              r"|(?<![\d.])59(?:½|\s?1/2)", re.IGNORECASE)
+
+
+def _number(word: str) -> int:
+    return int(word) if word.isdigit() else _WORD_NUMBERS[word.lower()]
+
+
+def _age(sentences: list[str]) -> Optional[FieldGuess]:
+    candidates = []
+    for s in _about(sentences, *_ELIGIBILITY_WORDS):
+        if _NOT_ELIGIBILITY.search(s):
+            continue
+        for m in _AGE.finditer(s):
+            age = int(m.group(1) or m.group(2))
+            if 16 <= age <= 26:
+                candidates.append((age, s))
+    return _vote(candidates, 0.92)
+
+
+def _service(sentences: list[str]) -> Optional[FieldGuess]:
+    candidates = []
+    for s in _about(sentences, *_ELIGIBILITY_WORDS, without=("vest", "catch-up")):
+        for m in _SERVICE.finditer(s):
+            n, unit, hours = _number(m.group(1)), m.group(2).lower(), m.group(3)
+            value = f"{n} {unit}{'s' if n != 1 else ''}" + (f" ({hours} hours)" if hours else "")
+            candidates.append((value, s))
+        if not candidates and _NO_SERVICE.search(s):
+            candidates.append(("None", s))
+    return _vote(candidates, 0.85)
+
+
+def _entry_dates(sentences: list[str]) -> Optional[FieldGuess]:
+    named, described = [], []
+    for s in _about(sentences, "entry"):
+        for m in _ENTRY_NAMED.finditer(s):
+            value = m.group(1).lower()
+            named.append((value.removesuffix("ly") if value.endswith("annually") else value, s))
+        described.extend((m.group(1).strip(), s) for m in _ENTRY_DESCRIBED.finditer(s))
+    # "quarterly entry" is a value; "entry dates are the first day of ..." is left to the LLM to word
+    return _vote(named, 0.85) or _vote(described, 0.6)
+
+
+# ============================================================
+# Contributions
+# ============================================================
+
+_MATCH = re.compile(
+    r"(\d{1,3}(?:\.\d+)?)\s*%\s+of\s+(?:the\s+)?(?:first\s+|each\s+dollar\s+[^.;%]*?up\s+to\s+)?"
+    r"(\d{1,2}(?:\.\d+)?)\s*%"
+    r"(?:[^.;%]{0,40}?(?:and|plus)\s+(\d{1,3}(?:\.\d+)?)\s*%\s+of\s+(?:the\s+)?next\s+(\d{1,2}(?:\.\d+)?)\s*%)?",
+    re.IGNORECASE,
+)
+_CAP = re.compile(r"(?:up to|not to exceed|maximum (?:of|matching contribution (?:is|of))|limited to)\s+"
+                  r"(\d{1,2}(?:\.\d+)?)\s*%\s+of\s+(?:your\s+|the participant's\s+)?(?:compensation|pay|salary)",
+                  re.IGNORECASE)
+_CATCH_UP = re.compile(r"catch[- ]up contributions?", re.IGNORECASE)
+_MATCH_WORDS = ("match",)
+
+
+def _pct(value: str) -> str:
+    number = float(value)
+    return f"{int(number) if number.is_integer() else number}%"
+
+
+def _match_formula(sentences: list[str]) -> Optional[FieldGuess]:
+    candidates = []
+    for s in _about(sentences, *_MATCH_WORDS, without=("safe harbor nonelective",)):
+        for m in _MATCH.finditer(s):
+            formula = f"{_pct(m.group(1))} of first {_pct(m.group(2))}"
+            if m.group(3):
+                formula += f" + {_pct(m.group(3))} of next {_pct(m.group(4))}"
+            candidates.append((formula, s))
+    return _vote(candidates, 0.88)
+
+
+def _match_cap(sentences: list[str], formula: Optional[FieldGuess]) -> Optional[FieldGuess]:
+    candidates = [(_pct(m.group(1)), s) for s in _about(sentences, *_MATCH_WORDS) for m in _CAP.finditer(s)]
+    guess = _vote(candidates, 0.75)
+    if guess is None and formula is not None:
+        # "100% of first 3% + 50% of next 2%": the match stops at 5% of pay, unless a dollar limit applies
+        tiers = re.findall(r"of (?:first|next) (\d+(?:\.\d+)?)%", formula.value)
+        dollar_limit = any("$" in s for s in _about(sentences, *_MATCH_WORDS))
+        return FieldGuess(_pct(str(sum(float(t) for t in tiers))),
+                          min(formula.confidence, 0.5 if dollar_limit else 0.85), formula.evidence)
+    return guess
+
+
+def _catch_up(sentences: list[str]) -> Optional[FieldGuess]:
+    candidates = []
+    for s in sentences:
+        m = _CATCH_UP.search(s)
+        if not m:
+            continue
+        lowered = s.lower()
+        if re.search(r"\b(?:not (?:permitted|allowed|available)|does not (?:permit|allow)|no catch[- ]up|may not make)\b", lowered):
+            candidates.append((False, s))
+        elif re.search(r"\b(?:may (?:also )?make|permit|allow|eligible to make|can make|available)", lowered):
+            candidates.append((True, s))
+    return _vote(candidates, 0.88)
+
+
+# ============================================================
+# Vesting
+# ============================================================
+
+_VEST_ROW = re.compile(
+    r"^\s*(?:(less than|fewer than)\s+)?" + _NUMBER + r"\s*(?:\(\d+\)\s*)?(?:years?|yrs?\.?)?"
+    r"(?:\s+of\s+(?:vesting\s+)?service)?(?:\s+(?:but less than|or more|and over|\+)[^\d%]*(?:\d+)?)?"
+    r"\s*[:\-–—.]*\s*(\d{1,3})\s*%\s*$",
+    re.IGNORECASE | re.MULTILINE,
+)
+_GRADED_INLINE = re.compile(r"(\d{1,2})\s*%\s+(?:per|for each|each|every)\s+(?:full\s+)?year", re.IGNORECASE)
+_CLIFF_INLINE = re.compile(r"(?:100\s*%|fully)\s+vested\s+(?:in\s+[^.;%]{0,60}?\s+)?(?:after|upon(?: completion of)?|once you (?:complete|have))\s+"
+                           + _NUMBER + r"\s*(?:\(\d+\)\s*)?years?", re.IGNORECASE)
+_IMMEDIATE = re.compile(r"(?:100\s*%|fully|immediately)\s+vested\s+(?:immediately|at all times|when made|upon entry)"
+                        r"|\bvest(?:s|ed)?\s+immediately\b|\bimmediate(?:ly)? (?:100\s*% )?vest", re.IGNORECASE)
+_EMPLOYER_WORDS = ("employer", "match", "company contribution", "profit sharing", "nonelective", "all contributions")
+_OWN_WORDS = ("your own", "elective deferral", "salary deferral", "deferral contributions", "rollover",
+              "your contributions", "employee contributions", "pre-tax contributions")
+
+
+def _vesting_table(text: str) -> Optional[tuple[list[tuple[int, int]], str]]:
+    """Rows of the first years -> vested % table after a mention of vesting"""
+    for mention in re.finditer(r"vest", text, re.IGNORECASE):
+        window = text[mention.start():mention.start() + 1500]
+        rows = []
+        for m in _VEST_ROW.finditer(window):
+            years, pct = _number(m.group(2)), int(m.group(3))
+            rows.append((years - 1 if m.group(1) else years, pct))
+        if len(rows) >= 2:
+            pcts = [p for _, p in rows]
+            if pcts == sorted(pcts) and pcts[-1] == 100:
+                return rows, _SPACE.sub(" ", window[:300])
+    return None
+
+
+def _vesting(text: str, sentences: list[str]) -> dict[str, FieldGuess]:
+    guesses = {}
+    table = _vesting_table(text)
+    if table:
+        rows, evidence = table
+        full = next(y for y, p in rows if p == 100)
+        partial = [(y, p) for y, p in rows if 0 < p < 100]
+        vtype = "graded" if partial else "cliff"
+        schedule = ", ".join(f"{p}% after {y} year{'s' if y != 1 else ''}" for y, p in rows if p > 0)
+        guesses["vesting.type"] = FieldGuess(vtype, 0.92, evidence)
+        guesses["vesting.years_to_full"] = FieldGuess(full, 0.92, evidence)
+        guesses["vesting.schedule"] = FieldGuess(schedule, 0.85, evidence)
+        return guesses
+
+    employer = _about(sentences, "vest", without=_OWN_WORDS)
+    employer = [s for s in employer if any(w in s.lower() for w in _EMPLOYER_WORDS)] or employer
+    candidates = []
+    for s in employer:
+        if (m := _CLIFF_INLINE.search(s)) and "per year" not in s.lower():
+            candidates.append((("cliff", _number(m.group(1)), m.group(0)), s))
+        elif m := _GRADED_INLINE.search(s):
+            step = int(m.group(1))
+            candidates.append((("graded", (100 + step - 1) // step if 0 < step <= 100 else None,
+                                f"{step}% per year"), s))
+        elif _IMMEDIATE.search(s) and any(w in s.lower() for w in _EMPLOYER_WORDS):
+            candidates.append((("immediate", 0, "100% immediately"), s))
+    guess = _vote(candidates, 0.85)
+    if guess is not None:
+        vtype, years, schedule = guess.value
+        guesses["vesting.type"] = FieldGuess(vtype, guess.confidence, guess.evidence)
+        guesses["vesting.schedule"] = FieldGuess(schedule, guess.confidence, guess.evidence)
+        if years is not None:
+            # graded steps that start after a waiting year aren't visible here
+            confidence = guess.confidence if vtype != "graded" else min(guess.confidence, 0.6)
+            guesses["vesting.years_to_full"] = FieldGuess(years, confidence, guess.evidence)
+    return guesses
+
+
+# ============================================================
+# Automatic enrollment and distributions
+# ============================================================
+
+_AUTO = re.compile(r"automatic(?:ally)?\s+(?:enroll|contribution arrangement)|auto[- ]enroll|\bEACA\b|\bQACA\b",
+                   re.IGNORECASE)
+_DEFAULT_RATE = re.compile(r"(?:default|automatic|initial)\s+(?:deferral|contribution|enrollment)?\s*"
+                           r"(?:rate|percentage|amount|election)?\s*(?:of|is|equal to|at)\s+(\d{1,2}(?:\.\d+)?)\s*%"
+                           r"|\benrolled\s+(?:at|with)\s+(?:a\s+)?(\d{1,2}(?:\.\d+)?)\s*%", re.IGNORECASE)
+_ESCALATE = re.compile(r"(?:increase[sd]?|escalat\w*)\s+(?:automatically\s+)?(?:by\s+)?(\d{1,2}(?:\.\d+)?)\s*%"
+                       r"|automatic(?:ally)?\s+(?:annual\s+)?(?:increase|escalat)|increase[sd]?\s+automatically"
+                       r"|auto[- ]escalat", re.IGNORECASE)
+
+
+def _flag(sentences: list[str], pattern: re.Pattern, allowed: str, confidence: float) -> Optional[FieldGuess]:
+    """True/False from sentences matching pattern: negated or 'not <allowed>' -> False"""
+    candidates = []
+    for s in sentences:
+        m = pattern.search(s)
+        if not m:
+            continue
+        lowered = s.lower()
+        if _negated(s, m.start()) or re.search(rf"\bnot\s+(?:be\s+)?{allowed}", lowered):
+            candidates.append((False, s))
+        elif re.search(rf"\b{allowed}|\bmay\b|\bwill\b|\bcan\b|\bavailable\b", lowered):
+            candidates.append((True, s))
+    return _vote(candidates, confidence)
+
+
+def _auto_enrollment(sentences: list[str]) -> dict[str, FieldGuess]:
+    guesses = {}
+    enabled = _flag(sentences, _AUTO, r"(?:provide|include|have|permit|offer|enroll)", 0.85)
+    if enabled is None:
+        return guesses
+    guesses["auto_enrollment.enabled"] = enabled
+    if not enabled.value:
+        # no automatic enrollment: no default rate or escalation to find
+        guesses["auto_enrollment.default_rate"] = FieldGuess(None, enabled.confidence, enabled.evidence)
+        guesses["auto_enrollment.auto_escalation"] = FieldGuess(None, enabled.confidence, enabled.evidence)
+        return guesses
+    about = _about(sentences, "automatic", "auto-", "default", "enrolled", "escalat", "contribution rate",
+                   "deferral rate")
+    rates = [(float(m.group(1) or m.group(2)), s) for s in about for m in _DEFAULT_RATE.finditer(s)]
+    if rate := _vote([(int(r) if r.is_integer() else r, s) for r, s in rates], 0.85):
+        guesses["auto_enrollment.default_rate"] = rate
+    escalation = [(not _negated(s, m.start()), s) for s in about for m in _ESCALATE.finditer(s)]
+    if escalate := _vote(escalation, 0.8):
+        guesses["auto_enrollment.auto_escalation"] = escalate
+    return guesses
+
+
+_HARDSHIP = re.compile(r"hardship\s+(?:withdrawals?|distributions?)", re.IGNORECASE)
+_LOANS = re.compile(r"\bloans?\b|\bborrow\b", re.IGNORECASE)
+
+
+# ============================================================
+# Entry points
+# ============================================================
+
+def pre_extract(text: str) -> dict[str, FieldGuess]:
+    """Every field the patterns could fill, by dotted path; fields they found nothing for are absent"""
+    text = text or ""
+    sentences = _sentences(text)
+    guesses = {
+        "plan_name": _plan_name(text),
+        "effective_date": _effective_date(text, sentences),
+        "eligibility.age_requirement": _age(sentences),
+        "eligibility.service_requirement": _service(sentences),
+        "eligibility.entry_dates": _entry_dates(sentences),
+        "contributions.catch_up_allowed": _catch_up(sentences),
+        "distributions.hardship_allowed": _flag(sentences, _HARDSHIP, r"(?:permit|allow|available)", 0.85),
+        "distributions.loans_allowed": _flag(
+            _about(sentences, "loan", "borrow", without=("loan program does not", "repay")),
+            _LOANS, r"(?:permit|allow|available|offer)", 0.8),
+    }
+    guesses["contributions.employer_match_formula"] = _match_formula(sentences)
+    guesses["contributions.match_cap"] = _match_cap(sentences, guesses["contributions.employer_match_formula"])
+    guesses.update(_vesting(text, sentences))
+    guesses.update(_auto_enrollment(sentences))
+    return {path: guess for path, guess in guesses.items() if guess is not None}
+
+
+def relevant_passages(text: str, groups: list[str], max_chars: int = 50000) -> str:
+    """
+    The passages of the document that speak to the given extraction
+    groups (see tools.plan_diff.groups_in), each with its neighbours;
+    the title page comes first when the "plan" group is asked for
+    """
+    text, chunks = chunk_text(text)
+    wanted = set(groups)
+    keep = [i for i, c in enumerate(chunks) if wanted & set(groups_in(text[c.start:c.end]))]
+    spans, last = [], -2
+    for i in keep:
+        lo, hi = max(0, i - 1), min(len(chunks), i + 2)
+        if spans and lo <= last:
+            spans[-1][1] = hi
+        else:
+            spans.append([lo, hi])
+        last = hi
+    passages = [text[chunks[lo].start:chunks[hi - 1].end] for lo, hi in spans]
+    if "plan" in wanted:
+        passages.insert(0, text[:TITLE_CHARS])
+    return "\n[...]\n".join(passages)[:max_chars]
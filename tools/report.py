@@ -0,0 +1,324 @@
+"""
+Report building and rendering - findings to a report dict, Markdown and PDF
+
+render_report(run_id, "md" | "pdf", build) renders a finished run's report
+once and then serves it from ReportCache (memory, plus REPORT_CACHE_DIR
+on disk), so reruns and repeat downloads don't render again.
+"""
+
+import os
+import re
+import threading
+import zlib
+from collections import OrderedDict
+from datetime import datetime
+from io import BytesIO
+from typing import Callable, Optional, List, Dict, Any, Union
+
+from .tracing import span
+
+
+def normalize_links(links: Optional[List[Dict[str, Any]]]) -> List[Dict[str, str]]:
+    seen = set()
+    out: List[Dict[str, str]] = []
+    for l in (links or []):
+        url = (l.get("url") or "").strip()
+        if not url or url in seen:
+            continue
+        seen.add(url)
+        out.append(
+            {
+                "title": (l.get("title") or "Official source").strip(),
+                "url": url,
+                "snippet": (l.get("snippet") or "").strip(),
+            }
+        )
+    return out
+
+
+def compile_report(plan_name: str, risk_level: str, findings: List[Dict[str, Any]]) -> Dict[str, Any]:
+    counts = {"compliant": 0, "gap": 0, "needs_review": 0}
+    for f in findings:
+        s = f.get("status", "needs_review")
+        counts[s] = counts.get(s, 0) + 1
+
+    all_sources: List[Dict[str, str]] = []
+    for f in findings:
+        all_sources.extend(normalize_links(f.get("links", [])))
+    all_sources = normalize_links(all_sources)
+
+    return {
+        "meta": {
+            "plan_name": plan_name,
+            "generated_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "risk_level": risk_level,
+            "counts": counts,
+        },
+        "findings": findings,
+        "sources": all_sources,
+    }
+
+
+def report_to_markdown(r: Dict[str, Any]) -> str:
+    meta = r["meta"]
+    c = meta["counts"]
+    lines: List[str] = []
+
+    lines.append(f"# Compliance Report — {meta['plan_name']}")
+    lines.append(f"**Generated:** {meta['generated_at']}")
+    lines.append(f"**Overall Risk:** {meta['risk_level']}")
+    lines.append("")
+    lines.append("## Executive Summary")
+    lines.append(f"- ✅ Compliant: **{c.get('compliant',0)}**")
+    lines.append(f"- ❌ Gaps: **{c.get('gap',0)}**")
+    lines.append(f"- ⚠ Needs Review: **{c.get('needs_review',0)}**")
+    lines.append("")
+    if "changes" in r:
+        # amendment review: field-level drift from the previous version of the plan
+        lines.append("## Changes Since Previous Version")
+        for ch in r["changes"]:
+            note = " (provision removed; previous value carried over)" if ch["change"] == "review" else ""
+            lines.append(f"- **{ch['field']}:** {ch['old'] if ch['old'] is not None else '—'} -> "
+                         f"{ch['new'] if ch['new'] is not None else '—'}{note}")
+        if not r["changes"]:
+            lines.append("_No extracted field changed._")
+        lines.append("")
+    lines.append("## Findings")
+    for f in r["findings"]:
+        status = f.get("status", "needs_review")
+        icon = {"compliant": "✅", "gap": "❌", "needs_review": "⚠"}.get(status, "⚠")
+        feature = f.get("feature", "—")
+        plan_value = str(f.get("plan_value", "—"))
+        regulation = (f.get("regulation") or "—").replace("\n", " ")
+        notes = (f.get("notes") or "").strip() or "—"
+        lines.append(f"### {icon} {feature}")
+        lines.append(f"- **Plan Value:** {plan_value}")
+        lines.append(f"- **Regulation:** {regulation}")
+        lines.append(f"- **Notes:** {notes}")
+        links = normalize_links(f.get("links", []))
+        if links:
+            lines.append("- **Sources:**")
+            for l in links:
+                lines.append(f"  - [{l['title']}]({l['url']})")
+        lines.append("")
+
+    lines.append("## Appendix — All Official Sources")
+    if r["sources"]:
+        for l in r["sources"]:
+            lines.append(f"- [{l['title']}]({l['url']})")
+    else:
+        lines.append("_No official web sources were used for this run._")
+
+    return "\n".join(lines)
+
+
+# ============================================================
+# PDF
+# ============================================================
+
+PAGE_WIDTH, PAGE_HEIGHT = 612, 792  # US Letter, points
+MARGIN_X, TOP_Y, BOTTOM_Y = 50, 732, 60
+LINE_HEIGHT = 12
+MAX_CHARS = 105
+
+# Characters Helvetica (WinAnsi) can't show are drawn from ZapfDingbats
+DINGBATS = {"✅": "4", "✔": "4", "❌": "8", "✘": "8", "⚠": "s"}
+DINGBAT_FALLBACK = "n"  # filled square
+
+
+def _pdf_string(data: bytes) -> bytes:
+    return b"(" + data.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)") + b")"
+
+
+def _text_ops(line: str, font: list) -> bytes:
+    """Show one line, switching to ZapfDingbats for characters outside WinAnsi; font is [current]"""
+    try:
+        data = line.encode("cp1252")
+    except UnicodeEncodeError:
+        data = None
+    if data is not None:  # the common case: one run in the current font
+        prefix = b"" if font[0] == b"/F1" else b"/F1 10 Tf "
+        font[0] = b"/F1"
+        return prefix + _pdf_string(data) + b" Tj T*"
+
+    ops, run = [], []
+
+    def flush():
+        if run:
+            if font[0] != b"/F1":
+                ops.append(b"/F1 10 Tf")
+                font[0] = b"/F1"
+            ops.append(_pdf_string("".join(run).encode("cp1252")) + b" Tj")
+            run.clear()
+
+    for ch in line:
+        try:
+            ch.encode("cp1252")
+            run.append(ch)
+        except UnicodeEncodeError:
+            flush()
+            if font[0] != b"/F3":
+                ops.append(b"/F3 10 Tf")
+                font[0] = b"/F3"
+            ops.append(_pdf_string(DINGBATS.get(ch, DINGBAT_FALLBACK).encode("ascii")) + b" Tj")
+    flush()
+    ops.append(b"T*")
+    return b" ".join(ops)
+
+
+def markdown_to_simple_pdf_bytes(title: str, markdown_text: str) -> bytes:
+    """
+    Markdown as plain text (no bold/italics), written straight to PDF: one
+    compressed text object per page in the standard Helvetica fonts, so
+    no font is embedded and no glyph is measured
+    """
+    lines: List[str] = []
+    for line in markdown_text.splitlines():
+        line = line.replace("\t", "    ")
+        lines.extend([line[i : i + MAX_CHARS] for i in range(0, len(line), MAX_CHARS)] or [""])
+
+    # same layout as before: title on page 1, then 12pt lines down to the bottom margin
+    first_y = TOP_Y - 26
+    pages: List[bytes] = []
+    start = 0
+    while start < len(lines) or not pages:
+        top = first_y if not pages else TOP_Y
+        count = (top - BOTTOM_Y) // LINE_HEIGHT + 1
+        ops = []
+        if not pages:
+            ops.append(b"BT /F2 14 Tf %d %d Td " % (MARGIN_X, TOP_Y) + _pdf_string(title.encode("cp1252", "replace")) + b" Tj ET")
+        font = [b"/F1"]
+        ops.append(b"BT /F1 10 Tf %d TL %d %d Td" % (LINE_HEIGHT, MARGIN_X, top))
+        ops.extend(_text_ops(line, font) for line in lines[start : start + count])
+        ops.append(b"ET")
+        pages.append(zlib.compress(b"\n".join(ops)))
+        start += count
+
+    # objects: 1 catalog, 2 page tree, 3-5 fonts, then a (page, content) pair per page
+    fonts = [b"/Helvetica /Encoding /WinAnsiEncoding", b"/Helvetica-Bold /Encoding /WinAnsiEncoding", b"/ZapfDingbats"]
+    page_ids = [6 + 2 * i for i in range(len(pages))]
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [%s] /Count %d >>" % (b" ".join(b"%d 0 R" % i for i in page_ids), len(pages)),
+        *(b"<< /Type /Font /Subtype /Type1 /BaseFont " + f + b" >>" for f in fonts),
+    ]
+    for page_id, content in zip(page_ids, pages):
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] "
+            b"/Resources << /Font << /F1 3 0 R /F2 4 0 R /F3 5 0 R >> >> /Contents %d 0 R >>"
+            % (PAGE_WIDTH, PAGE_HEIGHT, page_id + 1)
+        )
+        objects.append(b"<< /Length %d /Filter /FlateDecode >>\nstream\n" % len(content) + content + b"\nendstream")
+
+    out = BytesIO()
+    out.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(out.tell())
+        out.write(b"%d 0 obj\n" % number + body + b"\nendobj\n")
+    xref = out.tell()
+    out.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+    out.write(b"".join(b"%010d 00000 n \n" % offset for offset in offsets))
+    out.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref))
+    return out.getvalue()
+
+
+# ============================================================
+# Rendered reports, cached by run id
+# ============================================================
+
+REPORT_TITLE = "Compliance Audit Report"
+_SAFE_KEY = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+class ReportCache:
+    """
+    Markdown and PDF for finished runs, rendered on first request and then
+    served from an in-process LRU and, with root set, from disk (so they
+    outlive the process). A finished run's report never changes, so
+    entries are never invalidated
+    """
+
+    def __init__(self, root: str = None, max_entries: int = 64):
+        self.root = root
+        self.max_entries = max_entries
+        self._items: OrderedDict[tuple, Union[str, bytes]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "disk_hits": 0, "renders": 0}
+        if root:
+            os.makedirs(root, exist_ok=True)
+
+    def _path(self, key: str, fmt: str) -> Optional[str]:
+        # keys come from URLs and query params; only plain ids map to files
+        if not self.root or not _SAFE_KEY.match(key):
+            return None
+        return os.path.join(self.root, f"{key}.{fmt}")
+
+    def _remember(self, item: tuple, value: Union[str, bytes]):
+        with self._lock:
+            self._items[item] = value
+            self._items.move_to_end(item)
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+
+    def _cached(self, key: str, fmt: str) -> Optional[Union[str, bytes]]:
+        with self._lock:
+            value = self._items.get((key, fmt))
+            if value is not None:
+                self._items.move_to_end((key, fmt))
+                self.stats["hits"] += 1
+                return value
+
+        path = self._path(key, fmt)
+        if path and os.path.exists(path):
+            with open(path, "rb") as f:
+                data = f.read()
+            value = data.decode("utf-8") if fmt == "md" else data
+            self._remember((key, fmt), value)
+            with self._lock:
+                self.stats["disk_hits"] += 1
+            return value
+        return None
+
+    def render(self, key: str, fmt: str, build: Callable[[], Dict[str, Any]]) -> Union[str, bytes]:
+        """The "md" (str) or "pdf" (bytes) report for key; build() returns the report dict, called only on a miss"""
+        value = self._cached(key, fmt)
+        if value is not None:
+            return value
+
+        with span("report.render", format=fmt):
+            if fmt == "md":
+                value = report_to_markdown(build())
+            elif fmt == "pdf":
+                value = markdown_to_simple_pdf_bytes(REPORT_TITLE, self.render(key, "md", build))
+            else:
+                raise ValueError(f"unknown report format {fmt!r}")
+        with self._lock:
+            self.stats["renders"] += 1
+        self._remember((key, fmt), value)
+
+        path = self._path(key, fmt)
+        if path:
+            tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(value.encode("utf-8") if fmt == "md" else value)
+            os.replace(tmp, path)
+        return value
+
+
+_cache: Optional[ReportCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_report_cache() -> ReportCache:
+    """Lazy initialization of the process-wide report cache (REPORT_CACHE_DIR; empty = memory only)"""
+    global _cache
+
+    with _cache_lock:
+        if _cache is None:
+            _cache = ReportCache(root=os.getenv("REPORT_CACHE_DIR", ".cache/reports") or None)
+    return _cache
+
+
+def render_report(run_id: str, fmt: str, build: Callable[[], Dict[str, Any]]) -> Union[str, bytes]:
+    return get_report_cache().render(run_id, fmt, build)
@@ -0,0 +1,135 @@
+"""
+Local cross-encoder reranker with a persistent score cache
+
+Lets search_kb retrieve a wide candidate set cheaply and pass only the
+best few chunks on to the LLM. Scores are cached per (query, chunk hash),
+so repeat audits of the same features don't re-run the model.
+"""
+
+import hashlib
+import math
+import os
+import sqlite3
+import threading
+
+from sentence_transformers import CrossEncoder
+from .tracing import record_cache, span
+
+RERANK_MODEL_NAME = os.getenv("RERANK_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+
+# How many candidates to retrieve before reranking down to top_k
+RERANK_CANDIDATES = int(os.getenv("RERANK_CANDIDATES", "20"))
+
+_cross_encoder = None
+_cache = None
+
+
+def rerank_enabled() -> bool:
+    return os.getenv("KB_RERANK", "").lower() in ("1", "true", "yes")
+
+
+def _get_cross_encoder() -> CrossEncoder:
+    """Lazy initialization of the cross-encoder (CPU)"""
+    global _cross_encoder
+
+    if _cross_encoder is None:
+        _cross_encoder = CrossEncoder(RERANK_MODEL_NAME, device="cpu")
+
+    return _cross_encoder
+
+
+class RerankCache:
+    """(query, chunk hash) -> score, in memory and in a small SQLite file"""
+
+    def __init__(self, path: str):
+        self._memory: dict[tuple[str, str], float] = {}
+        self._lock = threading.Lock()
+        self._db = None
+        if path:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS scores ("
+                "model TEXT, query_hash TEXT, chunk_hash TEXT, score REAL, "
+                "PRIMARY KEY (model, query_hash, chunk_hash))"
+            )
+            self._db.commit()
+
+    def get_many(self, query_hash: str, chunk_hashes: list[str]) -> dict[str, float]:
+        found = {h: self._memory[(query_hash, h)] for h in chunk_hashes if (query_hash, h) in self._memory}
+        missing = [h for h in chunk_hashes if h not in found]
+
+        if missing and self._db is not None:
+            placeholders = ",".join("?" * len(missing))
+            with self._lock:
+                rows = self._db.execute(
+                    f"SELECT chunk_hash, score FROM scores WHERE model = ? AND query_hash = ? "
+                    f"AND chunk_hash IN ({placeholders})",
+                    [RERANK_MODEL_NAME, query_hash, *missing],
+                ).fetchall()
+            for chunk_hash, score in rows:
+                found[chunk_hash] = score
+                self._memory[(query_hash, chunk_hash)] = score
+
+        return found
+
+    def put_many(self, query_hash: str, scores: dict[str, float]):
+        for chunk_hash, score in scores.items():
+            self._memory[(query_hash, chunk_hash)] = score
+
+        if self._db is not None and scores:
+            with self._lock:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO scores VALUES (?, ?, ?, ?)",
+                    [(RERANK_MODEL_NAME, query_hash, h, s) for h, s in scores.items()],
+                )
+                self._db.commit()
+
+
+def _get_cache() -> RerankCache:
+    global _cache
+
+    if _cache is None:
+        _cache = RerankCache(os.getenv("RERANK_CACHE_PATH", ".cache/rerank.sqlite"))
+
+    return _cache
+
+
+def _sha256(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def chunk_hash(hit: dict) -> str:
+    metadata = hit["metadata"]
+    return metadata.get("content_hash") or _sha256(metadata.get("content", ""))
+
+
+def rerank(query: str, hits: list[dict], top_n: int) -> list[dict]:
+    """
+    Rerank retrieved hits with the cross-encoder and keep the best top_n.
+    Each hit's score becomes the cross-encoder probability.
+    """
+    if not hits:
+        return []
+
+    cache = _get_cache()
+    query_hash = _sha256(query)
+    hashes = [chunk_hash(h) for h in hits]
+
+    with span("kb.rerank", model=RERANK_MODEL_NAME, candidates=len(hits)):
+        scores = cache.get_many(query_hash, hashes)
+        missing = [(h, hit) for h, hit in zip(hashes, hits) if h not in scores]
+        record_cache(hits=len(hits) - len(missing), misses=len(missing))
+
+        if missing:
+            model = _get_cross_encoder()
+            logits = model.predict([(query, hit["metadata"].get("content", "")) for _, hit in missing])
+            fresh = {h: float(logit) for (h, _), logit in zip(missing, logits)}
+            cache.put_many(query_hash, fresh)
+            scores.update(fresh)
+
+    reranked = [
+        {**hit, "score": 1 / (1 + math.exp(-scores[h]))}
+        for h, hit in sorted(zip(hashes, hits), key=lambda pair: scores[pair[0]], reverse=True)
+    ]
+    return reranked[:top_n]
@@ -0,0 +1,211 @@
+"""
+Plan text normalization - strip page furniture before the text is prompted
+
+Text out of extract_text_from_pdf carries a "--- Page N ---" marker per
+page, running headers and footers, page numbers, tables of contents,
+disclaimers repeated page after page, words hyphenated across line breaks
+and ragged whitespace. None of it helps extraction, all of it is billed
+as input tokens:
+
+    normalized = normalize_text(pdf_text)
+    normalized.text                        # what the extraction prompt gets
+    normalized.tokens_saved                # tokens_before - tokens_after
+    normalized.removed                     # {"repeated_lines": 212, "page_numbers": 40, ...}
+
+Every pass is a single sweep over the lines with dict lookups, so the
+cost is linear in the length of the document. A line is only dropped as
+a header or footer when it repeats at the top or bottom of many pages,
+so a clause that happens to be restated somewhere is kept, and the first
+copy of every repeated line stays.
+"""
+
+import os
+import re
+from collections import Counter
+from dataclasses import dataclass, field
+
+from .tokens import count_tokens
+
+EDGE_LINES = 3               # header/footer candidates: this many non-blank lines at each end of a page
+REPEATED_PAGE_SHARE = 0.5    # ...dropped when they repeat on at least this share of the pages
+MIN_REPEATED_PAGES = 3
+BOILERPLATE_LINE_CHARS = 40  # a line this long repeated across pages anywhere on them is boilerplate too
+BOILERPLATE_PARAGRAPH_CHARS = 200  # a paragraph this long seen before is dropped (first copy kept)
+
+_PAGE_SPLIT = re.compile(r"^--- Page \d+ ---[ \t]*$|\f", re.MULTILINE)
+_PAGE_LABEL = re.compile(r"(?:page\s+)?\d+\s+of\s+\d+|page\s+\d+", re.IGNORECASE)
+# bare: only as a page's first/last line, and only its own page number - else it may be a table's last row
+_PAGE_NUMBER = re.compile(r"-?\s*(\d{1,4})\s*-?")
+_TOC_ENTRY = re.compile(r"(?:\.\s?){4,}\s*(?:\d{1,4}|[ivx]{1,5})$", re.IGNORECASE)
+_TOC_HEADING = re.compile(r"(?:table\s+of\s+)?contents", re.IGNORECASE)
+_HYPHEN_BREAK = re.compile(r"\b([A-Za-z]+)-\n[ \t]*([a-z]+)")
+_SPACE = re.compile(r"[ \t\u00a0]{2,}|[\t\u00a0]")  # single spaces are left alone: most of the text
+_DIGITS = re.compile(r"\d+")
+_LETTER = re.compile(r"[a-z]")
+_SENTENCE_END = (".", ";", ":", "!", "?")
+# a hyphen after these survives a line break unless the document spells the word closed up elsewhere
+_COMPOUND_PREFIXES = {"semi", "non", "pre", "post", "self", "co", "multi", "after", "catch", "full", "year",
+                      "one", "two", "three", "four", "five", "six", "ten", "twelve", "sixty", "seventy"}
+
+
+def normalization_enabled() -> bool:
+    return os.getenv("NORMALIZE_TEXT", "1").lower() not in ("0", "false", "no")
+
+
+@dataclass
+class NormalizedText:
+    text: str
+    tokens_before: int
+    tokens_after: int
+    chars_before: int
+    pages: int
+    removed: dict[str, int] = field(default_factory=dict)  # lines / breaks removed, by rule
+
+    @property
+    def tokens_saved(self) -> int:
+        return self.tokens_before - self.tokens_after
+
+    def summary(self) -> dict:
+        return {
+            "pages": self.pages,
+            "chars_before": self.chars_before,
+            "chars_after": len(self.text),
+            "tokens_before": self.tokens_before,
+            "tokens_after": self.tokens_after,
+            "tokens_saved": self.tokens_saved,
+            "removed": dict(self.removed),
+        }
+
+
+def _key(text: str) -> str:
+    """Header/footer lines that differ only in case, spacing or numbers (page 3 / page 4) share a key"""
+    return _DIGITS.sub("#", text.lower())
+
+
+def _exact_key(text: str) -> str:
+    """Boilerplate is matched on its exact text: numbers are the content of a plan provision"""
+    return " ".join(text.split())
+
+
+def _split_pages(text: str) -> list[tuple[list[str], list[str]]]:
+    """Per page: its lines, whitespace collapsed, and their keys (one regex pass per page, not per line)"""
+    pages = _PAGE_SPLIT.split(_SPACE.sub(" ", text))
+    if len(pages) > 1 and not pages[0].strip():
+        pages = pages[1:]  # nothing before the first page marker
+    return [([line.strip() for line in page.split("\n")], [key.strip() for key in _key(page).split("\n")])
+            for page in pages]
+
+
+def _edges(lines: list) -> list:
+    """The first and last EDGE_LINES of a page; a page too short to have a body has no edges"""
+    return lines[:EDGE_LINES] + lines[-EDGE_LINES:] if len(lines) > 2 * EDGE_LINES else []
+
+
+def _repeated_keys(pages: list[tuple[list[str], list[str]]]) -> tuple[set[str], set[str]]:
+    """
+    Keys of header/footer lines (digits collapsed), and the exact text of
+    long lines repeated anywhere on many pages
+    """
+    if len(pages) < MIN_REPEATED_PAGES:
+        return set(), set()
+    at_edges, anywhere = Counter(), Counter()
+    for lines, keys in pages:
+        keys = [k for k in keys if _LETTER.search(k)]  # a line of bare numbers is a page number or table row
+        at_edges.update(set(_edges(keys)))
+        anywhere.update({line for line in lines if len(line) >= BOILERPLATE_LINE_CHARS})
+    needed = max(MIN_REPEATED_PAGES, REPEATED_PAGE_SHARE * len(pages))
+    return ({k for k, n in at_edges.items() if n >= needed},
+            {k for k, n in anywhere.items() if n >= needed})
+
+
+def _has_leader(line: str) -> bool:
+    """Cheap test before _TOC_ENTRY: dot leaders of either spacing"""
+    return ".." in line or ". ." in line
+
+
+def _dehyphenate(text: str, removed: Counter) -> str:
+    """
+    Rejoin words broken across lines. A compound ("catch-up", "semi-annual")
+    keeps its hyphen when the document spells it that way elsewhere or it
+    starts with a compound prefix
+    """
+    if "-\n" not in text:
+        return text
+    words = set(re.findall(r"[A-Za-z]+(?:-[A-Za-z]+)*", text.lower()))
+
+    def join(m: re.Match) -> str:
+        removed["hyphen_breaks"] += 1
+        left, right = m.group(1), m.group(2)
+        closed, hyphenated = f"{left}{right}".lower(), f"{left}-{right}".lower()
+        keep = hyphenated in words or left.lower() in _COMPOUND_PREFIXES
+        keep = keep and not (closed in words and hyphenated not in words)
+        return f"{left}-{right}" if keep else f"{left}{right}"
+
+    return _HYPHEN_BREAK.sub(join, text)
+
+
+def normalize_text(text: str) -> NormalizedText:
+    """Strip page furniture, repeated headers/footers and boilerplate; collapse whitespace"""
+    text = text or ""
+    removed = Counter()
+    pages = _split_pages(_dehyphenate(text, removed))
+    if len(pages) > 1:
+        removed["page_breaks"] = len(pages) - 1
+    furniture, boilerplate = _repeated_keys(pages)
+
+    kept_pages, seen_repeated = [], set()
+    for page_no, (lines, keys) in enumerate(pages, start=1):
+        nonblank = [i for i, line in enumerate(lines) if line]
+        edges = set(_edges(nonblank))
+        ends = {nonblank[0], nonblank[-1]} if len(nonblank) > 1 else set()
+        kept = []
+        for i, (line, key) in enumerate(zip(lines, keys)):
+            if not line:
+                if kept and kept[-1]:
+                    kept.append("")  # runs of blank lines collapse to one
+                continue
+            number = _PAGE_NUMBER.fullmatch(line) if i in ends else None
+            repeated = key if i in edges and key in furniture else line if line in boilerplate else None
+            if (i in edges and _PAGE_LABEL.fullmatch(line)) or (number and int(number.group(1)) == page_no):
+                removed["page_numbers"] += 1
+            elif repeated is not None and repeated in seen_repeated:
+                removed["repeated_lines"] += 1  # first copy kept
+            elif (_has_leader(line) and _TOC_ENTRY.search(line)) or _TOC_HEADING.fullmatch(line):
+                removed["table_of_contents"] += 1
+            else:
+                if repeated is not None:
+                    seen_repeated.add(repeated)
+                kept.append(line)
+        while kept and not kept[-1]:
+            kept.pop()
+        if kept:
+            kept_pages.append(kept)
+
+    # a page ending mid-sentence runs straight on into the next; otherwise pages are paragraphs
+    out: list[str] = []
+    for lines in kept_pages:
+        if out and out[-1].endswith(_SENTENCE_END):
+            out.append("")
+        out.extend(lines)
+
+    # a long paragraph seen word for word before (a disclaimer restated per section) goes too;
+    # first copy kept
+    paragraphs, seen = [], set()
+    for paragraph in "\n".join(out).split("\n\n"):
+        if len(paragraph) >= BOILERPLATE_PARAGRAPH_CHARS:
+            key = _exact_key(paragraph)
+            if key in seen:
+                removed["repeated_paragraphs"] += 1
+                continue
+            seen.add(key)
+        paragraphs.append(paragraph)
+
+    normalized = "\n\n".join(paragraphs).strip()
+    return NormalizedText(
+        text=normalized,
+        tokens_before=count_tokens(text),
+        tokens_after=count_tokens(normalized),
+        chars_before=len(text),
+        pages=len(pages),
+        removed=dict(removed),
+    )
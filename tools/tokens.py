@@ -0,0 +1,46 @@
+"""
+Token counting helpers (tiktoken with an offline fallback)
+"""
+
+import os
+
+import tiktoken
+
+_encoding = None
+_encoding_failed = False
+
+
+def _get_encoding():
+    """Lazy load of the tokenizer; None when the BPE file can't be loaded (e.g. offline)"""
+    global _encoding, _encoding_failed
+
+    if _encoding is None and not _encoding_failed:
+        try:
+            _encoding = tiktoken.get_encoding(os.getenv("TIKTOKEN_ENCODING", "o200k_base"))
+        except Exception:
+            _encoding_failed = True
+
+    return _encoding
+
+
+def count_tokens(text: str) -> int:
+    """Number of tokens in text (~4 chars/token estimate if tiktoken is unavailable)"""
+    if not text:
+        return 0
+    encoding = _get_encoding()
+    if encoding is None:
+        return (len(text) + 3) // 4
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cut text to at most max_tokens tokens"""
+    if max_tokens <= 0:
+        return ""
+    encoding = _get_encoding()
+    if encoding is None:
+        return text[: max_tokens * 4]
+    tokens = encoding.encode(text, disallowed_special=())
+    if len(tokens) <= max_tokens:
+        return text
+    return encoding.decode(tokens[:max_tokens])
@@ -0,0 +1,276 @@
+"""
+Lightweight run tracing - nested spans with latency, tokens and cost
+
+Wrap a run in trace_run(); nodes and tools open span()s inside it.
+Each span records wall time, CPU time, LLM token usage, estimated cost
+and cache hits/misses. Traces export as JSON lines, one span per line.
+Outside of trace_run() spans are no-ops apart from their timing.
+
+LLM spans also carry the provider's cached input tokens (prompt caching)
+and the registry key of the prompt they sent (agents/prompts.py), so
+cached vs uncached input can be broken down per node and prompt version:
+
+    trace.prompt_cache()                              # this run
+    prompt_cache_summary(load_spans(paths))           # across exported runs
+"""
+
+import json
+import os
+import statistics
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
+from functools import wraps
+from typing import Iterable, Optional, Union
+
+# USD per 1M tokens: (input, cached input, output)
+MODEL_PRICES = {
+    "gpt-5": (1.25, 0.125, 10.00),
+    "gpt-5-mini": (0.25, 0.025, 2.00),
+    "gpt-5-nano": (0.05, 0.005, 0.40),
+}
+
+
+@dataclass
+class Span:
+    name: str
+    kind: str
+    span_id: str = field(default_factory=lambda: uuid.uuid4().hex[:12])
+    parent_id: Optional[str] = None
+    run_id: Optional[str] = None
+    start: float = 0.0
+    wall_ms: float = 0.0
+    cpu_ms: float = 0.0
+    input_tokens: int = 0
+    cached_tokens: int = 0
+    output_tokens: int = 0
+    cost_usd: float = 0.0
+    cache_hits: int = 0
+    cache_misses: int = 0
+    error: Optional[str] = None
+    attrs: dict = field(default_factory=dict)
+
+
+class Trace:
+    """All spans recorded during one run"""
+
+    def __init__(self, run_id: str = None):
+        self.run_id = run_id or uuid.uuid4().hex[:12]
+        self.spans: list[Span] = []
+        self._lock = threading.Lock()
+
+    def add(self, span: Span):
+        with self._lock:
+            self.spans.append(span)
+
+    def export_jsonl(self, path: str = None) -> str:
+        """Write spans as JSON lines; defaults to $TRACE_DIR/<run_id>.jsonl"""
+        if path is None:
+            trace_dir = os.getenv("TRACE_DIR", ".traces")
+            os.makedirs(trace_dir, exist_ok=True)
+            path = os.path.join(trace_dir, f"{self.run_id}.jsonl")
+
+        with open(path, "w", encoding="utf-8") as f:
+            for span in sorted(self.spans, key=lambda s: s.start):
+                f.write(json.dumps(asdict(span)) + "\n")
+        return path
+
+    def summary(self) -> list[dict]:
+        """One row per span name: call count, latency, tokens, cost, cache hits"""
+        groups: dict[tuple[str, str], list[Span]] = {}
+        for span in self.spans:
+            groups.setdefault((span.kind, span.name), []).append(span)
+
+        rows = []
+        for (kind, name), spans in groups.items():
+            walls = [s.wall_ms for s in spans]
+            rows.append({
+                "kind": kind,
+                "name": name,
+                "calls": len(spans),
+                "wall_ms_total": round(sum(walls), 1),
+                "wall_ms_p50": round(statistics.median(walls), 1),
+                "wall_ms_max": round(max(walls), 1),
+                "cpu_ms_total": round(sum(s.cpu_ms for s in spans), 1),
+                "input_tokens": sum(s.input_tokens for s in spans),
+                "cached_tokens": sum(s.cached_tokens for s in spans),
+                "uncached_tokens": sum(s.input_tokens - s.cached_tokens for s in spans),
+                "output_tokens": sum(s.output_tokens for s in spans),
+                "cost_usd": round(sum(s.cost_usd for s in spans), 6),
+                "cache_hits": sum(s.cache_hits for s in spans),
+                "cache_misses": sum(s.cache_misses for s in spans),
+                "errors": sum(1 for s in spans if s.error),
+            })
+
+        kind_order = {"node": 0, "llm": 1, "tool": 2}
+        return sorted(rows, key=lambda r: (kind_order.get(r["kind"], 3), -r["wall_ms_total"]))
+
+    def prompt_cache(self) -> list[dict]:
+        """Cached vs uncached input tokens per node and prompt version"""
+        return prompt_cache_summary(self.spans)
+
+
+_current_trace: ContextVar[Optional[Trace]] = ContextVar("current_trace", default=None)
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+@contextmanager
+def trace_run(run_id: str = None, trace: Trace = None):
+    """Collect spans for everything executed inside the block"""
+    trace = trace or Trace(run_id)
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+
+
+def iter_in_trace(iterable, trace: Trace):
+    """
+    Advance an iterator with the trace active on each step, for generators
+    like graph.stream() whose work happens inside next()
+    """
+    iterator = iter(iterable)
+    while True:
+        with trace_run(trace=trace):
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+        yield item
+
+
+@contextmanager
+def span(name: str, kind: str = "tool", **attrs):
+    """Time a block as a child of the current span"""
+    trace = _current_trace.get()
+    parent = _current_span.get()
+    s = Span(
+        name=name,
+        kind=kind,
+        parent_id=parent.span_id if parent else None,
+        run_id=trace.run_id if trace else None,
+        start=time.time(),
+        attrs=attrs,
+    )
+
+    token = _current_span.set(s)
+    wall_start = time.perf_counter()
+    cpu_start = time.thread_time()
+    try:
+        yield s
+    except BaseException as e:
+        s.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        s.wall_ms = (time.perf_counter() - wall_start) * 1000
+        s.cpu_ms = (time.thread_time() - cpu_start) * 1000
+        _current_span.reset(token)
+        if trace is not None:
+            trace.add(s)
+
+
+def traced(name: str = None, kind: str = "tool"):
+    """Decorator form of span()"""
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name or fn.__name__, kind=kind):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def estimate_cost(model: str, input_tokens: int, output_tokens: int, cached_tokens: int = 0) -> float:
+    prices = MODEL_PRICES.get(model)
+    if prices is None:
+        return 0.0
+    input_price, cached_price, output_price = prices
+    uncached = max(input_tokens - cached_tokens, 0)
+    return (uncached * input_price + cached_tokens * cached_price + output_tokens * output_price) / 1_000_000
+
+
+def record_usage(input_tokens: int, output_tokens: int, cached_tokens: int = 0, model: str = None):
+    """Attach LLM token usage (and its estimated cost) to the current span"""
+    s = _current_span.get()
+    if s is None:
+        return
+    s.input_tokens += input_tokens
+    s.output_tokens += output_tokens
+    s.cached_tokens += cached_tokens
+    s.cost_usd += estimate_cost(model or s.attrs.get("model", ""), input_tokens, output_tokens, cached_tokens)
+
+
+def record_cache(hits: int = 0, misses: int = 0):
+    """Count cache hits/misses against the current span"""
+    s = _current_span.get()
+    if s is not None:
+        s.cache_hits += hits
+        s.cache_misses += misses
+
+
+# ============================================================
+# Prompt cache metrics
+# ============================================================
+
+def load_spans(paths: Iterable[str]) -> list[dict]:
+    """Spans from exported trace files (export_jsonl), e.g. to aggregate many runs"""
+    spans = []
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            spans += [json.loads(line) for line in f if line.strip()]
+    return spans
+
+
+def _p50(values: list[float]) -> Optional[float]:
+    return round(statistics.median(values), 1) if values else None
+
+
+def prompt_cache_summary(spans: Iterable[Union[Span, dict]]) -> list[dict]:
+    """
+    One row per (node, prompt key) over LLM spans: input tokens split into
+    cached and uncached, cost against the cost without caching, and p50
+    latency of the calls that hit the cache vs those that didn't
+    """
+    groups: dict[tuple[str, str], list[dict]] = {}
+    for s in spans:
+        s = asdict(s) if isinstance(s, Span) else s
+        if s["kind"] != "llm":
+            continue
+        attrs = s.get("attrs") or {}
+        groups.setdefault((attrs.get("node") or s["name"], attrs.get("prompt") or "-"), []).append(s)
+
+    rows = []
+    for (node, prompt), calls in groups.items():
+        input_tokens = sum(s["input_tokens"] for s in calls)
+        cached_tokens = sum(s["cached_tokens"] for s in calls)
+        uncached_cost = sum(
+            estimate_cost((s.get("attrs") or {}).get("model", ""), s["input_tokens"], s["output_tokens"])
+            for s in calls
+        )
+        rows.append({
+            "node": node,
+            "prompt": prompt,
+            "calls": len(calls),
+            "cache_hit_calls": sum(1 for s in calls if s["cached_tokens"]),
+            "input_tokens": input_tokens,
+            "cached_tokens": cached_tokens,
+            "uncached_tokens": input_tokens - cached_tokens,
+            "cached_share": round(cached_tokens / input_tokens, 3) if input_tokens else 0.0,
+            "cost_usd": round(sum(s["cost_usd"] for s in calls), 6),
+            "cost_uncached_usd": round(uncached_cost, 6),
+            "wall_ms_p50_hit": _p50([s["wall_ms"] for s in calls if s["cached_tokens"]]),
+            "wall_ms_p50_miss": _p50([s["wall_ms"] for s in calls if not s["cached_tokens"]]),
+        })
+    return sorted(rows, key=lambda r: (r["node"], r["prompt"]))
@@ -1,8 +1,15 @@
 """
 Web search tool - restricted to official government sources only
+
+Searches run against the local mirror of official pages first
+(tools.official_mirror), which returns the matching passage text; the
+live DDGS search is the fallback when the mirror has nothing.
 """
 
 from ddgs import DDGS
+from .cancellation import bound_timeout, check_cancelled
+from .cassette import intercept
+from .tracing import span
 
 
 # Only allow official sources
@@ -15,16 +22,47 @@ ALLOWED_DOMAINS = [
     "govinfo.gov"
 ]
 
+# Per-request timeout, shortened to whatever is left of the audit's deadline
+WEB_TIMEOUT_S = 5.0
+
 
 def search_official_sources(query: str, max_results: int = 5) -> list[dict]:
+    return intercept(
+        "web",
+        {"query": query, "max_results": max_results},
+        lambda: _search_official_sources(query, max_results),
+    )
+
+
+def _search_official_sources(query: str, max_results: int) -> list[dict]:
+    from .official_mirror import mirror_mode, queue_urls, search_mirror
+
+    mode = mirror_mode()
+    if mode != "off":
+        with span("web.mirror", max_results=max_results) as s:
+            sources = search_mirror(query, max_results)
+            s.attrs["results"] = len(sources)
+        if sources or mode == "only":
+            return sources
+
+    sources = _search_live(query, max_results)
+    if mode != "off":
+        queue_urls([r["url"] for r in sources])
+    return sources
+
+
+def _search_live(query: str, max_results: int) -> list[dict]:
     site_filter = " OR ".join([f"site:{domain}" for domain in ALLOWED_DOMAINS])
     restricted_query = f"{query} ({site_filter})"
 
     sources = []
 
+    # outside the try: a cancelled audit must not turn into a "search error" link
+    check_cancelled()
     try:
-        with DDGS() as ddgs:
-            results = list(ddgs.text(restricted_query, max_results=max_results))
+        with span("web.ddgs", max_results=max_results):
+            with DDGS(timeout=bound_timeout(WEB_TIMEOUT_S)) as ddgs:
+                results = list(ddgs.text(restricted_query, max_results=max_results))
 
         for r in results:
             url = r.get("href", "")